@@ -1,12 +1,14 @@
 """
 数据管理API端点
 """
-from fastapi import APIRouter, HTTPException, UploadFile, File
+from fastapi import APIRouter, HTTPException, UploadFile, File, Query
 from typing import List, Dict, Optional
 from pydantic import BaseModel
 import json
 from loguru import logger
 
+from app.services.data_service import data_service
+
 router = APIRouter()
 
 
@@ -41,25 +43,11 @@ class PopulationData(BaseModel):
 
 
 @router.get("/facilities", response_model=List[Dict])
-async def get_facilities(city: Optional[str] = None, type: Optional[str] = None):
-    """获取健身设施数据"""
+async def get_facilities(city: Optional[str] = None, type: Optional[str] = None,
+                         limit: Optional[int] = Query(None, ge=1, le=1000), offset: int = Query(0, ge=0)):
+    """获取健身设施数据，limit 为空时返回全部"""
     try:
-        import os
-        # 读取真实数据
-        data_file = "data/raw/facilities.json"
-        if os.path.exists(data_file):
-            with open(data_file, 'r', encoding='utf-8') as f:
-                facilities = json.load(f)
-        else:
-            facilities = []
-        
-        # 过滤
-        if city:
-            facilities = [f for f in facilities if f["city"] == city]
-        if type:
-            facilities = [f for f in facilities if f["type"] == type]
-        
-        return facilities
+        return data_service.facilities(city=city, type=type, limit=limit, offset=offset)
     except Exception as e:
         logger.error(f"获取设施数据失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -69,18 +57,7 @@ async def get_facilities(city: Optional[str] = None, type: Optional[str] = None)
 async def get_population(city: Optional[str] = None):
     """获取人口数据"""
     try:
-        import os
-        data_file = "data/raw/population.json"
-        if os.path.exists(data_file):
-            with open(data_file, 'r', encoding='utf-8') as f:
-                population_data = json.load(f)
-        else:
-            population_data = []
-        
-        if city:
-            population_data = [p for p in population_data if p["city"] == city]
-        
-        return population_data
+        return data_service.population(city=city)
     except Exception as e:
         logger.error(f"获取人口数据失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -90,15 +67,7 @@ async def get_population(city: Optional[str] = None):
 async def get_participation():
     """获取健身参与数据"""
     try:
-        import os
-        data_file = "data/raw/participation.json"
-        if os.path.exists(data_file):
-            with open(data_file, 'r', encoding='utf-8') as f:
-                participation_data = json.load(f)
-        else:
-            participation_data = []
-        
-        return participation_data
+        return data_service.participation()
     except Exception as e:
         logger.error(f"获取参与数据失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -106,7 +75,7 @@ async def get_participation():
 
 @router.get("/statistics")
 async def get_statistics():
-    """获取统计概览"""
+    """获取统计概览，没有数据报告时由分析库实时汇总"""
     try:
         import os
         data_file = "data/processed/data_report.json"
@@ -115,12 +84,9 @@ async def get_statistics():
                 stats = json.load(f)
         else:
             stats = {
-                "total_facilities": 0,
-                "total_population": 0,
                 "coverage_rate": 0,
                 "kg_entities": 0,
-                "cities_count": 0,
-                "avg_participation_rate": 0
+                **data_service.summary()
             }
         return stats
     except Exception as e:
@@ -128,6 +94,19 @@ async def get_statistics():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/traffic")
+async def get_traffic(facility_id: Optional[str] = None, start: Optional[str] = None,
+                      end: Optional[str] = None, granularity: str = "day"):
+    """获取客流汇总（按小时/天/月），start 含、end 不含，格式 YYYY-MM-DD"""
+    try:
+        return data_service.traffic(facility_id, start, end, granularity)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"获取客流数据失败: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.post("/upload")
 async def upload_data(file: UploadFile = File(...)):
     """上传数据文件"""
@@ -1,11 +1,13 @@
 """
 知识图谱API端点
 """
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 from typing import List, Dict, Optional
 from pydantic import BaseModel
 from loguru import logger
 
+from app.services.knowledge_graph_service import MAX_PAGE_SIZE, knowledge_graph_service
+
 router = APIRouter()
 
 
@@ -24,156 +26,125 @@ class RelationQuery(BaseModel):
 
 
 @router.get("/entities")
-async def get_entities(entity_type: Optional[str] = None, limit: int = 50):
-    """获取实体列表"""
+async def get_entities(
+    entity_type: Optional[str] = None,
+    name: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = 50
+):
+    """分页获取实体列表，翻页时传入上一页返回的 next_cursor"""
     try:
-        entities = [
-            {"id": 1, "name": "石家庄市", "type": "City", "properties": {"population": 11000000, "province": "河北省"}},
-            {"id": 2, "name": "保定市", "type": "City", "properties": {"population": 9400000, "province": "河北省"}},
-            {"id": 3, "name": "石家庄市体育馆", "type": "Facility", "properties": {"area": 15000, "capacity": 8000}},
-            {"id": 4, "name": "跑步", "type": "Activity", "properties": {"category": "有氧运动", "intensity": "中等"}},
-            {"id": 5, "name": "河北省全民健身实施计划", "type": "Policy", "properties": {"level": "省级", "year": 2021}}
-        ]
-        
-        if entity_type:
-            entities = [e for e in entities if e["type"] == entity_type]
-        
-        return entities[:limit]
+        return knowledge_graph_service.list_entities(entity_type, name, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]) if e.args else str(e))
     except Exception as e:
         logger.error(f"获取实体失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/relations")
-async def get_relations(source: Optional[str] = None, target: Optional[str] = None):
-    """获取关系"""
+async def get_relations(
+    source: Optional[str] = None,
+    target: Optional[str] = None,
+    relation: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = 50
+):
+    """分页获取关系，source/target 可以是实体ID或名称"""
     try:
-        relations = [
-            {
-                "source": "石家庄市体育馆",
-                "relation": "LOCATED_IN",
-                "target": "石家庄市",
-                "properties": {"district": "长安区"}
-            },
-            {
-                "source": "石家庄市体育馆",
-                "relation": "PROVIDES",
-                "target": "篮球",
-                "properties": {"courts": 4}
-            },
-            {
-                "source": "河北省全民健身实施计划",
-                "relation": "AFFECTS",
-                "target": "石家庄市",
-                "properties": {"effective_date": "2022-01-01"}
-            }
-        ]
-        
-        if source:
-            relations = [r for r in relations if r["source"] == source]
-        if target:
-            relations = [r for r in relations if r["target"] == target]
-        
-        return relations
+        return knowledge_graph_service.list_relations(source, relation, target, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]) if e.args else str(e))
     except Exception as e:
         logger.error(f"获取关系失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/search")
-async def search_graph(query: str, limit: int = 20):
-    """搜索知识图谱"""
+async def search_graph(query: str, limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+                       entity_type: Optional[str] = None):
+    """搜索知识图谱实体（支持部分名称与错别字）"""
     try:
-        # 模拟搜索结果
-        results = [
-            {
-                "entity": "石家庄市体育馆",
-                "type": "Facility",
-                "score": 0.95,
-                "snippet": "位于石家庄市长安区,是综合性体育场馆"
-            },
-            {
-                "entity": "石家庄市",
-                "type": "City",
-                "score": 0.88,
-                "snippet": "河北省省会,人口1100万"
-            }
-        ]
-        
-        return results[:limit]
+        return knowledge_graph_service.search(query, limit, entity_type)
     except Exception as e:
         logger.error(f"搜索失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/suggest")
+async def suggest_entities(prefix: str, limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+                           entity_type: Optional[str] = None):
+    """实体名称前缀补全"""
+    try:
+        return knowledge_graph_service.suggest(prefix, limit, entity_type)
+    except Exception as e:
+        logger.error(f"补全失败: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/path")
-async def find_path(start: str, end: str, max_depth: int = 3):
-    """查找实体间路径"""
+async def find_path(start: str, end: str, max_depth: int = 3, relation: Optional[List[str]] = Query(None)):
+    """查找实体间最短路径，可用 relation 限定只沿某些关系类型走"""
     try:
-        path = {
-            "start": start,
-            "end": end,
-            "path": [
-                {"entity": start, "relation": "LOCATED_IN"},
-                {"entity": "石家庄市", "relation": "HAS_POLICY"},
-                {"entity": end}
-            ],
-            "length": 2
-        }
-        
-        return path
+        return knowledge_graph_service.find_path(start, end, max_depth, relation)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]) if e.args else str(e))
     except Exception as e:
         logger.error(f"路径查找失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/query")
+async def pattern_query(q: str, limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE), distinct: bool = False):
+    """三元组模式查询，模式间用 " . " 分隔，? 开头为变量，例如 ?f 位于 石家庄市 . ?f 提供 ?s"""
+    try:
+        return knowledge_graph_service.pattern_query(q, limit, distinct)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"模式查询失败: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/statistics")
 async def get_graph_statistics():
     """获取图谱统计信息"""
     try:
-        stats = {
-            "total_entities": 15432,
-            "total_relations": 28765,
-            "entity_types": {
-                "City": 11,
-                "Facility": 1258,
-                "Activity": 45,
-                "Policy": 128,
-                "Person": 13990
-            },
-            "relation_types": {
-                "LOCATED_IN": 1258,
-                "PROVIDES": 5632,
-                "AFFECTS": 1408,
-                "PARTICIPATES": 20467
-            }
-        }
-        
-        return stats
+        return knowledge_graph_service.statistics()
     except Exception as e:
         logger.error(f"获取统计信息失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/visualization")
-async def get_visualization_data(center_entity: str, depth: int = 2):
-    """获取可视化数据"""
+async def get_visualization_data(
+    center_entity: str,
+    depth: int = 2,
+    max_nodes: int = 200,
+    max_fanout: int = 50,
+    relation: Optional[List[str]] = Query(None)
+):
+    """获取以某实体为中心的k跳子图，每跳每个节点最多展开 max_fanout 条关系，节点数不超过 max_nodes"""
     try:
-        viz_data = {
-            "nodes": [
-                {"id": "1", "label": center_entity, "type": "Facility", "size": 30},
-                {"id": "2", "label": "石家庄市", "type": "City", "size": 25},
-                {"id": "3", "label": "篮球", "type": "Activity", "size": 20},
-                {"id": "4", "label": "游泳", "type": "Activity", "size": 20}
-            ],
-            "edges": [
-                {"source": "1", "target": "2", "label": "LOCATED_IN"},
-                {"source": "1", "target": "3", "label": "PROVIDES"},
-                {"source": "1", "target": "4", "label": "PROVIDES"}
-            ]
-        }
-        
-        return viz_data
+        return knowledge_graph_service.visualization(center_entity, depth, max_nodes, max_fanout, relation)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]) if e.args else str(e))
     except Exception as e:
         logger.error(f"获取可视化数据失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/complete")
+async def complete_facility_sports(facility: str, top_k: int = 5):
+    """知识图谱补全：推测设施可能提供的运动项目"""
+    try:
+        return knowledge_graph_service.complete_facility_sports(facility, top_k)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]) if e.args else str(e))
+    except Exception as e:
+        logger.error(f"知识图谱补全失败: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
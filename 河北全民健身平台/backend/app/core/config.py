@@ -1,6 +1,7 @@
 """
 配置文件
 """
+from pathlib import Path
 from typing import List
 
 
@@ -65,8 +66,26 @@ class Settings:
     SPARK_MASTER: str = "local[*]"
     SPARK_APP_NAME: str = "HebeFitness"
     
+    # 项目根目录（backend的上一级），相对路径均以此为基准
+    PROJECT_ROOT: Path = Path(__file__).resolve().parents[3]
+    
+    # 数据配置
+    FACILITIES_DATA_FILE: str = "fitness_facilities_data.json"
+    KG_DATA_FILE: str = "fps_knowledge_graph.json"  # 也可以是 export_to_jsonl 导出的 .jsonl 文件
+    KG_LOAD_WORKERS: int = 1  # .jsonl 图谱的并行解析进程数
+    COLUMNAR_DATA_DIR: str = "data/columnar"  # Parquet列式数据层，由 data_processing/storage/columnar_store.py 生成
+    ANALYTICS_DB_FILE: str = "data/analytics.db"  # SQLite分析库，API只读访问，启动时生成
+    ANALYTICS_SYNC_INTERVAL: int = 30  # 检查Parquet数据层/JSON源文件更新、重新载入分析库的间隔（秒）
+    ROLLUP_REFRESH_INTERVAL: int = 30  # 检查分析库变化、刷新图表汇总的间隔（秒）
+    
     # 模型配置
     MODEL_DIR: str = "ml_models/saved_models"
+    MODEL_MEMORY_BUDGET_MB: int = 512  # 已加载模型的内存上限，超出后按LRU淘汰
+    MODEL_REFRESH_INTERVAL: int = 30  # 检查新版本模型的间隔（秒）
+    
+    @property
+    def MODEL_PATH(self) -> Path:
+        return self.PROJECT_ROOT / self.MODEL_DIR
     
     class Config:
         case_sensitive = True
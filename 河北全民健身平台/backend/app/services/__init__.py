@@ -0,0 +1,11 @@
+"""
+业务服务层
+封装模型、知识图谱等需要在多个API端点间共享的资源
+"""
+import sys
+
+from app.core.config import settings
+
+# 服务层需要导入项目根目录下的模型与知识图谱模块
+if str(settings.PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(settings.PROJECT_ROOT))
@@ -0,0 +1,106 @@
+"""
+数据服务
+场馆、人口、健身参与与客流数据从嵌入式SQLite分析库读取，过滤、分页与聚合都在SQL中完成；
+每个工作进程复用一个只读连接。分析库在应用启动时生成（Parquet数据层优先，否则读取JSON源文件）；
+之后定期在后台线程中检查来源数据，列式数据导入或客流生成写入新数据后自动重新载入对应的表，
+无需任何外部数据库服务
+"""
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+
+from loguru import logger
+
+from app.core.config import settings
+from data_processing.storage.sqlite_store import AnalyticsStore
+
+
+class DataService:
+    """数据读取服务"""
+
+    def __init__(self, store: Optional[AnalyticsStore] = None,
+                 sync_interval: float = settings.ANALYTICS_SYNC_INTERVAL):
+        """
+        Args:
+            store: 分析库，默认使用配置中的路径
+            sync_interval: 检查来源数据更新的最小间隔（秒）
+        """
+        self.store = store or AnalyticsStore(
+            settings.PROJECT_ROOT / settings.ANALYTICS_DB_FILE,
+            settings.PROJECT_ROOT / settings.COLUMNAR_DATA_DIR
+        )
+        self.sync_interval = sync_interval
+        self._build_lock = threading.Lock()
+        self._checked = 0.0
+
+    def sync(self) -> Dict[str, int]:
+        """生成缺失的分析库并重新载入来源数据有更新的表
+
+        会阻塞到载入完成，应在启动时或工作线程中调用
+
+        Returns:
+            重新载入的表名 -> 行数
+        """
+        with self._build_lock:
+            self._checked = time.monotonic()
+            if not self.store.exists():
+                logger.info(f"未找到分析库，开始生成: {self.store.db_file}")
+            return self.store.sync()
+
+    def _sync_in_background(self):
+        try:
+            self.sync()
+        except Exception as e:
+            logger.warning(f"分析库更新失败，继续使用现有数据: {e}")
+
+    def ready(self) -> AnalyticsStore:
+        """分析库
+
+        正常情况下启动时已生成；启动时生成失败才会在这里同步生成。
+        距上次检查超过 sync_interval 时在后台线程中检查来源数据，请求不等待重新载入
+        """
+        if not self.store.exists():
+            self.sync()
+        elif time.monotonic() - self._checked >= self.sync_interval:
+            self._checked = time.monotonic()
+            threading.Thread(target=self._sync_in_background, name='analytics-sync', daemon=True).start()
+        return self.store
+
+    def read(self, name: str, columns: Optional[Sequence[str]] = None,
+             equals: Optional[Dict[str, object]] = None,
+             limit: Optional[int] = None, offset: int = 0) -> List[Dict]:
+        """读取表记录
+
+        Args:
+            name: 表名
+            columns: 需要的字段，None 为全部字段
+            equals: 字段 -> 取值 的相等过滤条件，值为None或空字符串的条件忽略
+            limit: 分页大小，None 为不分页
+            offset: 分页偏移
+        """
+        equals = {key: value for key, value in (equals or {}).items() if value not in (None, '')}
+        return self.ready().select(name, columns, equals, limit, offset)
+
+    def count(self, name: str, equals: Optional[Dict[str, object]] = None) -> int:
+        equals = {key: value for key, value in (equals or {}).items() if value not in (None, '')}
+        return self.ready().count(name, equals)
+
+    def facilities(self, city: Optional[str] = None, type: Optional[str] = None,
+                   limit: Optional[int] = None, offset: int = 0) -> List[Dict]:
+        return self.read('raw_facilities', equals={'city': city, 'type': type}, limit=limit, offset=offset)
+
+    def population(self, city: Optional[str] = None) -> List[Dict]:
+        return self.read('population', equals={'city': city})
+
+    def participation(self, city: Optional[str] = None) -> List[Dict]:
+        return self.read('participation', equals={'city': city})
+
+    def summary(self) -> Dict:
+        return self.ready().summary()
+
+    def traffic(self, facility_id: Optional[str] = None, start: Optional[str] = None,
+                end: Optional[str] = None, granularity: str = 'day') -> List[Dict]:
+        return self.ready().traffic_series(facility_id, start, end, granularity)
+
+
+data_service = DataService()
@@ -0,0 +1,466 @@
+"""
+知识图谱服务
+启动时把 fps_knowledge_graph.json 载入内存并建好索引，实体与关系按游标分页返回，
+各类型数量预先统计，路径与子图查询走邻接索引上的遍历引擎，实体搜索走倒排索引，
+三元组模式查询由带查询计划缓存的模式查询引擎执行；另基于已发布的TransE嵌入做链接补全，例如推测设施可能提供的运动项目
+"""
+import base64
+import binascii
+import threading
+from itertools import chain, islice
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from loguru import logger
+
+from app.core.config import settings
+from app.services.model_registry import ModelRegistry, model_registry
+from knowledge_graph.graph_traversal import GraphTraversal
+from knowledge_graph.pattern_query import PatternQueryEngine
+from knowledge_graph.relation_table import KnowledgeGraphData, load_graph
+from knowledge_graph.search_index import EntitySearchIndex
+from ml_models.knowledge_graph.transe_model import TransE
+
+# FPS知识图谱中 设施 -提供-> 运动项目 的关系名与运动项目实体前缀
+PROVIDES_RELATION = '提供'
+SPORT_PREFIX = 'Sport_'
+FACILITY_PREFIX = 'Facility_'
+
+# 分页与可视化的上限，避免一次请求序列化整张图
+MAX_PAGE_SIZE = 500
+MAX_VISUALIZATION_NODES = 1000
+MAX_TRAVERSAL_DEPTH = 6
+SNIPPET_LENGTH = 60
+
+
+def encode_cursor(value) -> str:
+    """游标编码（对调用方不透明）"""
+    return base64.urlsafe_b64encode(str(value).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor: str) -> str:
+    """游标解码
+
+    Raises:
+        ValueError: 游标格式错误
+    """
+    try:
+        return base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+    except (binascii.Error, UnicodeError) as e:
+        raise ValueError(f"无效的分页游标: {cursor}") from e
+
+
+def clamp_limit(limit: int, upper: int = MAX_PAGE_SIZE) -> int:
+    return max(1, min(limit, upper))
+
+
+class GraphIndex:
+    """已加载知识图谱上的查询索引
+
+    实体按类型保持文件中的顺序（新增实体追加在所属类型末尾），游标记录上一页最后一个实体ID
+    （或关系行号），翻页时直接定位，不随页码增大而变慢
+    """
+
+    def __init__(self, graph: KnowledgeGraphData):
+        self.graph = graph
+        self.type_ids: Dict[str, List[str]] = {}
+        # 实体ID -> 类型内位置
+        self.positions: Dict[str, int] = {}
+        # 名称 -> 实体ID（重名时取第一个）
+        self.name_index: Dict[str, str] = {}
+        self.search_index = EntitySearchIndex()
+        for entity_type, entities in graph.entities.items():
+            self.type_ids.setdefault(entity_type, [])
+            for entity_id in entities:
+                self._index_entity(entity_type, entity_id)
+        self.search_index.optimize()
+
+        relations = graph.relations
+        self.traversal = GraphTraversal(relations)
+        # 模式中的常量也可以写实体名称
+        self.query_engine = PatternQueryEngine(relations, aliases=self.name_index)
+        self.relation_types = dict(sorted(relations.predicate_counts().items(), key=lambda x: x[1], reverse=True))
+
+    def _index_entity(self, entity_type: str, entity_id: str):
+        ids = self.type_ids.setdefault(entity_type, [])
+        self.positions[entity_id] = len(ids)
+        ids.append(entity_id)
+        label = self.label(entity_id)
+        self.name_index.setdefault(label, entity_id)
+        properties = self.graph.get_entity(entity_id).properties
+        self.search_index.add(entity_id, label, entity_type, EntitySearchIndex.describe(properties))
+
+    def add_entity(self, entity_type: str, entity_id: str, properties: Dict):
+        """新增实体：写入图谱并增量更新列表、名称与全文索引（已存在的实体只更新属性与全文索引）"""
+        if entity_id in self.positions:
+            record = self.graph.get_entity(entity_id)
+            record.properties.clear()
+            record.properties.update(properties)
+            self.search_index.add(entity_id, self.label(entity_id), record.entity_type,
+                                  EntitySearchIndex.describe(record.properties))
+            return
+        self.graph.add_entity(entity_type, entity_id, properties)
+        self._index_entity(entity_type, entity_id)
+
+    @property
+    def total_entities(self) -> int:
+        return len(self.positions)
+
+    def label(self, entity_id: str) -> str:
+        """实体的显示名称"""
+        record = self.graph.get_entity(entity_id)
+        if record is None:
+            return entity_id
+        props = record.properties
+        return props.get('name') or props.get('title') or entity_id
+
+    def entity_type(self, entity_id: str) -> str:
+        record = self.graph.get_entity(entity_id)
+        return record.entity_type if record is not None else 'Unknown'
+
+    def resolve(self, entity: str) -> str:
+        """实体ID或名称 -> 实体ID
+
+        Raises:
+            KeyError: 实体不存在
+        """
+        if entity in self.positions:
+            return entity
+        entity_id = self.name_index.get(entity)
+        if entity_id is None:
+            raise KeyError(f"知识图谱中不存在实体: {entity}")
+        return entity_id
+
+    def entity_summary(self, entity_id: str) -> Dict:
+        record = self.graph.get_entity(entity_id)
+        return {
+            'id': entity_id,
+            'name': self.label(entity_id),
+            'type': record.entity_type,
+            'properties': record.properties
+        }
+
+    def list_entities(self, entity_type: Optional[str] = None, name: Optional[str] = None,
+                      cursor: Optional[str] = None, limit: int = 50) -> Dict:
+        """分页列出实体
+
+        Args:
+            entity_type: 实体类型（Facility/Area/Sport...），为空时列出全部
+            name: 名称包含的关键字
+            cursor: 上一页返回的 next_cursor
+            limit: 每页数量
+
+        Raises:
+            KeyError: 实体类型不存在
+            ValueError: 游标无效
+        """
+        if entity_type and entity_type not in self.type_ids:
+            raise KeyError(f"知识图谱中不存在实体类型: {entity_type}")
+        types = [entity_type] if entity_type else list(self.type_ids)
+
+        # 从游标所在类型的下一个实体开始，依次遍历后续类型
+        first, start = 0, 0
+        if cursor:
+            after = decode_cursor(cursor)
+            record = self.graph.get_entity(after)
+            if record is None or record.entity_type not in types:
+                raise ValueError(f"无效的分页游标: {cursor}")
+            first, start = types.index(record.entity_type), self.positions[after] + 1
+        ids = chain(islice(self.type_ids[types[first]], start, None),
+                    *(self.type_ids[t] for t in types[first + 1:]))
+
+        # 多取一个判断是否还有下一页
+        limit = clamp_limit(limit)
+        matched = []
+        for entity_id in ids:
+            if name and name not in self.label(entity_id):
+                continue
+            matched.append(entity_id)
+            if len(matched) > limit:
+                break
+
+        page = matched[:limit]
+        return {
+            'items': [self.entity_summary(entity_id) for entity_id in page],
+            'total': None if name else sum(len(self.type_ids[t]) for t in types),
+            'next_cursor': encode_cursor(page[-1]) if len(matched) > limit else None
+        }
+
+    def list_relations(self, source: Optional[str] = None, relation: Optional[str] = None,
+                       target: Optional[str] = None, cursor: Optional[str] = None, limit: int = 50) -> Dict:
+        """分页列出匹配的关系
+
+        Args:
+            source: 主语实体ID或名称
+            relation: 关系类型（谓词）
+            target: 宾语实体ID或名称
+            cursor: 上一页返回的 next_cursor
+            limit: 每页数量
+
+        Raises:
+            KeyError: 实体不存在
+            ValueError: 游标无效
+        """
+        relations = self.graph.relations
+        subject = self.resolve(source) if source else None
+        object_ = self.resolve(target) if target else None
+        rows = relations.rows(subject, relation, object_)
+
+        start = 0
+        if cursor:
+            after = decode_cursor(cursor)
+            if not after.isdigit():
+                raise ValueError(f"无效的分页游标: {cursor}")
+            start = int(np.searchsorted(rows, int(after), side='right'))
+
+        page = rows[start:start + clamp_limit(limit)]
+        items = []
+        for i in page:
+            row = relations.row(int(i))
+            items.append({
+                'source': row['subject'],
+                'source_name': self.label(row['subject']),
+                'relation': row['predicate'],
+                'target': row['object'],
+                'target_name': self.label(row['object']),
+                'properties': row['properties']
+            })
+
+        has_more = start + len(page) < len(rows)
+        return {
+            'items': items,
+            'total': int(len(rows)),
+            'next_cursor': encode_cursor(int(page[-1])) if has_more else None
+        }
+
+    def search(self, query: str, limit: int = 20, entity_type: Optional[str] = None) -> List[Dict]:
+        """全文检索实体，分数按第一名归一化到 (0, 1]"""
+        hits = self.search_index.search(query, clamp_limit(limit), entity_type)
+        top = hits[0][1] if hits else 1.0
+        results = []
+        for entity_id, score in hits:
+            record = self.graph.get_entity(entity_id)
+            results.append({
+                'id': entity_id,
+                'entity': self.label(entity_id),
+                'type': record.entity_type,
+                'score': round(score / top, 4),
+                'snippet': EntitySearchIndex.describe(record.properties)[:SNIPPET_LENGTH]
+            })
+        return results
+
+    def suggest(self, prefix: str, limit: int = 10, entity_type: Optional[str] = None) -> List[Dict]:
+        """名称前缀补全"""
+        return [
+            {'id': entity_id, 'entity': self.label(entity_id), 'type': self.entity_type(entity_id)}
+            for entity_id in self.search_index.suggest(prefix, clamp_limit(limit), entity_type)
+        ]
+
+    def statistics(self) -> Dict:
+        """图谱统计（加载时预先计算）"""
+        return {
+            'total_entities': self.total_entities,
+            'total_relations': len(self.graph.relations),
+            'entity_types': {t: len(ids) for t, ids in self.type_ids.items()},
+            'relation_types': self.relation_types
+        }
+
+    def neighborhood(self, center: str, depth: int = 2, max_nodes: int = 200, max_fanout: int = 50,
+                     relations: Optional[List[str]] = None) -> Dict:
+        """以某实体为中心的k跳子图，每跳每个节点最多展开 max_fanout 条关系
+
+        Raises:
+            KeyError: 实体不存在
+        """
+        center_id = self.resolve(center)
+        ego = self.traversal.ego_network(
+            center_id,
+            hops=max(0, min(depth, MAX_TRAVERSAL_DEPTH)),
+            max_fanout=clamp_limit(max_fanout, MAX_VISUALIZATION_NODES),
+            predicates=relations,
+            max_nodes=clamp_limit(max_nodes, MAX_VISUALIZATION_NODES)
+        )
+        table = self.graph.relations
+        return {
+            'center': center_id,
+            'nodes': [
+                {
+                    'id': node,
+                    'label': self.label(node),
+                    'type': self.entity_type(node),
+                    'size': max(30 - 5 * level, 10),
+                    'depth': level
+                }
+                for node, level in ego['nodes']
+            ],
+            'edges': [
+                {
+                    'source': table.terms[table.subjects[i]],
+                    'target': table.terms[table.objects[i]],
+                    'label': table.terms[table.predicates[i]]
+                }
+                for i in ego['rows']
+            ],
+            'truncated': ego['truncated']
+        }
+
+    def find_path(self, start: str, end: str, max_depth: int = 3,
+                  relations: Optional[List[str]] = None) -> Dict:
+        """两个实体间的最短关系路径（不区分关系方向）
+
+        Raises:
+            KeyError: 实体不存在
+        """
+        start_id, end_id = self.resolve(start), self.resolve(end)
+        path = self.traversal.shortest_path(start_id, end_id, max(0, min(max_depth, MAX_TRAVERSAL_DEPTH)),
+                                            predicates=relations)
+        steps = []
+        for entity_id, row, direction in path or []:
+            step = {'entity': entity_id, 'name': self.label(entity_id), 'type': self.entity_type(entity_id)}
+            if row is not None:
+                step['relation'] = self.graph.relations.terms[self.graph.relations.predicates[row]]
+                step['direction'] = direction
+            steps.append(step)
+        return {
+            'start': start_id,
+            'end': end_id,
+            'found': path is not None,
+            'path': steps,
+            'length': len(steps) - 1 if path is not None else None
+        }
+
+    def pattern_query(self, query: str, limit: int = 50, distinct: bool = False) -> Dict:
+        """执行三元组模式查询，例如 "?f 位于 石家庄市 . ?f 提供 ?s"
+
+        Raises:
+            ValueError: 查询语法错误或中间结果过大
+        """
+        plan = self.query_engine.compile(query)
+        items, total = self.query_engine.execute_counted(query, distinct=distinct, limit=clamp_limit(limit))
+        labels = {value: self.label(value) for item in items for value in item.values()}
+        return {
+            'variables': plan.variables,
+            'items': items,
+            'labels': labels,
+            'total': total,
+            'plan': plan.explain()
+        }
+
+
+class KnowledgeGraphService:
+    """知识图谱服务"""
+
+    TRANSE_MODEL = 'transe'
+
+    def __init__(self, registry: ModelRegistry, kg_file: Path):
+        self.registry = registry
+        self.kg_file = Path(kg_file)
+        self._lock = threading.Lock()
+        self._graph_index: Optional[GraphIndex] = None
+        self._graph_lock = threading.Lock()
+        # 按模型实例缓存的名称索引，模型切换版本后重新构建
+        self._indexed_model: Optional[TransE] = None
+        self._name_index: Dict[str, str] = {}
+        self._sports: List[str] = []
+
+    def load_graph(self) -> GraphIndex:
+        """加载知识图谱并建立索引（应用启动时调用，之后的请求直接使用）"""
+        with self._graph_lock:
+            if self._graph_index is None:
+                graph = load_graph(str(self.kg_file), settings.KG_LOAD_WORKERS)
+                self._graph_index = GraphIndex(graph)
+                logger.info(f"✅ 知识图谱已加载: {self._graph_index.total_entities}个实体, "
+                            f"{len(graph.relations)}个关系")
+        return self._graph_index
+
+    @property
+    def graph(self) -> GraphIndex:
+        return self._graph_index if self._graph_index is not None else self.load_graph()
+
+    def list_entities(self, entity_type: Optional[str] = None, name: Optional[str] = None,
+                      cursor: Optional[str] = None, limit: int = 50) -> Dict:
+        return self.graph.list_entities(entity_type, name, cursor, limit)
+
+    def list_relations(self, source: Optional[str] = None, relation: Optional[str] = None,
+                       target: Optional[str] = None, cursor: Optional[str] = None, limit: int = 50) -> Dict:
+        return self.graph.list_relations(source, relation, target, cursor, limit)
+
+    def statistics(self) -> Dict:
+        return self.graph.statistics()
+
+    def search(self, query: str, limit: int = 20, entity_type: Optional[str] = None) -> List[Dict]:
+        return self.graph.search(query, limit, entity_type)
+
+    def suggest(self, prefix: str, limit: int = 10, entity_type: Optional[str] = None) -> List[Dict]:
+        return self.graph.suggest(prefix, limit, entity_type)
+
+    def add_entity(self, entity_type: str, entity_id: str, properties: Dict):
+        """新增或更新实体，索引随之增量更新"""
+        graph = self.graph
+        with self._graph_lock:
+            graph.add_entity(entity_type, entity_id, properties)
+
+    def visualization(self, center_entity: str, depth: int = 2, max_nodes: int = 200, max_fanout: int = 50,
+                      relations: Optional[List[str]] = None) -> Dict:
+        return self.graph.neighborhood(center_entity, depth, max_nodes, max_fanout, relations)
+
+    def find_path(self, start: str, end: str, max_depth: int = 3, relations: Optional[List[str]] = None) -> Dict:
+        return self.graph.find_path(start, end, max_depth, relations)
+
+    def pattern_query(self, query: str, limit: int = 50, distinct: bool = False) -> Dict:
+        return self.graph.pattern_query(query, limit, distinct)
+
+    def complete_facility_sports(self, facility: str, top_k: int = 5) -> Dict:
+        """推测设施可能提供、但图谱中尚未记录的运动项目
+
+        Args:
+            facility: 设施实体ID（如 Facility_1）或设施名称
+            top_k: 返回数量
+
+        Raises:
+            KeyError: 模型未发布或设施不存在
+        """
+        model = self._get_model()
+        facility_id = self._resolve(model, facility)
+
+        predictions = model.complete_tails(facility_id, PROVIDES_RELATION, candidates=self._sports, top_k=top_k)
+        return {
+            'facility_id': facility_id,
+            'facility_name': model.entity_labels.get(facility_id, facility_id),
+            'relation': PROVIDES_RELATION,
+            'model_version': self.registry.active_version(self.TRANSE_MODEL),
+            'predictions': [
+                {
+                    'entity_id': entity_id,
+                    'name': model.entity_labels.get(entity_id, entity_id[len(SPORT_PREFIX):]),
+                    'score': round(score, 4)
+                }
+                for entity_id, score in predictions
+            ]
+        }
+
+    def _get_model(self) -> TransE:
+        model = self.registry.get(self.TRANSE_MODEL)
+        if model is not self._indexed_model:
+            with self._lock:
+                if model is not self._indexed_model:
+                    self._name_index = {
+                        name: entity_id for entity_id, name in model.entity_labels.items()
+                        if entity_id.startswith(FACILITY_PREFIX)
+                    }
+                    self._sports = [e for e in model.entity2id if e.startswith(SPORT_PREFIX)]
+                    self._indexed_model = model
+        return model
+
+    def _resolve(self, model: TransE, facility: str) -> str:
+        """设施名称或ID -> 实体ID"""
+        if facility in model.entity2id:
+            return facility
+        facility_id = self._name_index.get(facility)
+        if facility_id is None:
+            raise KeyError(f"知识图谱中不存在设施: {facility}")
+        return facility_id
+
+
+knowledge_graph_service = KnowledgeGraphService(model_registry, settings.PROJECT_ROOT / settings.KG_DATA_FILE)
@@ -0,0 +1,222 @@
+"""
+模型注册中心
+从 settings.MODEL_DIR 发现版本化的模型文件（<模型名>/<版本>/manifest.json），
+首次请求时才加载，按内存预算做LRU淘汰；新版本发布后先加载再原子切换，
+切换前已取得旧模型引用的请求不受影响
+"""
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from loguru import logger
+
+from app.core.config import settings
+from ml_models.model_artifact import artifact_nbytes, list_versions, read_manifest
+from ml_models.recommendation.deep_recommender import NeuralCollaborativeFiltering, MatrixFactorization
+from ml_models.knowledge_graph.transe_model import TransE
+from recommendation.collaborative.cf_recommender import CollaborativeFilteringRecommender
+from recommendation.topn_cache import TopNCache
+
+
+class ModelRegistry:
+    """模型注册中心"""
+
+    def __init__(self, model_dir: Path, memory_budget: int, refresh_interval: float = 30):
+        """
+        Args:
+            model_dir: 模型根目录
+            memory_budget: 已加载模型的内存上限（字节）
+            refresh_interval: 检查新版本的最小间隔（秒）
+        """
+        self.model_dir = Path(model_dir)
+        self.memory_budget = memory_budget
+        self.refresh_interval = refresh_interval
+
+        # 按manifest中的model_type选择加载函数
+        self._loaders: Dict[str, Callable[[str], Any]] = {
+            'ncf': NeuralCollaborativeFiltering.from_file,
+            'mf': MatrixFactorization.from_file,
+            'transe': TransE.from_file,
+            'cf_similarity': CollaborativeFilteringRecommender.from_file,
+            TopNCache.MODEL_TYPE: TopNCache.from_file,
+        }
+
+        self._lock = threading.RLock()
+        self._cache: "OrderedDict[Tuple[str, str], Tuple[Any, int]]" = OrderedDict()
+        self._load_locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._active: Dict[str, str] = {}
+        self._pinned: Set[str] = set()
+        self._last_scan: Dict[str, float] = {}
+
+    def register_loader(self, model_type: str, loader: Callable[[str], Any]):
+        """注册新的模型类型加载函数"""
+        self._loaders[model_type] = loader
+
+    def discover(self) -> Dict[str, List[str]]:
+        """扫描模型目录，返回 模型名 -> 版本列表，并把未固定版本的模型指向最新版本"""
+        found = {}
+        if self.model_dir.is_dir():
+            for entry in sorted(self.model_dir.iterdir()):
+                if entry.is_dir() and not entry.name.startswith('.'):
+                    versions = self.refresh(entry.name, preload=False)
+                    if versions:
+                        found[entry.name] = versions
+
+        logger.info(f"发现 {len(found)} 个模型: {', '.join(found) or '无'}")
+        return found
+
+    def refresh(self, name: str, preload: bool = True) -> List[str]:
+        """重新扫描某个模型的版本；出现新版本时先加载再切换"""
+        versions = list_versions(self.model_dir, name)
+        with self._lock:
+            self._last_scan[name] = time.monotonic()
+            current = self._active.get(name)
+            if not versions or name in self._pinned or versions[-1] == current:
+                return versions
+
+        latest = versions[-1]
+        if preload and current is not None:
+            # 新版本加载完成前请求继续使用旧版本
+            self.get(name, latest)
+
+        with self._lock:
+            if name not in self._pinned:
+                self._active[name] = latest
+        if current is not None:
+            logger.info(f"模型 {name} 切换版本: {current} -> {latest}")
+        return versions
+
+    def activate(self, name: str, version: str):
+        """固定使用指定版本（回滚或灰度），之后不再自动升级"""
+        if version not in list_versions(self.model_dir, name):
+            raise KeyError(f"模型 {name} 不存在版本 {version}")
+
+        self.get(name, version)
+        with self._lock:
+            self._active[name] = version
+            self._pinned.add(name)
+        logger.info(f"模型 {name} 固定为版本 {version}")
+
+    def unpin(self, name: str):
+        """取消版本固定，恢复跟随最新版本"""
+        with self._lock:
+            self._pinned.discard(name)
+            self._last_scan.pop(name, None)
+
+    def active_version(self, name: str) -> Optional[str]:
+        """当前生效的版本"""
+        self._maybe_refresh(name)
+        return self._active.get(name)
+
+    def has_model(self, name: str) -> bool:
+        """是否存在已发布的模型"""
+        return self.active_version(name) is not None
+
+    def get(self, name: str, version: Optional[str] = None) -> Any:
+        """获取模型（首次访问时加载）
+
+        Args:
+            name: 模型名
+            version: 版本号，默认使用当前生效版本
+        """
+        if version is None:
+            version = self.active_version(name)
+            if version is None:
+                raise KeyError(f"未找到模型: {name}")
+
+        key = (name, version)
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                self._cache.move_to_end(key)
+                return entry[0]
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        # 同一模型只加载一次，其余并发请求等待加载结果
+        with load_lock:
+            with self._lock:
+                entry = self._cache.get(key)
+                if entry is not None:
+                    self._cache.move_to_end(key)
+                    return entry[0]
+
+            model, nbytes = self._load(name, version)
+
+            with self._lock:
+                self._cache[key] = (model, nbytes)
+                self._load_locks.pop(key, None)
+                self._evict(keep=key)
+        return model
+
+    def get_path(self, name: str, version: Optional[str] = None) -> Path:
+        """模型目录路径"""
+        version = version or self.active_version(name)
+        if version is None:
+            raise KeyError(f"未找到模型: {name}")
+        return self.model_dir / name / version
+
+    def unload(self, name: Optional[str] = None):
+        """卸载已加载的模型（不影响正在使用它们的请求）"""
+        with self._lock:
+            for key in list(self._cache):
+                if name is None or key[0] == name:
+                    del self._cache[key]
+
+    def status(self) -> Dict:
+        """注册中心状态"""
+        with self._lock:
+            loaded = [
+                {'name': name, 'version': version, 'memory_mb': round(nbytes / 1024 / 1024, 2)}
+                for (name, version), (_, nbytes) in self._cache.items()
+            ]
+            return {
+                'model_dir': str(self.model_dir),
+                'memory_budget_mb': round(self.memory_budget / 1024 / 1024, 2),
+                'memory_used_mb': round(self._memory_used() / 1024 / 1024, 2),
+                'active': dict(self._active),
+                'pinned': sorted(self._pinned),
+                'loaded': loaded
+            }
+
+    def _maybe_refresh(self, name: str):
+        """距上次扫描超过间隔时检查新版本"""
+        last = self._last_scan.get(name)
+        if last is None or time.monotonic() - last >= self.refresh_interval:
+            self.refresh(name)
+
+    def _load(self, name: str, version: str) -> Tuple[Any, int]:
+        """按模型类型加载模型文件"""
+        path = self.model_dir / name / version
+        manifest = read_manifest(path)
+        model_type = manifest['model_type']
+        loader = self._loaders.get(model_type)
+        if loader is None:
+            raise ValueError(f"未知的模型类型: {model_type}")
+
+        start = time.perf_counter()
+        model = loader(str(path))
+        nbytes = artifact_nbytes(path)
+        logger.info(
+            f"加载模型 {name}@{version} ({model_type}), "
+            f"{nbytes / 1024 / 1024:.1f}MB, 耗时 {(time.perf_counter() - start) * 1000:.1f}ms"
+        )
+        return model, nbytes
+
+    def _memory_used(self) -> int:
+        return sum(nbytes for _, nbytes in self._cache.values())
+
+    def _evict(self, keep: Tuple[str, str]):
+        """超出内存预算时淘汰最久未使用的模型"""
+        while self._memory_used() > self.memory_budget and len(self._cache) > 1:
+            oldest = next(k for k in self._cache if k != keep)
+            del self._cache[oldest]
+            logger.info(f"内存超出预算，淘汰模型 {oldest[0]}@{oldest[1]}")
+
+
+model_registry = ModelRegistry(
+    settings.MODEL_PATH,
+    memory_budget=settings.MODEL_MEMORY_BUDGET_MB * 1024 * 1024,
+    refresh_interval=settings.MODEL_REFRESH_INTERVAL
+)
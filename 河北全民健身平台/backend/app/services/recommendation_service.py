@@ -0,0 +1,267 @@
+"""
+推荐服务
+在线请求优先查预计算的Top-N缓存（O(1)），缓存中没有的用户用已加载模型实时打分，
+完全没有交互记录的冷启动用户返回热门活动
+"""
+import json
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+from app.core.config import settings
+from app.services.data_service import data_service
+from app.services.model_registry import ModelRegistry, model_registry
+from recommendation.collaborative.cf_recommender import FitnessActivityRecommender
+from recommendation.location.facility_recommender import FacilityRecommender
+from recommendation.topn_cache import item_based_scores, top_n, user_based_scores
+
+# 接口method参数 -> 缓存中的推荐方法（ncf 仅在发布的缓存中NCF通过留出验证时可用）
+METHOD_ALIASES = {
+    'collaborative': 'item_based',
+    'item_based': 'item_based',
+    'user_based': 'user_based',
+    'ncf': 'ncf',
+    'deep': 'ncf'
+}
+
+# 每分钟消耗热量（千卡），按运动强度估算
+CALORIES_PER_MINUTE = {'低': 4, '中等': 7, '高': 10}
+
+# 每周训练日，按健身水平安排
+WEEKLY_DAYS = {
+    'low': ['周一', '周三', '周五'],
+    'medium': ['周一', '周三', '周五', '周日'],
+    'high': ['周一', '周二', '周四', '周五', '周六']
+}
+
+
+class RecommendationService:
+    """推荐服务"""
+
+    TOPN_MODEL = 'recommend_topn'
+    CF_MODEL = 'cf_similarity'
+    NCF_MODEL = 'ncf'
+
+    def __init__(self, registry: ModelRegistry):
+        self.registry = registry
+        self.activity_recommender = FitnessActivityRecommender()
+        self.activities = self.activity_recommender.activities
+        self._facility_recommender: Optional[FacilityRecommender] = None
+        self._facility_lock = threading.Lock()
+
+    def recommend_activities(self, user_id: int, method: str = 'collaborative',
+                             top_n_size: int = 5) -> List[Dict]:
+        """推荐健身活动"""
+        method = self._resolve_method(method)
+
+        cache = self._get_model(self.TOPN_MODEL)
+        recommendations = cache.recommend(method, user_id, top_n_size) if cache else None
+        source = method
+        if recommendations is None:
+            recommendations = self._score_user(method, user_id, top_n_size)
+        if recommendations is None:
+            # 冷启动用户：返回热门活动
+            recommendations = [(item['item_id'], item['mean_rating']) for item in self._popular_items(top_n_size)]
+            source = 'popular'
+
+        return [self._activity_detail(activity_id, score, source) for activity_id, score in recommendations]
+
+    def recommend_facilities(self, user_id: int, latitude: float, longitude: float,
+                             top_n_size: int = 5) -> List[Dict]:
+        """推荐附近的健身设施，优先提供用户喜欢的运动项目"""
+        sports = []
+        cf = self._get_model(self.CF_MODEL)
+        if cf is not None:
+            sports = [self.activities[a]['name'] for a in self._liked_items(cf.user_item_matrix, user_id)
+                      if a in self.activities]
+        return self._get_facility_recommender().recommend(latitude, longitude, top_n_size, sports=sports)
+
+    def similar_users(self, user_id: int, top_n_size: int = 10) -> List[Dict]:
+        """获取相似用户"""
+        cache = self._get_model(self.TOPN_MODEL)
+        similar = cache.similar_users(user_id, top_n_size) if cache else None
+
+        cf = self._get_model(self.CF_MODEL)
+        if cf is None:
+            return []
+        matrix = cf.user_item_matrix
+        if similar is None:
+            if user_id not in matrix.index or cf.user_similarity is None:
+                return []
+            row = matrix.index.get_loc(user_id)
+            sims = np.array(cf.user_similarity[row], dtype=np.float32)[None, :]
+            sims[0, row] = -np.inf
+            users, scores = top_n(sims, top_n_size)
+            similar = [(int(matrix.index[u]), float(s)) for u, s in zip(users[0], scores[0]) if u >= 0]
+
+        liked = self._liked_items(matrix, user_id)
+        return [
+            {
+                'user_id': other_id,
+                'similarity': round(similarity, 4),
+                'common_activities': [
+                    self.activities.get(a, {}).get('name', '未知')
+                    for a in sorted(liked & self._liked_items(matrix, other_id))
+                ]
+            }
+            for other_id, similarity in similar
+        ]
+
+    def trending_activities(self, city: Optional[str] = None, limit: int = 10) -> List[Dict]:
+        """获取热门活动（按参与人数），指定城市时该市常见项目优先"""
+        popular = self._popular_items(len(self.activities))
+        city_activities = self._city_popular_activities(city) if city else []
+
+        trending = []
+        for item in popular:
+            name = self.activities.get(item['item_id'], {}).get('name', '未知')
+            trending.append({
+                'activity_id': item['item_id'],
+                'activity': name,
+                'participants': item['count'],
+                'average_rating': item['mean_rating'],
+                'city_popular': name in city_activities
+            })
+
+        if city_activities:
+            trending.sort(key=lambda x: not x['city_popular'])
+        return trending[:limit]
+
+    def personalized_plan(self, profile: Dict) -> Dict:
+        """基于用户画像生成每周健身方案"""
+        activities = self.activity_recommender.recommend_by_user_profile(profile)
+        if not activities:
+            activities = [{**a, 'activity_name': a['name']} for a in self.activities.values()][:3]
+
+        days = WEEKLY_DAYS.get(profile.get('fitness_level'), WEEKLY_DAYS['medium'])
+        weekly_plan = []
+        for i, day in enumerate(days):
+            activity = activities[i % len(activities)]
+            duration = activity['duration']
+            weekly_plan.append({
+                'day': day,
+                'activities': [{
+                    'name': activity['activity_name'],
+                    'duration': duration,
+                    'intensity': activity['intensity'],
+                    'calories': duration * CALORIES_PER_MINUTE.get(activity['intensity'], 6)
+                }]
+            })
+
+        total_duration = sum(a['duration'] for d in weekly_plan for a in d['activities'])
+        total_calories = sum(a['calories'] for d in weekly_plan for a in d['activities'])
+        tips = ["注意运动前热身和运动后拉伸", "保持充足的水分摄入"]
+        if profile.get('health_conditions'):
+            tips.insert(0, "您有健康状况需要关注，请在专业人士指导下调整运动强度")
+
+        return {
+            'user_profile': profile,
+            'weekly_plan': weekly_plan,
+            'weekly_target': {
+                'total_duration': total_duration,
+                'total_calories': total_calories,
+                'frequency': len(weekly_plan)
+            },
+            'tips': [f"建议每周锻炼{len(weekly_plan)}次"] + tips
+        }
+
+    def _resolve_method(self, method: str) -> str:
+        cache = self._get_model(self.TOPN_MODEL)
+        accepted = [name for name, resolved in METHOD_ALIASES.items()
+                    if resolved != 'ncf' or (cache is not None and cache.validated('ncf'))]
+        if method not in accepted:
+            raise ValueError(f"未知或不可用的推荐方法: {method}，可选: {', '.join(accepted)}")
+        return METHOD_ALIASES[method]
+
+    def _get_model(self, name: str):
+        """获取已发布的模型，未训练时返回None"""
+        try:
+            return self.registry.get(name)
+        except KeyError:
+            return None
+
+    def _get_facility_recommender(self) -> FacilityRecommender:
+        """首次使用时加载设施数据并建立空间索引"""
+        if self._facility_recommender is None:
+            with self._facility_lock:
+                if self._facility_recommender is None:
+                    data_file = settings.PROJECT_ROOT / settings.FACILITIES_DATA_FILE
+                    facilities = []
+                    if data_file.exists():
+                        with open(data_file, 'r', encoding='utf-8') as f:
+                            data = json.load(f)
+                        facilities = data.get('facilities', []) if isinstance(data, dict) else data
+                    else:
+                        logger.warning(f"未找到设施数据: {data_file}")
+                    self._facility_recommender = FacilityRecommender(facilities)
+        return self._facility_recommender
+
+    def _score_user(self, method: str, user_id: int, top_n_size: int) -> Optional[List[Tuple[int, float]]]:
+        """缓存未命中时用已加载的模型实时打分"""
+        cf = self._get_model(self.CF_MODEL)
+        if cf is None or user_id not in cf.user_item_matrix.index:
+            return None
+
+        matrix = cf.user_item_matrix
+        ratings = np.asarray(matrix.values, dtype=np.float32)
+        row = matrix.index.get_loc(user_id)
+
+        ncf = self._get_model(self.NCF_MODEL) if method == 'ncf' else None
+        if ncf is not None and row < ncf.num_users:
+            scores = ncf.score_all(np.array([row])).astype(np.float32)
+            scores[ratings[row:row + 1] > 0] = -np.inf
+        elif method == 'user_based' and cf.user_similarity is not None:
+            scores = user_based_scores(ratings, np.asarray(cf.user_similarity[row:row + 1], dtype=np.float32), row)
+        else:
+            if cf.item_similarity is None:
+                cf.calculate_item_similarity()
+            scores = item_based_scores(ratings[row:row + 1], np.asarray(cf.item_similarity, dtype=np.float32))
+
+        items, values = top_n(scores, top_n_size)
+        logger.debug(f"用户 {user_id} 未命中推荐缓存，实时计算 ({method})")
+        return [(int(matrix.columns[i]), float(v)) for i, v in zip(items[0], values[0]) if i >= 0]
+
+    def _popular_items(self, limit: int) -> List[Dict]:
+        cache = self._get_model(self.TOPN_MODEL)
+        if cache is not None:
+            return cache.popular_items(limit)
+
+        # 尚未训练模型时按活动目录顺序返回
+        return [{'item_id': a, 'count': 0, 'mean_rating': 0.0} for a in list(self.activities)[:limit]]
+
+    def _activity_detail(self, activity_id: int, score: float, source: str) -> Dict:
+        activity = self.activities.get(activity_id, {})
+        name = activity.get('name', '未知')
+        reasons = {
+            'item_based': f"与您喜欢的活动相似,{name}也很适合您",
+            'user_based': f"许多和您相似的用户都喜欢{name}",
+            'ncf': f"根据您的运动偏好,推荐{name}",
+            'popular': f"{name}是当前最受欢迎的运动之一"
+        }
+        return {
+            'activity_id': activity_id,
+            'activity_name': name,
+            'category': activity.get('category', ''),
+            'intensity': activity.get('intensity', ''),
+            'duration': activity.get('duration', 0),
+            'recommendation_score': round(score, 4),
+            'reason': reasons.get(source, reasons['popular'])
+        }
+
+    @staticmethod
+    def _liked_items(matrix, user_id: int) -> set:
+        if user_id not in matrix.index:
+            return set()
+        row = np.asarray(matrix.loc[user_id])
+        return {int(i) for i in matrix.columns[row > 0]}
+
+    @staticmethod
+    def _city_popular_activities(city: str) -> List[str]:
+        for record in data_service.read('participation', ['popular_activities'], {'city': city}):
+            return record.get('popular_activities') or []
+        return []
+
+
+recommendation_service = RecommendationService(model_registry)
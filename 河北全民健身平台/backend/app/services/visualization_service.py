@@ -0,0 +1,363 @@
+"""
+可视化服务
+图表与热力图数据由汇总引擎预先计算：载入数据时按 城市/场馆类型/建成年份 等维度在分析库中做分组聚合，
+再把每个图表（及其各城市、各指标的变体）整理成接口返回的结构缓存起来，请求只是一次字典查找。
+引擎定期比较分析库中各表的写入版本，只重新计算依赖已变化表的汇总与图表
+"""
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from app.core.config import settings
+from app.services.data_service import DataService, data_service
+
+# 全民健身参与率目标（%）
+TARGET_PARTICIPATION_RATE = 38.5
+
+# 场馆服务半径（米），与可及性评价中的服务半径一致
+SERVICE_RADIUS_M = 1250
+
+# 热力图网格大小（度），约5公里
+HEATMAP_CELL_DEG = 0.05
+
+# 汇总 -> 依赖的分析库表
+ROLLUP_SOURCES: Dict[str, Tuple[str, ...]] = {
+    'facility_cube': ('facilities',),
+    'facility_sports': ('facilities',),
+    'map_points': ('raw_facilities',),
+    'participation': ('participation',),
+    'traffic_years': ('traffic',),
+}
+
+# 图表 -> 依赖的汇总
+CHART_ROLLUPS: Dict[str, Tuple[str, ...]] = {
+    'map-data': ('map_points',),
+    'heatmap': ('map_points',),
+    'facility-distribution': ('facility_cube',),
+    'participation': ('participation',),
+    'activity-popularity': ('participation', 'facility_sports'),
+    'trends': ('facility_cube', 'participation', 'traffic_years'),
+}
+
+TREND_INDICATORS = ('participation_rate', 'facility_count', 'new_facilities', 'visitors')
+
+
+def _latest_by_city(participation: List[Dict]) -> List[Dict]:
+    """每个城市最新年份的参与记录，保持城市首次出现的顺序"""
+    latest: Dict[str, Dict] = {}
+    for record in participation:
+        current = latest.get(record['city'])
+        if current is None or (record['year'] or 0) > (current['year'] or 0):
+            latest[record['city']] = record
+    return list(latest.values())
+
+
+def build_map_data(points: List[Dict]) -> Dict:
+    facilities = [
+        {key: point[key] for key in ('id', 'name', 'latitude', 'longitude', 'type', 'capacity')}
+        for point in points
+    ]
+    return {
+        "facilities": facilities,
+        "coverage_areas": [
+            {
+                "facility_id": facility["id"],
+                "center": [facility["latitude"], facility["longitude"]],
+                "radius": SERVICE_RADIUS_M
+            }
+            for facility in facilities
+        ]
+    }
+
+
+def build_heatmap(points: List[Dict], cell_deg: float = HEATMAP_CELL_DEG) -> Dict:
+    """场馆按经纬度网格聚合，强度为网格内容量之和相对最大网格的比例，坐标取容量加权中心（容量为0时取平均）"""
+    # 网格 -> [容量, 容量加权纬度和, 容量加权经度和, 纬度和, 经度和, 场馆数]
+    cells: Dict[Tuple[int, int], List[float]] = defaultdict(lambda: [0.0] * 6)
+    for point in points:
+        lat, lng = point['latitude'], point['longitude']
+        if lat is None or lng is None:
+            continue
+        weight = float(point['capacity'] or 0)
+        cell = cells[(int(lat // cell_deg), int(lng // cell_deg))]
+        for k, value in enumerate((weight, lat * weight, lng * weight, lat, lng, 1)):
+            cell[k] += value
+
+    peak = max((cell[0] for cell in cells.values()), default=0.0)
+    heatmap_points = []
+    for key in sorted(cells):
+        weight, lat_weighted, lng_weighted, lat_sum, lng_sum, count = cells[key]
+        if weight > 0:
+            lat, lng = lat_weighted / weight, lng_weighted / weight
+        else:
+            lat, lng = lat_sum / count, lng_sum / count
+        heatmap_points.append({
+            "lat": round(lat, 4),
+            "lng": round(lng, 4),
+            "intensity": round(weight / peak, 3) if peak else 0.0,
+            "facilities": int(count)
+        })
+    return {"points": heatmap_points, "cell_deg": cell_deg}
+
+
+def build_facility_distribution(cube: List[Dict]) -> Dict:
+    counts: Dict[str, int] = defaultdict(int)
+    for row in cube:
+        counts[row['facility_type'] or "其他"] += row['count']
+    ordered = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+    total = sum(counts.values())
+    return {
+        "types": [label for label, _ in ordered],
+        "counts": [count for _, count in ordered],
+        "percentages": [round(count / total * 100, 1) for _, count in ordered] if total else []
+    }
+
+
+def build_participation_chart(participation: List[Dict]) -> Dict:
+    latest = _latest_by_city(participation)
+    return {
+        "cities": [record['city'] for record in latest],
+        "participation_rates": [round((record['participation_rate'] or 0) * 100, 1) for record in latest],
+        "target_rate": TARGET_PARTICIPATION_RATE
+    }
+
+
+def build_activity_popularity(participation: List[Dict], facility_sports: List[Dict]) -> Dict:
+    """运动项目热度，两个量纲不同的序列分开返回
+
+    daily_visitors: 提供该项目的场馆日均客流之和（人次/日，多项目场馆计入每个项目）
+    popular_cities: 最新一年将该项目列为热门项目的城市数
+    """
+    visitors: Dict[str, int] = defaultdict(int)
+    for facility in facility_sports:
+        for sport in facility['sports_types'] or []:
+            visitors[sport] += facility['daily_visitors'] or 0
+    cities: Dict[str, int] = defaultdict(int)
+    for record in _latest_by_city(participation):
+        for activity in set(record['popular_activities'] or []):
+            cities[activity] += 1
+
+    activities = sorted(visitors.keys() | cities.keys(),
+                        key=lambda activity: (-visitors.get(activity, 0), -cities.get(activity, 0), activity))
+    return {
+        "activities": activities,
+        "daily_visitors": [int(visitors.get(activity, 0)) for activity in activities],
+        "popular_cities": [cities.get(activity, 0) for activity in activities]
+    }
+
+
+def build_trends(indicator: str, cube: List[Dict], participation: List[Dict],
+                 traffic_years: List[Dict]) -> Dict:
+    """按年份的趋势：参与率（%）、累计场馆数、新建场馆数、年客流"""
+    series: Dict[int, float] = defaultdict(float)
+    if indicator == 'participation_rate':
+        rates = defaultdict(list)
+        for record in participation:
+            if record['year'] is not None and record['participation_rate'] is not None:
+                rates[record['year']].append(record['participation_rate'])
+        series.update({year: round(sum(values) / len(values) * 100, 1) for year, values in rates.items()})
+    elif indicator in ('facility_count', 'new_facilities'):
+        for row in cube:
+            if row['build_year']:
+                series[row['build_year']] += row['count']
+        if indicator == 'facility_count':
+            total = 0
+            for year in sorted(series):
+                total += series[year]
+                series[year] = total
+    elif indicator == 'visitors':
+        series.update({int(row['period']): row['visitors'] for row in traffic_years})
+
+    years = sorted(series)
+    return {
+        "years": years,
+        "values": [series[year] if indicator == 'participation_rate' else int(series[year]) for year in years],
+        "indicator": indicator,
+        "target": TARGET_PARTICIPATION_RATE if indicator == 'participation_rate' else None
+    }
+
+
+class RollupEngine:
+    """图表汇总引擎"""
+
+    def __init__(self, data: DataService, refresh_interval: float = 30):
+        """初始化
+
+        Args:
+            data: 数据服务（提供分析库）
+            refresh_interval: 检查分析库变化的最小间隔（秒）
+        """
+        self.data = data
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._versions: Dict[str, Tuple] = {}
+        self._rollups: Dict[str, List[Dict]] = {}
+        # 图表 -> 变体（城市/指标，None为全部） -> 接口返回结构
+        self._charts: Dict[str, Dict[Optional[str], Dict]] = {}
+        self._last_check: Optional[float] = None
+
+    # ------------------------------------------------------------------ 汇总
+
+    def _compute_rollup(self, name: str) -> List[Dict]:
+        store = self.data.store
+        if name == 'facility_cube':
+            return store.aggregate('facilities', ['city', 'facility_type', 'build_year'], {
+                'count': ('COUNT', '*'),
+                'daily_visitors': ('SUM', 'daily_visitors')
+            })
+        if name == 'facility_sports':
+            return [row for row in store.select('facilities', ['city', 'sports_types', 'daily_visitors'])
+                    if row['sports_types']]
+        if name == 'map_points':
+            return store.select('raw_facilities', ['id', 'name', 'city', 'latitude', 'longitude', 'type', 'capacity'])
+        if name == 'participation':
+            return store.select('participation', ['city', 'year', 'participation_rate', 'popular_activities'])
+        if name == 'traffic_years':
+            return store.traffic_series(granularity='year')
+        raise KeyError(name)
+
+    def _compute_chart(self, chart: str) -> Dict[Optional[str], Dict]:
+        """计算图表的全部变体"""
+        rollups = self._rollups
+        if chart in ('map-data', 'heatmap'):
+            build: Callable[[List[Dict]], Dict] = build_map_data if chart == 'map-data' else build_heatmap
+            points = rollups['map_points']
+            by_city = defaultdict(list)
+            for point in points:
+                by_city[point['city']].append(point)
+            return {None: build(points), **{city: build(rows) for city, rows in by_city.items() if city}}
+        if chart == 'facility-distribution':
+            cube = rollups['facility_cube']
+            by_city = defaultdict(list)
+            for row in cube:
+                by_city[row['city']].append(row)
+            return {None: build_facility_distribution(cube),
+                    **{city: build_facility_distribution(rows) for city, rows in by_city.items() if city}}
+        if chart == 'participation':
+            return {None: build_participation_chart(rollups['participation'])}
+        if chart == 'activity-popularity':
+            return {None: build_activity_popularity(rollups['participation'], rollups['facility_sports'])}
+        if chart == 'trends':
+            return {indicator: build_trends(indicator, rollups['facility_cube'], rollups['participation'],
+                                            rollups['traffic_years'])
+                    for indicator in TREND_INDICATORS}
+        raise KeyError(chart)
+
+    def refresh(self, force: bool = False) -> List[str]:
+        """比较各表写入版本，重新计算依赖已变化表的汇总与图表
+
+        Returns:
+            重新计算的图表
+        """
+        with self._lock:
+            self._last_check = time.monotonic()
+            store = self.data.ready()
+            versions = store.table_versions()
+            changed_tables = {name for name in set(versions) | set(self._versions)
+                              if force or versions.get(name) != self._versions.get(name)}
+            stale_rollups = [name for name, tables in ROLLUP_SOURCES.items()
+                             if name not in self._rollups or changed_tables & set(tables)]
+            if not stale_rollups:
+                return []
+
+            start = time.perf_counter()
+            rollups = dict(self._rollups)
+            for name in stale_rollups:
+                rollups[name] = self._compute_rollup(name)
+            self._rollups = rollups
+
+            stale_charts = [chart for chart, names in CHART_ROLLUPS.items()
+                            if chart not in self._charts or set(names) & set(stale_rollups)]
+            charts = dict(self._charts)
+            for chart in stale_charts:
+                charts[chart] = self._compute_chart(chart)
+            # 整体替换，并发读取看到的要么是旧结果要么是新结果
+            self._charts = charts
+            self._versions = versions
+            logger.info(f"✅ 图表汇总已更新: {', '.join(stale_charts)} "
+                        f"(汇总 {', '.join(stale_rollups)}, 耗时 {(time.perf_counter() - start) * 1000:.1f}ms)")
+            return stale_charts
+
+    def _refresh_in_background(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            logger.warning(f"图表汇总更新失败，继续使用现有结果: {e}")
+
+    def _maybe_refresh(self):
+        """距上次检查超过 refresh_interval 时在后台线程中重新汇总，请求直接使用已有结果"""
+        last = self._last_check
+        if last is not None and time.monotonic() - last >= self.refresh_interval:
+            self._last_check = time.monotonic()
+            threading.Thread(target=self._refresh_in_background, name='chart-rollup', daemon=True).start()
+
+    def get(self, chart: str, variant: Optional[str] = None) -> Dict:
+        """获取预先计算的图表数据
+
+        Args:
+            chart: 图表名称
+            variant: 城市（map-data/heatmap/facility-distribution）或指标（trends），None 为全部
+
+        Raises:
+            KeyError: 未知的图表
+        """
+        if chart not in CHART_ROLLUPS:
+            raise KeyError(f"未知的图表: {chart}")
+        self._maybe_refresh()
+        variants = self._charts.get(chart)
+        if variants is None:
+            # 首次汇总尚未完成（或启动时失败）时只能同步汇总
+            self.refresh()
+            variants = self._charts[chart]
+        result = variants.get(variant)
+        if result is None:
+            # 没有数据的城市返回空图表（不缓存，避免任意参数撑大缓存）
+            result = self._compute_empty(chart)
+        return result
+
+    def _compute_empty(self, chart: str) -> Dict:
+        if chart == 'map-data':
+            return build_map_data([])
+        if chart == 'heatmap':
+            return build_heatmap([])
+        return build_facility_distribution([])
+
+
+class VisualizationService:
+    """可视化服务"""
+
+    def __init__(self, data: DataService, refresh_interval: float):
+        self.engine = RollupEngine(data, refresh_interval)
+
+    def refresh(self, force: bool = False) -> List[str]:
+        return self.engine.refresh(force)
+
+    def map_data(self, city: Optional[str] = None) -> Dict:
+        return self.engine.get('map-data', city or None)
+
+    def heatmap(self, city: Optional[str] = None) -> Dict:
+        return self.engine.get('heatmap', city or None)
+
+    def facility_distribution(self, city: Optional[str] = None) -> Dict:
+        return self.engine.get('facility-distribution', city or None)
+
+    def participation(self) -> Dict:
+        return self.engine.get('participation')
+
+    def activity_popularity(self) -> Dict:
+        return self.engine.get('activity-popularity')
+
+    def trends(self, indicator: str) -> Dict:
+        """
+        Raises:
+            ValueError: 不支持的指标
+        """
+        if indicator not in TREND_INDICATORS:
+            raise ValueError(f"不支持的指标: {indicator}，可选 {', '.join(TREND_INDICATORS)}")
+        return self.engine.get('trends', indicator)
+
+
+visualization_service = VisualizationService(data_service, settings.ROLLUP_REFRESH_INTERVAL)
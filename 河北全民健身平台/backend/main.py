@@ -3,12 +3,17 @@
 """
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 from fastapi.staticfiles import StaticFiles
 from loguru import logger
 import uvicorn
 
 from app.core.config import settings
 from app.api.v1 import api_router
+from app.services.model_registry import model_registry
+from app.services.data_service import data_service
+from app.services.knowledge_graph_service import knowledge_graph_service
+from app.services.visualization_service import visualization_service
 
 # 创建FastAPI应用
 app = FastAPI(
@@ -43,6 +48,27 @@ async def startup_event():
     logger.info(f"📝 项目名称: {settings.PROJECT_NAME}")
     logger.info(f"🌍 环境: {settings.ENVIRONMENT}")
     logger.info(f"🔗 API文档: http://{settings.HOST}:{settings.PORT}/api/docs")
+    
+    # 只扫描模型版本，模型在首次请求时再加载
+    model_registry.discover()
+    
+    # 知识图谱在启动时载入内存并建立索引
+    try:
+        knowledge_graph_service.load_graph()
+    except FileNotFoundError as e:
+        logger.warning(f"知识图谱文件不存在，/kg 接口暂不可用: {e}")
+    
+    # 生成或更新分析库（在线程池中执行，不阻塞事件循环）
+    try:
+        await run_in_threadpool(data_service.sync)
+    except Exception as e:
+        logger.warning(f"分析库生成失败，数据接口将在首次访问时重试: {e}")
+    
+    # 可视化图表汇总在启动时预先计算，失败时在首次请求图表时重试
+    try:
+        await run_in_threadpool(visualization_service.refresh)
+    except Exception as e:
+        logger.warning(f"图表汇总计算失败，将在首次请求时重试: {e}")
 
 
 @app.on_event("shutdown")
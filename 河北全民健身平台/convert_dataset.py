@@ -3,373 +3,313 @@
 """
 数据集转换脚本 - 将Excel数据集转换为项目所需格式
 包含NLP语义分析功能，将文本描述转换为量化指标
+
+按列向量化转换：每个指标列用预编译的正则一次性 Series.str.extract，
+运动项目用所有关键词组成的单个正则一遍扫描；大表可按行分块交给进程池并行转换
 """
 
-import pandas as pd
+import argparse
 import json
 import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
 from loguru import logger
-import sys
 
-# 配置日志
-log_file = 'logs/dataset_conversion.log'
-logger.remove()
-logger.add(sys.stderr, level="INFO")
-logger.add(log_file, rotation="10 MB", retention="30 days", level="DEBUG", encoding="utf-8")
+# 面积：优先取带单位的数字，否则取第一个数字
+AREA_WITH_UNIT = re.compile(r'(\d+\.?\d*)\s*(?:平方米|㎡)')
+NUMBER = re.compile(r'(\d+\.?\d*)')
+INTEGER = re.compile(r'(\d+)')
+YEAR = re.compile(r'((?:19|20)\d{2})')
+
+CITY = re.compile(r'(石家庄|保定|唐山|秦皇岛|邯郸|邢台|张家口|承德|沧州|廊坊|衡水)市')
+DISTRICT = re.compile(r'([^省市]+?(?:区|县|市))')
+
+# 场馆类型映射，按顺序取第一个出现的关键词
+FACILITY_TYPE_MAPPING = {
+    "公共体育场": "体育场",
+    "公共体育馆": "体育馆",
+    "全民健身中心": "健身中心",
+    "体育公园": "体育公园",
+    "游泳馆": "游泳馆",
+    "综合体育馆": "综合馆"
+}
+
+YES_VALUES = ["是", "有", "yes", "Yes", "YES", "true", "True"]
+
+# 常见运动项目（结果按此顺序排列）
+SPORT_KEYWORDS = [
+    "足球", "篮球", "排球", "羽毛球", "乒乓球", "网球",
+    "游泳", "跑步", "健身", "瑜伽", "太极拳", "广场舞",
+    "滑冰", "滑雪", "攀岩", "武术", "体操"
+]
+# 所有关键词编译成一个自动机，零宽前瞻使每个位置都尝试匹配，文本只扫描一遍
+SPORTS_PATTERN = re.compile('(?=(' + '|'.join(map(re.escape, SPORT_KEYWORDS)) + '))')
+SPORT_RANKS = {sport: i for i, sport in enumerate(SPORT_KEYWORDS)}
+
+# 输入表中用到的列
+SOURCE_COLUMNS = [
+    'venueName', 'img src', 'adress', 'adress.1', 'left 2', 'left 3', 'left 4', 'left 5', 'left 6',
+    'left 7', 'left 8', 'left 9', 'left 10', 'left 11', 'left 12', 'left 13', 'left 14', 'left 15',
+    '设施', '项目', '备注', 'venue-text', 'img-text'
+]
+
+# 面积指标 -> 来源列
+AREA_COLUMNS = {
+    "building_area": 'left 5',
+    "outdoor_free_area": 'left 6',
+    "site_area": 'left 7',
+    "outdoor_area": 'left 8',
+    "core_free_area": 'left 10',
+    "core_area": 'left 12',
+    "land_area": 'left 14'
+}
+
+# 计数指标 -> 来源列
+COUNT_COLUMNS = {
+    "outdoor_courts": 'left 9',
+    "core_courts": 'left 13',
+    "seats": 'left 15'
+}
+
+DEFAULT_CHUNK_SIZE = 50_000
+
+
+def configure_logging():
+    """配置日志（以脚本方式运行时调用）"""
+    log_file = 'logs/dataset_conversion.log'
+    logger.remove()
+    logger.add(sys.stderr, level="INFO")
+    logger.add(log_file, rotation="10 MB", retention="30 days", level="DEBUG", encoding="utf-8")
+
 
-logger.info("=" * 80)
-logger.info("开始数据集转换任务")
-logger.info("=" * 80)
+def as_text(column: pd.Series) -> pd.Series:
+    """单元格 -> str(值)，空单元格为 None"""
+    notna = column.notna()
+    texts = pd.Series(None, index=column.index, dtype=object)
+    texts[notna] = column[notna].map(str)
+    return texts
 
 
 class TextToIndicatorConverter:
-    """文本描述到指标值的转换器 - NLP语义分析"""
-    
+    """文本描述到指标值的转换器 - NLP语义分析
+
+    每个方法处理一整列文本（as_text 的结果），空单元格得到缺省值
+    """
+
     def __init__(self):
-        logger.info("初始化文本到指标转换器")
-        
-    def extract_area_value(self, text: str) -> float:
+        logger.debug("初始化文本到指标转换器")
+
+    def extract_area_values(self, texts: pd.Series) -> pd.Series:
         """从文本中提取面积数值（平方米）"""
-        if pd.isna(text) or not str(text).strip():
-            return 0.0
-        
-        text = str(text)
-        # 匹配数字（支持小数和千分位）
-        patterns = [
-            r'(\d+\.?\d*)\s*(?:平方米|㎡)',
-            r'(\d+,\d+\.?\d*)\s*(?:平方米|㎡)',
-            r'(\d+\.?\d*)',
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, text)
-            if match:
-                value_str = match.group(1).replace(',', '')
-                try:
-                    value = float(value_str)
-                    logger.debug(f"提取面积值: '{text}' -> {value}")
-                    return value
-                except:
-                    continue
-        
-        logger.warning(f"无法提取面积值: {text}")
-        return 0.0
-    
-    def extract_number_value(self, text: str) -> float:
-        """从文本中提取数值"""
-        if pd.isna(text) or not str(text).strip():
-            return 0.0
-        
-        text = str(text).replace(',', '')
-        # 匹配数字
-        match = re.search(r'(\d+\.?\d*)', text)
-        if match:
-            try:
-                value = float(match.group(1))
-                logger.debug(f"提取数值: '{text}' -> {value}")
-                return value
-            except:
-                pass
-        
-        return 0.0
-    
-    def extract_year(self, text: str) -> int:
+        values = texts.str.extract(AREA_WITH_UNIT, expand=False)
+        values = values.fillna(texts.str.extract(NUMBER, expand=False))
+
+        failed = texts.notna() & values.isna() & (texts.str.strip() != '')
+        if failed.any():
+            logger.warning(f"无法提取面积值: {int(failed.sum())} 条，例如 {texts[failed].iloc[0]}")
+        return values.astype(float).fillna(0.0)
+
+    def extract_number_values(self, texts: pd.Series) -> pd.Series:
+        """从文本中提取数值（去除千分位）"""
+        values = texts.str.replace(',', '', regex=False).str.extract(NUMBER, expand=False)
+        return values.astype(float).fillna(0.0)
+
+    def extract_years(self, texts: pd.Series) -> pd.Series:
         """从文本中提取年份"""
-        if pd.isna(text) or not str(text).strip():
-            return 0
-        
-        text = str(text)
-        match = re.search(r'(19|20)\d{2}', text)
-        if match:
-            year = int(match.group(0))
-            logger.debug(f"提取年份: '{text}' -> {year}")
-            return year
-        
-        return 0
-    
-    def parse_location(self, text: str) -> dict:
-        """解析地址信息"""
-        if pd.isna(text) or not str(text).strip():
-            return {"province": "", "city": "", "district": "", "full_address": ""}
-        
-        text = str(text).strip()
-        
-        # 提取省市区
-        province = ""
-        city = ""
-        district = ""
-        
-        # 匹配省份
-        if "河北省" in text:
-            province = "河北省"
-        
-        # 匹配城市
-        city_pattern = r'(石家庄|保定|唐山|秦皇岛|邯郸|邢台|张家口|承德|沧州|廊坊|衡水)市'
-        city_match = re.search(city_pattern, text)
-        if city_match:
-            city = city_match.group(1) + "市"
-        
-        # 匹配区县
-        district_pattern = r'([^省市]+?(?:区|县|市))'
-        district_match = re.search(district_pattern, text)
-        if district_match:
-            district = district_match.group(1)
-        
-        logger.debug(f"解析地址: '{text}' -> 省:{province}, 市:{city}, 区:{district}")
-        
-        return {
-            "province": province,
-            "city": city,
-            "district": district,
-            "full_address": text
-        }
-    
-    def parse_facility_type(self, text: str) -> str:
-        """解析场馆类型"""
-        if pd.isna(text) or not str(text).strip():
-            return "未知"
-        
-        text = str(text).strip()
-        
-        # 场馆类型映射
-        type_mapping = {
-            "公共体育场": "体育场",
-            "公共体育馆": "体育馆",
-            "全民健身中心": "健身中心",
-            "体育公园": "体育公园",
-            "游泳馆": "游泳馆",
-            "综合体育馆": "综合馆"
-        }
-        
-        for key, value in type_mapping.items():
-            if key in text:
-                logger.debug(f"解析场馆类型: '{text}' -> {value}")
-                return value
-        
-        return text if text else "未知"
-    
-    def parse_yes_no(self, text: str) -> bool:
+        return texts.str.extract(YEAR, expand=False).astype(float).fillna(0).astype(np.int64)
+
+    def parse_locations(self, texts: pd.Series) -> List[Dict]:
+        """解析地址信息，空单元格为空字典"""
+        stripped = texts.str.strip()
+        province = np.where(stripped.str.contains("河北省", regex=False).fillna(False), "河北省", "")
+        city = (stripped.str.extract(CITY, expand=False) + "市").fillna("")
+        district = stripped.str.extract(DISTRICT, expand=False).fillna("")
+
+        locations = []
+        for present, p, c, d, full in zip(texts.notna().tolist(), province.tolist(), city.tolist(),
+                                          district.tolist(), stripped.fillna("").tolist()):
+            locations.append({"province": p, "city": c, "district": d, "full_address": full} if present else {})
+        return locations
+
+    def parse_facility_types(self, texts: pd.Series) -> pd.Series:
+        """解析场馆类型：按映射表取第一个出现的关键词，没有则保留原文，空白为"未知" """
+        stripped = texts.str.strip()
+        conditions = [stripped.str.contains(key, regex=False).fillna(False).to_numpy(dtype=bool)
+                      for key in FACILITY_TYPE_MAPPING]
+        types = np.select(conditions, list(FACILITY_TYPE_MAPPING.values()),
+                          default=stripped.fillna("").to_numpy(dtype=object))
+        types = np.where(stripped.fillna("").to_numpy(dtype=object) == "", "未知", types)
+        return pd.Series(types, index=texts.index, dtype=object).where(texts.notna(), "")
+
+    def parse_yes_no(self, texts: pd.Series) -> pd.Series:
         """解析是/否"""
-        if pd.isna(text):
-            return False
-        
-        text = str(text).strip()
-        result = text in ["是", "有", "yes", "Yes", "YES", "true", "True"]
-        logger.debug(f"解析是否: '{text}' -> {result}")
-        return result
-    
-    def extract_sports_types(self, text: str) -> list:
-        """提取运动项目"""
-        if pd.isna(text) or not str(text).strip():
-            return []
-        
-        text = str(text)
+        return texts.str.strip().isin(YES_VALUES)
+
+    def extract_sports_types(self, texts: pd.Series) -> List[List[str]]:
+        """提取运动项目（按 SPORT_KEYWORDS 的顺序）"""
         sports = []
-        
-        # 常见运动项目
-        sport_keywords = [
-            "足球", "篮球", "排球", "羽毛球", "乒乓球", "网球",
-            "游泳", "跑步", "健身", "瑜伽", "太极拳", "广场舞",
-            "滑冰", "滑雪", "攀岩", "武术", "体操"
-        ]
-        
-        for sport in sport_keywords:
-            if sport in text:
-                sports.append(sport)
-        
-        if sports:
-            logger.debug(f"提取运动项目: '{text}' -> {sports}")
-        
+        for found in texts.str.findall(SPORTS_PATTERN).tolist():
+            sports.append(sorted(set(found), key=SPORT_RANKS.__getitem__) if isinstance(found, list) else [])
         return sports
 
 
-def convert_dataset():
-    """转换数据集主函数"""
-    
+def convert_frame(df: pd.DataFrame) -> List[Dict]:
+    """把一块数据表转换为场馆记录（id 为行索引+1）
+
+    Raises:
+        ValueError: 缺少必需的列
+    """
+    missing = [column for column in SOURCE_COLUMNS if column not in df.columns]
+    if missing:
+        raise ValueError(f"数据集缺少列: {', '.join(missing)}")
+
+    converter = TextToIndicatorConverter()
+    texts = {column: as_text(df[column]) for column in SOURCE_COLUMNS}
+
+    def plain(column: str) -> List[str]:
+        return texts[column].fillna("").tolist()
+
+    def ints(values: pd.Series) -> List[int]:
+        return values.astype(np.int64).tolist()
+
+    areas = {key: converter.extract_area_values(texts[column]).tolist() for key, column in AREA_COLUMNS.items()}
+    counts = {key: ints(converter.extract_number_values(texts[column])) for key, column in COUNT_COLUMNS.items()}
+    visitors = ints(texts['img-text'].str.extract(INTEGER, expand=False).astype(float).fillna(0))
+    columns = {
+        "id": (df.index + 1).tolist(),
+        "name": plain('venueName'),
+        "location": converter.parse_locations(texts['adress']),
+        "sports_types": converter.extract_sports_types(texts['项目']),
+        "description": plain('adress.1'),
+        "facility_type": converter.parse_facility_types(texts['left 2']).tolist(),
+        # 去除"运营单位："前缀
+        "operator": texts['left 3'].str.replace('运营单位：', '', regex=False).str.strip().fillna("").tolist(),
+        "build_year": converter.extract_years(texts['left 4']).tolist(),
+        "has_outdoor_fitness": converter.parse_yes_no(texts['left 11']).tolist(),
+        "subsidy_status": plain('venue-text'),
+        "image_url": plain('img src'),
+        "facilities": plain('设施'),
+        "projects": plain('项目'),
+        "remarks": plain('备注')
+    }
+
+    facilities = []
+    for i in range(len(df)):
+        facilities.append({
+            "id": columns["id"][i],
+            "name": columns["name"][i],
+            "location": columns["location"][i],
+            "sports_types": columns["sports_types"][i],
+            "description": columns["description"][i],
+            "facility_type": columns["facility_type"][i],
+            "operator": columns["operator"][i],
+            "build_year": columns["build_year"][i],
+            "indicators": {
+                "building_area": areas["building_area"][i],
+                "site_area": areas["site_area"][i],
+                "land_area": areas["land_area"][i],
+                "core_area": areas["core_area"][i],
+                "core_free_area": areas["core_free_area"][i],
+                "outdoor_area": areas["outdoor_area"][i],
+                "outdoor_free_area": areas["outdoor_free_area"][i],
+                "seats": counts["seats"][i],
+                "core_courts": counts["core_courts"][i],
+                "outdoor_courts": counts["outdoor_courts"][i],
+                "has_outdoor_fitness": columns["has_outdoor_fitness"][i],
+                "daily_visitors": visitors[i]
+            },
+            "subsidy_status": columns["subsidy_status"][i],
+            "image_url": columns["image_url"][i],
+            "facilities": columns["facilities"][i],
+            "projects": columns["projects"][i],
+            "remarks": columns["remarks"][i]
+        })
+    return facilities
+
+
+def read_dataset(input_file: str) -> pd.DataFrame:
+    """读取数据集（Excel、CSV或Parquet）"""
+    suffix = Path(input_file).suffix.lower()
+    if suffix in ('.xlsx', '.xls'):
+        return pd.read_excel(input_file)
+    if suffix == '.csv':
+        return pd.read_csv(input_file)
+    if suffix == '.parquet':
+        return pd.read_parquet(input_file)
+    raise ValueError(f"不支持的数据集格式: {input_file}")
+
+
+def convert_facilities(df: pd.DataFrame, workers: int = 1, chunk_size: int = DEFAULT_CHUNK_SIZE) -> List[Dict]:
+    """按行分块转换，workers 大于1时分块交给进程池并行处理，结果保持原有行序"""
+    chunks = [df.iloc[start:start + chunk_size] for start in range(0, len(df), max(chunk_size, 1))]
+    if workers <= 1 or len(chunks) <= 1:
+        results = map(convert_frame, chunks)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=min(workers, len(chunks)))
+        results = executor.map(convert_frame, chunks)
+
+    facilities: List[Dict] = []
+    try:
+        for chunk in results:
+            facilities.extend(chunk)
+            logger.info(f"已处理 {len(facilities)}/{len(df)} 条数据...")
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return facilities
+
+
+def convert_dataset(input_file: str, output_file: str = 'fitness_facilities_data.json',
+                    workers: int = 1, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Dict:
+    """转换数据集主函数
+
+    Args:
+        input_file: 数据集文件（.xlsx/.xls/.csv/.parquet）
+        output_file: 输出JSON文件
+        workers: 并行转换的进程数
+        chunk_size: 每块的行数
+
+    Returns:
+        输出的数据（metadata + facilities）
+    """
     logger.info("开始读取Excel数据集...")
-    
+
     try:
-        # 读取Excel文件
-        df = pd.read_excel('/Users/haoxiugong/Desktop/projects/nlp/数据集.xlsx')
+        df = read_dataset(input_file)
         logger.info(f"✅ 成功读取数据集: {len(df)} 行, {len(df.columns)} 列")
-        
-        # 初始化转换器
-        converter = TextToIndicatorConverter()
-        
-        # 转换后的数据
-        facilities = []
-        
-        logger.info("开始逐行处理数据...")
-        
-        for idx, row in df.iterrows():
-            try:
-                # 提取基本信息 - 根据实际列名
-                facility = {
-                    "id": idx + 1,
-                    "name": str(row['venueName']) if pd.notna(row['venueName']) else "",
-                    "location": {},
-                    "sports_types": [],
-                    "description": "",
-                    "facility_type": "",
-                    "operator": "",
-                    "build_year": 0,
-                    "indicators": {
-                        "building_area": 0.0,
-                        "site_area": 0.0,
-                        "land_area": 0.0,
-                        "core_area": 0.0,
-                        "core_free_area": 0.0,
-                        "outdoor_area": 0.0,
-                        "outdoor_free_area": 0.0,
-                        "seats": 0,
-                        "core_courts": 0,
-                        "outdoor_courts": 0,
-                        "has_outdoor_fitness": False,
-                        "daily_visitors": 0
-                    },
-                    "subsidy_status": "",
-                    "image_url": "",
-                    "facilities": "",
-                    "projects": "",
-                    "remarks": ""
-                }
-                
-                # 图片URL
-                if pd.notna(row['img src']):
-                    facility["image_url"] = str(row['img src'])
-                
-                # 地址信息
-                if pd.notna(row['adress']):
-                    location_text = str(row['adress'])
-                    facility["location"] = converter.parse_location(location_text)
-                
-                # 详细地址
-                if pd.notna(row['adress.1']):
-                    facility["description"] = str(row['adress.1'])
-                
-                # 场馆类型
-                if pd.notna(row['left 2']):
-                    facility["facility_type"] = converter.parse_facility_type(str(row['left 2']))
-                
-                # 运营单位
-                if pd.notna(row['left 3']):
-                    operator_text = str(row['left 3'])
-                    # 去除"运营单位："前缀
-                    facility["operator"] = operator_text.replace('运营单位：', '').strip()
-                
-                # 建成年份
-                if pd.notna(row['left 4']):
-                    facility["build_year"] = converter.extract_year(str(row['left 4']))
-                
-                # 建筑面积
-                if pd.notna(row['left 5']):
-                    facility["indicators"]["building_area"] = converter.extract_area_value(str(row['left 5']))
-                
-                # 场馆外围免费或低收费开放的场地面积
-                if pd.notna(row['left 6']):
-                    facility["indicators"]["outdoor_free_area"] = converter.extract_area_value(str(row['left 6']))
-                
-                # 场地面积
-                if pd.notna(row['left 7']):
-                    facility["indicators"]["site_area"] = converter.extract_area_value(str(row['left 7']))
-                
-                # 场馆外围场地面积
-                if pd.notna(row['left 8']):
-                    facility["indicators"]["outdoor_area"] = converter.extract_area_value(str(row['left 8']))
-                
-                # 场馆外围免费或低收费开放的场地片数
-                if pd.notna(row['left 9']):
-                    facility["indicators"]["outdoor_courts"] = int(converter.extract_number_value(str(row['left 9'])))
-                
-                # 核心区免费或低收费开放的场地面积
-                if pd.notna(row['left 10']):
-                    facility["indicators"]["core_free_area"] = converter.extract_area_value(str(row['left 10']))
-                
-                # 是否有户外公共区域及户外健身器材
-                if pd.notna(row['left 11']):
-                    facility["indicators"]["has_outdoor_fitness"] = converter.parse_yes_no(str(row['left 11']))
-                
-                # 核心区场地面积
-                if pd.notna(row['left 12']):
-                    facility["indicators"]["core_area"] = converter.extract_area_value(str(row['left 12']))
-                
-                # 核心区免费或低收费开放的场地片数
-                if pd.notna(row['left 13']):
-                    facility["indicators"]["core_courts"] = int(converter.extract_number_value(str(row['left 13'])))
-                
-                # 用地面积
-                if pd.notna(row['left 14']):
-                    facility["indicators"]["land_area"] = converter.extract_area_value(str(row['left 14']))
-                
-                # 固定座位数
-                if pd.notna(row['left 15']):
-                    facility["indicators"]["seats"] = int(converter.extract_number_value(str(row['left 15'])))
-                
-                # 上级主管单位
-                if pd.notna(row['left 16']):
-                    # 可以添加到备注或其他字段
-                    pass
-                
-                # 设施
-                if pd.notna(row['设施']):
-                    facility["facilities"] = str(row['设施'])
-                
-                # 项目（运动项目）
-                if pd.notna(row['项目']):
-                    projects_text = str(row['项目'])
-                    facility["projects"] = projects_text
-                    facility["sports_types"] = converter.extract_sports_types(projects_text)
-                
-                # 备注
-                if pd.notna(row['备注']):
-                    facility["remarks"] = str(row['备注'])
-                
-                # 补助状态
-                if pd.notna(row['venue-text']):
-                    facility["subsidy_status"] = str(row['venue-text'])
-                
-                # 客流量
-                if pd.notna(row['img-text']):
-                    visitors_text = str(row['img-text'])
-                    visitors_match = re.search(r'(\d+)', visitors_text)
-                    if visitors_match:
-                        facility["indicators"]["daily_visitors"] = int(visitors_match.group(1))
-                
-                facilities.append(facility)
-                
-                if (idx + 1) % 100 == 0:
-                    logger.info(f"已处理 {idx + 1}/{len(df)} 条数据...")
-                
-            except Exception as e:
-                logger.error(f"处理第 {idx + 1} 行数据时出错: {str(e)}")
-                continue
-        
+
+        logger.info("开始按列处理数据...")
+        facilities = convert_facilities(df, workers, chunk_size)
         logger.info(f"✅ 数据处理完成，共转换 {len(facilities)} 条记录")
-        
+
         # 保存为JSON格式
         output_data = {
             "metadata": {
                 "total_count": len(facilities),
                 "conversion_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "source": "数据集.xlsx",
+                "source": Path(input_file).name,
                 "description": "河北省全民健身场馆数据 - 通过NLP语义分析转换"
             },
             "facilities": facilities
         }
-        
-        # 保存到项目根目录
-        output_file = 'fitness_facilities_data.json'
+
         with open(output_file, 'w', encoding='utf-8') as f:
             json.dump(output_data, f, ensure_ascii=False, indent=2)
-        
+
         logger.info(f"✅ 数据已保存到: {output_file}")
-        
+
         # 生成统计报告
         generate_statistics(facilities)
-        
+
         return output_data
-        
+
     except Exception as e:
         logger.error(f"❌ 数据转换失败: {str(e)}")
         raise
@@ -380,42 +320,54 @@ def generate_statistics(facilities: list):
     logger.info("\n" + "=" * 80)
     logger.info("数据统计报告")
     logger.info("=" * 80)
-    
+
     # 按城市统计
     city_count = {}
     facility_type_count = {}
     total_area = 0
     total_visitors = 0
-    
+
     for facility in facilities:
         city = facility["location"].get("city", "未知")
         if city:
             city_count[city] = city_count.get(city, 0) + 1
-        
+
         ftype = facility.get("facility_type", "未知")
         facility_type_count[ftype] = facility_type_count.get(ftype, 0) + 1
-        
+
         total_area += facility["indicators"].get("site_area", 0)
         total_visitors += facility["indicators"].get("daily_visitors", 0)
-    
+
     logger.info(f"\n总场馆数: {len(facilities)}")
     logger.info(f"总场地面积: {total_area:,.2f} 平方米")
     logger.info(f"总日客流量: {total_visitors:,} 人次")
-    
+
     logger.info("\n按城市分布:")
     for city, count in sorted(city_count.items(), key=lambda x: x[1], reverse=True):
         logger.info(f"  {city}: {count} 个场馆")
-    
+
     logger.info("\n按场馆类型分布:")
     for ftype, count in sorted(facility_type_count.items(), key=lambda x: x[1], reverse=True):
         logger.info(f"  {ftype}: {count} 个")
-    
+
     logger.info("=" * 80)
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="将Excel数据集转换为场馆JSON数据")
+    parser.add_argument('input', nargs='?', default='数据集.xlsx', help='数据集文件（.xlsx/.xls/.csv/.parquet）')
+    parser.add_argument('--output', default='fitness_facilities_data.json', help='输出JSON文件')
+    parser.add_argument('--workers', type=int, default=1, help='并行转换的进程数')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='每块的行数')
+    args = parser.parse_args()
+
+    configure_logging()
+    logger.info("=" * 80)
+    logger.info("开始数据集转换任务")
+    logger.info("=" * 80)
+
     try:
-        convert_dataset()
+        convert_dataset(args.input, args.output, args.workers, args.chunk_size)
         logger.info("\n🎉 数据集转换任务完成!")
     except Exception as e:
         logger.error(f"\n❌ 任务失败: {str(e)}")
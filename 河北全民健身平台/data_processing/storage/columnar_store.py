@@ -0,0 +1,467 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+列式数据层
+各数据集（场馆、人口、健身参与、知识图谱、小时客流）以固定的Arrow schema存为Parquet，
+按城市/年份/月份等列做Hive风格分区（root/数据集/列=值/part-N.parquet）。
+读取时只解码用到的列，过滤条件先裁剪分区目录、再按行组统计信息跳过不相关的数据；
+无空值的数值列可以零拷贝转为NumPy数组
+
+    python data_processing/storage/columnar_store.py import        # 由JSON源文件生成Parquet
+    python data_processing/storage/columnar_store.py info          # 查看各数据集的分区与大小
+"""
+
+import argparse
+import json
+import shutil
+import sys
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from loguru import logger
+
+# 以脚本方式运行时也能导入项目内模块
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+from knowledge_graph.relation_table import iter_kg_items
+
+DEFAULT_STORE_DIR = 'data/columnar'
+
+# 单次写入的行组大小，过滤条件按行组的最小/最大值跳过数据
+ROW_GROUP_SIZE = 64 * 1024
+
+# (列名, 运算符, 值) 的列表表示逐项AND，列表的列表表示多组条件OR（与 pandas/pyarrow 的 filters 参数一致）
+Filters = Union[List[Tuple[str, str, object]], List[List[Tuple[str, str, object]]], ds.Expression]
+
+# 场馆数据中嵌套的 location / indicators 字段，存储时展开为顶层列
+LOCATION_FIELDS = ('province', 'city', 'district', 'full_address')
+INDICATOR_FIELDS = (
+    'building_area', 'site_area', 'land_area', 'core_area', 'core_free_area',
+    'outdoor_area', 'outdoor_free_area', 'seats', 'core_courts', 'outdoor_courts',
+    'has_outdoor_fitness', 'daily_visitors'
+)
+
+
+class DatasetSpec:
+    """数据集定义
+
+    schema 包含分区列；source 为相对项目根目录的JSON源文件，
+    flatten/nest 在源记录与按schema展开的平铺记录之间转换，order_by 为读取后恢复源文件顺序的列
+    """
+
+    __slots__ = ('name', 'schema', 'partition_by', 'source', 'order_by', 'flatten', 'nest')
+
+    def __init__(self, name: str, schema: pa.Schema, partition_by: Sequence[str] = (),
+                 source: Optional[str] = None, order_by: Optional[str] = None,
+                 flatten: Optional[Callable[[Dict], Dict]] = None,
+                 nest: Optional[Callable[[Dict], Dict]] = None):
+        self.name = name
+        self.schema = schema
+        self.partition_by = tuple(partition_by)
+        self.source = source
+        self.order_by = order_by
+        self.flatten = flatten
+        self.nest = nest
+
+    @property
+    def partitioning(self) -> Optional[ds.Partitioning]:
+        if not self.partition_by:
+            return None
+        return ds.partitioning(pa.schema([self.schema.field(name) for name in self.partition_by]), flavor='hive')
+
+
+def _flatten_facility(facility: Dict) -> Dict:
+    record = {key: value for key, value in facility.items() if key not in ('location', 'indicators')}
+    location = facility.get('location') or {}
+    indicators = facility.get('indicators') or {}
+    record.update({name: location.get(name) for name in LOCATION_FIELDS})
+    record.update({name: indicators.get(name) for name in INDICATOR_FIELDS})
+    return record
+
+
+def _nest_facility(record: Dict) -> Dict:
+    """平铺记录还原为 fitness_facilities_data.json 中的嵌套结构，空值字段不写入嵌套字典"""
+    facility = {}
+    for key, value in record.items():
+        if key in LOCATION_FIELDS:
+            nested = facility.setdefault('location', {})
+        elif key in INDICATOR_FIELDS:
+            nested = facility.setdefault('indicators', {})
+        else:
+            facility[key] = value
+            continue
+        if value is not None:
+            nested[key] = value
+    return facility
+
+
+def _flatten_properties(record: Dict) -> Dict:
+    """属性字典各键类型不一，整体存为JSON字符串列"""
+    return dict(record, properties=json.dumps(record.get('properties') or {}, ensure_ascii=False))
+
+
+def _nest_properties(record: Dict) -> Dict:
+    if record.get('properties') is not None:
+        record['properties'] = json.loads(record['properties'])
+    return record
+
+
+DATASETS: Dict[str, DatasetSpec] = {spec.name: spec for spec in (
+    DatasetSpec(
+        'facilities',
+        pa.schema([
+            ('id', pa.int32()),
+            ('name', pa.string()),
+            *[(name, pa.string()) for name in LOCATION_FIELDS],
+            ('sports_types', pa.list_(pa.string())),
+            ('description', pa.string()),
+            ('facility_type', pa.string()),
+            ('operator', pa.string()),
+            ('build_year', pa.int32()),
+            *[(name, pa.float64()) for name in INDICATOR_FIELDS[:7]],
+            ('seats', pa.int32()),
+            ('core_courts', pa.int32()),
+            ('outdoor_courts', pa.int32()),
+            ('has_outdoor_fitness', pa.bool_()),
+            ('daily_visitors', pa.int32()),
+            ('subsidy_status', pa.string()),
+            ('image_url', pa.string()),
+            ('facilities', pa.string()),
+            ('projects', pa.string()),
+            ('remarks', pa.string()),
+        ]),
+        partition_by=['city'], source='fitness_facilities_data.json', order_by='id',
+        flatten=_flatten_facility, nest=_nest_facility
+    ),
+    DatasetSpec(
+        'raw_facilities',
+        pa.schema([
+            ('id', pa.int32()),
+            ('name', pa.string()),
+            ('type', pa.string()),
+            ('city', pa.string()),
+            ('district', pa.string()),
+            ('address', pa.string()),
+            ('area', pa.int64()),
+            ('capacity', pa.int64()),
+            ('open_hours', pa.string()),
+            ('facilities', pa.list_(pa.string())),
+            ('latitude', pa.float64()),
+            ('longitude', pa.float64()),
+            ('phone', pa.string()),
+            ('is_free', pa.bool_()),
+            ('rating', pa.float64()),
+        ]),
+        partition_by=['city'], source='data/raw/facilities.json', order_by='id'
+    ),
+    DatasetSpec(
+        'population',
+        pa.schema([
+            ('city', pa.string()),
+            ('total_population', pa.int64()),
+            ('urban_population', pa.int64()),
+            ('rural_population', pa.int64()),
+            ('age_0_14', pa.int64()),
+            ('age_15_64', pa.int64()),
+            ('age_65_plus', pa.int64()),
+            ('year', pa.int32()),
+        ]),
+        partition_by=['year'], source='data/raw/population.json'
+    ),
+    DatasetSpec(
+        'participation',
+        pa.schema([
+            ('city', pa.string()),
+            ('regular_participants', pa.int64()),
+            ('participation_rate', pa.float64()),
+            ('weekly_frequency', pa.float64()),
+            ('avg_duration', pa.int32()),
+            ('popular_activities', pa.list_(pa.string())),
+            ('year', pa.int32()),
+        ]),
+        partition_by=['year'], source='data/raw/participation.json'
+    ),
+    DatasetSpec(
+        'kg_entities',
+        pa.schema([
+            ('entity_type', pa.string()),
+            ('entity_id', pa.string()),
+            ('properties', pa.string()),
+        ]),
+        partition_by=['entity_type'], source='fps_knowledge_graph.json',
+        flatten=_flatten_properties, nest=_nest_properties
+    ),
+    DatasetSpec(
+        'kg_relations',
+        pa.schema([
+            ('subject', pa.string()),
+            ('predicate', pa.string()),
+            ('object', pa.string()),
+            ('properties', pa.string()),
+        ]),
+        partition_by=['predicate'], source='fps_knowledge_graph.json',
+        flatten=_flatten_properties, nest=_nest_properties
+    ),
+    # 由 traffic_prediction/data/data_generator.py 逐月写入，没有JSON源文件
+    DatasetSpec(
+        'traffic',
+        pa.schema([
+            ('facility_id', pa.dictionary(pa.int32(), pa.string())),
+            ('timestamp', pa.timestamp('ns')),
+            ('visitors', pa.int64()),
+            ('month', pa.string()),
+        ]),
+        partition_by=['month']
+    ),
+)}
+
+
+def get_spec(name: str) -> DatasetSpec:
+    """按名称获取数据集定义
+
+    Raises:
+        KeyError: 未定义的数据集
+    """
+    spec = DATASETS.get(name)
+    if spec is None:
+        raise KeyError(f"未定义的数据集: {name}，可选 {', '.join(DATASETS)}")
+    return spec
+
+
+def iter_source_records(spec: DatasetSpec, project_root: Union[str, Path] = PROJECT_ROOT) -> Iterator[Dict]:
+    """逐条产出数据集JSON源文件中的记录（未展开）
+
+    Raises:
+        ValueError: 数据集没有JSON源文件
+    """
+    if spec.source is None:
+        raise ValueError(f"数据集 {spec.name} 没有JSON源文件")
+    path = Path(project_root) / spec.source
+
+    if spec.name.startswith('kg_'):
+        # 关系流式读取，不整体载入
+        for key, value in iter_kg_items(str(path)):
+            if key == 'relation' and spec.name == 'kg_relations':
+                yield value
+            elif key == 'entities' and spec.name == 'kg_entities':
+                for entity_type, entities in value.items():
+                    for entity_id, properties in entities.items():
+                        yield {'entity_type': entity_type, 'entity_id': entity_id, 'properties': properties}
+        return
+
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get(spec.name, [])
+    yield from data
+
+
+def to_table(spec: DatasetSpec, records: Iterable[Dict]) -> pa.Table:
+    """源记录按数据集schema转为Arrow表，缺失的列为空值"""
+    if spec.flatten is not None:
+        records = (spec.flatten(record) for record in records)
+    return pa.Table.from_pylist(list(records), schema=spec.schema)
+
+
+def build_filter(filters: Optional[Filters]) -> Optional[ds.Expression]:
+    """把 [(列, 运算符, 值), ...] 形式的过滤条件转为Arrow表达式，已是表达式时原样返回"""
+    if filters is None or isinstance(filters, ds.Expression):
+        return filters
+    if not filters:
+        return None
+    return pq.filters_to_expression(filters)
+
+
+def to_numpy(column: Union[pa.ChunkedArray, pa.Array]) -> np.ndarray:
+    """列转为NumPy数组
+
+    只有一个分块、无空值且为定长数值/时间类型时零拷贝（返回只读视图），
+    否则复制：多分块时拼接，整数列含空值时转为浮点并以NaN表示空值
+    """
+    if isinstance(column, pa.ChunkedArray):
+        if column.num_chunks == 1:
+            column = column.chunk(0)
+        elif column.num_chunks == 0:
+            return np.empty(0, dtype=column.type.to_pandas_dtype())
+    if isinstance(column, pa.Array) and column.null_count == 0 and (
+            pa.types.is_integer(column.type) or pa.types.is_floating(column.type)
+            or pa.types.is_temporal(column.type)):
+        return column.to_numpy(zero_copy_only=True)
+    return column.to_numpy(zero_copy_only=False)
+
+
+class ColumnarStore:
+    """Parquet数据集目录"""
+
+    def __init__(self, root: Union[str, Path] = DEFAULT_STORE_DIR):
+        """初始化
+
+        Args:
+            root: 数据集根目录，相对路径以项目根目录为基准
+        """
+        root = Path(root)
+        self.root = root if root.is_absolute() else PROJECT_ROOT / root
+
+    def path(self, name: str) -> Path:
+        get_spec(name)
+        return self.root / name
+
+    def exists(self, name: str) -> bool:
+        """数据集是否已写入"""
+        path = self.path(name)
+        return path.is_dir() and any(path.rglob('*.parquet'))
+
+    def write(self, name: str, data: Union[pa.Table, Iterable[Dict]], replace: bool = True) -> int:
+        """写入数据集
+
+        Args:
+            name: 数据集名称
+            data: Arrow表或源记录（按 DatasetSpec.flatten 展开）
+            replace: True 时清空整个数据集；False 时只覆盖 data 中出现的分区，其余分区保留
+
+        Returns:
+            写入的行数
+        """
+        spec = get_spec(name)
+        table = data if isinstance(data, pa.Table) else to_table(spec, data)
+        table = table.select(spec.schema.names).cast(spec.schema)
+
+        path = self.path(name)
+        if replace and path.exists():
+            shutil.rmtree(path)
+        ds.write_dataset(
+            table, path, format='parquet',
+            partitioning=spec.partitioning,
+            basename_template='part-{i}.parquet',
+            existing_data_behavior='delete_matching',
+            max_rows_per_group=ROW_GROUP_SIZE,
+            min_rows_per_group=min(ROW_GROUP_SIZE, max(table.num_rows, 1))
+        )
+        logger.info(f"✅ 写入数据集 {name}: {table.num_rows} 行 -> {path}")
+        return table.num_rows
+
+    def dataset(self, name: str) -> ds.Dataset:
+        """打开数据集（只读取文件列表与元数据，不读取数据）
+
+        Raises:
+            FileNotFoundError: 数据集尚未写入
+        """
+        spec = get_spec(name)
+        if not self.exists(name):
+            raise FileNotFoundError(f"数据集 {name} 尚未写入: {self.path(name)}")
+        return ds.dataset(self.path(name), schema=spec.schema, format='parquet', partitioning=spec.partitioning)
+
+    def read(self, name: str, columns: Optional[Sequence[str]] = None,
+             filters: Optional[Filters] = None) -> pa.Table:
+        """读取数据集
+
+        Args:
+            name: 数据集名称
+            columns: 需要的列，None 为全部列
+            filters: 过滤条件，分区列上的条件直接裁剪目录
+
+        Returns:
+            Arrow表；数据集定义了 order_by 时按该列排序（即源文件顺序）
+        """
+        spec = get_spec(name)
+        columns = list(spec.schema.names if columns is None else columns)
+        order_by = spec.order_by
+        scan_columns = columns + [order_by] if order_by and order_by not in columns else columns
+
+        table = self.dataset(name).to_table(columns=scan_columns, filter=build_filter(filters))
+        if order_by:
+            table = table.sort_by(order_by).select(columns)
+        return table
+
+    def read_records(self, name: str, columns: Optional[Sequence[str]] = None,
+                     filters: Optional[Filters] = None) -> List[Dict]:
+        """读取为字典列表；读取全部列时还原为源文件中的记录结构"""
+        spec = get_spec(name)
+        records = self.read(name, columns, filters).to_pylist()
+        if columns is None and spec.nest is not None:
+            records = [spec.nest(record) for record in records]
+        return records
+
+    def read_numpy(self, name: str, columns: Sequence[str],
+                   filters: Optional[Filters] = None) -> Dict[str, np.ndarray]:
+        """读取为 列名 -> NumPy数组，见 to_numpy"""
+        table = self.read(name, columns, filters)
+        return {column: to_numpy(table.column(column)) for column in columns}
+
+    def modified_time(self, name: str) -> Optional[float]:
+        """数据集最后写入的时间戳（最新Parquet文件的修改时间），未写入时为None"""
+        times = [file.stat().st_mtime for file in self.path(name).rglob('*.parquet')]
+        return max(times) if times else None
+
+    def partitions(self, name: str) -> List[str]:
+        """数据集的分区目录（相对数据集根目录）"""
+        path = self.path(name)
+        return sorted({str(file.parent.relative_to(path)) for file in path.rglob('*.parquet')})
+
+    def import_sources(self, names: Optional[Sequence[str]] = None,
+                       project_root: Union[str, Path] = PROJECT_ROOT) -> Dict[str, int]:
+        """由JSON源文件（重新）生成数据集，源文件不存在的数据集跳过
+
+        Returns:
+            数据集名称 -> 写入行数
+        """
+        names = list(names) if names else [name for name, spec in DATASETS.items() if spec.source]
+        counts = {}
+        for name in names:
+            spec = get_spec(name)
+            if spec.source is None:
+                raise ValueError(f"数据集 {name} 没有JSON源文件")
+            if not (Path(project_root) / spec.source).exists():
+                logger.warning(f"跳过数据集 {name}: 未找到 {spec.source}")
+                continue
+            counts[name] = self.write(name, iter_source_records(spec, project_root))
+        return counts
+
+    def describe(self, name: str) -> Dict:
+        """数据集概况：行数、分区、文件数与磁盘大小（只读Parquet元数据）"""
+        files = sorted(self.path(name).rglob('*.parquet'))
+        return {
+            'rows': sum(pq.ParquetFile(file).metadata.num_rows for file in files),
+            'partitions': len(self.partitions(name)),
+            'files': len(files),
+            'bytes': sum(file.stat().st_size for file in files)
+        }
+
+
+def configure_logging():
+    """配置日志输出（仅在以脚本方式运行时调用）"""
+    logger.remove()
+    logger.add(sys.stderr, level="INFO")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parquet列式数据层")
+    parser.add_argument('command', choices=['import', 'info'], help='import: 由JSON源文件生成; info: 查看数据集')
+    parser.add_argument('--root', default=DEFAULT_STORE_DIR, help='数据集根目录')
+    parser.add_argument('--datasets', nargs='*', help='只处理指定的数据集')
+    args = parser.parse_args()
+
+    configure_logging()
+    store = ColumnarStore(args.root)
+    if args.command == 'import':
+        counts = store.import_sources(args.datasets)
+        logger.info(f"✅ 共导入 {len(counts)} 个数据集，{sum(counts.values())} 行")
+        return
+
+    for name in args.datasets or DATASETS:
+        if not store.exists(name):
+            print(f"{name:15s} 未写入")
+            continue
+        info = store.describe(name)
+        print(f"{name:15s} {info['rows']:>10,} 行  {info['partitions']:>4} 个分区  "
+              f"{info['files']:>4} 个文件  {info['bytes'] / 1024:>10.1f} KB")
+
+
+if __name__ == "__main__":
+    main()
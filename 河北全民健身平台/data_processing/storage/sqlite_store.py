@@ -0,0 +1,500 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+嵌入式分析库（SQLite）
+场馆、人口、健身参与与小时客流各建一张带索引的表，表结构由列式数据层的Arrow schema生成；
+build 时优先从Parquet数据集载入，尚未生成Parquet的数据集直接读取JSON源文件。
+API只读访问：每个工作进程（线程）复用一个只读连接，SQL按参数组合生成固定文本，
+由连接的语句缓存复用预编译语句；过滤、聚合与分页都在SQL中完成
+
+    python data_processing/storage/sqlite_store.py build       # (重新)生成 data/analytics.db
+    python data_processing/storage/sqlite_store.py sync        # 只重新载入来源数据有更新的表
+    python data_processing/storage/sqlite_store.py info        # 查看各表行数
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import pyarrow as pa
+import pyarrow.compute as pc
+from loguru import logger
+
+# 以脚本方式运行时也能导入项目内模块
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+from data_processing.storage.columnar_store import (
+    DEFAULT_STORE_DIR, ColumnarStore, get_spec, iter_source_records, to_table
+)
+
+DEFAULT_DB_FILE = 'data/analytics.db'
+
+# 入库的数据集（表名与数据集同名）及其索引
+TABLE_INDEXES: Dict[str, List[Tuple[str, ...]]] = {
+    'raw_facilities': [('city', 'type'), ('type',)],
+    'facilities': [('city', 'facility_type'), ('facility_type',), ('build_year',)],
+    'population': [('city', 'year')],
+    'participation': [('city', 'year')],
+    'traffic': [('facility_id', 'timestamp'), ('timestamp',)],
+}
+
+# 各表的写入版本，与表数据在同一事务中更新，读取方据此判断哪些表发生了变化
+VERSIONS_TABLE = 'table_versions'
+
+# 客流汇总粒度 -> 时间戳前缀长度（'YYYY-MM-DD HH:MM:SS'）
+TRAFFIC_GRANULARITY = {'hour': 13, 'day': 10, 'month': 7, 'year': 4}
+
+# aggregate 可用的聚合函数
+AGGREGATES = ('COUNT', 'SUM', 'AVG', 'MIN', 'MAX')
+
+# 每个连接缓存的预编译语句数
+CACHED_STATEMENTS = 256
+INSERT_BATCH_ROWS = 50_000
+
+
+def _sql_type(data_type: pa.DataType) -> str:
+    if pa.types.is_integer(data_type) or pa.types.is_boolean(data_type):
+        return 'INTEGER'
+    if pa.types.is_floating(data_type):
+        return 'REAL'
+    return 'TEXT'
+
+
+class TableSpec:
+    """由数据集schema派生的表结构：列、SQL类型以及读取时需要还原的布尔/列表列"""
+
+    __slots__ = ('name', 'columns', 'types', 'bool_columns', 'json_columns', 'order_by')
+
+    def __init__(self, name: str):
+        spec = get_spec(name)
+        self.name = name
+        self.columns = list(spec.schema.names)
+        self.types = {field.name: _sql_type(field.type) for field in spec.schema}
+        self.bool_columns = {field.name for field in spec.schema if pa.types.is_boolean(field.type)}
+        self.json_columns = {field.name for field in spec.schema if pa.types.is_list(field.type)}
+        # 没有排序列时按插入顺序（即源文件顺序）返回
+        self.order_by = spec.order_by or 'rowid'
+
+    def create_sql(self) -> str:
+        columns = ', '.join(f'"{column}" {self.types[column]}' for column in self.columns)
+        return f'CREATE TABLE {self.name} ({columns})'
+
+    def index_sql(self) -> List[str]:
+        return [
+            f'CREATE INDEX idx_{self.name}_{"_".join(index)} ON {self.name} ({", ".join(index)})'
+            for index in TABLE_INDEXES[self.name]
+        ]
+
+    def check_columns(self, columns: Sequence[str]):
+        """列名来自请求参数，拼入SQL前先校验
+
+        Raises:
+            ValueError: 表中没有该列
+        """
+        unknown = [column for column in columns if column not in self.types]
+        if unknown:
+            raise ValueError(f"表 {self.name} 没有列: {', '.join(unknown)}")
+
+
+TABLES: Dict[str, TableSpec] = {name: TableSpec(name) for name in TABLE_INDEXES}
+
+
+def get_table(name: str) -> TableSpec:
+    """
+    Raises:
+        KeyError: 未入库的数据集
+    """
+    table = TABLES.get(name)
+    if table is None:
+        raise KeyError(f"分析库中没有表: {name}，可选 {', '.join(TABLES)}")
+    return table
+
+
+def _sql_values(column: pa.ChunkedArray) -> List:
+    """Arrow列转为sqlite3可绑定的Python值：时间戳转ISO文本，列表转JSON文本"""
+    if pa.types.is_timestamp(column.type):
+        return pc.strftime(column, format='%Y-%m-%d %H:%M:%S').to_pylist()
+    if pa.types.is_dictionary(column.type):
+        return column.cast(pa.string()).to_pylist()
+    if pa.types.is_list(column.type):
+        return [None if value is None else json.dumps(value, ensure_ascii=False) for value in column.to_pylist()]
+    return column.to_pylist()
+
+
+@lru_cache(maxsize=1024)
+def _select_sql(table: str, columns: Tuple[str, ...], filters: Tuple[str, ...],
+                paged: bool, order_by: str) -> str:
+    """生成查询语句；同一参数组合得到同一SQL文本，命中连接的预编译语句缓存"""
+    sql = f'SELECT {", ".join(columns)} FROM {table}'
+    if filters:
+        sql += ' WHERE ' + ' AND '.join(filters)
+    sql += f' ORDER BY {order_by}'
+    if paged:
+        sql += ' LIMIT ? OFFSET ?'
+    return sql
+
+
+class AnalyticsStore:
+    """SQLite分析库"""
+
+    def __init__(self, db_file: Union[str, Path] = DEFAULT_DB_FILE,
+                 columnar_dir: Union[str, Path] = DEFAULT_STORE_DIR):
+        """初始化
+
+        Args:
+            db_file: 数据库文件，相对路径以项目根目录为基准
+            columnar_dir: build 时读取的Parquet数据层目录
+        """
+        db_file = Path(db_file)
+        self.db_file = db_file if db_file.is_absolute() else PROJECT_ROOT / db_file
+        self.columnar = ColumnarStore(columnar_dir)
+        self._local = threading.local()
+
+    def exists(self) -> bool:
+        return self.db_file.exists()
+
+    def connection(self) -> sqlite3.Connection:
+        """当前线程的只读连接（首次调用时打开，fork 出的子进程重新打开）"""
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            local.pid = os.getpid()
+            local.conn = sqlite3.connect(
+                f'file:{self.db_file}?mode=ro', uri=True,
+                cached_statements=CACHED_STATEMENTS
+            )
+            local.conn.execute('PRAGMA query_only = ON')
+        return local.conn
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.pid = None
+
+    # ------------------------------------------------------------------ 写入
+
+    def build(self, names: Optional[Sequence[str]] = None,
+              project_root: Union[str, Path] = PROJECT_ROOT) -> Dict[str, int]:
+        """从Parquet数据层（或JSON源文件）重新载入各表
+
+        每张表在单个事务内清空并重新写入，读连接在提交前看到的始终是旧数据
+
+        Returns:
+            表名 -> 行数
+        """
+        names = list(names or TABLES)
+        self.db_file.parent.mkdir(parents=True, exist_ok=True)
+        counts = {}
+        # 入库时间取读取来源数据之前的时间，载入期间来源数据再有更新时下次 sync 仍会重新载入
+        updated_at = datetime.now().isoformat()
+        # 手动控制事务，DROP/CREATE 与写入在同一事务中
+        conn = sqlite3.connect(self.db_file, isolation_level=None)
+        try:
+            # WAL模式下写入不阻塞API的读连接
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute(f'CREATE TABLE IF NOT EXISTS {VERSIONS_TABLE} '
+                         '(name TEXT PRIMARY KEY, version INTEGER, rows INTEGER, updated_at TEXT)')
+            for name in names:
+                table = self._source_table(name, project_root)
+                counts[name] = self._replace(conn, get_table(name), table, updated_at)
+            conn.execute('ANALYZE')
+        finally:
+            conn.close()
+        logger.info(f"✅ 分析库已更新: {self.db_file} {counts}")
+        return counts
+
+    def sync(self, names: Optional[Sequence[str]] = None,
+             project_root: Union[str, Path] = PROJECT_ROOT) -> Dict[str, int]:
+        """只重新载入尚未入库、或来源数据（Parquet数据集/JSON源文件）比入库时间新的表
+
+        Returns:
+            重新载入的表名 -> 行数，没有需要更新的表时为空
+        """
+        stale = self.stale_tables(names, project_root)
+        return self.build(stale, project_root) if stale else {}
+
+    def stale_tables(self, names: Optional[Sequence[str]] = None,
+                     project_root: Union[str, Path] = PROJECT_ROOT) -> List[str]:
+        """尚未入库或来源数据比入库时间新的表"""
+        versions = self.table_versions() if self.exists() else {}
+        stale = []
+        for name in names or TABLES:
+            if name not in versions:
+                stale.append(name)
+                continue
+            modified = self.source_modified_time(name, project_root)
+            if modified is not None and datetime.fromtimestamp(modified) > datetime.fromisoformat(versions[name][1]):
+                stale.append(name)
+        return stale
+
+    def source_modified_time(self, name: str, project_root: Union[str, Path] = PROJECT_ROOT) -> Optional[float]:
+        """表的来源数据最后修改的时间戳（与 _source_table 的选择顺序一致），没有来源数据时为None"""
+        modified = self.columnar.modified_time(name)
+        if modified is not None:
+            return modified
+        spec = get_spec(name)
+        if spec.source is not None and (Path(project_root) / spec.source).exists():
+            return (Path(project_root) / spec.source).stat().st_mtime
+        return None
+
+    def _source_table(self, name: str, project_root: Union[str, Path]) -> pa.Table:
+        """表数据来源：Parquet数据集优先，其次JSON源文件，都没有时建空表"""
+        spec = get_spec(name)
+        if self.columnar.exists(name):
+            return self.columnar.read(name)
+        if spec.source is not None and (Path(project_root) / spec.source).exists():
+            return to_table(spec, iter_source_records(spec, project_root))
+        logger.warning(f"表 {name} 没有Parquet数据集或JSON源文件，建为空表")
+        return spec.schema.empty_table()
+
+    @staticmethod
+    def _replace(conn: sqlite3.Connection, spec: TableSpec, table: pa.Table, updated_at: str) -> int:
+        table = table.select(spec.columns)
+        insert = f'INSERT INTO {spec.name} VALUES ({", ".join("?" * len(spec.columns))})'
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute(f'DROP TABLE IF EXISTS {spec.name}')
+            conn.execute(spec.create_sql())
+            for start in range(0, table.num_rows, INSERT_BATCH_ROWS):
+                batch = table.slice(start, INSERT_BATCH_ROWS)
+                conn.executemany(insert, zip(*(_sql_values(batch.column(c)) for c in spec.columns)))
+            # 写完数据再建索引，比逐行维护索引快
+            for statement in spec.index_sql():
+                conn.execute(statement)
+            conn.execute(
+                f'INSERT INTO {VERSIONS_TABLE} VALUES (?, 1, ?, ?) ON CONFLICT(name) DO UPDATE SET '
+                'version = version + 1, rows = excluded.rows, updated_at = excluded.updated_at',
+                (spec.name, table.num_rows, updated_at)
+            )
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return table.num_rows
+
+    # ------------------------------------------------------------------ 查询
+
+    def _rows(self, sql: str, params: Sequence = ()) -> Iterator[Tuple]:
+        return self.connection().execute(sql, params)
+
+    @staticmethod
+    def _where(spec: TableSpec, equals: Optional[Dict[str, object]]) -> Tuple[Tuple[str, ...], List]:
+        """相等过滤条件，值为None的条件忽略；列表值生成 IN 条件"""
+        filters, params = [], []
+        for column, value in sorted((equals or {}).items()):
+            if value is None:
+                continue
+            spec.check_columns([column])
+            if isinstance(value, (list, tuple, set)):
+                value = list(value)
+                filters.append(f'{column} IN ({", ".join("?" * len(value))})')
+                params.extend(value)
+            else:
+                filters.append(f'{column} = ?')
+                params.append(value)
+        return tuple(filters), params
+
+    def select(self, name: str, columns: Optional[Sequence[str]] = None,
+               equals: Optional[Dict[str, object]] = None,
+               limit: Optional[int] = None, offset: int = 0) -> List[Dict]:
+        """查询记录
+
+        Args:
+            name: 表名
+            columns: 返回的列，None 为全部列
+            equals: 列 -> 取值 的相等过滤条件
+            limit: 返回条数上限，None 为不分页
+            offset: 分页偏移
+
+        Returns:
+            记录列表，布尔与列表列还原为Python类型
+        """
+        spec = get_table(name)
+        columns = tuple(columns or spec.columns)
+        spec.check_columns(columns)
+        filters, params = self._where(spec, equals)
+        if limit is not None:
+            params += [limit, offset]
+        sql = _select_sql(name, columns, filters, limit is not None, spec.order_by)
+
+        bools = [i for i, c in enumerate(columns) if c in spec.bool_columns]
+        lists = [i for i, c in enumerate(columns) if c in spec.json_columns]
+        records = []
+        for row in self._rows(sql, params):
+            if bools or lists:
+                row = list(row)
+                for i in bools:
+                    row[i] = None if row[i] is None else bool(row[i])
+                for i in lists:
+                    row[i] = None if row[i] is None else json.loads(row[i])
+            records.append(dict(zip(columns, row)))
+        return records
+
+    def count(self, name: str, equals: Optional[Dict[str, object]] = None) -> int:
+        spec = get_table(name)
+        filters, params = self._where(spec, equals)
+        sql = f'SELECT COUNT(*) FROM {name}' + (' WHERE ' + ' AND '.join(filters) if filters else '')
+        return self._rows(sql, params).fetchone()[0]
+
+    def group_count(self, name: str, column: str, equals: Optional[Dict[str, object]] = None) -> List[Tuple]:
+        """按列分组计数，按数量降序
+
+        Returns:
+            [(取值, 数量), ...]
+        """
+        spec = get_table(name)
+        spec.check_columns([column])
+        filters, params = self._where(spec, equals)
+        where = ' WHERE ' + ' AND '.join(filters) if filters else ''
+        sql = f'SELECT {column}, COUNT(*) AS n FROM {name}{where} GROUP BY {column} ORDER BY n DESC, {column}'
+        return [tuple(row) for row in self._rows(sql, params)]
+
+    def aggregate(self, name: str, group_by: Sequence[str], aggregates: Dict[str, Tuple[str, str]],
+                  equals: Optional[Dict[str, object]] = None) -> List[Dict]:
+        """多列分组聚合
+
+        Args:
+            name: 表名
+            group_by: 分组列
+            aggregates: 结果字段 -> (聚合函数, 列)，列为 '*' 表示 COUNT(*)
+            equals: 相等过滤条件
+
+        Returns:
+            每组一条记录，按分组列排序
+
+        Raises:
+            ValueError: 列不存在或聚合函数不支持
+        """
+        spec = get_table(name)
+        spec.check_columns(group_by)
+        expressions = []
+        for function, column in aggregates.values():
+            if function not in AGGREGATES:
+                raise ValueError(f"不支持的聚合函数: {function}，可选 {', '.join(AGGREGATES)}")
+            if column != '*':
+                spec.check_columns([column])
+            expressions.append(f'{function}({column})')
+        filters, params = self._where(spec, equals)
+        where = ' WHERE ' + ' AND '.join(filters) if filters else ''
+        groups = ', '.join(group_by)
+        sql = f'SELECT {", ".join([*group_by, *expressions])} FROM {name}{where}'
+        if group_by:
+            sql += f' GROUP BY {groups} ORDER BY {groups}'
+        keys = [*group_by, *aggregates]
+        return [dict(zip(keys, row)) for row in self._rows(sql, params)]
+
+    def summary(self) -> Dict:
+        """数据概览：场馆数、覆盖城市数、最新年份总人口、平均参与率"""
+        conn = self.connection()
+        facilities, cities = conn.execute(
+            "SELECT COUNT(*), COUNT(DISTINCT NULLIF(city, '')) FROM facilities").fetchone()
+        population = conn.execute(
+            'SELECT COALESCE(SUM(total_population), 0) FROM population '
+            'WHERE year = (SELECT MAX(year) FROM population)').fetchone()[0]
+        participation = conn.execute(
+            'SELECT AVG(participation_rate) FROM participation '
+            'WHERE year = (SELECT MAX(year) FROM participation)').fetchone()[0]
+        return {
+            'total_facilities': facilities,
+            'total_population': population,
+            'cities_count': cities,
+            'avg_participation_rate': round(participation or 0, 4)
+        }
+
+    def traffic_series(self, facility_id: Optional[str] = None, start: Optional[str] = None,
+                       end: Optional[str] = None, granularity: str = 'day') -> List[Dict]:
+        """客流按时间汇总
+
+        Args:
+            facility_id: 设施ID（如 Facility_1），None 为全部设施合计
+            start: 起始时间（含），'YYYY-MM-DD' 或 'YYYY-MM-DD HH:MM:SS'
+            end: 结束时间（不含）
+            granularity: hour / day / month / year
+
+        Returns:
+            [{'period', 'visitors', 'records'}, ...]，按时间升序
+
+        Raises:
+            ValueError: 不支持的汇总粒度
+        """
+        width = TRAFFIC_GRANULARITY.get(granularity)
+        if width is None:
+            raise ValueError(f"不支持的汇总粒度: {granularity}，可选 {', '.join(TRAFFIC_GRANULARITY)}")
+
+        filters, params = [], []
+        if facility_id is not None:
+            filters.append('facility_id = ?')
+            params.append(facility_id)
+        if start is not None:
+            filters.append('timestamp >= ?')
+            params.append(start)
+        if end is not None:
+            filters.append('timestamp < ?')
+            params.append(end)
+        where = ' WHERE ' + ' AND '.join(filters) if filters else ''
+        sql = (f'SELECT substr(timestamp, 1, {width}) AS period, SUM(visitors), COUNT(*) '
+               f'FROM traffic{where} GROUP BY period ORDER BY period')
+        return [{'period': period, 'visitors': visitors, 'records': records}
+                for period, visitors, records in self._rows(sql, params)]
+
+    def table_versions(self) -> Dict[str, Tuple[int, str]]:
+        """表名 -> (写入版本, 写入时间)；重新生成整个库时版本号会从1重新计数，需同时比较写入时间"""
+        conn = self.connection()
+        if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                            (VERSIONS_TABLE,)).fetchone():
+            return {}
+        return {name: (version, updated_at)
+                for name, version, updated_at in conn.execute(f'SELECT name, version, updated_at FROM {VERSIONS_TABLE}')}
+
+    def table_counts(self) -> Dict[str, int]:
+        """各表行数（未建的表不列出）"""
+        conn = self.connection()
+        existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        return {name: conn.execute(f'SELECT COUNT(*) FROM {name}').fetchone()[0]
+                for name in TABLES if name in existing}
+
+
+def configure_logging():
+    """配置日志输出（仅在以脚本方式运行时调用）"""
+    logger.remove()
+    logger.add(sys.stderr, level="INFO")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite分析库")
+    parser.add_argument('command', choices=['build', 'sync', 'info'],
+                        help='build: 载入数据; sync: 只载入来源数据有更新的表; info: 查看各表行数')
+    parser.add_argument('--db', default=DEFAULT_DB_FILE, help='数据库文件')
+    parser.add_argument('--columnar-dir', default=DEFAULT_STORE_DIR, help='Parquet数据层目录')
+    parser.add_argument('--tables', nargs='*', help='只载入指定的表')
+    args = parser.parse_args()
+
+    configure_logging()
+    store = AnalyticsStore(args.db, args.columnar_dir)
+    if args.command == 'build':
+        store.build(args.tables)
+        return
+    if args.command == 'sync':
+        counts = store.sync(args.tables)
+        if not counts:
+            logger.info("✅ 分析库已是最新")
+        return
+
+    if not store.exists():
+        print(f"分析库尚未生成: {store.db_file}")
+        return
+    for name, rows in store.table_counts().items():
+        print(f"{name:15s} {rows:>10,} 行")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,22 @@
 """
 可及性评价模块 - GIS空间分析、距离计算、时间可及性
 """
+import sys
 import numpy as np
 import pandas as pd
+from pathlib import Path
 from typing import List, Dict, Tuple
 from loguru import logger
 import json
 from math import radians, cos, sin, asin, sqrt
 
+# 以脚本方式运行时也能导入项目内模块
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+from data_processing.storage.columnar_store import ColumnarStore
+
 
 class AccessibilityEvaluator:
     """可及性评价器"""
@@ -266,13 +275,16 @@ if __name__ == "__main__":
     # 测试示例
     evaluator = AccessibilityEvaluator()
     
-    # 加载设施数据
-    with open('data/raw/facilities.json', 'r', encoding='utf-8') as f:
-        facilities = json.load(f)
-    
-    # 加载人口数据
-    with open('data/raw/population.json', 'r', encoding='utf-8') as f:
-        population = json.load(f)
+    # 已生成列式数据时只读取评价用到的列，否则读取JSON原始数据
+    store = ColumnarStore()
+    if store.exists('raw_facilities') and store.exists('population'):
+        facilities = store.read_records('raw_facilities', ['name', 'latitude', 'longitude', 'open_hours'])
+        population = store.read_records('population', ['city', 'total_population'])
+    else:
+        with open('data/raw/facilities.json', 'r', encoding='utf-8') as f:
+            facilities = json.load(f)
+        with open('data/raw/population.json', 'r', encoding='utf-8') as f:
+            population = json.load(f)
     
     # 计算综合可及性
     accessibility_result = evaluator.calculate_comprehensive_accessibility(facilities, population)
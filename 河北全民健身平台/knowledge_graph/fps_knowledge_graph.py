@@ -12,13 +12,29 @@
 - 属性信息：各实体的详细属性
 """
 
+import gc
+import hashlib
 import json
 import sys
 from pathlib import Path
-from typing import List, Dict, Optional, Set, Tuple
+from typing import Iterable, List, Dict, Optional, Set, Tuple
 from loguru import logger
 from datetime import datetime
-from collections import defaultdict
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import accumulate, repeat
+
+# 以脚本方式运行时也能导入项目内模块
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+from knowledge_graph.kg_jsonl import write_jsonl
+from knowledge_graph.rdf_writer import write_rdf
+from knowledge_graph.triple_store import TriplePartition, TripleStore
+
+# 分片并行构建时每个进程分到的分片数（多于1以便负载均衡）
+SHARDS_PER_WORKER = 4
 
 # 配置日志
 log_dir = Path("logs")
@@ -46,8 +62,9 @@ class FPSKnowledgeGraph:
             'Sport': {}          # 运动项目实体
         }
         
-        # 关系存储
-        self.relations = []
+        # 关系存储（带SPO/POS/OSP索引，自动去重）
+        self.store = TripleStore()
+        self.total_entities = 0
         
         # 属性存储
         self.attributes = defaultdict(dict)
@@ -66,10 +83,39 @@ class FPSKnowledgeGraph:
             logger.warning(f"未知实体类型: {entity_type}")
             return
         
+        if entity_id not in self.entities[entity_type]:
+            self.total_entities += 1
         self.entities[entity_type][entity_id] = properties
         self.attributes[entity_id] = properties
         logger.debug(f"添加实体: {entity_type} - {entity_id}")
     
+    def add_entities(self, entity_type: str, items: Iterable[Tuple[str, Dict]]):
+        """批量添加同一类型的实体（语义同逐个 add_entity，不逐条记录日志）"""
+        items = dict(items)
+        type_entities = self.entities[entity_type]
+        self.total_entities += len(items.keys() - type_entities.keys())
+        type_entities.update(items)
+        self.attributes.update(items)
+    
+    def merge_relations(self, partition: TriplePartition) -> int:
+        """并入并行构建时子进程建好的关系分片，返回新增的关系数"""
+        return self.store.merge_partition(partition)
+    
+    def remove_entity(self, entity_type: str, entity_id: str) -> bool:
+        """删除实体及与其相连的全部关系，返回实体是否存在"""
+        type_entities = self.entities.get(entity_type)
+        if not type_entities or entity_id not in type_entities:
+            return False
+        
+        del type_entities[entity_id]
+        self.attributes.pop(entity_id, None)
+        self.total_entities -= 1
+        incident = list(self.store.match(subject=entity_id)) + list(self.store.match(object=entity_id))
+        for subject, predicate, object, _ in incident:
+            self.store.remove(subject, predicate, object)
+        logger.debug(f"删除实体: {entity_type} - {entity_id}")
+        return True
+    
     def add_relation(self, subject: str, predicate: str, object: str, properties: Optional[Dict] = None):
         """添加关系三元组
         
@@ -78,15 +124,23 @@ class FPSKnowledgeGraph:
             predicate: 谓词（关系类型）
             object: 宾语实体ID
             properties: 关系属性
+        
+        Returns:
+            是否为新关系（重复的三元组只合并属性）
         """
-        relation = {
-            'subject': subject,
-            'predicate': predicate,
-            'object': object,
-            'properties': properties or {}
-        }
-        self.relations.append(relation)
-        logger.debug(f"添加关系: {subject} --[{predicate}]--> {object}")
+        added = self.store.add(subject, predicate, object, properties)
+        if added:
+            logger.debug(f"添加关系: {subject} --[{predicate}]--> {object}")
+        return added
+    
+    def remove_relation(self, subject: str, predicate: str, object: str) -> bool:
+        """删除关系三元组，返回关系是否存在"""
+        return self.store.remove(subject, predicate, object)
+    
+    @property
+    def relations(self) -> List[Dict]:
+        """全部关系（按添加顺序），格式与JSON导出一致"""
+        return self.store.relations()
     
     def get_entity(self, entity_id: str) -> Optional[Dict]:
         """获取实体信息"""
@@ -94,115 +148,184 @@ class FPSKnowledgeGraph:
     
     def get_relations_by_subject(self, subject: str) -> List[Dict]:
         """获取主语为指定实体的所有关系"""
-        return [r for r in self.relations if r['subject'] == subject]
+        return self.store.relations_by_subject(subject)
     
     def get_relations_by_predicate(self, predicate: str) -> List[Dict]:
         """获取指定类型的所有关系"""
-        return [r for r in self.relations if r['predicate'] == predicate]
+        return self.store.relations_by_predicate(predicate)
+    
+    def get_relations_by_object(self, object: str) -> List[Dict]:
+        """获取宾语为指定实体的所有关系"""
+        return self.store.relations_by_object(object)
     
     def get_statistics(self) -> Dict:
         """获取知识图谱统计信息"""
         stats = {
             'entities': {k: len(v) for k, v in self.entities.items()},
-            'total_entities': sum(len(v) for v in self.entities.values()),
-            'total_relations': len(self.relations),
-            'relation_types': len(set(r['predicate'] for r in self.relations))
+            'total_entities': self.total_entities,
+            'total_relations': len(self.store),
+            'relation_types': self.store.num_predicates
         }
         return stats
     
-    def export_to_json(self, output_file: str):
-        """导出知识图谱为JSON格式"""
-        kg_data = {
-            'metadata': {
-                'name': '河北省全民健身公共服务知识图谱',
-                'description': '基于LKDF框架构建的FPS领域知识图谱',
-                'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                'dimensions': ['时间(T)', '区域(A)', '政策法规(L)', '指标(I)', '个人(P)', '设施(F)', '运动项目(S)']
-            },
-            'entities': self.entities,
-            'relations': self.relations,
-            'statistics': self.get_statistics()
+    def _metadata(self) -> Dict:
+        return {
+            'name': '河北省全民健身公共服务知识图谱',
+            'description': '基于LKDF框架构建的FPS领域知识图谱',
+            'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'dimensions': ['时间(T)', '区域(A)', '政策法规(L)', '指标(I)', '个人(P)', '设施(F)', '运动项目(S)']
         }
+    
+    def export_to_json(self, output_file: str):
+        """导出知识图谱为JSON格式
+        
+        输出与 json.dump(..., indent=2) 一致，但关系逐条写出，不先拼成完整的文档
+        """
+        def dumps(value, level: int) -> str:
+            return json.dumps(value, ensure_ascii=False, indent=2).replace('\n', '\n' + '  ' * level)
         
         with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(kg_data, f, ensure_ascii=False, indent=2)
+            f.write('{\n  "metadata": ' + dumps(self._metadata(), 1))
+            f.write(',\n  "entities": ' + dumps(self.entities, 1))
+            f.write(',\n  "relations": [')
+            for i, (s, p, o, props) in enumerate(self.store.match()):
+                f.write(',\n    ' if i else '\n    ')
+                f.write(dumps({'subject': s, 'predicate': p, 'object': o, 'properties': props}, 2))
+            f.write('\n  ]' if len(self.store) else ']')
+            f.write(',\n  "statistics": ' + dumps(self.get_statistics(), 1) + '\n}')
         
         logger.info(f"✅ 知识图谱已导出到: {output_file}")
     
+    def export_to_jsonl(self, output_file: str):
+        """导出知识图谱为JSON Lines格式（每行一个实体或关系，流式写出，可并行加载）"""
+        entities = (
+            (entity_type, entity_id, props)
+            for entity_type, type_entities in self.entities.items()
+            for entity_id, props in type_entities.items()
+        )
+        count = write_jsonl(output_file, self._metadata(), self.get_statistics(), entities, self.store.match())
+        logger.info(f"✅ 知识图谱已导出到: {output_file} ({count} 行)")
+    
     def export_to_owl(self, output_file: str):
-        """导出为OWL本体格式（用于Protege）"""
-        owl_content = self._generate_owl_content()
+        """导出为OWL本体格式（RDF/XML，用于Protege）
         
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(owl_content)
-        
-        logger.info(f"✅ OWL本体已导出到: {output_file}")
-    
-    def _generate_owl_content(self) -> str:
-        """生成OWL格式内容"""
-        owl = ['<?xml version="1.0"?>']
-        owl.append('<rdf:RDF xmlns="http://www.fps-hebei.org/ontology#"')
-        owl.append('     xml:base="http://www.fps-hebei.org/ontology"')
-        owl.append('     xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#"')
-        owl.append('     xmlns:owl="http://www.w3.org/2002/07/owl#"')
-        owl.append('     xmlns:xml="http://www.w3.org/XML/1998/namespace"')
-        owl.append('     xmlns:xsd="http://www.w3.org/2001/XMLSchema#"')
-        owl.append('     xmlns:rdfs="http://www.w3.org/2000/01/rdf-schema#">')
-        owl.append('')
-        owl.append('    <owl:Ontology rdf:about="http://www.fps-hebei.org/ontology">')
-        owl.append('        <rdfs:label>河北省全民健身公共服务知识图谱</rdfs:label>')
-        owl.append('        <rdfs:comment>基于LKDF框架的FPS领域本体</rdfs:comment>')
-        owl.append('    </owl:Ontology>')
-        owl.append('')
-        
-        # 定义类
-        owl.append('    <!-- 实体类定义 -->')
-        for entity_type in self.entities.keys():
-            owl.append(f'    <owl:Class rdf:about="#{entity_type}">')
-            owl.append(f'        <rdfs:label>{entity_type}</rdfs:label>')
-            owl.append('    </owl:Class>')
-            owl.append('')
-        
-        # 定义属性
-        owl.append('    <!-- 对象属性定义 -->')
-        predicates = set(r['predicate'] for r in self.relations)
-        for predicate in predicates:
-            owl.append(f'    <owl:ObjectProperty rdf:about="#{predicate}">')
-            owl.append(f'        <rdfs:label>{predicate}</rdfs:label>')
-            owl.append('    </owl:ObjectProperty>')
-            owl.append('')
-        
-        # 定义实例（示例部分）
-        owl.append('    <!-- 实例定义（部分示例） -->')
-        for entity_type, entities in self.entities.items():
-            for entity_id, props in list(entities.items())[:5]:  # 只导出前5个示例
-                safe_id = entity_id.replace(' ', '_').replace('/', '_')
-                owl.append(f'    <{entity_type} rdf:about="#{safe_id}">')
-                owl.append(f'        <rdfs:label>{entity_id}</rdfs:label>')
-                for key, value in props.items():
-                    if isinstance(value, (str, int, float)):
-                        owl.append(f'        <{key}>{value}</{key}>')
-                owl.append(f'    </{entity_type}>')
-                owl.append('')
-        
-        owl.append('</rdf:RDF>')
-        
-        return '\n'.join(owl)
+        包含全部实例、带数据类型的属性以及实例间的对象属性断言，流式写出
+        """
+        count = self._export_rdf(output_file)
+        logger.info(f"✅ OWL本体已导出到: {output_file} ({count} 个三元组)")
+    
+    def export_to_ntriples(self, output_file: str):
+        """导出为N-Triples格式（每行一个三元组，也可作为Turtle读取）"""
+        count = self._export_rdf(output_file)
+        logger.info(f"✅ N-Triples已导出到: {output_file} ({count} 个三元组)")
+    
+    def _export_rdf(self, output_file: str) -> int:
+        """按文件后缀流式写出RDF，返回三元组数"""
+        entities = (
+            (entity_type, entity_id, props)
+            for entity_type, type_entities in self.entities.items()
+            for entity_id, props in type_entities.items()
+        )
+        return write_rdf(
+            output_file,
+            classes=self.entities.keys(),
+            predicates=self.store.predicate_counts(),
+            entities=entities,
+            relations=self.store.match(),
+            label='河北省全民健身公共服务知识图谱',
+            comment='基于LKDF框架的FPS领域本体'
+        )
 
 
 class FPSKnowledgeGraphBuilder:
-    """FPS知识图谱构建器"""
+    """FPS知识图谱构建器
+    
+    以设施记录为单位增量构建：每个设施按内容哈希判断是否变化，只对变化的设施
+    撤销旧的派生内容（设施实体、关系、对共享实体的引用、城市指标贡献）并写入新的；
+    年份、城市、区县、运动项目等共享实体按引用计数创建与删除，城市指标只重算受影响的城市
+    """
+    
+    PROVINCE_ID = "Area_河北省"
+    
+    TIME_PERIODS = [
+        {'id': 'Period_1980s', 'name': '1980年代', 'start': 1980, 'end': 1989},
+        {'id': 'Period_1990s', 'name': '1990年代', 'start': 1990, 'end': 1999},
+        {'id': 'Period_2000s', 'name': '2000年代', 'start': 2000, 'end': 2009},
+        {'id': 'Period_2010s', 'name': '2010年代', 'start': 2010, 'end': 2019},
+        {'id': 'Period_2020s', 'name': '2020年代', 'start': 2020, 'end': 2029}
+    ]
+    
+    # 运动项目分类
+    SPORT_CATEGORIES = {
+        '足球': '球类运动', '篮球': '球类运动', '排球': '球类运动',
+        '羽毛球': '球类运动', '乒乓球': '球类运动', '网球': '球类运动',
+        '游泳': '水上运动', '跑步': '田径运动', '健身': '力量训练',
+        '瑜伽': '柔韧性训练', '太极拳': '传统运动', '广场舞': '群众运动',
+        '滑冰': '冰雪运动', '滑雪': '冰雪运动'
+    }
+    
+    # 指标类型
+    INDICATORS = [
+        {'id': 'Indicator_场地面积', 'name': '场地面积', 'unit': '平方米', 'category': '设施指标'},
+        {'id': 'Indicator_建筑面积', 'name': '建筑面积', 'unit': '平方米', 'category': '设施指标'},
+        {'id': 'Indicator_用地面积', 'name': '用地面积', 'unit': '平方米', 'category': '设施指标'},
+        {'id': 'Indicator_座位数', 'name': '座位数', 'unit': '座', 'category': '设施指标'},
+        {'id': 'Indicator_日客流量', 'name': '日客流量', 'unit': '人次', 'category': '使用指标'},
+        {'id': 'Indicator_人均场地面积', 'name': '人均体育场地面积', 'unit': '平方米/人', 'category': '区域指标'},
+        {'id': 'Indicator_参与率', 'name': '经常参加体育锻炼人数比例', 'unit': '%', 'category': '人口指标'},
+        {'id': 'Indicator_覆盖率', 'name': '公共健身设施覆盖率', 'unit': '%', 'category': '区域指标'},
+        {'id': 'Indicator_设施密度', 'name': '每万人拥有体育设施数', 'unit': '个/万人', 'category': '区域指标'}
+    ]
+    
+    # 政策法规
+    POLICIES = [
+        {
+            'id': 'Law_全民健身计划',
+            'title': '全民健身计划（2021-2025年）',
+            'level': '国家级',
+            'department': '国务院',
+            'publish_year': 2021,
+            'type': '规划'
+        },
+        {
+            'id': 'Law_河北省全民健身条例',
+            'title': '河北省全民健身条例',
+            'level': '省级',
+            'department': '河北省人大',
+            'publish_year': 2020,
+            'type': '法规'
+        },
+        {
+            'id': 'Law_体育场馆补助政策',
+            'title': '公共体育场馆向社会免费或低收费开放补助资金管理办法',
+            'level': '国家级',
+            'department': '财政部、体育总局',
+            'publish_year': 2014,
+            'type': '管理办法'
+        }
+    ]
     
     def __init__(self):
         """初始化构建器"""
         self.kg = FPSKnowledgeGraph()
+        
+        # 增量构建状态
+        self._hashes: Dict[str, str] = {}        # 设施实体ID -> 记录内容哈希
+        self._footprints: Dict[str, Dict] = {}   # 设施实体ID -> 该设施派生出的内容
+        self._refs: Dict[str, Counter] = {kind: Counter() for kind in ('year', 'city', 'district', 'sport')}
+        self._city_stats: Dict[str, Dict] = {}
+        self._static_built = False
+        
         logger.info("✅ 初始化FPS知识图谱构建器")
     
-    def build_from_facilities_data(self, data_file: str):
+    def build_from_facilities_data(self, data_file: str, workers: int = 1):
         """从场馆数据构建知识图谱
         
+        同一构建器再次调用时只同步与上次相比发生变化的设施
+        
         Args:
             data_file: 场馆数据JSON文件路径
+            workers: 首次构建时使用的进程数（按城市分片并行）
         """
         logger.info(f"开始从数据文件构建知识图谱: {data_file}")
         
@@ -213,26 +336,7 @@ class FPSKnowledgeGraphBuilder:
         facilities = data['facilities']
         logger.info(f"加载 {len(facilities)} 个场馆数据")
         
-        # 1. 构建时间维度实体 (Time)
-        self._build_time_entities(facilities)
-        
-        # 2. 构建区域维度实体 (Area)
-        self._build_area_entities(facilities)
-        
-        # 3. 构建设施实体 (Facility)
-        self._build_facility_entities(facilities)
-        
-        # 4. 构建运动项目实体 (Sport)
-        self._build_sport_entities(facilities)
-        
-        # 5. 构建指标实体 (Indicator)
-        self._build_indicator_entities(facilities)
-        
-        # 6. 构建政策法规实体 (Law) - 基于补助状态
-        self._build_law_entities(facilities)
-        
-        # 7. 构建关系
-        self._build_relations(facilities)
+        self.sync_facilities(facilities, workers)
         
         # 统计信息
         stats = self.kg.get_statistics()
@@ -245,294 +349,450 @@ class FPSKnowledgeGraphBuilder:
         
         return self.kg
     
-    def _build_time_entities(self, facilities: List[Dict]):
-        """构建时间维度实体"""
-        logger.info("构建时间维度实体...")
+    def sync_facilities(self, facilities: List[Dict], workers: int = 1) -> Dict[str, int]:
+        """以 facilities 为全量快照同步：写入新增和变化的设施，删除快照中已不存在的设施
+        
+        Args:
+            facilities: 全部设施记录
+            workers: 进程数；大于1且图谱中还没有设施时，按城市分片并行构建
+        
+        Returns:
+            {'added', 'updated', 'unchanged', 'deleted'} 各自的设施数
+        """
+        if workers > 1 and not self._hashes:
+            return self._build_sharded(facilities, workers)
+        
+        incoming = {self._facility_id(facility) for facility in facilities}
+        stale = [facility_id for facility_id in self._hashes if facility_id not in incoming]
+        
+        changes = self.upsert_facilities(facilities)
+        changes['deleted'] = self._delete(stale)
+        logger.info(f"✅ 同步完成: 新增 {changes['added']}，更新 {changes['updated']}，"
+                    f"删除 {changes['deleted']}，未变化 {changes['unchanged']}")
+        return changes
+    
+    def upsert_facilities(self, facilities: Iterable[Dict]) -> Dict[str, int]:
+        """新增或更新设施，内容未变化的设施直接跳过
         
-        # 提取所有年份
-        years = set()
+        Returns:
+            {'added', 'updated', 'unchanged'} 各自的设施数
+        """
+        self._build_static_entities()
+        
+        changes = {'added': 0, 'updated': 0, 'unchanged': 0}
+        dirty_cities: Set[str] = set()
         for facility in facilities:
-            if facility.get('build_year'):
-                years.add(facility['build_year'])
-        
-        # 创建年份实体
-        for year in sorted(years):
-            entity_id = f"Year_{year}"
-            properties = {
-                'year': year,
-                'type': '年份',
-                'decade': f"{year//10*10}年代"
-            }
-            self.kg.add_entity('Time', entity_id, properties)
-        
-        # 创建时间段实体
-        time_periods = [
-            {'id': 'Period_1980s', 'name': '1980年代', 'start': 1980, 'end': 1989},
-            {'id': 'Period_1990s', 'name': '1990年代', 'start': 1990, 'end': 1999},
-            {'id': 'Period_2000s', 'name': '2000年代', 'start': 2000, 'end': 2009},
-            {'id': 'Period_2010s', 'name': '2010年代', 'start': 2010, 'end': 2019},
-            {'id': 'Period_2020s', 'name': '2020年代', 'start': 2020, 'end': 2029}
+            facility_id = self._facility_id(facility)
+            content_hash = self._content_hash(facility)
+            previous = self._hashes.get(facility_id)
+            if previous == content_hash:
+                changes['unchanged'] += 1
+                continue
+            
+            footprint = self._footprint(facility)
+            self._apply(facility_id, footprint, self._footprints.get(facility_id), dirty_cities)
+            self._hashes[facility_id] = content_hash
+            self._footprints[facility_id] = footprint
+            changes['added' if previous is None else 'updated'] += 1
+        
+        for city in dirty_cities:
+            self._refresh_city_indicator(city)
+        return changes
+    
+    def delete_facilities(self, facility_ids: Iterable[str]) -> int:
+        """按设施记录ID删除设施及其派生内容，返回实际删除的设施数"""
+        return self._delete([f"Facility_{facility_id}" for facility_id in facility_ids])
+    
+    def _delete(self, facility_ids: Iterable[str]) -> int:
+        dirty_cities: Set[str] = set()
+        count = 0
+        for facility_id in facility_ids:
+            footprint = self._footprints.pop(facility_id, None)
+            if footprint is None:
+                continue
+            self._apply(facility_id, None, footprint, dirty_cities)
+            del self._hashes[facility_id]
+            count += 1
+        
+        for city in dirty_cities:
+            self._refresh_city_indicator(city)
+        return count
+    
+    def _build_sharded(self, facilities: List[Dict], workers: int) -> Dict[str, int]:
+        """按城市分片并行构建（图谱中尚无设施时）
+        
+        分两轮使用同一个进程池：
+        1. 子进程列出各分片关系用到的谓词和宾语（城市、年份、运动项目等共享实体），主进程统一登记词表ID；
+        2. 子进程计算设施的内容哈希与派生内容，用共享词的全局ID和本分片预留的设施ID区间
+           建好关系的SPO/POS/OSP部分索引，并汇总共享实体引用数与城市指标。
+        主进程按分片顺序用 dict.update / 集合并集整块并入设施实体、增量状态与关系索引，
+        再按合并后的引用数一次性创建共享实体和城市指标，结果与逐条同步得到的图谱相同
+        """
+        self._build_static_entities()
+        shards = self._partition(facilities, workers)
+        
+        refs: Dict[str, Counter] = {kind: Counter() for kind in self._refs}
+        added = 0
+        # 合并时接管的大量dict/set都不成环，暂停循环垃圾回收，免得反复全堆扫描已载入的设施记录
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            with ProcessPoolExecutor(max_workers=min(workers, len(shards)) or 1,
+                                     initializer=_init_shard_worker, initargs=(facilities,)) as executor:
+                shared_ids = self.kg.store.intern_terms(
+                    term for terms in executor.map(_shard_terms, shards) for term in terms
+                )
+                # 每个分片的设施ID紧接在前一个分片之后
+                first_ids = accumulate((len(shard) for shard in shards[:-1]), initial=self.kg.store.num_terms)
+                for part in executor.map(_build_shard, shards, first_ids, repeat(shared_ids)):
+                    self._hashes.update(part['hashes'])
+                    self._footprints.update(part['footprints'])
+                    self.kg.add_entities('Facility', part['entities'])
+                    self.kg.merge_relations(part['relations'])
+                    for kind, counts in part['refs'].items():
+                        refs[kind].update(counts)
+                    for city, stats in part['city_stats'].items():
+                        total = self._city_stats.setdefault(city, {'total_area': 0, 'facility_count': 0, 'total_visitors': 0})
+                        for key, value in stats.items():
+                            total[key] += value
+                    added += len(part['hashes'])
+        finally:
+            if gc_enabled:
+                gc.enable()
+        
+        # 引用数全部就位后再创建共享实体，城市与区县同名时按最终引用数决定级别
+        for kind, counts in refs.items():
+            self._refs[kind].update(counts)
+        for kind, counts in refs.items():
+            for name in counts:
+                self._refresh_shared_entity(kind, name)
+        for city in list(self._city_stats):
+            self._refresh_city_indicator(city)
+        
+        logger.info(f"✅ 分片并行构建 {added} 个设施（{len(shards)} 个分片，{workers} 个进程）")
+        return {'added': added, 'updated': 0, 'unchanged': 0, 'deleted': 0}
+    
+    def _partition(self, facilities: List[Dict], workers: int) -> List[List[int]]:
+        """按城市把设施下标分片，大城市再切成不超过平均分片大小的若干片，按大小从大到小排列
+        
+        同一ID出现多次时只保留最后一条，与逐条同步时后者覆盖前者的结果一致
+        """
+        latest = {self._facility_id(facility): i for i, facility in enumerate(facilities)}
+        by_city: Dict[Optional[str], List[int]] = defaultdict(list)
+        for i in sorted(latest.values()):
+            by_city[facilities[i].get('location', {}).get('city')].append(i)
+        
+        shard_size = max(1, -(-len(latest) // (workers * SHARDS_PER_WORKER)))
+        shards = [
+            indices[start:start + shard_size]
+            for indices in by_city.values()
+            for start in range(0, len(indices), shard_size)
         ]
+        shards.sort(key=len, reverse=True)
+        return shards
+    
+    @staticmethod
+    def _facility_id(facility: Dict) -> str:
+        return f"Facility_{facility['id']}"
+    
+    @staticmethod
+    def _content_hash(facility: Dict) -> str:
+        content = json.dumps(facility, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.blake2b(content.encode('utf-8'), digest_size=16).hexdigest()
+    
+    def _build_static_entities(self):
+        """构建与设施数据无关的实体：时间段、省、指标类型、政策法规"""
+        if self._static_built:
+            return
         
-        for period in time_periods:
+        for period in self.TIME_PERIODS:
             self.kg.add_entity('Time', period['id'], period)
         
-        logger.info(f"✅ 创建 {len(years)} 个年份实体和 {len(time_periods)} 个时间段实体")
-    
-    def _build_area_entities(self, facilities: List[Dict]):
-        """构建区域维度实体"""
-        logger.info("构建区域维度实体...")
-        
-        # 省级实体
-        province_id = "Area_河北省"
-        self.kg.add_entity('Area', province_id, {
+        self.kg.add_entity('Area', self.PROVINCE_ID, {
             'name': '河北省',
             'level': '省级',
             'type': '行政区域'
         })
         
-        # 市级实体
-        cities = set()
-        districts = set()
-        
-        for facility in facilities:
-            location = facility.get('location', {})
-            city = location.get('city')
-            district = location.get('district')
-            
-            if city:
-                cities.add(city)
-            if district:
-                districts.add(district)
-        
-        # 创建市级实体
-        for city in cities:
-            if city:
-                city_id = f"Area_{city}"
-                self.kg.add_entity('Area', city_id, {
-                    'name': city,
-                    'level': '市级',
-                    'province': '河北省',
-                    'type': '行政区域'
-                })
-                
-                # 添加省市关系
-                self.kg.add_relation(city_id, '属于', province_id)
-        
-        # 创建区县级实体
-        for district in districts:
-            if district and district not in cities:
-                district_id = f"Area_{district}"
-                self.kg.add_entity('Area', district_id, {
-                    'name': district,
-                    'level': '区县级',
-                    'type': '行政区域'
-                })
-        
-        logger.info(f"✅ 创建 1 个省级、{len(cities)} 个市级、{len(districts)} 个区县级实体")
-    
-    def _build_facility_entities(self, facilities: List[Dict]):
-        """构建设施实体"""
-        logger.info("构建设施实体...")
+        for indicator in self.INDICATORS:
+            self.kg.add_entity('Indicator', indicator['id'], indicator)
         
-        for facility in facilities:
-            facility_id = f"Facility_{facility['id']}"
-            
-            properties = {
-                'name': facility.get('name', ''),
-                'type': facility.get('facility_type', ''),
-                'operator': facility.get('operator', ''),
-                'build_year': facility.get('build_year', 0),
-                'address': facility.get('description', ''),
-                'subsidy_status': facility.get('subsidy_status', ''),
-                'image_url': facility.get('image_url', ''),
-                # 指标数据
-                'building_area': facility['indicators'].get('building_area', 0),
-                'site_area': facility['indicators'].get('site_area', 0),
-                'land_area': facility['indicators'].get('land_area', 0),
-                'seats': facility['indicators'].get('seats', 0),
-                'daily_visitors': facility['indicators'].get('daily_visitors', 0),
-                'has_outdoor_fitness': facility['indicators'].get('has_outdoor_fitness', False)
-            }
-            
-            self.kg.add_entity('Facility', facility_id, properties)
+        for policy in self.POLICIES:
+            self.kg.add_entity('Law', policy['id'], policy)
         
-        logger.info(f"✅ 创建 {len(facilities)} 个设施实体")
+        self._static_built = True
+        logger.info(f"✅ 创建 {len(self.TIME_PERIODS)} 个时间段、1 个省级、"
+                    f"{len(self.INDICATORS)} 个指标类型和 {len(self.POLICIES)} 个政策法规实体")
     
-    def _build_sport_entities(self, facilities: List[Dict]):
-        """构建运动项目实体"""
-        logger.info("构建运动项目实体...")
+    @staticmethod
+    def _footprint(facility: Dict) -> Dict:
+        """设施记录派生出的全部内容
         
-        # 收集所有运动项目
-        sports = set()
-        for facility in facilities:
-            sports.update(facility.get('sports_types', []))
-        
-        # 运动项目分类
-        sport_categories = {
-            '足球': '球类运动', '篮球': '球类运动', '排球': '球类运动',
-            '羽毛球': '球类运动', '乒乓球': '球类运动', '网球': '球类运动',
-            '游泳': '水上运动', '跑步': '田径运动', '健身': '力量训练',
-            '瑜伽': '柔韧性训练', '太极拳': '传统运动', '广场舞': '群众运动',
-            '滑冰': '冰雪运动', '滑雪': '冰雪运动'
+        Returns:
+            {'properties': 设施实体属性, 'refs': [(共享实体种类, 名称)],
+             'relations': {(谓词, 宾语): 关系属性}, 'city': 城市, 'site_area', 'daily_visitors'}
+        """
+        indicators = facility.get('indicators', {})
+        properties = {
+            'name': facility.get('name', ''),
+            'type': facility.get('facility_type', ''),
+            'operator': facility.get('operator', ''),
+            'build_year': facility.get('build_year', 0),
+            'address': facility.get('description', ''),
+            'subsidy_status': facility.get('subsidy_status', ''),
+            'image_url': facility.get('image_url', ''),
+            # 指标数据
+            'building_area': indicators.get('building_area', 0),
+            'site_area': indicators.get('site_area', 0),
+            'land_area': indicators.get('land_area', 0),
+            'seats': indicators.get('seats', 0),
+            'daily_visitors': indicators.get('daily_visitors', 0),
+            'has_outdoor_fitness': indicators.get('has_outdoor_fitness', False)
         }
         
-        for sport in sports:
+        refs = []
+        relations = {}
+        location = facility.get('location', {})
+        city = location.get('city')
+        district = location.get('district')
+        build_year = facility.get('build_year')
+        
+        # 1. 设施-区域关系
+        if city:
+            refs.append(('city', city))
+            relations[('位于', f"Area_{city}")] = {}
+        if district:
+            refs.append(('district', district))
+        
+        # 2. 设施-时间关系
+        if build_year:
+            refs.append(('year', build_year))
+            relations[('建成于', f"Year_{build_year}")] = {}
+        
+        # 3. 设施-运动项目关系
+        for sport in dict.fromkeys(facility.get('sports_types', [])):
             if sport:
-                sport_id = f"Sport_{sport}"
-                self.kg.add_entity('Sport', sport_id, {
-                    'name': sport,
-                    'category': sport_categories.get(sport, '其他运动'),
+                refs.append(('sport', sport))
+                relations[('提供', f"Sport_{sport}")] = {}
+        
+        # 4. 设施-政策关系（基于补助状态）
+        if '补助' in facility.get('subsidy_status', ''):
+            relations[('受益于', 'Law_体育场馆补助政策')] = {}
+        
+        # 5. 设施-指标关系：每个设施都符合场地面积指标
+        relations[('符合指标', 'Indicator_场地面积')] = {'value': indicators.get('site_area', 0)}
+        
+        return {
+            'properties': properties,
+            'refs': refs,
+            'relations': relations,
+            'city': city,
+            'site_area': indicators.get('site_area', 0),
+            'daily_visitors': indicators.get('daily_visitors', 0)
+        }
+    
+    def _apply(self, facility_id: str, new: Optional[Dict], old: Optional[Dict], dirty_cities: Set[str]):
+        """用新的派生内容替换旧的（new为None表示删除设施，old为None表示新增）"""
+        if new is not None:
+            self.kg.add_entity('Facility', facility_id, new['properties'])
+            # 先增加新引用、后释放旧引用，两次都引用的共享实体不会被删掉再重建
+            for kind, name in new['refs']:
+                self._acquire(kind, name)
+        
+        old_relations = old['relations'] if old else {}
+        new_relations = new['relations'] if new else {}
+        for (predicate, object), properties in old_relations.items():
+            if new_relations.get((predicate, object)) != properties:
+                self.kg.remove_relation(facility_id, predicate, object)
+        for (predicate, object), properties in new_relations.items():
+            if old_relations.get((predicate, object)) != properties:
+                self.kg.add_relation(facility_id, predicate, object, properties or None)
+        
+        if old is not None:
+            for kind, name in old['refs']:
+                self._release(kind, name)
+            self._add_city_stats(old, -1, dirty_cities)
+        if new is not None:
+            self._add_city_stats(new, 1, dirty_cities)
+        else:
+            self.kg.remove_entity('Facility', facility_id)
+    
+    def _acquire(self, kind: str, name):
+        refs = self._refs[kind]
+        refs[name] += 1
+        if refs[name] == 1:
+            self._refresh_shared_entity(kind, name)
+    
+    def _release(self, kind: str, name):
+        refs = self._refs[kind]
+        refs[name] -= 1
+        if refs[name] <= 0:
+            del refs[name]
+            self._refresh_shared_entity(kind, name)
+    
+    def _refresh_shared_entity(self, kind: str, name):
+        """共享实体的引用数在0与非0之间变化时，创建或删除对应实体"""
+        if kind == 'year':
+            entity_id = f"Year_{name}"
+            if self._refs['year'][name]:
+                self.kg.add_entity('Time', entity_id, {
+                    'year': name,
+                    'type': '年份',
+                    'decade': f"{name//10*10}年代"
+                })
+            else:
+                self.kg.remove_entity('Time', entity_id)
+        elif kind == 'sport':
+            entity_id = f"Sport_{name}"
+            if self._refs['sport'][name]:
+                self.kg.add_entity('Sport', entity_id, {
+                    'name': name,
+                    'category': self.SPORT_CATEGORIES.get(name, '其他运动'),
                     'type': '运动项目'
                 })
-        
-        logger.info(f"✅ 创建 {len(sports)} 个运动项目实体")
-    
-    def _build_indicator_entities(self, facilities: List[Dict]):
-        """构建指标实体"""
-        logger.info("构建指标实体...")
-        
-        # 定义指标类型
-        indicators = [
-            {'id': 'Indicator_场地面积', 'name': '场地面积', 'unit': '平方米', 'category': '设施指标'},
-            {'id': 'Indicator_建筑面积', 'name': '建筑面积', 'unit': '平方米', 'category': '设施指标'},
-            {'id': 'Indicator_用地面积', 'name': '用地面积', 'unit': '平方米', 'category': '设施指标'},
-            {'id': 'Indicator_座位数', 'name': '座位数', 'unit': '座', 'category': '设施指标'},
-            {'id': 'Indicator_日客流量', 'name': '日客流量', 'unit': '人次', 'category': '使用指标'},
-            {'id': 'Indicator_人均场地面积', 'name': '人均体育场地面积', 'unit': '平方米/人', 'category': '区域指标'},
-            {'id': 'Indicator_参与率', 'name': '经常参加体育锻炼人数比例', 'unit': '%', 'category': '人口指标'},
-            {'id': 'Indicator_覆盖率', 'name': '公共健身设施覆盖率', 'unit': '%', 'category': '区域指标'},
-            {'id': 'Indicator_设施密度', 'name': '每万人拥有体育设施数', 'unit': '个/万人', 'category': '区域指标'}
-        ]
-        
-        for indicator in indicators:
-            self.kg.add_entity('Indicator', indicator['id'], indicator)
-        
-        # 计算区域级指标
-        city_stats = defaultdict(lambda: {'total_area': 0, 'facility_count': 0, 'total_visitors': 0})
-        
-        for facility in facilities:
-            city = facility.get('location', {}).get('city')
-            if city:
-                city_stats[city]['total_area'] += facility['indicators'].get('site_area', 0)
-                city_stats[city]['facility_count'] += 1
-                city_stats[city]['total_visitors'] += facility['indicators'].get('daily_visitors', 0)
-        
-        # 为每个城市创建指标实例
-        for city, stats in city_stats.items():
-            city_id = f"Area_{city}"
-            
-            # 人均场地面积指标实例（假设人口100万）
-            per_capita_area = stats['total_area'] / 1000000
-            indicator_id = f"IndicatorValue_{city}_人均场地面积"
-            self.kg.add_entity('Indicator', indicator_id, {
-                'indicator_type': '人均体育场地面积',
-                'value': round(per_capita_area, 2),
-                'unit': '平方米/人',
-                'area': city,
-                'year': 2025
+            else:
+                self.kg.remove_entity('Sport', entity_id)
+        else:
+            self._refresh_area(name)
+    
+    def _refresh_area(self, name: str):
+        """区域实体：有设施位于该市时为市级，否则仅被用作区县名时为区县级"""
+        area_id = f"Area_{name}"
+        if self._refs['city'][name]:
+            self.kg.add_entity('Area', area_id, {
+                'name': name,
+                'level': '市级',
+                'province': '河北省',
+                'type': '行政区域'
             })
-            
-            # 添加指标关系
-            self.kg.add_relation(city_id, '具有指标', indicator_id)
-        
-        logger.info(f"✅ 创建 {len(indicators)} 个指标类型和区域指标实例")
-    
-    def _build_law_entities(self, facilities: List[Dict]):
-        """构建政策法规实体"""
-        logger.info("构建政策法规实体...")
-        
-        # 定义政策法规
-        policies = [
-            {
-                'id': 'Law_全民健身计划',
-                'title': '全民健身计划（2021-2025年）',
-                'level': '国家级',
-                'department': '国务院',
-                'publish_year': 2021,
-                'type': '规划'
-            },
-            {
-                'id': 'Law_河北省全民健身条例',
-                'title': '河北省全民健身条例',
-                'level': '省级',
-                'department': '河北省人大',
-                'publish_year': 2020,
-                'type': '法规'
-            },
-            {
-                'id': 'Law_体育场馆补助政策',
-                'title': '公共体育场馆向社会免费或低收费开放补助资金管理办法',
-                'level': '国家级',
-                'department': '财政部、体育总局',
-                'publish_year': 2014,
-                'type': '管理办法'
-            }
-        ]
-        
-        for policy in policies:
-            self.kg.add_entity('Law', policy['id'], policy)
+            # 添加省市关系
+            self.kg.add_relation(area_id, '属于', self.PROVINCE_ID)
+            return
         
-        logger.info(f"✅ 创建 {len(policies)} 个政策法规实体")
+        self.kg.remove_entity('Area', area_id)
+        if self._refs['district'][name]:
+            self.kg.add_entity('Area', area_id, {
+                'name': name,
+                'level': '区县级',
+                'type': '行政区域'
+            })
     
-    def _build_relations(self, facilities: List[Dict]):
-        """构建实体间关系"""
-        logger.info("构建实体间关系...")
-        
-        relation_count = 0
+    def _add_city_stats(self, footprint: Dict, sign: int, dirty_cities: Set[str]):
+        if accumulate_city_stats(self._city_stats, footprint, sign):
+            dirty_cities.add(footprint['city'])
+    
+    def _refresh_city_indicator(self, city: str):
+        """重算城市的区域级指标实例"""
+        indicator_id = f"IndicatorValue_{city}_人均场地面积"
+        stats = self._city_stats.get(city)
+        if not stats or stats['facility_count'] <= 0:
+            self._city_stats.pop(city, None)
+            self.kg.remove_entity('Indicator', indicator_id)
+            return
         
-        for facility in facilities:
-            facility_id = f"Facility_{facility['id']}"
-            
-            # 1. 设施-区域关系
-            city = facility.get('location', {}).get('city')
-            if city:
-                city_id = f"Area_{city}"
-                self.kg.add_relation(facility_id, '位于', city_id)
-                relation_count += 1
-            
-            # 2. 设施-时间关系
-            build_year = facility.get('build_year')
-            if build_year:
-                year_id = f"Year_{build_year}"
-                self.kg.add_relation(facility_id, '建成于', year_id)
-                relation_count += 1
-            
-            # 3. 设施-运动项目关系
-            for sport in facility.get('sports_types', []):
-                if sport:
-                    sport_id = f"Sport_{sport}"
-                    self.kg.add_relation(facility_id, '提供', sport_id)
-                    relation_count += 1
-            
-            # 4. 设施-政策关系（基于补助状态）
-            if '补助' in facility.get('subsidy_status', ''):
-                self.kg.add_relation(facility_id, '受益于', 'Law_体育场馆补助政策')
-                relation_count += 1
-            
-            # 5. 设施-指标关系
-            # 每个设施都符合场地面积指标
-            self.kg.add_relation(facility_id, '符合指标', 'Indicator_场地面积', {
-                'value': facility['indicators'].get('site_area', 0)
-            })
-            relation_count += 1
+        # 人均场地面积指标实例（假设人口100万）
+        per_capita_area = stats['total_area'] / 1000000
+        self.kg.add_entity('Indicator', indicator_id, {
+            'indicator_type': '人均体育场地面积',
+            'value': round(per_capita_area, 2),
+            'unit': '平方米/人',
+            'area': city,
+            'year': 2025
+        })
         
-        logger.info(f"✅ 创建 {relation_count} 个关系")
+        # 添加指标关系
+        self.kg.add_relation(f"Area_{city}", '具有指标', indicator_id)
     
     def export_knowledge_graph(self, json_file: str = 'fps_knowledge_graph.json', 
-                               owl_file: str = 'fps_ontology.owl'):
+                               owl_file: str = 'fps_ontology.owl',
+                               jsonl_file: Optional[str] = None,
+                               ntriples_file: Optional[str] = None):
         """导出知识图谱"""
         logger.info("导出知识图谱...")
         
         # 导出JSON格式
         self.kg.export_to_json(json_file)
         
+        # 导出JSON Lines格式（大规模图谱流式加载用）
+        if jsonl_file:
+            self.kg.export_to_jsonl(jsonl_file)
+        
         # 导出OWL格式（用于Protege）
         self.kg.export_to_owl(owl_file)
         
+        # 导出N-Triples格式（三元组库批量导入用）
+        if ntriples_file:
+            self.kg.export_to_ntriples(ntriples_file)
+        
         logger.info("✅ 知识图谱导出完成")
 
 
+def accumulate_city_stats(city_stats: Dict[str, Dict], footprint: Dict, sign: int = 1) -> bool:
+    """把设施对所在城市指标的贡献计入（sign=1）或扣除（sign=-1），返回设施是否有城市"""
+    city = footprint['city']
+    if not city:
+        return False
+    stats = city_stats.setdefault(city, {'total_area': 0, 'facility_count': 0, 'total_visitors': 0})
+    stats['total_area'] += sign * footprint['site_area']
+    stats['facility_count'] += sign
+    stats['total_visitors'] += sign * footprint['daily_visitors']
+    return True
+
+
+# 分片构建时子进程读取的设施记录（fork启动时直接继承父进程内存，不经序列化）
+_shard_facilities: List[Dict] = []
+
+
+def _init_shard_worker(facilities: List[Dict]):
+    global _shard_facilities
+    _shard_facilities = facilities
+
+
+def _shard_terms(indices: List[int]) -> List[str]:
+    """分片内设施关系用到的谓词与宾语（在子进程中运行）"""
+    terms = {}
+    for i in indices:
+        for predicate, object in FPSKnowledgeGraphBuilder._footprint(_shard_facilities[i])['relations']:
+            terms[predicate] = terms[object] = None
+    return list(terms)
+
+
+def _build_shard(indices: List[int], first_id: int, shared_ids: Dict[str, int]) -> Dict:
+    """计算一个分片内设施的内容哈希与派生内容，建立关系的部分索引，
+    并汇总共享实体引用数与城市指标（在子进程中运行）
+    
+    Args:
+        indices: 分片内设施的下标
+        first_id: 本分片设施ID在词表中的起始编号（按 indices 顺序连续分配）
+        shared_ids: 主进程已登记的谓词、宾语ID
+    """
+    hashes = {}
+    footprints = {}
+    relations = TriplePartition(shared_ids, first_id)
+    refs: Dict[str, Counter] = defaultdict(Counter)
+    city_stats: Dict[str, Dict] = {}
+    for i in indices:
+        facility = _shard_facilities[i]
+        facility_id = FPSKnowledgeGraphBuilder._facility_id(facility)
+        footprint = FPSKnowledgeGraphBuilder._footprint(facility)
+        hashes[facility_id] = FPSKnowledgeGraphBuilder._content_hash(facility)
+        footprints[facility_id] = footprint
+        relations.intern(facility_id)
+        for (predicate, object), properties in footprint['relations'].items():
+            relations.add(facility_id, predicate, object, properties)
+        for kind, name in footprint['refs']:
+            refs[kind][name] += 1
+        accumulate_city_stats(city_stats, footprint)
+    return {
+        'hashes': hashes,
+        'footprints': footprints,
+        'entities': {facility_id: footprint['properties'] for facility_id, footprint in footprints.items()},
+        'relations': relations,
+        'refs': dict(refs),
+        'city_stats': city_stats
+    }
+
+
 def main():
     """主函数"""
     logger.info("=" * 80)
@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+知识图谱网络分析
+在关系表上建立稀疏邻接矩阵（CSR），用稀疏线性代数一次性计算出入度、连通分量、
+PageRank、介数中心性（小图精确计算，大图抽样近似），以及按实体类型、设施属性的聚合统计
+
+分析结果写入摘要文件（fps_kg_summary.json），以图谱文件内容的摘要作为图谱版本，
+版本不变时直接读取摘要，图谱文件变化后重新计算
+"""
+
+import hashlib
+import json
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from loguru import logger
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+
+from knowledge_graph.relation_table import KnowledgeGraphData, load_graph
+
+# 没有实体记录的节点（只出现在关系中）的类型
+UNKNOWN_TYPE = 'Unknown'
+
+# 介数中心性每批同时展开的源点数
+BETWEENNESS_BLOCK = 32
+
+# 节点数不超过该值时摘要中的介数中心性精确计算，否则从 BETWEENNESS_SAMPLES 个源点抽样估计
+EXACT_BETWEENNESS_NODES = 5000
+BETWEENNESS_SAMPLES = 256
+
+# 摘要格式版本，摘要字段变化时递增，使旧摘要失效
+SUMMARY_FORMAT = 2
+
+
+def graph_version(kg_file: str) -> str:
+    """图谱版本：图谱文件内容的摘要"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(kg_file, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class GraphAnalytics:
+    """知识图谱网络分析"""
+
+    def __init__(self, graph: KnowledgeGraphData):
+        """
+        Args:
+            graph: 已加载的知识图谱；节点为全部实体加上只出现在关系中的实体
+        """
+        self.graph = graph
+        relations = graph.relations
+
+        # 节点编号：先是关系表中作为主语/宾语出现的词，再是没有任何关系的实体
+        subjects = relations.column('subject')
+        objects = relations.column('object')
+        used = np.unique(np.concatenate([subjects, objects]))
+        term_to_node = np.full(len(relations.terms), -1, dtype=np.int64)
+        term_to_node[used] = np.arange(len(used))
+        self.nodes: List[str] = relations.terms_of(used)
+        seen = set(self.nodes)
+        self.nodes.extend(entity_id for entity_id in graph.records if entity_id not in seen)
+        self.num_nodes = len(self.nodes)
+
+        self.sources = term_to_node[subjects]
+        self.targets = term_to_node[objects]
+        self.edge_predicates = relations.column('predicate')
+
+        # 节点类型编码
+        self.types: List[str] = list(graph.entities) + [UNKNOWN_TYPE]
+        type_codes = {entity_type: i for i, entity_type in enumerate(self.types)}
+        unknown = type_codes[UNKNOWN_TYPE]
+        records = graph.records
+        self.node_types = np.fromiter(
+            (type_codes[records[node].entity_type] if node in records else unknown for node in self.nodes),
+            dtype=np.int32, count=self.num_nodes
+        )
+
+        # 有向邻接矩阵（重复边合并为一条）与对称化的无向邻接矩阵（去掉自环）
+        n = self.num_nodes
+        ones = np.ones(len(self.sources), dtype=np.float64)
+        directed = sparse.csr_matrix((ones, (self.sources, self.targets)), shape=(n, n))
+        directed.data[:] = 1.0
+        self.adjacency = directed
+        undirected = (directed + directed.T).tocsr()
+        undirected.setdiag(0)
+        undirected.eliminate_zeros()
+        undirected.data[:] = 1.0
+        self.undirected = undirected
+
+    # ------------------------------------------------------------------ 度与连通性
+
+    def degrees(self) -> Dict[str, np.ndarray]:
+        """出度与入度（按关系条数计）"""
+        return {
+            'out': np.bincount(self.sources, minlength=self.num_nodes),
+            'in': np.bincount(self.targets, minlength=self.num_nodes)
+        }
+
+    def components(self) -> np.ndarray:
+        """弱连通分量标签"""
+        _, labels = connected_components(self.undirected, directed=False)
+        return labels
+
+    # ------------------------------------------------------------------ 中心性
+
+    def pagerank(self, damping: float = 0.85, tol: float = 1e-10, max_iter: int = 100) -> np.ndarray:
+        """PageRank（幂迭代；没有出边的节点把分值均匀分给全部节点）"""
+        n = self.num_nodes
+        if n == 0:
+            return np.zeros(0)
+        out_degree = np.asarray(self.adjacency.sum(axis=1)).ravel()
+        dangling = out_degree == 0
+        inverse = np.divide(1.0, out_degree, out=np.zeros(n), where=~dangling)
+        transition = (sparse.diags(inverse) @ self.adjacency).T.tocsr()
+
+        rank = np.full(n, 1.0 / n)
+        for _ in range(max_iter):
+            updated = damping * (transition @ rank) + (damping * rank[dangling].sum() + 1.0 - damping) / n
+            converged = np.abs(updated - rank).sum() < tol * n
+            rank = updated
+            if converged:
+                break
+        return rank / rank.sum()
+
+    def betweenness(self, samples: Optional[int] = 64, seed: int = 42) -> np.ndarray:
+        """介数中心性（无向、归一化），从 samples 个随机源点出发估计，None或不少于节点数时精确计算
+
+        Brandes算法按层同步展开：一批源点的BFS前沿是 n×k 的稠密矩阵，每层扩展与
+        反向累积依赖值都是一次稀疏矩阵乘稠密矩阵
+        """
+        n = self.num_nodes
+        if n < 3:
+            return np.zeros(n)
+        if samples is None or samples >= n:
+            pivots = np.arange(n)
+        else:
+            pivots = np.random.default_rng(seed).choice(n, size=samples, replace=False)
+
+        adjacency = self.undirected
+        centrality = np.zeros(n)
+        for start in range(0, len(pivots), BETWEENNESS_BLOCK):
+            block = pivots[start:start + BETWEENNESS_BLOCK]
+            columns = np.arange(len(block))
+            dist = np.full((n, len(block)), -1, dtype=np.int32)
+            sigma = np.zeros((n, len(block)))
+            dist[block, columns] = 0
+            sigma[block, columns] = 1.0
+
+            # 正向：逐层计算最短路径数
+            depth = 0
+            while True:
+                frontier = np.where(dist == depth, sigma, 0.0)
+                reached = adjacency @ frontier
+                fresh = (reached > 0) & (dist < 0)
+                if not fresh.any():
+                    break
+                depth += 1
+                dist[fresh] = depth
+                sigma[fresh] = reached[fresh]
+
+            # 反向：从最深层开始累积依赖值
+            delta = np.zeros_like(sigma)
+            safe_sigma = np.where(sigma > 0, sigma, 1.0)
+            for level in range(depth, 0, -1):
+                coefficient = np.where(dist == level, (1.0 + delta) / safe_sigma, 0.0)
+                delta += np.where(dist == level - 1, sigma * (adjacency @ coefficient), 0.0)
+            delta[block, columns] = 0.0
+            centrality += delta.sum(axis=1)
+
+        # 抽样外推到全部源点；无向图每条路径被两端各计一次；按 (n-1)(n-2) 归一化
+        return centrality * (n / len(pivots)) / ((n - 1) * (n - 2))
+
+    # ------------------------------------------------------------------ 聚合
+
+    def type_aggregates(self, degrees: Dict[str, np.ndarray]) -> Dict[str, Dict]:
+        """各实体类型的节点数、平均出入度与最大度"""
+        total = degrees['in'] + degrees['out']
+        counts = np.bincount(self.node_types, minlength=len(self.types))
+        out_sum = np.bincount(self.node_types, weights=degrees['out'], minlength=len(self.types))
+        in_sum = np.bincount(self.node_types, weights=degrees['in'], minlength=len(self.types))
+        max_degree = np.zeros(len(self.types), dtype=np.int64)
+        np.maximum.at(max_degree, self.node_types, total)
+
+        result = {}
+        for code, entity_type in enumerate(self.types):
+            if entity_type == UNKNOWN_TYPE and not counts[code]:
+                continue
+            count = int(counts[code])
+            result[entity_type] = {
+                'count': count,
+                'avg_out_degree': round(float(out_sum[code]) / count, 4) if count else 0,
+                'avg_in_degree': round(float(in_sum[code]) / count, 4) if count else 0,
+                'max_degree': int(max_degree[code])
+            }
+        return result
+
+    def relation_patterns(self) -> List[Dict]:
+        """(主语类型, 谓词, 宾语类型) 组合的关系数，按数量降序"""
+        if not len(self.sources):
+            return []
+        num_types = len(self.types)
+        predicates, predicate_codes = np.unique(self.edge_predicates, return_inverse=True)
+        keys = ((self.node_types[self.sources].astype(np.int64) * len(predicates) + predicate_codes)
+                * num_types + self.node_types[self.targets])
+        unique, counts = np.unique(keys, return_counts=True)
+        terms = self.graph.relations.terms
+        patterns = []
+        for key, count in sorted(zip(unique.tolist(), counts.tolist()), key=lambda x: -x[1]):
+            rest, object_type = divmod(key, num_types)
+            subject_type, predicate = divmod(rest, len(predicates))
+            patterns.append({
+                'subject_type': self.types[subject_type],
+                'predicate': terms[predicates[predicate]],
+                'object_type': self.types[object_type],
+                'count': count
+            })
+        return patterns
+
+    def facility_aggregates(self, recent: int = 5) -> Dict:
+        """设施类型、面积、客流与建设年代的统计"""
+        facilities = self.graph.entities.get('Facility', {})
+        count = len(facilities)
+        values = list(facilities.values())
+        site_area = np.fromiter((f.get('site_area', 0) or 0 for f in values), dtype=np.float64, count=count)
+        visitors = np.fromiter((f.get('daily_visitors', 0) or 0 for f in values), dtype=np.int64, count=count)
+        years = np.fromiter((f.get('build_year', 0) or 0 for f in values), dtype=np.int64, count=count)
+
+        built = years > 0
+        decades, decade_counts = np.unique(years[built] // 10 * 10, return_counts=True)
+        newest = np.argsort(-years, kind='stable')[:recent]
+        return {
+            'count': count,
+            'types': dict(Counter(f.get('type', '未知') for f in values)),
+            'total_site_area': float(site_area.sum()),
+            'avg_site_area': float(site_area.mean()) if count else 0.0,
+            'total_daily_visitors': int(visitors.sum()),
+            'avg_daily_visitors': float(visitors.mean()) if count else 0.0,
+            'decades': {f"{decade}年代": int(n) for decade, n in zip(decades.tolist(), decade_counts.tolist())},
+            'recent': [
+                {'name': values[i].get('name', ''), 'build_year': int(years[i])}
+                for i in newest.tolist() if years[i] > 0
+            ]
+        }
+
+    def city_facility_counts(self) -> Dict[str, int]:
+        """各城市（市级区域）通过“位于”关系连接的设施数"""
+        relations = self.graph.relations
+        areas = self.graph.entities.get('Area', {})
+        counts: Dict[str, int] = {}
+        for area_id, count in relations.value_counts('object', relations.rows(predicate='位于')).items():
+            area = areas.get(area_id)
+            if area and area.get('level') == '市级':
+                counts[area['name']] = counts.get(area['name'], 0) + count
+        return counts
+
+    def per_capita_area(self) -> List[Dict]:
+        """人均体育场地面积指标，按数值降序"""
+        indicators = [
+            {'city': ind.get('area', '未知'), 'value': ind.get('value', 0)}
+            for ind in self.graph.entities.get('Indicator', {}).values()
+            if ind.get('indicator_type') == '人均体育场地面积'
+        ]
+        return sorted(indicators, key=lambda x: x['value'], reverse=True)
+
+    # ------------------------------------------------------------------ 摘要
+
+    def _top(self, scores: np.ndarray, k: int) -> List[Dict]:
+        if not len(scores):
+            return []
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        records = self.graph.records
+        result = []
+        for node in top.tolist():
+            entity_id = self.nodes[node]
+            record = records.get(entity_id)
+            properties = record.properties if record else {}
+            value = scores[node]
+            result.append({
+                'id': entity_id,
+                'name': properties.get('name') or properties.get('title') or entity_id,
+                'type': self.types[self.node_types[node]],
+                'value': int(value) if np.issubdtype(scores.dtype, np.integer) else round(float(value), 6)
+            })
+        return result
+
+    def summary(self, top_k: int = 10, betweenness_samples: Optional[int] = None) -> Dict:
+        """全部分析结果（可直接写成JSON）
+
+        Args:
+            top_k: 各排行榜的条数
+            betweenness_samples: 介数中心性的抽样源点数，None 时节点数不超过 EXACT_BETWEENNESS_NODES
+                则精确计算，否则抽样 BETWEENNESS_SAMPLES 个源点
+        """
+        graph = self.graph
+        if betweenness_samples is None and self.num_nodes > EXACT_BETWEENNESS_NODES:
+            betweenness_samples = BETWEENNESS_SAMPLES
+        samples = min(betweenness_samples or self.num_nodes, self.num_nodes)
+        stats = graph.statistics or graph.compute_statistics()
+        degrees = self.degrees()
+        labels = self.components()
+        component_sizes = np.sort(np.bincount(labels))[::-1] if len(labels) else np.zeros(0, dtype=np.int64)
+
+        # 网络密度沿用 n(n-1)/2 作为最大关系数
+        total_entities = stats['total_entities']
+        total_relations = stats['total_relations']
+        max_relations = total_entities * (total_entities - 1) / 2
+        city_counts = sorted(self.city_facility_counts().items(), key=lambda x: x[1], reverse=True)
+        facilities = self.facility_aggregates()
+
+        return {
+            'name': graph.metadata.get('name', ''),
+            'created_at': graph.metadata.get('created_at', ''),
+            'dimensions': graph.metadata.get('dimensions', []),
+            'statistics': stats,
+            'top_cities': [{'city': city, 'count': count} for city, count in city_counts[:top_k]],
+            'city_facilities': dict(city_counts),
+            'facility_types': facilities['types'],
+            'time_periods': facilities['decades'],
+            'relation_types': dict(Counter(graph.relations.predicate_counts()).most_common()),
+            'network': {
+                'nodes': self.num_nodes,
+                'edges': int(len(self.sources)),
+                'density': total_relations / max_relations if max_relations > 0 else 0,
+                'average_degree': total_relations * 2 / total_entities if total_entities else 0,
+                'top_out_degree': self._top(degrees['out'], top_k),
+                'top_in_degree': self._top(degrees['in'], top_k),
+                'components': {
+                    'count': int(len(component_sizes)),
+                    'largest': int(component_sizes[0]) if len(component_sizes) else 0,
+                    'sizes': component_sizes[:top_k].tolist()
+                },
+                'pagerank': self._top(self.pagerank(), top_k),
+                'betweenness': {
+                    'samples': samples,
+                    'exact': samples == self.num_nodes,
+                    'top': self._top(self.betweenness(betweenness_samples), top_k)
+                }
+            },
+            'entity_types': self.type_aggregates(degrees),
+            'relation_patterns': self.relation_patterns(),
+            'facilities': {key: value for key, value in facilities.items() if key not in ('types', 'decades')},
+            'per_capita_area': self.per_capita_area()
+        }
+
+
+def load_summary(kg_file: str, summary_file: str, refresh: bool = False, **options) -> Dict:
+    """读取分析摘要，图谱版本或计算参数与摘要中记录的不一致（或 refresh=True）时重新计算并写回
+
+    Args:
+        kg_file: 图谱文件（JSON或JSON Lines）
+        summary_file: 摘要文件
+        refresh: 忽略已有摘要强制重算
+        options: 传给 GraphAnalytics.summary 的参数
+
+    Returns:
+        摘要字典，含 graph_version
+    """
+    version = graph_version(kg_file)
+    settings = {'format': SUMMARY_FORMAT, **options}
+    path = Path(summary_file)
+    if not refresh and path.exists():
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+            if cached.get('graph_version') == version and cached.get('settings') == settings:
+                logger.info(f"✅ 图谱未变化，使用已有摘要: {summary_file}")
+                return cached
+        except (OSError, ValueError) as e:
+            logger.warning(f"摘要文件无法读取，重新计算: {e}")
+
+    summary = {'graph_version': version, 'settings': settings}
+    summary.update(GraphAnalytics(load_graph(kg_file)).summary(**options))
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    logger.info(f"✅ 摘要已导出到: {summary_file}")
+    return summary
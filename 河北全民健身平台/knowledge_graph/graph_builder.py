@@ -1,38 +1,137 @@
 """
 时空知识图谱构建模块
 """
-from neo4j import GraphDatabase
-from typing import List, Dict, Tuple, Optional
+from itertools import islice
+from typing import Iterable, Iterator, List, Dict, Tuple, Optional
 from loguru import logger
 import json
 from datetime import datetime
 
+# 批量写入时每个事务包含的记录数
+DEFAULT_BATCH_SIZE = 1000
+
+
+def merge_nodes_query(label: str, key: str) -> str:
+    """批量MERGE节点的Cypher：每行 {'key': 唯一键值, 'props': 其余属性}"""
+    return (
+        f"UNWIND $rows AS row "
+        f"MERGE (n:{label} {{{key}: row.key}}) "
+        f"SET n += row.props"
+    )
+
+
+def chunked(rows: Iterable, size: int) -> Iterator[List]:
+    """按固定大小切分序列"""
+    iterator = iter(rows)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
 
 class Neo4jConnector:
-    """Neo4j数据库连接器"""
+    """Neo4j数据库连接器
     
-    def __init__(self, uri: str, user: str, password: str):
-        self.driver = GraphDatabase.driver(uri, auth=(user, password))
+    driver 维护连接池，会话在连接器内复用，不再每条查询新开一次
+    """
+    
+    def __init__(self, uri: str, user: str, password: str, driver=None, database: Optional[str] = None):
+        """
+        Args:
+            uri: 数据库地址
+            user: 用户名
+            password: 密码
+            driver: 已创建的驱动（如测试用的 FakeDriver），None时按地址新建
+            database: 数据库名，None为默认库
+        """
+        if driver is None:
+            from neo4j import GraphDatabase
+            driver = GraphDatabase.driver(uri, auth=(user, password))
+        self.driver = driver
+        self.database = database
+        self._session = None
         logger.info(f"连接Neo4j数据库: {uri}")
     
+    def session(self):
+        """复用的会话（会话不是线程安全的，连接器只在单线程中使用）"""
+        if self._session is None:
+            if self.database:
+                self._session = self.driver.session(database=self.database)
+            else:
+                self._session = self.driver.session()
+        return self._session
+    
     def close(self):
         """关闭连接"""
+        if self._session is not None:
+            self._session.close()
+            self._session = None
         self.driver.close()
         logger.info("关闭Neo4j连接")
     
     def execute_query(self, query: str, parameters: Optional[Dict] = None):
         """执行Cypher查询"""
-        with self.driver.session() as session:
-            result = session.run(query, parameters or {})
-            return [record for record in result]
+        result = self.session().run(query, parameters or {})
+        return [record for record in result]
+    
+    def write_batches(self, query: str, rows: Iterable[Dict], batch_size: int = DEFAULT_BATCH_SIZE) -> Dict:
+        """分批写入：每批作为 $rows 参数在一个显式事务中执行一次
+        
+        Args:
+            query: 以 UNWIND $rows AS row 开头的Cypher
+            rows: 记录序列
+            batch_size: 每批记录数
+        
+        Returns:
+            {'rows': 写入记录数, 'batches': 事务数}
+        
+        Raises:
+            ValueError: batch_size 不是正数
+        """
+        if batch_size <= 0:
+            raise ValueError(f"batch_size 必须为正数: {batch_size}")
+        
+        session = self.session()
+        total = batches = 0
+        for batch in chunked(rows, batch_size):
+            try:
+                # 异常退出 with 时事务自动回滚，已写入的批次不受影响
+                with session.begin_transaction() as tx:
+                    tx.run(query, {"rows": batch}).consume()
+                    tx.commit()
+            except Exception as e:
+                logger.error(f"第 {batches + 1} 批写入失败（已回滚）: {e}")
+                raise
+            total += len(batch)
+            batches += 1
+        return {"rows": total, "batches": batches}
 
 
 class FitnessKnowledgeGraph:
     """全民健身知识图谱构建器"""
     
+    # 运动项目分类
+    ACTIVITY_CATEGORIES = {
+        "跑步": "有氧运动", "健走": "有氧运动", "游泳": "有氧运动",
+        "篮球": "球类运动", "足球": "球类运动", "羽毛球": "球类运动", "乒乓球": "球类运动",
+        "瑜伽": "柔韧性训练", "太极拳": "传统运动", "广场舞": "群众运动",
+        "健身": "力量训练"
+    }
+    
     def __init__(self, neo4j_uri: str = "bolt://localhost:7687", 
-                 user: str = "neo4j", password: str = "password"):
-        self.connector = Neo4jConnector(neo4j_uri, user, password)
+                 user: str = "neo4j", password: str = "password",
+                 driver=None, batch_size: int = DEFAULT_BATCH_SIZE):
+        """
+        Args:
+            neo4j_uri: 数据库地址
+            user: 用户名
+            password: 密码
+            driver: 已创建的驱动（如 FakeDriver），None时按地址新建
+            batch_size: 批量写入时每个事务的记录数
+        """
+        self.connector = Neo4jConnector(neo4j_uri, user, password, driver=driver)
+        self.batch_size = batch_size
         logger.info("初始化全民健身知识图谱构建器")
     
     def create_constraints(self):
@@ -57,127 +156,85 @@ class FitnessKnowledgeGraph:
         """创建城市节点"""
         logger.info(f"创建 {len(cities_data)} 个城市节点...")
         
-        query = """
-        MERGE (c:City {name: $name})
-        SET c.province = $province,
-            c.total_population = $total_population,
-            c.urban_population = $urban_population,
-            c.rural_population = $rural_population,
-            c.urbanization_rate = $urbanization_rate,
-            c.year = $year
-        RETURN c
-        """
-        
-        for city in cities_data:
-            params = {
-                "name": city.get("city", ""),
-                "province": "河北省",
-                "total_population": city.get("total_population", 0),
-                "urban_population": city.get("urban_population", 0),
-                "rural_population": city.get("rural_population", 0),
-                "urbanization_rate": city.get("urban_population", 0) / city.get("total_population", 1),
-                "year": city.get("year", 2024)
+        rows = (
+            {
+                "key": city.get("city", ""),
+                "props": {
+                    "province": "河北省",
+                    "total_population": city.get("total_population", 0),
+                    "urban_population": city.get("urban_population", 0),
+                    "rural_population": city.get("rural_population", 0),
+                    "urbanization_rate": city.get("urban_population", 0) / city.get("total_population", 1),
+                    "year": city.get("year", 2024)
+                }
             }
-            self.connector.execute_query(query, params)
+            for city in cities_data
+        )
+        result = self.connector.write_batches(merge_nodes_query("City", "name"), rows, self.batch_size)
         
-        logger.info("✅ 城市节点创建完成")
+        logger.info(f"✅ 城市节点创建完成（{result['batches']} 批）")
     
     def create_facility_nodes(self, facilities_data: List[Dict]):
         """创建健身设施节点"""
         logger.info(f"创建 {len(facilities_data)} 个健身设施节点...")
         
-        query = """
-        MERGE (f:Facility {id: $id})
-        SET f.name = $name,
-            f.type = $type,
-            f.city = $city,
-            f.district = $district,
-            f.address = $address,
-            f.area = $area,
-            f.capacity = $capacity,
-            f.latitude = $latitude,
-            f.longitude = $longitude,
-            f.build_year = $build_year,
-            f.investment = $investment,
-            f.annual_visitors = $annual_visitors,
-            f.open_hours = $open_hours
-        RETURN f
-        """
-        
-        for facility in facilities_data:
-            params = {
-                "id": facility.get("id"),
-                "name": facility.get("name", ""),
-                "type": facility.get("type", ""),
-                "city": facility.get("city", ""),
-                "district": facility.get("district", ""),
-                "address": facility.get("address", ""),
-                "area": facility.get("area", 0),
-                "capacity": facility.get("capacity", 0),
-                "latitude": facility.get("latitude", 0.0),
-                "longitude": facility.get("longitude", 0.0),
-                "build_year": facility.get("build_year", 2020),
-                "investment": facility.get("investment", 0),
-                "annual_visitors": facility.get("annual_visitors", 0),
-                "open_hours": facility.get("open_hours", "")
+        rows = (
+            {
+                "key": facility.get("id"),
+                "props": {
+                    "name": facility.get("name", ""),
+                    "type": facility.get("type", ""),
+                    "city": facility.get("city", ""),
+                    "district": facility.get("district", ""),
+                    "address": facility.get("address", ""),
+                    "area": facility.get("area", 0),
+                    "capacity": facility.get("capacity", 0),
+                    "latitude": facility.get("latitude", 0.0),
+                    "longitude": facility.get("longitude", 0.0),
+                    "build_year": facility.get("build_year", 2020),
+                    "investment": facility.get("investment", 0),
+                    "annual_visitors": facility.get("annual_visitors", 0),
+                    "open_hours": facility.get("open_hours", "")
+                }
             }
-            self.connector.execute_query(query, params)
+            for facility in facilities_data
+        )
+        result = self.connector.write_batches(merge_nodes_query("Facility", "id"), rows, self.batch_size)
         
-        logger.info("✅ 健身设施节点创建完成")
+        logger.info(f"✅ 健身设施节点创建完成（{result['batches']} 批）")
     
     def create_activity_nodes(self, activities: List[str]):
         """创建运动项目节点"""
         logger.info(f"创建 {len(activities)} 个运动项目节点...")
         
-        query = """
-        MERGE (a:Activity {name: $name})
-        SET a.category = $category
-        RETURN a
-        """
-        
-        # 运动项目分类
-        activity_categories = {
-            "跑步": "有氧运动", "健走": "有氧运动", "游泳": "有氧运动",
-            "篮球": "球类运动", "足球": "球类运动", "羽毛球": "球类运动", "乒乓球": "球类运动",
-            "瑜伽": "柔韧性训练", "太极拳": "传统运动", "广场舞": "群众运动",
-            "健身": "力量训练"
-        }
-        
-        for activity in activities:
-            params = {
-                "name": activity,
-                "category": activity_categories.get(activity, "其他运动")
-            }
-            self.connector.execute_query(query, params)
+        rows = (
+            {"key": activity, "props": {"category": self.ACTIVITY_CATEGORIES.get(activity, "其他运动")}}
+            for activity in activities
+        )
+        result = self.connector.write_batches(merge_nodes_query("Activity", "name"), rows, self.batch_size)
         
-        logger.info("✅ 运动项目节点创建完成")
+        logger.info(f"✅ 运动项目节点创建完成（{result['batches']} 批）")
     
     def create_policy_nodes(self, policies_data: List[Dict]):
         """创建政策节点"""
         logger.info(f"创建 {len(policies_data)} 个政策节点...")
         
-        query = """
-        MERGE (p:Policy {title: $title})
-        SET p.level = $level,
-            p.department = $department,
-            p.publish_date = $publish_date,
-            p.effective_date = $effective_date,
-            p.url = $url
-        RETURN p
-        """
-        
-        for policy in policies_data:
-            params = {
-                "title": policy.get("title", ""),
-                "level": policy.get("level", ""),
-                "department": policy.get("department", ""),
-                "publish_date": policy.get("publish_date", ""),
-                "effective_date": policy.get("effective_date", ""),
-                "url": policy.get("url", "")
+        rows = (
+            {
+                "key": policy.get("title", ""),
+                "props": {
+                    "level": policy.get("level", ""),
+                    "department": policy.get("department", ""),
+                    "publish_date": policy.get("publish_date", ""),
+                    "effective_date": policy.get("effective_date", ""),
+                    "url": policy.get("url", "")
+                }
             }
-            self.connector.execute_query(query, params)
+            for policy in policies_data
+        )
+        result = self.connector.write_batches(merge_nodes_query("Policy", "title"), rows, self.batch_size)
         
-        logger.info("✅ 政策节点创建完成")
+        logger.info(f"✅ 政策节点创建完成（{result['batches']} 批）")
     
     def create_relationships(self):
         """创建关系"""
@@ -265,8 +322,8 @@ class FitnessKnowledgeGraph:
 class KnowledgeGraphBuilder:
     """知识图谱构建流程"""
     
-    def __init__(self):
-        self.kg = FitnessKnowledgeGraph()
+    def __init__(self, driver=None, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.kg = FitnessKnowledgeGraph(driver=driver, batch_size=batch_size)
     
     def build_from_data(self, data_dir: str = "data/raw"):
         """从数据文件构建知识图谱"""
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+知识图谱遍历引擎
+在 RelationTable 上建立CSR邻接索引（不区分方向，每条关系在两端各登记一次），
+提供按层双向BFS最短路径和带每跳扇出上限、谓词过滤的k跳子图（ego network）提取；
+每层扩展都是对整层前沿的numpy向量运算，热点子图结果按LRU缓存
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from knowledge_graph.relation_table import RelationTable
+
+# 遍历方向：沿关系方向（主语->宾语）为out，反向为in
+OUT, IN = 'out', 'in'
+
+
+class GraphTraversal:
+    """知识图谱遍历引擎"""
+
+    def __init__(self, relations: RelationTable, cache_size: int = 256):
+        """
+        Args:
+            relations: 已加载的关系表（节点为其词表ID）
+            cache_size: 缓存的子图数量
+        """
+        self.relations = relations
+        self.num_nodes = len(relations.terms)
+
+        subjects = relations.column('subject')
+        objects = relations.column('object')
+        rows = np.arange(len(relations), dtype=np.int32)
+
+        # 每条关系登记两次：subject->object（out）与 object->subject（in）
+        src = np.concatenate([subjects, objects])
+        dst = np.concatenate([objects, subjects])
+        edge_rows = np.concatenate([rows, rows])
+        outgoing = np.concatenate([np.ones(len(rows), dtype=bool), np.zeros(len(rows), dtype=bool)])
+
+        order = np.argsort(src, kind='stable')
+        self.indptr = np.zeros(self.num_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=self.num_nodes), out=self.indptr[1:])
+        self.neighbors = dst[order]
+        self.edge_rows = edge_rows[order]
+        self.edge_outgoing = outgoing[order]
+        self.edge_predicates = relations.column('predicate')[self.edge_rows]
+
+        self._cache: "OrderedDict[tuple, Dict]" = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+
+    def degree(self, node: int) -> int:
+        return int(self.indptr[node + 1] - self.indptr[node])
+
+    def node_id(self, term: str) -> int:
+        """实体ID -> 节点编号
+
+        Raises:
+            KeyError: 实体不在关系表中
+        """
+        node = self.relations.term_ids.get(term)
+        if node is None:
+            raise KeyError(f"知识图谱中不存在实体: {term}")
+        return node
+
+    def _predicate_ids(self, predicates: Optional[Iterable[str]]) -> Optional[np.ndarray]:
+        if not predicates:
+            return None
+        term_ids = self.relations.term_ids
+        return np.array(sorted({term_ids[p] for p in predicates if p in term_ids}), dtype=np.int32)
+
+    def _expand(self, frontier: np.ndarray, predicate_ids: Optional[np.ndarray] = None,
+                max_fanout: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray, bool]:
+        """整层前沿的邻接边
+
+        Args:
+            frontier: 前沿节点
+            predicate_ids: 只沿这些谓词扩展，None表示不限
+            max_fanout: 每个节点最多取的边数（按CSR顺序），None表示不限
+
+        Returns:
+            (边的源节点, 边在CSR中的下标, 是否有节点因扇出上限被截断)
+        """
+        starts = self.indptr[frontier]
+        counts = self.indptr[frontier + 1] - starts
+        capped = False
+        if max_fanout is not None and predicate_ids is None:
+            capped = bool((counts > max_fanout).any())
+            counts = np.minimum(counts, max_fanout)
+        total = int(counts.sum())
+        if total == 0:
+            return np.empty(0, dtype=frontier.dtype), np.empty(0, dtype=np.int64), capped
+
+        # 每条边在所属节点区间内的偏移：arange(total) 减去所在段的起点
+        offsets = np.cumsum(counts) - counts
+        within = np.arange(total) - np.repeat(offsets, counts)
+        edges = np.repeat(starts, counts) + within
+        sources = np.repeat(frontier, counts)
+
+        if predicate_ids is not None:
+            keep = np.isin(self.edge_predicates[edges], predicate_ids)
+            edges, sources = edges[keep], sources[keep]
+            if max_fanout is not None and len(edges):
+                # 过滤后再按节点截断：源节点有序，同一节点的边相邻
+                first = np.r_[0, np.flatnonzero(sources[1:] != sources[:-1]) + 1]
+                rank = np.arange(len(edges)) - np.repeat(first, np.diff(np.r_[first, len(edges)]))
+                keep = rank < max_fanout
+                capped = not keep.all()
+                edges, sources = edges[keep], sources[keep]
+        return sources, edges, capped
+
+    def shortest_path(self, start: str, end: str, max_depth: int = 3,
+                      predicates: Optional[Iterable[str]] = None) -> Optional[List[Tuple[str, Optional[int], Optional[str]]]]:
+        """双向BFS最短路径（不区分关系方向）
+
+        每轮扩展前沿较小的一侧，新发现的节点若已被另一侧访问过即相遇；
+        整层扩展完后取两侧距离之和最小的相遇点
+
+        Args:
+            start: 起点实体ID
+            end: 终点实体ID
+            max_depth: 路径最多经过的关系数
+            predicates: 只沿这些谓词走，None表示不限
+
+        Returns:
+            [(实体ID, 到下一步的关系行号, 方向)]，最后一步的行号与方向为None；
+            超出 max_depth 仍不可达时返回None
+
+        Raises:
+            KeyError: 实体不存在
+        """
+        source, target = self.node_id(start), self.node_id(end)
+        if source == target:
+            return [(start, None, None)]
+        predicate_ids = self._predicate_ids(predicates)
+
+        # 两侧各自的 距离 / 父节点 / 经由的CSR边
+        dist = [np.full(self.num_nodes, -1, dtype=np.int32) for _ in range(2)]
+        parent = [np.full(self.num_nodes, -1, dtype=np.int32) for _ in range(2)]
+        via = [np.full(self.num_nodes, -1, dtype=np.int64) for _ in range(2)]
+        frontiers = [np.array([source]), np.array([target])]
+        dist[0][source] = 0
+        dist[1][target] = 0
+        depth = [0, 0]
+
+        meeting = None
+        while depth[0] + depth[1] < max_depth and len(frontiers[0]) and len(frontiers[1]):
+            side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+            sources, edges, _ = self._expand(frontiers[side], predicate_ids)
+            targets = self.neighbors[edges]
+            new = dist[side][targets] < 0
+            targets, sources, edges = targets[new], sources[new], edges[new]
+            targets, first = np.unique(targets, return_index=True)
+
+            depth[side] += 1
+            dist[side][targets] = depth[side]
+            parent[side][targets] = sources[first]
+            via[side][targets] = edges[first]
+            frontiers[side] = targets
+
+            met = targets[dist[1 - side][targets] >= 0]
+            if len(met):
+                meeting = int(met[np.argmin(dist[1 - side][met])])
+                break
+
+        if meeting is None:
+            return None
+
+        # 起点 -> 相遇点
+        forward = []
+        node = meeting
+        while node != source:
+            forward.append((int(parent[0][node]), int(via[0][node])))
+            node = int(parent[0][node])
+        forward.reverse()
+
+        terms = self.relations.terms
+        path = []
+        for node, edge in forward:
+            path.append((terms[node], int(self.edge_rows[edge]), OUT if self.edge_outgoing[edge] else IN))
+        # 相遇点 -> 终点：后向搜索记录的边方向与行走方向相反
+        node = meeting
+        while node != target:
+            edge = int(via[1][node])
+            path.append((terms[node], int(self.edge_rows[edge]), IN if self.edge_outgoing[edge] else OUT))
+            node = int(parent[1][node])
+        path.append((terms[target], None, None))
+        return path
+
+    def ego_network(self, center: str, hops: int = 2, max_fanout: Optional[int] = 50,
+                    predicates: Optional[Iterable[str]] = None, max_nodes: int = 200) -> Dict:
+        """以某实体为中心的k跳子图
+
+        Args:
+            center: 中心实体ID
+            hops: 跳数
+            max_fanout: 每跳中每个节点最多展开的边数，抑制枢纽节点（如省、城市）的爆炸
+            predicates: 只沿这些谓词展开
+            max_nodes: 子图节点数上限
+
+        Returns:
+            {'nodes': [(实体ID, 跳数)], 'rows': [关系行号], 'truncated': bool}，结果可能被缓存共享，调用方不要修改
+
+        Raises:
+            KeyError: 实体不存在
+        """
+        key = (center, hops, max_fanout, tuple(sorted(predicates)) if predicates else None, max_nodes)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                return cached
+
+        result = self._ego_network(self.node_id(center), hops, max_fanout, self._predicate_ids(predicates), max_nodes)
+
+        with self._lock:
+            self._cache[key] = result
+            self._cache.move_to_end(key)
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return result
+
+    def _ego_network(self, center: int, hops: int, max_fanout: Optional[int],
+                     predicate_ids: Optional[np.ndarray], max_nodes: int) -> Dict:
+        level = {center: 0}
+        nodes = [center]
+        rows = []
+        truncated = False
+        frontier = np.array([center])
+        for hop in range(1, hops + 1):
+            if not len(frontier):
+                break
+            _, edges, capped = self._expand(frontier, predicate_ids, max_fanout)
+            truncated = truncated or capped
+            targets = self.neighbors[edges]
+
+            # 按发现顺序加入新节点，直到达到上限
+            unique, first = np.unique(targets, return_index=True)
+            fresh = [int(n) for n in unique[np.argsort(first, kind='stable')] if int(n) not in level]
+            room = max_nodes - len(nodes)
+            if len(fresh) > room:
+                fresh = fresh[:room]
+                truncated = True
+            for n in fresh:
+                level[n] = hop
+            nodes.extend(fresh)
+
+            # 只保留两端都在子图中的边
+            inside = np.isin(targets, np.fromiter(level, dtype=np.int64, count=len(level)))
+            rows.append(self.edge_rows[edges[inside]])
+            frontier = np.array(fresh, dtype=frontier.dtype)
+
+        terms = self.relations.terms
+        return {
+            'nodes': [(terms[n], level[n]) for n in nodes],
+            'rows': np.unique(np.concatenate(rows)).tolist() if rows else [],
+            'truncated': truncated
+        }
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
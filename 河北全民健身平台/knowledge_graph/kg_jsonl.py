@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+知识图谱JSON Lines格式
+每行一条记录，写出与读取都是逐行进行，内存占用与图谱规模无关；
+文件可按行边界切成若干字节区间，由多个进程分别解析
+
+记录格式：
+    {"kind": "metadata", "metadata": {...}}
+    {"kind": "statistics", "statistics": {...}}
+    {"kind": "entity", "type": "Facility", "id": "Facility_1", "properties": {...}}
+    {"kind": "relation", "subject": ..., "predicate": ..., "object": ..., "properties": {...}}
+"""
+
+import json
+import os
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+JSONL_SUFFIXES = ('.jsonl', '.ndjson')
+
+# 写出时攒够这么多字符再写一次文件
+WRITE_BUFFER_CHARS = 1 << 20
+
+
+def is_jsonl(path: str) -> bool:
+    return str(path).lower().endswith(JSONL_SUFFIXES)
+
+
+def write_jsonl(output_file: str, metadata: Dict, statistics: Dict,
+                entities: Iterable[Tuple[str, str, Dict]],
+                relations: Iterable[Tuple[str, str, str, Optional[Dict]]]) -> int:
+    """流式写出知识图谱
+
+    Args:
+        output_file: 输出文件
+        metadata: 元数据
+        statistics: 统计信息
+        entities: (类型, 实体ID, 属性) 序列
+        relations: (主语, 谓词, 宾语, 属性) 序列
+
+    Returns:
+        写出的记录数
+    """
+    dumps = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+    count = 0
+    with open(output_file, 'w', encoding='utf-8') as f:
+        buffer: List[str] = []
+        size = 0
+
+        def emit(record: Dict):
+            nonlocal size, count
+            line = dumps(record)
+            buffer.append(line)
+            size += len(line) + 1
+            count += 1
+            if size >= WRITE_BUFFER_CHARS:
+                flush()
+
+        def flush():
+            nonlocal size
+            if buffer:
+                f.write('\n'.join(buffer))
+                f.write('\n')
+                buffer.clear()
+                size = 0
+
+        emit({'kind': 'metadata', 'metadata': metadata})
+        emit({'kind': 'statistics', 'statistics': statistics})
+        for entity_type, entity_id, properties in entities:
+            emit({'kind': 'entity', 'type': entity_type, 'id': entity_id, 'properties': properties})
+        for subject, predicate, object, properties in relations:
+            emit({'kind': 'relation', 'subject': subject, 'predicate': predicate, 'object': object,
+                  'properties': properties or {}})
+        flush()
+    return count
+
+
+def byte_ranges(path: str, num_chunks: int) -> List[Tuple[int, int]]:
+    """把文件切成大致等长、边界落在行尾的字节区间"""
+    size = os.path.getsize(path)
+    num_chunks = max(1, min(num_chunks, size // (1 << 16) or 1))
+    bounds = [0]
+    with open(path, 'rb') as f:
+        for i in range(1, num_chunks):
+            target = max(size * i // num_chunks, bounds[-1])
+            f.seek(target)
+            f.readline()  # 跳到下一行开头
+            position = f.tell()
+            if position >= size:
+                break
+            if position > bounds[-1]:
+                bounds.append(position)
+    bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def iter_jsonl(path: str, start: int = 0, end: Optional[int] = None) -> Iterator[Dict]:
+    """逐行解码 [start, end) 字节区间内的记录（start 须位于行首）"""
+    decode = json.JSONDecoder().raw_decode
+    with open(path, 'rb') as f:
+        f.seek(start)
+        position = start
+        for line in f:
+            if end is not None and position >= end:
+                break
+            position += len(line)
+            line = line.strip()
+            if line:
+                yield decode(line.decode('utf-8'))[0]
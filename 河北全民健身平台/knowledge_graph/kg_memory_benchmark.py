@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+知识图谱内存占用对比
+生成与 fps_knowledge_graph.json 同格式的合成图谱，分别用 json.load 得到的
+dict-of-dicts 结构与列式 RelationTable 加载，比较常驻内存、加载峰值与耗时
+
+每种方式在单独的子进程中加载，内存按进程RSS统计（而非只统计Python分配的tracemalloc），
+包含解释器的内存碎片与未归还的空闲块，耗时也不受tracemalloc的插桩影响
+"""
+
+import argparse
+import gc
+import json
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict
+
+from loguru import logger
+
+# 以脚本方式运行时也能导入项目内模块
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+from knowledge_graph.relation_table import read_graph
+
+PREDICATES = ['位于', '建成于', '提供', '受益于', '符合指标', '属于', '具有指标']
+
+
+def generate_graph_file(path: Path, num_triples: int, seed: int = 42):
+    """生成合成知识图谱文件（约每5条关系一个设施实体，20%的关系带属性）"""
+    rng = random.Random(seed)
+    num_facilities = max(num_triples // 5, 1)
+    cities = [f"Area_城市{i}" for i in range(11)]
+    sports = [f"Sport_项目{i}" for i in range(20)]
+    years = [f"Year_{y}" for y in range(1980, 2026)]
+
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('{"metadata": {"name": "合成知识图谱"}, "entities": {"Facility": {')
+        f.write(', '.join(
+            f'"Facility_{i}": {json.dumps({"name": f"设施{i}", "type": "体育馆"}, ensure_ascii=False)}'
+            for i in range(num_facilities)
+        ))
+        f.write('}}, "relations": [')
+        for n in range(num_triples):
+            facility = f"Facility_{rng.randrange(num_facilities)}"
+            predicate = rng.choice(PREDICATES)
+            target = rng.choice(cities if predicate == '位于' else years if predicate == '建成于' else sports)
+            relation = {
+                'subject': facility,
+                'predicate': predicate,
+                'object': target,
+                'properties': {'value': rng.randrange(100000)} if rng.random() < 0.2 else {}
+            }
+            if n:
+                f.write(', ')
+            f.write(json.dumps(relation, ensure_ascii=False))
+        f.write(']}')
+
+
+def current_rss_mb() -> float:
+    """当前进程的常驻内存（MB）"""
+    with open('/proc/self/statm') as f:
+        pages = int(f.read().split()[1])
+    return pages * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+
+
+def peak_rss_mb() -> float:
+    """进程生命周期内的峰值常驻内存（MB，Linux下 ru_maxrss 以KB计）"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def load_dicts(path: Path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def measure(loader: str, path: Path) -> Dict[str, float]:
+    """在当前（新启动的）进程中加载图谱，统计RSS增量、峰值与耗时
+
+    统计完成前一直持有加载结果，常驻内存即整个图谱加载后的端到端占用
+    """
+    gc.collect()
+    base = current_rss_mb()
+    start = time.perf_counter()
+    if loader == 'dicts':
+        data = load_dicts(path)
+        triples = len(data['relations'])
+    else:
+        data = read_graph(str(path))
+        triples = len(data.relations)
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    stats = {
+        'triples': triples,
+        'resident_mb': current_rss_mb() - base,
+        'peak_mb': peak_rss_mb() - base,
+        'seconds': elapsed
+    }
+    if loader == 'table':
+        stats['column_mb'] = data.relations.nbytes() / 1024 / 1024
+    return stats
+
+
+def measure_in_subprocess(loader: str, path: Path) -> Dict[str, float]:
+    """在全新的子进程中测量，避免前一次加载释放后的内存被复用而影响RSS统计"""
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(measure, loader, path).result()
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="知识图谱内存占用对比")
+    parser.add_argument('--triples', type=int, default=1_000_000, help='合成图谱的三元组数量')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'kg_benchmark.json'
+        logger.info(f"生成 {args.triples:,} 个三元组的合成图谱...")
+        generate_graph_file(path, args.triples, args.seed)
+        logger.info(f"文件大小: {path.stat().st_size / 1024 / 1024:.1f}MB")
+
+        dict_stats = measure_in_subprocess('dicts', path)
+        table_stats = measure_in_subprocess('table', path)
+        assert dict_stats['triples'] == table_stats['triples'] == args.triples
+
+    logger.info("=" * 60)
+    logger.info(f"{'存储方式':<16}{'常驻(MB)':>12}{'峰值(MB)':>12}{'耗时(s)':>10}")
+    for name, stats in (('dict-of-dicts', dict_stats), ('RelationTable', table_stats)):
+        logger.info(f"{name:<16}{stats['resident_mb']:>12.1f}{stats['peak_mb']:>12.1f}{stats['seconds']:>10.2f}")
+    logger.info(f"其中三元组列: {table_stats['column_mb']:.1f}MB，其余为实体属性、关系属性旁表与词表")
+    logger.info("=" * 60)
+    logger.info(f"✅ 常驻内存降低为原来的 {table_stats['resident_mb'] / dict_stats['resident_mb']:.1%}，"
+                f"加载耗时为原来的 {table_stats['seconds'] / dict_stats['seconds']:.1%}")
+
+
+if __name__ == "__main__":
+    main()
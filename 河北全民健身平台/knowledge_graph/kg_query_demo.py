@@ -12,49 +12,55 @@ from typing import List, Dict, Set
 from loguru import logger
 from collections import defaultdict
 
+# 以脚本方式运行时也能导入项目内模块
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+from knowledge_graph.pattern_query import PatternQueryEngine
+from knowledge_graph.relation_table import load_graph
+
 # 配置日志
 logger.remove()
 logger.add(sys.stderr, level="INFO", format="<green>{time:HH:mm:ss}</green> | <level>{message}</level>")
 
 
 class KnowledgeGraphQuery:
-    """知识图谱查询器"""
+    """知识图谱查询器
+    
+    实体按ID直接取自图谱的全局记录表，多跳查询通过关系表的 (谓词, 宾语) /
+    (主语, 谓词) 组合索引一步定位，耗时只与结果数量有关；城市统计在加载时一次算好
+    """
     
     def __init__(self, kg_file: str):
-        """加载知识图谱"""
-        with open(kg_file, 'r', encoding='utf-8') as f:
-            self.kg_data = json.load(f)
-        
-        self.entities = self.kg_data['entities']
-        self.relations = self.kg_data['relations']
+        """加载知识图谱（与同进程内其他模块共享同一份列式存储）"""
+        self.graph = load_graph(kg_file)
+        self.entities = self.graph.entities
+        self.records = self.graph.records
+        self.relations = self.graph.relations
+        self.city_stats = self._build_city_stats()
+        self.engine = PatternQueryEngine(self.relations)
         
-        # 构建索引
-        self._build_indexes()
-        
-        logger.info(f"✅ 加载知识图谱: {self.kg_data['metadata']['name']}")
-        logger.info(f"   实体数: {self.kg_data['statistics']['total_entities']}")
-        logger.info(f"   关系数: {self.kg_data['statistics']['total_relations']}")
-    
-    def _build_indexes(self):
-        """构建查询索引"""
-        # 主语索引
-        self.subject_index = defaultdict(list)
-        # 宾语索引
-        self.object_index = defaultdict(list)
-        # 谓词索引
-        self.predicate_index = defaultdict(list)
-        
-        for relation in self.relations:
-            self.subject_index[relation['subject']].append(relation)
-            self.object_index[relation['object']].append(relation)
-            self.predicate_index[relation['predicate']].append(relation)
+        logger.info(f"✅ 加载知识图谱: {self.graph.metadata.get('name', kg_file)}")
+        logger.info(f"   实体数: {self.graph.statistics['total_entities']}")
+        logger.info(f"   关系数: {self.graph.statistics['total_relations']}")
     
     def get_entity(self, entity_id: str) -> Dict:
         """获取实体信息"""
-        for entity_type, entities in self.entities.items():
-            if entity_id in entities:
-                return {'type': entity_type, **entities[entity_id]}
-        return None
+        record = self.records.get(entity_id)
+        return record.to_dict() if record else None
+    
+    def query(self, query: str, select: List[str] = None, distinct: bool = False, limit: int = None) -> List[Dict]:
+        """三元组模式查询，例如 ?f 位于 Area_石家庄市 . ?f 提供 ?s"""
+        return self.engine.execute(query, select, distinct, limit)
+    
+    def _entities(self, entity_ids: List[str]) -> List[Dict]:
+        """批量取实体（带id字段），跳过不存在的实体"""
+        records = self.records
+        return [
+            {'id': entity_id, **records[entity_id].to_dict()}
+            for entity_id in entity_ids if entity_id in records
+        ]
     
     def find_entities_by_type(self, entity_type: str) -> List[Dict]:
         """按类型查找实体"""
@@ -65,104 +71,94 @@ class KnowledgeGraphQuery:
     
     def find_relations_by_subject(self, subject: str) -> List[Dict]:
         """查找主语为指定实体的关系"""
-        return self.subject_index.get(subject, [])
+        return self.relations.by_subject(subject)
     
     def find_relations_by_object(self, obj: str) -> List[Dict]:
         """查找宾语为指定实体的关系"""
-        return self.object_index.get(obj, [])
+        return self.relations.by_object(obj)
     
     def find_relations_by_predicate(self, predicate: str) -> List[Dict]:
         """查找指定类型的关系"""
-        return self.predicate_index.get(predicate, [])
+        return self.relations.by_predicate(predicate)
     
     def query_city_facilities(self, city_name: str) -> List[Dict]:
         """查询城市的所有设施"""
-        city_id = f"Area_{city_name}"
-        
-        # 查找所有位于该城市的设施
-        relations = self.find_relations_by_object(city_id)
-        facilities = []
-        
-        for rel in relations:
-            if rel['predicate'] == '位于':
-                facility_id = rel['subject']
-                facility = self.get_entity(facility_id)
-                if facility:
-                    facilities.append({'id': facility_id, **facility})
-        
-        return facilities
+        return self._entities(self.relations.subjects_of('位于', f"Area_{city_name}"))
     
     def query_facility_sports(self, facility_id: str) -> List[str]:
         """查询设施提供的运动项目"""
-        relations = self.find_relations_by_subject(facility_id)
-        sports = []
-        
-        for rel in relations:
-            if rel['predicate'] == '提供':
-                sport_id = rel['object']
-                sport = self.get_entity(sport_id)
-                if sport:
-                    sports.append(sport.get('name', ''))
-        
-        return sports
+        records = self.records
+        return [
+            records[sport_id].properties.get('name', '')
+            for sport_id in self.relations.objects_of(facility_id, '提供') if sport_id in records
+        ]
+    
+    def query_facility_areas(self, facility_id: str) -> List[str]:
+        """查询设施所在区域的名称"""
+        records = self.records
+        return [
+            records[area_id].properties.get('name', '未知')
+            for area_id in self.relations.objects_of(facility_id, '位于') if area_id in records
+        ]
     
     def query_facilities_by_year(self, year: int) -> List[Dict]:
         """查询指定年份建成的设施"""
-        year_id = f"Year_{year}"
-        
-        relations = self.find_relations_by_object(year_id)
-        facilities = []
-        
-        for rel in relations:
-            if rel['predicate'] == '建成于':
-                facility_id = rel['subject']
-                facility = self.get_entity(facility_id)
-                if facility:
-                    facilities.append({'id': facility_id, **facility})
-        
-        return facilities
+        return self._entities(self.relations.subjects_of('建成于', f"Year_{year}"))
     
     def query_policy_beneficiaries(self, policy_id: str) -> List[Dict]:
         """查询受某政策影响的设施"""
-        relations = self.find_relations_by_object(policy_id)
-        facilities = []
+        return self._entities(self.relations.subjects_of('受益于', policy_id))
+    
+    def _build_city_stats(self) -> Dict[str, Dict]:
+        """一次扫描“位于”关系，汇总每个区域的设施统计
+        
+        Returns:
+            区域实体ID -> 统计信息（与 get_city_statistics 的返回格式一致，不含city字段）
+        """
+        relations = self.relations
+        rows = relations.rows(predicate='位于')
+        subjects = relations.terms_of(relations.column('subject')[rows])
+        objects = relations.terms_of(relations.column('object')[rows])
         
-        for rel in relations:
-            if rel['predicate'] == '受益于':
-                facility_id = rel['subject']
-                facility = self.get_entity(facility_id)
-                if facility:
-                    facilities.append({'id': facility_id, **facility})
+        records = self.records
+        totals: Dict[str, Dict] = {}
+        for facility_id, area_id in zip(subjects, objects):
+            record = records.get(facility_id)
+            if record is None:
+                continue
+            f = record.to_dict()
+            stats = totals.get(area_id)
+            if stats is None:
+                stats = totals[area_id] = {
+                    'total_facilities': 0,
+                    'total_site_area': 0,
+                    'total_visitors': 0,
+                    'facility_types': defaultdict(int),
+                    'year_sum': 0,
+                    'year_count': 0
+                }
+            stats['total_facilities'] += 1
+            stats['total_site_area'] += f.get('site_area', 0)
+            stats['total_visitors'] += f.get('daily_visitors', 0)
+            stats['facility_types'][f.get('type', '未知')] += 1
+            year = f.get('build_year', 0)
+            if year > 0:
+                stats['year_sum'] += year
+                stats['year_count'] += 1
         
-        return facilities
+        for stats in totals.values():
+            year_sum, year_count = stats.pop('year_sum'), stats.pop('year_count')
+            stats['avg_build_year'] = int(year_sum / year_count) if year_count else 0
+            stats['facility_types'] = dict(stats['facility_types'])
+        return totals
     
     def get_city_statistics(self, city_name: str) -> Dict:
-        """获取城市统计信息"""
-        facilities = self.query_city_facilities(city_name)
-        
-        if not facilities:
+        """获取城市统计信息（预先汇总，O(1)）"""
+        stats = self.city_stats.get(f"Area_{city_name}")
+        if stats is None:
             return None
         
-        stats = {
-            'city': city_name,
-            'total_facilities': len(facilities),
-            'total_site_area': sum(f.get('site_area', 0) for f in facilities),
-            'total_visitors': sum(f.get('daily_visitors', 0) for f in facilities),
-            'facility_types': defaultdict(int),
-            'avg_build_year': 0
-        }
-        
-        # 统计设施类型
-        for f in facilities:
-            ftype = f.get('type', '未知')
-            stats['facility_types'][ftype] += 1
-        
-        # 平均建成年份
-        years = [f.get('build_year', 0) for f in facilities if f.get('build_year', 0) > 0]
-        if years:
-            stats['avg_build_year'] = int(sum(years) / len(years))
-        
-        return stats
+        return {'city': city_name, **stats, 'facility_types': dict(stats['facility_types'])}
 
 
 def demo_basic_queries(kg: KnowledgeGraphQuery):
@@ -291,13 +287,8 @@ def demo_policy_queries(kg: KnowledgeGraphQuery):
     # 按城市统计
     city_count = defaultdict(int)
     for f in beneficiaries:
-        # 查找设施所在城市
-        relations = kg.find_relations_by_subject(f['id'])
-        for rel in relations:
-            if rel['predicate'] == '位于':
-                city_entity = kg.get_entity(rel['object'])
-                if city_entity:
-                    city_count[city_entity.get('name', '未知')] += 1
+        for city in kg.query_facility_areas(f['id']):
+            city_count[city] += 1
     
     logger.info("\n按城市分布:")
     for city, count in sorted(city_count.items(), key=lambda x: x[1], reverse=True)[:10]:
@@ -335,6 +326,32 @@ def demo_complex_queries(kg: KnowledgeGraphQuery):
         logger.info(f"  {ind.get('area', '未知')}: {ind.get('value', 0):.2f} 平方米/人")
 
 
+def demo_pattern_queries(kg: KnowledgeGraphQuery):
+    """演示三元组模式查询"""
+    logger.info("\n" + "=" * 80)
+    logger.info("演示7: 三元组模式查询")
+    logger.info("=" * 80)
+    
+    # 石家庄市的设施及其建成年份
+    query = "?f 位于 Area_石家庄市 . ?f 建成于 ?year"
+    logger.info(f"\n查询: {query}")
+    for line in kg.engine.explain(query):
+        logger.info(f"  计划 {line}")
+    results = kg.query(query)
+    logger.info(f"  结果 {len(results)} 条")
+    for r in results[:5]:
+        logger.info(f"  - {kg.get_entity(r['f'])['name']} ({r['year']})")
+    
+    # 2020年建成且享受补助政策的设施所在城市
+    query = "?f 建成于 Year_2020 . ?f 受益于 ?law . ?f 位于 ?city"
+    logger.info(f"\n查询: {query}")
+    for line in kg.engine.explain(query):
+        logger.info(f"  计划 {line}")
+    cities = kg.query(query, select=['city'], distinct=True)
+    names = [kg.get_entity(r['city'])['name'] for r in cities]
+    logger.info(f"  涉及城市 ({len(names)}个): {'、'.join(names)}")
+
+
 def main():
     """主函数"""
     logger.info("=" * 80)
@@ -351,6 +368,7 @@ def main():
     demo_time_queries(kg)
     demo_policy_queries(kg)
     demo_complex_queries(kg)
+    demo_pattern_queries(kg)
     
     logger.info("\n" + "=" * 80)
     logger.info("🎉 演示完成!")
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+进程内的Neo4j驱动替身
+接口与 neo4j 驱动中构建器用到的部分一致（driver.session / session.run /
+session.begin_transaction / tx.run / tx.commit / result.consume），无需启动数据库即可
+检验批量写入的分批、事务与吞吐
+
+能解释 merge_nodes_query 生成的批量MERGE语句，把节点保存在内存中；其他语句只记录不执行。
+每次 run / commit 计为一次网络往返，可用 latency 模拟往返延迟
+"""
+
+import re
+import time
+from collections import defaultdict
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# merge_nodes_query 生成的语句
+_MERGE_NODES = re.compile(
+    r'^\s*UNWIND \$rows AS row\s+MERGE \((\w+):(\w+) \{(\w+): row\.key\}\)\s+SET \1 \+= row\.props\s*$'
+)
+
+
+class FakeCounters:
+    def __init__(self):
+        self.nodes_created = 0
+        self.properties_set = 0
+
+
+class FakeSummary:
+    def __init__(self, query: str, counters: FakeCounters):
+        self.query = query
+        self.counters = counters
+
+
+class FakeResult:
+    """查询结果（替身不返回记录）"""
+
+    def __init__(self, query: str, counters: FakeCounters):
+        self._summary = FakeSummary(query, counters)
+
+    def __iter__(self) -> Iterator:
+        return iter(())
+
+    def consume(self) -> FakeSummary:
+        return self._summary
+
+
+class FakeGraph:
+    """内存中的节点存储：标签 -> 唯一键值 -> 属性"""
+
+    def __init__(self):
+        self.nodes: Dict[str, Dict] = defaultdict(dict)
+
+    def count(self, label: Optional[str] = None) -> int:
+        if label is not None:
+            return len(self.nodes.get(label, {}))
+        return sum(len(nodes) for nodes in self.nodes.values())
+
+    def apply(self, query: str, parameters: Dict, counters: FakeCounters, undo: List[Tuple]):
+        """执行语句，每改动一个节点先把原状态记入撤销日志（回滚用，语句中途出错时也完整）"""
+        match = _MERGE_NODES.match(query)
+        if match is None:
+            return
+        _, label, key = match.groups()
+        nodes = self.nodes[label]
+        for row in parameters.get('rows', []):
+            node_key = row['key']
+            node = nodes.get(node_key)
+            undo.append((label, node_key, None if node is None else dict(node)))
+            if node is None:
+                node = nodes[node_key] = {key: node_key}
+                counters.nodes_created += 1
+            node.update(row.get('props') or {})
+            counters.properties_set += len(row.get('props') or {})
+
+    def revert(self, undo: List[Tuple]):
+        for label, node_key, previous in reversed(undo):
+            if previous is None:
+                self.nodes[label].pop(node_key, None)
+            else:
+                self.nodes[label][node_key] = previous
+
+
+class FakeTransaction:
+    """显式事务：语句立即生效，回滚时按撤销日志恢复"""
+
+    def __init__(self, session: 'FakeSession'):
+        self.session = session
+        self.closed = False
+        self._undo: List[Tuple] = []
+
+    def run(self, query: str, parameters: Optional[Dict] = None, **kwargs) -> FakeResult:
+        if self.closed:
+            raise RuntimeError("事务已关闭")
+        parameters = dict(parameters or {}, **kwargs)
+        counters = FakeCounters()
+        self.session.driver._execute(query, parameters, counters, self._undo)
+        return FakeResult(query, counters)
+
+    def commit(self):
+        if self.closed:
+            raise RuntimeError("事务已关闭")
+        self.session.driver._round_trip()
+        self.session.driver.commits += 1
+        self.closed = True
+
+    def rollback(self):
+        if not self.closed:
+            self.session.driver.graph.revert(self._undo)
+            self.session.driver.rollbacks += 1
+            self.closed = True
+
+    def close(self):
+        self.rollback()
+
+    def __enter__(self) -> 'FakeTransaction':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class FakeSession:
+    def __init__(self, driver: 'FakeDriver'):
+        self.driver = driver
+        self.closed = False
+
+    def run(self, query: str, parameters: Optional[Dict] = None, **kwargs) -> FakeResult:
+        """自动提交事务中执行"""
+        parameters = dict(parameters or {}, **kwargs)
+        counters = FakeCounters()
+        undo: List[Tuple] = []
+        try:
+            self.driver._execute(query, parameters, counters, undo)
+        except Exception:
+            self.driver.graph.revert(undo)
+            raise
+        return FakeResult(query, counters)
+
+    def begin_transaction(self) -> FakeTransaction:
+        return FakeTransaction(self)
+
+    def close(self):
+        self.closed = True
+
+    def __enter__(self) -> 'FakeSession':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class FakeDriver:
+    """Neo4j驱动替身"""
+
+    def __init__(self, latency: float = 0.0):
+        """
+        Args:
+            latency: 每次网络往返的模拟延迟（秒）
+        """
+        self.latency = latency
+        self.graph = FakeGraph()
+        self.queries: List[Tuple[str, int]] = []  # (语句, 参数中的行数)
+        self.sessions = 0
+        self.round_trips = 0
+        self.commits = 0
+        self.rollbacks = 0
+
+    def session(self, **kwargs) -> FakeSession:
+        self.sessions += 1
+        return FakeSession(self)
+
+    def close(self):
+        pass
+
+    def _round_trip(self):
+        self.round_trips += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _execute(self, query: str, parameters: Dict, counters: FakeCounters, undo: List[Tuple]):
+        self._round_trip()
+        self.queries.append((query, len(parameters['rows']) if 'rows' in parameters else 1))
+        self.graph.apply(query, parameters, counters, undo)
@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+三元组模式查询引擎
+查询由若干三元组模式组成，模式之间用单独的 "." 或换行分隔，以 ? 开头的是变量，例如：
+
+    ?f 位于 Area_石家庄市 . ?f 提供 ?s
+
+含空格的常量可加双引号。编译时按各模式在关系表索引上的匹配行数估算基数，
+贪心地先执行结果最少的模式、再依次连接与已绑定变量相连且估计结果最小的模式；
+执行时中间结果按列保存为numpy数组，连接时已绑定值较少则走索引批量查找，
+否则扫描模式的候选行后排序合并。编译好的查询计划按LRU缓存，关系表变化后重新编译
+"""
+
+import argparse
+import re
+import sys
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+# 以脚本方式运行时也能导入项目内模块
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+from knowledge_graph.relation_table import COLUMNS, PAIR_INDEXES, RelationTable, expand_ranges, load_graph
+
+# 词法：双引号常量、独立的 "." 分隔符、其他非空白片段
+_TOKEN = re.compile(r'"((?:[^"\\]|\\.)*)"|(\S+)')
+_VARIABLE = re.compile(r'^\?\w+$')
+_ESCAPE = re.compile(r'\\(.)')
+
+# 中间结果行数上限，防止笛卡尔积耗尽内存
+MAX_INTERMEDIATE_ROWS = 5_000_000
+
+
+class QueryError(ValueError):
+    """查询语法错误或结果超出上限"""
+
+
+class PatternStep:
+    """查询计划中的一步：一个三元组模式
+
+    terms 中每一项为 ('var', 变量名) 或 ('const', 词表ID)；常量不在词表中时为 ('const', -1)，该模式不匹配任何行
+    """
+
+    __slots__ = ('text', 'terms', 'cardinality', 'estimate', 'join_vars')
+
+    def __init__(self, text: str, terms: Tuple[Tuple[str, object], ...], cardinality: int):
+        self.text = text
+        self.terms = terms
+        self.cardinality = cardinality
+        self.estimate = cardinality
+        self.join_vars: List[str] = []
+
+    @property
+    def variables(self) -> List[str]:
+        names = []
+        for kind, value in self.terms:
+            if kind == 'var' and value not in names:
+                names.append(value)
+        return names
+
+    def constants(self) -> Dict[str, int]:
+        return {column: value for column, (kind, value) in zip(COLUMNS, self.terms) if kind == 'const'}
+
+    def describe(self) -> str:
+        joined = f"，连接变量 {' '.join(self.join_vars)}" if self.join_vars else ''
+        return f"{self.text}  [匹配 {self.cardinality} 行，估计结果 {self.estimate:.0f} 行{joined}]"
+
+
+class QueryPlan:
+    """编译后的查询计划"""
+
+    def __init__(self, query: str, steps: List[PatternStep], version: Tuple[int, int]):
+        self.query = query
+        self.steps = steps
+        self.version = version
+        self.variables: List[str] = []
+        for step in steps:
+            for name in step.variables:
+                if name not in self.variables:
+                    self.variables.append(name)
+
+    def explain(self) -> List[str]:
+        return [f"{i}. {step.describe()}" for i, step in enumerate(self.steps, 1)]
+
+
+def parse_query(query: str) -> List[Tuple[str, str, str]]:
+    """解析查询文本为三元组模式列表
+
+    Raises:
+        QueryError: 模式不是三项，或查询为空
+    """
+    patterns = []
+    for line in query.splitlines():
+        current: List[str] = []
+        for quoted, bare in _TOKEN.findall(line):
+            if bare == '.':
+                if current:
+                    patterns.append(current)
+                current = []
+                continue
+            current.append(_ESCAPE.sub(r'\1', quoted) if not bare else bare)
+        if current:
+            patterns.append(current)
+
+    if not patterns:
+        raise QueryError("查询为空")
+    for pattern in patterns:
+        if len(pattern) != 3:
+            raise QueryError(f"三元组模式必须由主语、谓词、宾语三项组成: {' '.join(pattern)}")
+    return [tuple(pattern) for pattern in patterns]
+
+
+class PatternQueryEngine:
+    """三元组模式查询引擎"""
+
+    def __init__(self, relations: RelationTable, aliases: Optional[Dict[str, str]] = None,
+                 cache_size: int = 128, max_rows: int = MAX_INTERMEDIATE_ROWS):
+        """
+        Args:
+            relations: 关系表
+            aliases: 常量不在词表中时的别名映射（如 实体名称 -> 实体ID），可选
+            cache_size: 缓存的查询计划数量
+            max_rows: 中间结果行数上限
+        """
+        self.relations = relations
+        self.aliases = aliases if aliases is not None else {}
+        self.max_rows = max_rows
+        self._plans: "OrderedDict[str, QueryPlan]" = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------ 编译
+
+    def compile(self, query: str) -> QueryPlan:
+        """编译查询（命中缓存时直接返回）
+
+        Raises:
+            QueryError: 查询语法错误
+        """
+        key = query.strip()
+        version = (len(self.relations), len(self.relations.terms))
+        with self._lock:
+            plan = self._plans.get(key)
+            if plan is not None and plan.version == version:
+                self._plans.move_to_end(key)
+                return plan
+
+        plan = QueryPlan(key, self._order(self._steps(parse_query(key))), version)
+        with self._lock:
+            self._plans[key] = plan
+            self._plans.move_to_end(key)
+            while len(self._plans) > self._cache_size:
+                self._plans.popitem(last=False)
+        return plan
+
+    def _term_id(self, term: str) -> int:
+        term_ids = self.relations.term_ids
+        term_id = term_ids.get(term)
+        if term_id is None and term in self.aliases:
+            term_id = term_ids.get(self.aliases[term])
+        return -1 if term_id is None else term_id
+
+    def _steps(self, patterns: List[Tuple[str, str, str]]) -> List[PatternStep]:
+        """模式 -> 计划步骤，基数为只按常量匹配时的行数"""
+        steps = []
+        for pattern in patterns:
+            terms = tuple(
+                ('var', term[1:]) if _VARIABLE.match(term) else ('const', self._term_id(term))
+                for term in pattern
+            )
+            step = PatternStep(' '.join(pattern), terms, 0)
+            step.cardinality = len(self._candidates(step))
+            steps.append(step)
+        return steps
+
+    def _distinct(self, step: PatternStep, variable: str) -> int:
+        """模式候选行中某变量的不同取值数"""
+        column = COLUMNS[[value for _, value in step.terms].index(variable)]
+        rows = self._candidates(step)
+        return max(len(np.unique(self.relations.column(column)[rows])), 1)
+
+    def _order(self, steps: List[PatternStep]) -> List[PatternStep]:
+        """贪心确定连接顺序：每步选与已绑定变量相连、估计结果最少的模式
+
+        与已绑定变量 v 连接时，结果估计为 当前行数 × 模式行数 / 模式中 v 的不同取值数
+        """
+        remaining = list(steps)
+        ordered: List[PatternStep] = []
+        bound: set = set()
+        current = 1.0
+        while remaining:
+            connected = [step for step in remaining if bound & set(step.variables)]
+            candidates = connected or remaining
+            best, best_estimate = None, None
+            for step in candidates:
+                shared = [name for name in step.variables if name in bound]
+                if shared:
+                    fanout = min(step.cardinality / self._distinct(step, name) for name in shared)
+                    estimate = current * fanout
+                else:
+                    estimate = current * step.cardinality
+                if best is None or (estimate, step.cardinality) < (best_estimate, best.cardinality):
+                    best, best_estimate = step, estimate
+            best.estimate = best_estimate
+            best.join_vars = [name for name in best.variables if name in bound]
+            current = best_estimate
+            bound.update(best.variables)
+            ordered.append(best)
+            remaining.remove(best)
+        return ordered
+
+    # ------------------------------------------------------------------ 执行
+
+    def _candidates(self, step: PatternStep) -> np.ndarray:
+        """只按常量匹配的行号"""
+        constants = step.constants()
+        if any(value < 0 for value in constants.values()):
+            return np.empty(0, dtype=np.int32)
+        terms = self.relations.terms
+        return self.relations.rows(**{column: terms[value] for column, value in constants.items()})
+
+    def _repeated_mask(self, step: PatternStep, rows: np.ndarray) -> np.ndarray:
+        """同一模式中重复出现的变量（如 ?x 关联 ?x）要求对应列相等"""
+        keep = np.ones(len(rows), dtype=bool)
+        seen: Dict[str, str] = {}
+        for column, (kind, value) in zip(COLUMNS, step.terms):
+            if kind != 'var':
+                continue
+            if value in seen:
+                keep &= self.relations.column(seen[value])[rows] == self.relations.column(column)[rows]
+            seen.setdefault(value, column)
+        return keep
+
+    def _check_size(self, count: int, step: PatternStep):
+        """在分配连接结果之前检查行数，超出上限时直接报错而不是耗尽内存"""
+        if count > self.max_rows:
+            raise QueryError(f"中间结果超过 {self.max_rows:,} 行，请增加常量缩小范围: {step.text}")
+
+    def _join(self, step: PatternStep, solutions: Dict[str, np.ndarray], size: int) -> Tuple[np.ndarray, np.ndarray]:
+        """把模式与当前结果连接
+
+        Returns:
+            (当前结果中的行下标, 关系表行号)
+
+        Raises:
+            QueryError: 连接结果超出行数上限
+        """
+        relations = self.relations
+        columns = {value: column for column, (kind, value) in zip(COLUMNS, step.terms) if kind == 'var'}
+        shared = [name for name in step.variables if name in solutions]
+
+        if not shared:
+            rows = self._candidates(step)
+            rows = rows[self._repeated_mask(step, rows)]
+            # 与已有结果做笛卡尔积
+            self._check_size(size * len(rows), step)
+            return np.repeat(np.arange(size), len(rows)), np.tile(rows, size)
+
+        # 选不同取值最少的变量作为连接键
+        keys = {name: np.unique(solutions[name], return_inverse=True) for name in shared}
+        join = min(shared, key=lambda name: len(keys[name][0]))
+        values, inverse = keys[join]
+        join_column = columns[join]
+
+        constants = step.constants()
+        if any(value < 0 for value in constants.values()):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int32)
+
+        if step.cardinality <= len(values):
+            # 候选行少：扫描候选行，按连接列排序后合并
+            rows = self._candidates(step)
+            row_keys = relations.column(join_column)[rows]
+            order = np.argsort(row_keys, kind='stable')
+            rows, row_keys = rows[order], row_keys[order]
+            lo = np.searchsorted(row_keys, values, side='left')
+            hi = np.searchsorted(row_keys, values, side='right')
+            self._check_size(int((hi - lo).sum()), step)
+            owners, offsets = expand_ranges(lo, hi)
+            matched = rows[offsets]
+        else:
+            # 已绑定值少：按连接列的索引批量查找（有常量时优先用组合索引）
+            other, other_id = None, None
+            for column, value in constants.items():
+                other, other_id = column, value
+                if (join_column, column) in PAIR_INDEXES or (column, join_column) in PAIR_INDEXES:
+                    break
+            owners, matched = relations.lookup(join_column, values, other, other_id)
+            for column, value in constants.items():
+                if column != other:
+                    keep = relations.column(column)[matched] == value
+                    owners, matched = owners[keep], matched[keep]
+
+        # owners 是 values 中的下标，再展开到当前结果的每一行
+        order = np.argsort(owners, kind='stable')
+        owners, matched = owners[order], matched[order]
+        lo = np.searchsorted(owners, inverse, side='left')
+        hi = np.searchsorted(owners, inverse, side='right')
+        self._check_size(int((hi - lo).sum()), step)
+        solution_rows, offsets = expand_ranges(lo, hi)
+        matched = matched[offsets]
+
+        # 其余共享变量与模式内重复变量
+        keep = self._repeated_mask(step, matched)
+        for name in shared:
+            if name != join:
+                keep &= relations.column(columns[name])[matched] == solutions[name][solution_rows]
+        return solution_rows[keep], matched[keep]
+
+    def execute(self, query: str, select: Optional[List[str]] = None, distinct: bool = False,
+                limit: Optional[int] = None) -> List[Dict[str, str]]:
+        """执行查询
+
+        Args:
+            query: 查询文本
+            select: 返回的变量（不带?），默认全部
+            distinct: 是否去除重复结果
+            limit: 最多返回的结果数
+
+        Returns:
+            每个结果为 变量名 -> 实体ID/谓词
+
+        Raises:
+            QueryError: 查询语法错误、select中有未出现的变量或中间结果超出上限
+        """
+        return self.execute_counted(query, select, distinct, limit)[0]
+
+    def execute_counted(self, query: str, select: Optional[List[str]] = None, distinct: bool = False,
+                        limit: Optional[int] = None) -> Tuple[List[Dict[str, str]], int]:
+        """执行查询，只为前 limit 个结果生成字典，同时返回结果总数
+
+        Returns:
+            (结果列表, 结果总数)
+
+        Raises:
+            QueryError: 同 execute
+        """
+        plan = self.compile(query)
+        select = [name.lstrip('?') for name in select] if select else plan.variables
+        unknown = [name for name in select if name not in plan.variables]
+        if unknown:
+            raise QueryError(f"查询中没有变量: {', '.join('?' + name for name in unknown)}")
+
+        relations = self.relations
+        solutions: Dict[str, np.ndarray] = {}
+        size = 1
+        for step in plan.steps:
+            solution_rows, rows = self._join(step, solutions, size)
+            solutions = {name: values[solution_rows] for name, values in solutions.items()}
+            for column, (kind, value) in zip(COLUMNS, step.terms):
+                if kind == 'var' and value not in solutions:
+                    solutions[value] = relations.column(column)[rows]
+            size = len(rows)
+            if not size:
+                break
+
+        if not size:
+            return [], 0
+        if not select:
+            # 没有变量的查询只判断是否匹配，每个匹配对应一个空结果
+            total = 1 if distinct else size
+            return [{} for _ in range(total if limit is None else min(total, max(limit, 0)))], total
+        table = np.stack([solutions[name] for name in select], axis=1)
+        if distinct:
+            _, first = np.unique(table, axis=0, return_index=True)
+            table = table[np.sort(first)]
+        total = len(table)
+        if limit is not None:
+            table = table[:max(limit, 0)]
+        terms = relations.terms
+        return [dict(zip(select, (terms[i] for i in row))) for row in table.tolist()], total
+
+    def explain(self, query: str) -> List[str]:
+        """查询计划的文字说明"""
+        return self.compile(query).explain()
+
+
+def main():
+    """命令行执行查询"""
+    parser = argparse.ArgumentParser(description="知识图谱三元组模式查询")
+    parser.add_argument('query', help='查询，例如 "?f 位于 Area_石家庄市 . ?f 提供 ?s"')
+    parser.add_argument('--kg-file', default='fps_knowledge_graph.json', help='知识图谱文件')
+    parser.add_argument('--select', nargs='*', help='返回的变量')
+    parser.add_argument('--distinct', action='store_true', help='去除重复结果')
+    parser.add_argument('--limit', type=int, default=50, help='最多显示的结果数')
+    parser.add_argument('--explain', action='store_true', help='显示查询计划')
+    args = parser.parse_args()
+
+    engine = PatternQueryEngine(load_graph(args.kg_file).relations)
+    try:
+        if args.explain:
+            logger.info("查询计划:")
+            for line in engine.explain(args.query):
+                logger.info(f"  {line}")
+        results, total = engine.execute_counted(args.query, args.select, args.distinct, args.limit)
+    except QueryError as e:
+        logger.error(f"查询失败: {e}")
+        sys.exit(1)
+
+    for result in results:
+        logger.info("  ".join(f"?{name}={value}" for name, value in result.items()))
+    logger.info(f"✅ 共 {total} 条结果")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+知识图谱RDF序列化
+把全部实体（类型、标签、带数据类型的字面量属性）与实体间关系（对象属性断言）
+流式写出为 RDF/XML（OWL，可用Protege打开）或 N-Triples；输入为实体、关系的迭代器，
+输出攒成块后写入文件句柄，内存占用与图谱规模无关
+
+带属性的关系用OWL2注解公理（owl:Axiom）表示关系属性；数据属性与注解属性的声明
+在写出实例时收集，放在文档末尾（RDF中三元组的先后顺序没有语义）
+"""
+
+import json
+import math
+import re
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set, TextIO, Tuple
+
+ONTOLOGY_IRI = 'http://www.fps-hebei.org/ontology'
+NAMESPACE = ONTOLOGY_IRI + '#'
+
+RDF = 'http://www.w3.org/1999/02/22-rdf-syntax-ns#'
+RDFS = 'http://www.w3.org/2000/01/rdf-schema#'
+OWL = 'http://www.w3.org/2002/07/owl#'
+XSD = 'http://www.w3.org/2001/XMLSchema#'
+
+RDFXML_SUFFIXES = ('.owl', '.rdf', '.xml')
+# N-Triples文件本身也是合法的Turtle文档
+NTRIPLES_SUFFIXES = ('.nt', '.ttl')
+
+# 攒够这么多字符再写一次文件
+WRITE_BUFFER_CHARS = 1 << 20
+
+# 作为 rdfs:label 的属性（依次查找），都没有时用实体ID
+LABEL_PROPERTIES = ('name', 'title')
+
+# 需要转义或剔除的字符：绝大多数值不含这些字符，先查找再转换
+_XML_SPECIAL = re.compile('[&<>"\r\n\t\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+# XML 1.0 不允许出现的字符
+_INVALID_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+_XML_TEXT_ESCAPES = str.maketrans({'&': '&amp;', '<': '&lt;', '>': '&gt;', '\r': '&#13;'})
+_XML_ATTR_ESCAPES = str.maketrans({'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;',
+                                   '\r': '&#13;', '\n': '&#10;', '\t': '&#9;'})
+# IRI中不允许出现的字符（百分号编码），中文等非ASCII字符按IRI规范保留
+_IRI_UNSAFE = re.compile(r'[\x00-\x20<>"{}|\\^`%#\x7f]')
+_NT_SPECIAL = re.compile(r'[\\"\n\r]')
+_NT_ESCAPES = str.maketrans({'\\': '\\\\', '"': '\\"', '\n': '\\n', '\r': '\\r'})
+_NCNAME_INVALID = re.compile(r'[^\w.\-]')
+
+Literal = Tuple[str, Optional[str]]
+
+
+def escape_text(value: str) -> str:
+    """XML文本节点转义"""
+    if _XML_SPECIAL.search(value) is None:
+        return value
+    return _INVALID_XML_CHARS.sub('', value).translate(_XML_TEXT_ESCAPES)
+
+
+def escape_attr(value: str) -> str:
+    """XML属性值（双引号）转义"""
+    if _XML_SPECIAL.search(value) is None:
+        return value
+    return _INVALID_XML_CHARS.sub('', value).translate(_XML_ATTR_ESCAPES)
+
+
+def iri_fragment(name: str) -> str:
+    """实体ID -> 本体命名空间下的IRI片段"""
+    return _IRI_UNSAFE.sub(lambda m: ''.join(f'%{b:02X}' for b in m.group().encode('utf-8')), name)
+
+
+@lru_cache(maxsize=65536)
+def resource_attr(name: str) -> str:
+    """实体ID -> RDF/XML中 rdf:about / rdf:resource 的属性值（宾语大量重复，缓存最近用过的）"""
+    return escape_attr('#' + iri_fragment(name))
+
+
+@lru_cache(maxsize=65536)
+def iri_ref(name: str) -> str:
+    """实体ID、类名、属性名 -> N-Triples中的 <完整IRI>"""
+    return f'<{NAMESPACE}{iri_fragment(name)}>'
+
+
+def local_name(name: str) -> str:
+    """类、属性名 -> 合法的XML NCName（RDF/XML中要作元素名），两种格式共用以保证IRI一致"""
+    name = _NCNAME_INVALID.sub('_', name) or '_'
+    if not (name[0].isalpha() or name[0] == '_'):
+        name = '_' + name
+    return name
+
+
+def literals(value) -> Iterator[Literal]:
+    """属性值 -> (词法形式, 数据类型IRI) 序列；字符串为普通字面量（数据类型None）
+
+    列表中的每个标量各成一个字面量，None被跳过，其余类型按JSON文本写出
+    """
+    if value is None:
+        return
+    if isinstance(value, bool):
+        yield ('true' if value else 'false', XSD + 'boolean')
+    elif isinstance(value, int):
+        yield (str(value), XSD + 'integer')
+    elif isinstance(value, float):
+        if math.isnan(value):
+            yield ('NaN', XSD + 'double')
+        elif math.isinf(value):
+            yield ('INF' if value > 0 else '-INF', XSD + 'double')
+        else:
+            yield (repr(value), XSD + 'double')
+    elif isinstance(value, str):
+        yield (value, None)
+    elif isinstance(value, (list, tuple, set)):
+        for item in value:
+            if isinstance(item, (list, tuple, set, dict)):
+                yield (json.dumps(item, ensure_ascii=False), None)
+            else:
+                yield from literals(item)
+    else:
+        yield (json.dumps(value, ensure_ascii=False, default=str), None)
+
+
+def entity_label(entity_id: str, properties: Dict) -> str:
+    for key in LABEL_PROPERTIES:
+        value = properties.get(key)
+        if isinstance(value, str) and value:
+            return value
+    return entity_id
+
+
+class RDFWriter:
+    """RDF流式写出基类：负责写出顺序、缓冲与声明收集，子类实现具体语法"""
+
+    def __init__(self, f: TextIO):
+        """
+        Args:
+            f: 以文本方式打开的输出文件句柄（UTF-8）
+        """
+        self.f = f
+        self.triples = 0
+        self._buffer: List[str] = []
+        self._size = 0
+        self._names: Dict[str, str] = {}
+        self._data_properties: Set[str] = set()
+        self._annotation_properties: Set[str] = set()
+
+    def write(self, classes: Iterable[str], predicates: Iterable[str],
+              entities: Iterable[Tuple[str, str, Dict]],
+              relations: Iterable[Tuple[str, str, str, Optional[Dict]]],
+              label: str = '', comment: str = '') -> int:
+        """写出完整文档
+
+        Args:
+            classes: 实体类型
+            predicates: 关系谓词
+            entities: (类型, 实体ID, 属性) 序列
+            relations: (主语, 谓词, 宾语, 属性) 序列
+            label: 本体名称
+            comment: 本体说明
+
+        Returns:
+            写出的三元组数
+        """
+        self._begin(label, comment)
+        self._section('实体类定义')
+        for entity_type in classes:
+            self._declare(self._name(entity_type), OWL + 'Class', entity_type)
+        self._section('对象属性定义')
+        for predicate in predicates:
+            self._declare(self._name(predicate), OWL + 'ObjectProperty', predicate)
+        self._section('实例定义')
+        for entity_type, entity_id, properties in entities:
+            self._entity(entity_type, entity_id, properties)
+        self._section('实例间关系')
+        self._relations(relations)
+        self._section('数据属性定义')
+        for key in sorted(self._data_properties):
+            self._declare(self._name(key), OWL + 'DatatypeProperty', key)
+        self._section('注解属性定义（关系属性）')
+        for key in sorted(self._annotation_properties):
+            self._declare(self._name(key), OWL + 'AnnotationProperty', key)
+        self._end()
+        self._flush()
+        return self.triples
+
+    def _name(self, name: str) -> str:
+        local = self._names.get(name)
+        if local is None:
+            local = self._names[name] = local_name(name)
+        return local
+
+    def _emit(self, text: str):
+        self._buffer.append(text)
+        self._size += len(text)
+        if self._size >= WRITE_BUFFER_CHARS:
+            self._flush()
+
+    def _flush(self):
+        if self._buffer:
+            self.f.write(''.join(self._buffer))
+            self._buffer.clear()
+            self._size = 0
+
+    def _begin(self, label: str, comment: str):
+        raise NotImplementedError
+
+    def _end(self):
+        pass
+
+    def _section(self, title: str):
+        pass
+
+    def _declare(self, local: str, kind: str, label: str):
+        raise NotImplementedError
+
+    def _entity(self, entity_type: str, entity_id: str, properties: Dict):
+        raise NotImplementedError
+
+    def _relations(self, relations: Iterable[Tuple[str, str, str, Optional[Dict]]]):
+        raise NotImplementedError
+
+
+class RDFXMLWriter(RDFWriter):
+    """RDF/XML（OWL）写出，保持原 fps_ontology.owl 的命名空间与缩进风格"""
+
+    def _begin(self, label: str, comment: str):
+        self._emit(
+            '<?xml version="1.0"?>\n'
+            f'<rdf:RDF xmlns="{NAMESPACE}"\n'
+            f'     xml:base="{ONTOLOGY_IRI}"\n'
+            f'     xmlns:rdf="{RDF}"\n'
+            f'     xmlns:owl="{OWL}"\n'
+            '     xmlns:xml="http://www.w3.org/XML/1998/namespace"\n'
+            f'     xmlns:xsd="{XSD}"\n'
+            f'     xmlns:rdfs="{RDFS}">\n\n'
+            f'    <owl:Ontology rdf:about="{ONTOLOGY_IRI}">\n'
+        )
+        self.triples += 1
+        if label:
+            self._emit(f'        <rdfs:label>{escape_text(label)}</rdfs:label>\n')
+            self.triples += 1
+        if comment:
+            self._emit(f'        <rdfs:comment>{escape_text(comment)}</rdfs:comment>\n')
+            self.triples += 1
+        self._emit('    </owl:Ontology>\n\n')
+
+    def _end(self):
+        self._emit('</rdf:RDF>\n')
+
+    def _section(self, title: str):
+        self._emit(f'    <!-- {title} -->\n')
+
+    def _declare(self, local: str, kind: str, label: str):
+        element = 'owl:' + kind[len(OWL):]
+        self._emit(f'    <{element} rdf:about="{resource_attr(local)}">\n'
+                   f'        <rdfs:label>{escape_text(label)}</rdfs:label>\n'
+                   f'    </{element}>\n\n')
+        self.triples += 2
+
+    def _properties(self, properties: Dict, declared: Set[str]) -> List[str]:
+        lines = []
+        for key, value in properties.items():
+            element = self._name(key)
+            for lexical, datatype in literals(value):
+                declared.add(key)
+                if datatype is None:
+                    lines.append(f'        <{element}>{escape_text(lexical)}</{element}>\n')
+                else:
+                    lines.append(f'        <{element} rdf:datatype="{datatype}">{lexical}</{element}>\n')
+        self.triples += len(lines)
+        return lines
+
+    def _entity(self, entity_type: str, entity_id: str, properties: Dict):
+        element = self._name(entity_type)
+        lines = [f'    <{element} rdf:about="{resource_attr(entity_id)}">\n',
+                 f'        <rdfs:label>{escape_text(entity_label(entity_id, properties))}</rdfs:label>\n']
+        lines.extend(self._properties(properties, self._data_properties))
+        lines.append(f'    </{element}>\n\n')
+        self.triples += 2
+        self._emit(''.join(lines))
+
+    def _relations(self, relations: Iterable[Tuple[str, str, str, Optional[Dict]]]):
+        # 相邻的同主语关系合并到一个 rdf:Description 中；
+        # 注解公理不能嵌套在其中，先暂存，主语切换时写出
+        current = None
+        axioms: List[str] = []
+        for subject, predicate, object, properties in relations:
+            if subject != current:
+                if current is not None:
+                    self._emit('    </rdf:Description>\n\n')
+                    self._emit(''.join(axioms))
+                    axioms.clear()
+                current = subject
+                self._emit(f'    <rdf:Description rdf:about="{resource_attr(subject)}">\n')
+            element = self._name(predicate)
+            target = resource_attr(object)
+            self._emit(f'        <{element} rdf:resource="{target}"/>\n')
+            self.triples += 1
+            if properties:
+                annotations = self._properties(properties, self._annotation_properties)
+                if annotations:
+                    axioms.append(
+                        '    <owl:Axiom>\n'
+                        f'        <owl:annotatedSource rdf:resource="{resource_attr(subject)}"/>\n'
+                        f'        <owl:annotatedProperty rdf:resource="{resource_attr(element)}"/>\n'
+                        f'        <owl:annotatedTarget rdf:resource="{target}"/>\n'
+                        + ''.join(annotations) +
+                        '    </owl:Axiom>\n\n'
+                    )
+                    self.triples += 4
+        if current is not None:
+            self._emit('    </rdf:Description>\n\n')
+            self._emit(''.join(axioms))
+
+
+class NTriplesWriter(RDFWriter):
+    """N-Triples写出（每行一个三元组，同时也是合法的Turtle）"""
+
+    RDF_TYPE = f'<{RDF}type>'
+    RDFS_LABEL = f'<{RDFS}label>'
+
+    def __init__(self, f: TextIO):
+        super().__init__(f)
+        self._blank_nodes = 0
+
+    def _triple(self, subject: str, predicate: str, object: str):
+        """各项均为已写成N-Triples语法的项（<IRI>、_:空节点或字面量）"""
+        self._emit(f'{subject} {predicate} {object} .\n')
+        self.triples += 1
+
+    @staticmethod
+    def _literal(lexical: str, datatype: Optional[str]) -> str:
+        if datatype is None:
+            if _NT_SPECIAL.search(lexical) is not None:
+                lexical = lexical.translate(_NT_ESCAPES)
+            return f'"{lexical}"'
+        return f'"{lexical}"^^<{datatype}>'
+
+    def _literal_triples(self, node: str, properties: Dict, declared: Set[str]):
+        for key, value in properties.items():
+            predicate = iri_ref(self._name(key))
+            for lexical, datatype in literals(value):
+                declared.add(key)
+                self._triple(node, predicate, self._literal(lexical, datatype))
+
+    def _begin(self, label: str, comment: str):
+        ontology = f'<{ONTOLOGY_IRI}>'
+        self._triple(ontology, self.RDF_TYPE, f'<{OWL}Ontology>')
+        if label:
+            self._triple(ontology, self.RDFS_LABEL, self._literal(label, None))
+        if comment:
+            self._triple(ontology, f'<{RDFS}comment>', self._literal(comment, None))
+
+    def _declare(self, local: str, kind: str, label: str):
+        node = iri_ref(local)
+        self._triple(node, self.RDF_TYPE, f'<{kind}>')
+        self._triple(node, self.RDFS_LABEL, self._literal(label, None))
+
+    def _entity(self, entity_type: str, entity_id: str, properties: Dict):
+        node = iri_ref(entity_id)
+        self._triple(node, self.RDF_TYPE, iri_ref(self._name(entity_type)))
+        self._triple(node, self.RDFS_LABEL, self._literal(entity_label(entity_id, properties), None))
+        self._literal_triples(node, properties, self._data_properties)
+
+    def _relations(self, relations: Iterable[Tuple[str, str, str, Optional[Dict]]]):
+        for subject, predicate, object, properties in relations:
+            source, target = iri_ref(subject), iri_ref(object)
+            predicate = iri_ref(self._name(predicate))
+            self._triple(source, predicate, target)
+            if properties:
+                self._blank_nodes += 1
+                axiom = f'_:axiom{self._blank_nodes}'
+                self._triple(axiom, self.RDF_TYPE, f'<{OWL}Axiom>')
+                self._triple(axiom, f'<{OWL}annotatedSource>', source)
+                self._triple(axiom, f'<{OWL}annotatedProperty>', predicate)
+                self._triple(axiom, f'<{OWL}annotatedTarget>', target)
+                self._literal_triples(axiom, properties, self._annotation_properties)
+
+
+def writer_for(path: str):
+    """按文件后缀选择写出类
+
+    Raises:
+        ValueError: 不支持的后缀
+    """
+    suffix = Path(path).suffix.lower()
+    if suffix in RDFXML_SUFFIXES:
+        return RDFXMLWriter
+    if suffix in NTRIPLES_SUFFIXES:
+        return NTriplesWriter
+    raise ValueError(f"不支持的RDF文件格式: {suffix}")
+
+
+def write_rdf(output_file: str, classes: Iterable[str], predicates: Iterable[str],
+              entities: Iterable[Tuple[str, str, Dict]],
+              relations: Iterable[Tuple[str, str, str, Optional[Dict]]],
+              label: str = '', comment: str = '') -> int:
+    """流式写出RDF文件，格式由后缀决定（.owl/.rdf/.xml 为RDF/XML，.nt/.ttl 为N-Triples）
+
+    Returns:
+        写出的三元组数
+
+    Raises:
+        ValueError: 不支持的后缀
+    """
+    writer_class = writer_for(output_file)
+    with open(output_file, 'w', encoding='utf-8') as f:
+        return writer_class(f).write(classes, predicates, entities, relations, label, comment)
@@ -0,0 +1,689 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+知识图谱的紧凑内存表示
+
+关系按列存储：主语/谓词/宾语各为一列int32，字符串统一存入词表，
+关系属性只为非空的行保存在旁表中；实体用 __slots__ 记录。
+查询器、特征提取器和可视化脚本通过 load_graph 共享同一份已加载的图谱，
+百万级三元组只占几十MB，而不是每条关系一个dict。
+关系按批解码（JSON按64K字符的文本窗口整体交给 json.loads，JSON Lines按行）并批量追加，
+解码与词表编码都在C层完成；JSON Lines格式的图谱还可按文件区间由多个进程并行解析，再按文件顺序合并
+"""
+
+import json
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from array import array
+from bisect import bisect_left
+from itertools import chain, compress, count
+from operator import itemgetter, methodcaller
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, TextIO, Tuple
+
+import numpy as np
+from loguru import logger
+
+from knowledge_graph.kg_jsonl import byte_ranges, is_jsonl, iter_jsonl
+
+COLUMNS = ('subject', 'predicate', 'object')
+
+# 建立组合索引的列对：(谓词, 宾语) 用于“谁位于某城市”，(主语, 谓词) 用于“某设施位于哪里”
+PAIR_INDEXES = (('subject', 'predicate'), ('predicate', 'object'))
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_SEPARATOR = re.compile(r'[ \t\n\r]*([,\]])[ \t\n\r]*')
+
+# 按批解码关系时每批的文本窗口（字符数），JSON Lines每批的关系条数
+BATCH_CHARS = 1 << 16
+JSONL_BATCH_SIZE = 8192
+
+_SPO = itemgetter('subject', 'predicate', 'object')
+_PROPERTIES = methodcaller('get', 'properties')
+
+
+class _JsonStream:
+    """按块读取JSON文本，逐个解码其中的值"""
+
+    def __init__(self, f: TextIO, chunk_size: int = 1 << 16):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        # 已从缓冲区丢弃的字符数，base + pos 为在文件中的位置
+        self.base = 0
+        self.eof = False
+
+    def _fill(self, size: int = 0) -> bool:
+        """读入更多内容；未解码部分较大时按其长度读取，避免大值反复重试解码"""
+        if self.eof:
+            return False
+        chunk = self.f.read(max(self.chunk_size, size, len(self.buffer) - self.pos))
+        if not chunk:
+            self.eof = True
+            return False
+        self.base += self.pos
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """跳过空白，返回下一个字符（文件结束时返回空串）"""
+        while True:
+            self.pos = _WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer) or not self._fill():
+                return self.buffer[self.pos:self.pos + 1]
+
+    def expect(self, chars: str) -> str:
+        ch = self.peek()
+        if not ch or ch not in chars:
+            raise ValueError(f"JSON格式错误: 期望 {chars!r}，实际 {ch!r}")
+        self.pos += 1
+        return ch
+
+    def decode(self):
+        """解码下一个完整的JSON值，缓冲区不够时继续读取"""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # 值恰好结束于缓冲区末尾时可能被截断（如数字），读入更多内容再确认
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+    def _next_element(self) -> Tuple[Any, str]:
+        """解码下一个数组元素，返回 (元素, 其后的分隔符 ',' 或 ']')"""
+        # 热路径：缓冲区内连续解码，只在数据不足时回退到逐步读取
+        buffer, pos = self.buffer, self.pos
+        try:
+            value, end = self.decoder.raw_decode(buffer, pos)
+            match = _SEPARATOR.match(buffer, end)
+        except json.JSONDecodeError:
+            match = None
+        if match is None or (match.end() == len(buffer) and not self.eof):
+            value = self.decode()
+            separator = self.expect(',]')
+            self.peek()
+        else:
+            self.pos = match.end()
+            separator = match.group(1)
+        return value, separator
+
+    def iter_array(self) -> Iterator[Any]:
+        """逐个解码数组元素（调用前已消费 '['，结束时消费 ']'）"""
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            value, separator = self._next_element()
+            yield value
+            if separator == ']':
+                return
+
+    def iter_array_batches(self, batch_chars: int = BATCH_CHARS) -> Iterator[List[Any]]:
+        """按批解码元素为对象的数组（调用前已消费 '['，结束时消费 ']'）
+
+        每批读入约 batch_chars 个字符，截到最后一个 '},' 处，加上方括号整体交给 json.loads。
+        截断位置只有落在两个元素之间时整体解码才会成功；落在字符串或嵌套对象内部、
+        或窗口越过了数组末尾时解码失败，该窗口回退为逐个解码
+        """
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            if len(self.buffer) - self.pos < batch_chars:
+                self._fill(batch_chars)
+            buffer, pos = self.buffer, self.pos
+            cut = buffer.rfind('},', pos)
+            if cut > pos:
+                try:
+                    batch = json.loads('[' + buffer[pos:cut + 1] + ']')
+                except json.JSONDecodeError:
+                    batch = None
+                if batch is not None:
+                    self.pos = cut + 2
+                    yield batch
+                    continue
+
+            # 逐个解码到截断位置（或数组结束）
+            stop = self.base + cut
+            batch = []
+            while True:
+                value, separator = self._next_element()
+                batch.append(value)
+                if separator == ']' or self.base + self.pos > stop:
+                    break
+            yield batch
+            if separator == ']':
+                return
+
+
+def iter_kg_items(kg_file: str, chunk_size: int = BATCH_CHARS) -> Iterator[Tuple[str, Any]]:
+    """流式读取知识图谱导出文件
+
+    relations 列表逐条产出 ('relation', 关系字典)，不会整体载入内存；
+    其余顶层字段整体产出 (字段名, 值)。JSON Lines文件的实体逐个产出 ('entities', {类型: {ID: 属性}})
+
+    Args:
+        kg_file: FPSKnowledgeGraph.export_to_json / export_to_jsonl 导出的文件
+        chunk_size: 按批解码关系时每批的文本窗口（字符数）
+    """
+    for key, value in iter_kg_batches(kg_file, chunk_size):
+        if key == 'relations':
+            for relation in value:
+                yield 'relation', relation
+        else:
+            yield key, value
+
+
+def iter_kg_batches(kg_file: str, chunk_size: int = BATCH_CHARS) -> Iterator[Tuple[str, Any]]:
+    """同 iter_kg_items，但关系按批产出 ('relations', [关系字典, ...])"""
+    if is_jsonl(kg_file):
+        yield from _iter_jsonl_batches(kg_file)
+        return
+
+    with open(kg_file, 'r', encoding='utf-8') as f:
+        stream = _JsonStream(f)
+        stream.expect('{')
+        if stream.peek() == '}':
+            return
+        while True:
+            key = stream.decode()
+            stream.expect(':')
+            if key == 'relations':
+                stream.expect('[')
+                for batch in stream.iter_array_batches(chunk_size):
+                    yield 'relations', batch
+            else:
+                yield key, stream.decode()
+            if stream.expect(',}') == '}':
+                break
+
+
+def _iter_jsonl_batches(kg_file: str, start: int = 0, end: Optional[int] = None) -> Iterator[Tuple[str, Any]]:
+    batch: List[Dict] = []
+    for record in iter_jsonl(kg_file, start, end):
+        kind = record.pop('kind')
+        if kind == 'relation':
+            batch.append(record)
+            if len(batch) >= JSONL_BATCH_SIZE:
+                yield 'relations', batch
+                batch = []
+            continue
+        if batch:
+            yield 'relations', batch
+            batch = []
+        if kind == 'entity':
+            yield 'entities', {record['type']: {record['id']: record['properties']}}
+        else:
+            yield kind, record[kind]
+    if batch:
+        yield 'relations', batch
+
+
+def expand_ranges(lo: np.ndarray, hi: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """把一组 [lo, hi) 区间展开为 (区间编号, 区间内下标)
+
+    例如 lo=[0, 5], hi=[2, 7] 展开为 ([0, 0, 1, 1], [0, 1, 5, 6])
+    """
+    counts = hi - lo
+    total = int(counts.sum())
+    owners = np.repeat(np.arange(len(lo), dtype=np.int64), counts)
+    starts = np.cumsum(counts) - counts
+    offsets = np.arange(total, dtype=np.int64) - np.repeat(starts, counts)
+    return owners, np.repeat(lo, counts) + offsets
+
+
+class EntityRecord:
+    """实体记录"""
+
+    __slots__ = ('entity_id', 'entity_type', 'properties')
+
+    def __init__(self, entity_id: str, entity_type: str, properties: Dict):
+        self.entity_id = entity_id
+        self.entity_type = entity_type
+        self.properties = properties
+
+    def to_dict(self) -> Dict:
+        return {'type': self.entity_type, **self.properties}
+
+
+class RelationTable:
+    """列式关系表"""
+
+    def __init__(self):
+        # 词表：实体ID与谓词共用
+        self.terms: List[str] = []
+        self.term_ids: Dict[str, int] = {}
+
+        self.subjects = array('i')
+        self.predicates = array('i')
+        self.objects = array('i')
+        # 关系属性旁表：只为非空属性的行保存 (属性名组合ID, 属性值...) 元组，
+        # 行号单调递增，按行号二分查找；同一组属性名只保存一次
+        self._property_rows = array('i')
+        self._property_values: List[tuple] = []
+        self._property_keys: List[tuple] = []
+        self._property_key_ids: Dict[tuple, int] = {}
+
+        # 查询用的numpy列与排序索引，追加数据后失效
+        self._arrays: Dict[str, np.ndarray] = {}
+        self._indexes: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        # 列对 -> (组合键的乘数, 排序后的组合键, 对应行号)
+        self._pair_indexes: Dict[Tuple[str, str], Tuple[int, np.ndarray, np.ndarray]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.subjects)
+
+    def __getstate__(self) -> Dict:
+        # 跨进程传递时不带锁和可重建的numpy缓存
+        state = self.__dict__.copy()
+        for key in ('_arrays', '_indexes', '_pair_indexes', '_lock'):
+            del state[key]
+        return state
+
+    def __setstate__(self, state: Dict):
+        self.__dict__.update(state)
+        self._arrays = {}
+        self._indexes = {}
+        self._pair_indexes = {}
+        self._lock = threading.Lock()
+
+    def __iter__(self) -> Iterator[Dict]:
+        for i in range(len(self)):
+            yield self.row(i)
+
+    def intern(self, term: str) -> int:
+        """字符串 -> 词表ID"""
+        term_id = self.term_ids.get(term)
+        if term_id is None:
+            term_id = len(self.terms)
+            self.terms.append(term)
+            self.term_ids[term] = term_id
+        return term_id
+
+    def append(self, subject: str, predicate: str, object: str, properties: Optional[Dict] = None) -> int:
+        """追加一条关系，返回行号"""
+        row = len(self.subjects)
+        self.subjects.append(self.intern(subject))
+        self.predicates.append(self.intern(predicate))
+        self.objects.append(self.intern(object))
+        if properties:
+            self._add_properties(row, properties)
+        self._invalidate()
+        return row
+
+    def extend(self, relations: List[Dict]) -> int:
+        """批量追加关系（格式同JSON导出），结果与逐条 append 相同，返回追加的行数
+
+        三列按行交错展开后一次性编码，新词按首次出现的顺序分配ID，与逐条追加一致
+        """
+        start = len(self.subjects)
+        terms = list(chain.from_iterable(map(_SPO, relations)))
+        term_ids = self.term_ids
+        new_terms = [term for term in dict.fromkeys(terms) if term not in term_ids]
+        if new_terms:
+            term_ids.update(zip(new_terms, range(len(self.terms), len(self.terms) + len(new_terms))))
+            self.terms.extend(new_terms)
+        ids = list(map(term_ids.__getitem__, terms))
+        self.subjects.extend(ids[0::3])
+        self.predicates.extend(ids[1::3])
+        self.objects.extend(ids[2::3])
+
+        properties = list(map(_PROPERTIES, relations))
+        for row, values in zip(compress(count(start), properties), filter(None, properties)):
+            self._add_properties(row, values)
+        self._invalidate()
+        return len(relations)
+
+    def _add_properties(self, row: int, properties: Dict):
+        keys = tuple(properties)
+        key_id = self._property_key_ids.get(keys)
+        if key_id is None:
+            key_id = len(self._property_keys)
+            self._property_keys.append(keys)
+            self._property_key_ids[keys] = key_id
+        self._property_rows.append(row)
+        self._property_values.append((key_id, *properties.values()))
+
+    def _invalidate(self):
+        """追加数据后丢弃numpy列与索引缓存"""
+        if self._arrays:
+            self._arrays = {}
+            self._indexes = {}
+            self._pair_indexes = {}
+
+    def row(self, i: int) -> Dict:
+        """第i行，格式与JSON导出中的关系一致"""
+        terms = self.terms
+        return {
+            'subject': terms[self.subjects[i]],
+            'predicate': terms[self.predicates[i]],
+            'object': terms[self.objects[i]],
+            'properties': self.properties(i)
+        }
+
+    def properties(self, i: int) -> Dict:
+        """第i行的关系属性（每次返回新字典）"""
+        rows = self._property_rows
+        j = bisect_left(rows, i)
+        if j == len(rows) or rows[j] != i:
+            return {}
+        values = self._property_values[j]
+        return dict(zip(self._property_keys[values[0]], values[1:]))
+
+    def column(self, name: str) -> np.ndarray:
+        """列的numpy副本（subject/predicate/object）"""
+        arrays = self._arrays
+        if name not in arrays:
+            with self._lock:
+                if name not in self._arrays:
+                    source = {'subject': self.subjects, 'predicate': self.predicates, 'object': self.objects}[name]
+                    self._arrays[name] = np.array(source, dtype=np.int32)
+            arrays = self._arrays
+        return arrays[name]
+
+    def _index(self, name: str) -> Tuple[np.ndarray, np.ndarray]:
+        """列的排序索引 (排序后的值, 对应行号)"""
+        index = self._indexes.get(name)
+        if index is None:
+            values = self.column(name)
+            order = np.argsort(values, kind='stable').astype(np.int32)
+            index = (values[order], order)
+            self._indexes[name] = index
+        return index
+
+    def _pair_index(self, first: str, second: str) -> Tuple[int, np.ndarray, np.ndarray]:
+        """两列的组合排序索引，组合键为 第一列 * 词表大小 + 第二列"""
+        key = (first, second)
+        index = self._pair_indexes.get(key)
+        if index is None:
+            base = max(len(self.terms), 1)
+            keys = self.column(first).astype(np.int64) * base + self.column(second)
+            order = np.argsort(keys, kind='stable').astype(np.int32)
+            index = (base, keys[order], order)
+            self._pair_indexes[key] = index
+        return index
+
+    def _pair_rows(self, first: str, first_id: int, second: str, second_id: int) -> np.ndarray:
+        """用组合索引取出两列同时匹配的行号（升序），耗时只与结果数有关"""
+        base, keys, order = self._pair_index(first, second)
+        if first_id >= base or second_id >= base:
+            # 建索引之后新加入词表、尚未出现在任何行中的词
+            return np.empty(0, dtype=np.int32)
+        key = first_id * base + second_id
+        lo, hi = np.searchsorted(keys, [key, key + 1])
+        return order[lo:hi]
+
+    def rows(self, subject: Optional[str] = None, predicate: Optional[str] = None,
+             object: Optional[str] = None) -> np.ndarray:
+        """匹配模式的行号（升序），None表示任意"""
+        bound = {}
+        for name, term in zip(COLUMNS, (subject, predicate, object)):
+            if term is not None:
+                term_id = self.term_ids.get(term)
+                if term_id is None:
+                    return np.empty(0, dtype=np.int32)
+                bound[name] = term_id
+        if not bound:
+            return np.arange(len(self), dtype=np.int32)
+
+        for first, second in PAIR_INDEXES:
+            if first in bound and second in bound:
+                rows = self._pair_rows(first, bound[first], second, bound[second])
+                rest = [name for name in bound if name not in (first, second)]
+                for name in rest:
+                    rows = rows[self.column(name)[rows] == bound[name]]
+                return rows
+
+        # 先用区间最短的列取出候选行，再按其余列过滤
+        ranges = {}
+        for name, term_id in bound.items():
+            values, order = self._index(name)
+            lo, hi = np.searchsorted(values, [term_id, term_id + 1])
+            ranges[name] = order[lo:hi]
+        first = min(ranges, key=lambda name: len(ranges[name]))
+        rows = ranges[first]
+        for name, term_id in bound.items():
+            if name != first and len(rows):
+                rows = rows[self.column(name)[rows] == term_id]
+        return rows
+
+    def lookup(self, column: str, ids: np.ndarray, other: Optional[str] = None,
+               other_id: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """批量等值查找：对 ids 中的每个词表ID，找出 column 列等于它（且 other 列等于 other_id）的行
+
+        两列构成组合索引时直接按组合键查找，否则用单列索引查找后再按 other 列过滤
+
+        Args:
+            column: 查找的列
+            ids: 词表ID数组
+            other: 另一个取固定值的列，可选
+            other_id: other 列的词表ID
+
+        Returns:
+            (ids中的位置, 行号)，按位置升序，同一位置内行号升序
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        pair = None
+        if other is not None:
+            pair = (column, other) if (column, other) in PAIR_INDEXES else \
+                (other, column) if (other, column) in PAIR_INDEXES else None
+
+        if pair is not None:
+            base, keys, order = self._pair_index(*pair)
+            valid = (ids < base) & (other_id < base)
+            probe = ids * base + other_id if pair[0] == column else other_id * base + ids
+        else:
+            keys, order = self._index(column)
+            valid = np.ones(len(ids), dtype=bool)
+            probe = ids
+        lo = np.searchsorted(keys, probe, side='left')
+        hi = np.where(valid, np.searchsorted(keys, probe, side='right'), lo)
+        positions, offsets = expand_ranges(lo, hi)
+        rows = order[offsets]
+        if other is not None and pair is None:
+            keep = self.column(other)[rows] == other_id
+            positions, rows = positions[keep], rows[keep]
+        return positions, rows
+
+    def relations(self, subject: Optional[str] = None, predicate: Optional[str] = None,
+                  object: Optional[str] = None) -> List[Dict]:
+        """匹配模式的关系字典列表"""
+        return [self.row(int(i)) for i in self.rows(subject, predicate, object)]
+
+    def by_subject(self, subject: str) -> List[Dict]:
+        return self.relations(subject=subject)
+
+    def by_predicate(self, predicate: str) -> List[Dict]:
+        return self.relations(predicate=predicate)
+
+    def by_object(self, object: str) -> List[Dict]:
+        return self.relations(object=object)
+
+    def objects_of(self, subject: str, predicate: str) -> List[str]:
+        """(主语, 谓词) 对应的宾语，按行顺序"""
+        rows = self.rows(subject=subject, predicate=predicate)
+        return self.terms_of(self.column('object')[rows])
+
+    def subjects_of(self, predicate: str, object: str) -> List[str]:
+        """(谓词, 宾语) 对应的主语，按行顺序"""
+        rows = self.rows(predicate=predicate, object=object)
+        return self.terms_of(self.column('subject')[rows])
+
+    def terms_of(self, ids: np.ndarray) -> List[str]:
+        """词表ID数组 -> 字符串列表"""
+        terms = self.terms
+        return [terms[i] for i in ids]
+
+    def value_counts(self, column: str, rows: Optional[np.ndarray] = None) -> Dict[str, int]:
+        """某一列中各值出现的次数，按首次出现的顺序排列
+
+        Args:
+            column: subject（出度）/ predicate / object（入度）
+            rows: 只统计这些行，默认全部
+        """
+        values = self.column(column)
+        if rows is not None:
+            values = values[rows]
+        unique, first, counts = np.unique(values, return_index=True, return_counts=True)
+        order = np.argsort(first, kind='stable')
+        return {self.terms[unique[i]]: int(counts[i]) for i in order}
+
+    def predicate_counts(self) -> Dict[str, int]:
+        """各谓词的关系数量"""
+        return self.value_counts('predicate')
+
+    def merge(self, other: 'RelationTable'):
+        """把另一张关系表的全部行追加到末尾（词表ID重新映射）"""
+        mapping = np.array([self.intern(term) for term in other.terms], dtype=np.int32)
+        offset = len(self)
+        for name in COLUMNS:
+            source = getattr(other, f'{name}s')
+            getattr(self, f'{name}s').frombytes(mapping[np.frombuffer(source, dtype=np.int32)].tobytes())
+
+        key_mapping = []
+        for keys in other._property_keys:
+            key_id = self._property_key_ids.get(keys)
+            if key_id is None:
+                key_id = len(self._property_keys)
+                self._property_keys.append(keys)
+                self._property_key_ids[keys] = key_id
+            key_mapping.append(key_id)
+        self._property_rows.extend(row + offset for row in other._property_rows)
+        self._property_values.extend((key_mapping[values[0]], *values[1:]) for values in other._property_values)
+        self._invalidate()
+
+    def nbytes(self) -> int:
+        """三列整数数组占用的字节数"""
+        return sum(col.itemsize * len(col) for col in (self.subjects, self.predicates, self.objects))
+
+
+class KnowledgeGraphData:
+    """已加载的知识图谱"""
+
+    def __init__(self, metadata: Optional[Dict] = None):
+        self.metadata: Dict = metadata or {}
+        self.statistics: Dict = {}
+        # 类型 -> 实体ID -> 属性（属性字典与实体记录共享，不重复保存）
+        self.entities: Dict[str, Dict[str, Dict]] = {}
+        self.records: Dict[str, EntityRecord] = {}
+        self.relations = RelationTable()
+
+    def add_entity(self, entity_type: str, entity_id: str, properties: Dict):
+        self.entities.setdefault(entity_type, {})[entity_id] = properties
+        self.records[entity_id] = EntityRecord(entity_id, entity_type, properties)
+
+    def get_entity(self, entity_id: str) -> Optional[EntityRecord]:
+        """按ID获取实体记录"""
+        return self.records.get(entity_id)
+
+    def compute_statistics(self) -> Dict:
+        """按已加载的内容重新计算统计信息"""
+        return {
+            'entities': {k: len(v) for k, v in self.entities.items()},
+            'total_entities': len(self.records),
+            'total_relations': len(self.relations),
+            'relation_types': len(self.relations.predicate_counts())
+        }
+
+
+def read_graph(kg_file: str, workers: int = 1) -> KnowledgeGraphData:
+    """读取知识图谱文件（不使用缓存）
+
+    Args:
+        kg_file: JSON或JSON Lines文件
+        workers: 大于1且为JSON Lines文件时，按文件区间多进程并行解析
+    """
+    if workers > 1 and is_jsonl(kg_file):
+        return _read_jsonl_parallel(kg_file, workers)
+
+    graph = KnowledgeGraphData()
+    _add_items(graph, iter_kg_batches(kg_file))
+    if not graph.statistics:
+        graph.statistics = graph.compute_statistics()
+    return graph
+
+
+def _add_items(graph: KnowledgeGraphData, items: Iterator[Tuple[str, Any]]):
+    for key, value in items:
+        if key == 'relations':
+            graph.relations.extend(value)
+        elif key == 'relation':
+            graph.relations.append(value['subject'], value['predicate'], value['object'], value.get('properties'))
+        elif key == 'entities':
+            for entity_type, entities in value.items():
+                graph.entities.setdefault(entity_type, {})
+                for entity_id, properties in entities.items():
+                    graph.add_entity(entity_type, entity_id, properties)
+        elif key == 'metadata':
+            graph.metadata = value
+        elif key == 'statistics':
+            graph.statistics = value
+            # 没有实体的类型（如Person）在JSON Lines中没有记录，按统计信息补上
+            for entity_type in value.get('entities', {}):
+                graph.entities.setdefault(entity_type, {})
+
+
+def _read_jsonl_chunk(kg_file: str, start: int, end: int) -> KnowledgeGraphData:
+    """解析JSON Lines文件的一个区间（在子进程中运行）"""
+    graph = KnowledgeGraphData()
+    _add_items(graph, _iter_jsonl_batches(kg_file, start, end))
+    graph.records = {}  # 实体记录由合并方重建，不必传回
+    return graph
+
+
+def _read_jsonl_parallel(kg_file: str, workers: int) -> KnowledgeGraphData:
+    """多进程解析JSON Lines文件，按文件顺序合并各区间的结果，结果与顺序读取一致"""
+    ranges = byte_ranges(kg_file, workers * 4)
+    graph = KnowledgeGraphData()
+    with ProcessPoolExecutor(max_workers=min(workers, len(ranges))) as executor:
+        starts, ends = zip(*ranges)
+        for part in executor.map(_read_jsonl_chunk, [kg_file] * len(ranges), starts, ends):
+            if part.metadata:
+                graph.metadata = part.metadata
+            if part.statistics:
+                graph.statistics = part.statistics
+            for entity_type, entities in part.entities.items():
+                graph.entities.setdefault(entity_type, {})
+                for entity_id, properties in entities.items():
+                    graph.add_entity(entity_type, entity_id, properties)
+            graph.relations.merge(part.relations)
+
+    if not graph.statistics:
+        graph.statistics = graph.compute_statistics()
+    return graph
+
+
+_graph_cache: Dict[str, Tuple[float, KnowledgeGraphData]] = {}
+_graph_lock = threading.Lock()
+
+
+def load_graph(kg_file: str, workers: int = 1) -> KnowledgeGraphData:
+    """加载知识图谱，同一文件在进程内只加载一次（文件更新后重新加载）
+
+    Args:
+        kg_file: JSON或JSON Lines文件
+        workers: JSON Lines文件的并行解析进程数
+    """
+    path = str(Path(kg_file).resolve())
+    mtime = Path(path).stat().st_mtime
+    with _graph_lock:
+        cached = _graph_cache.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        graph = read_graph(path, workers)
+        _graph_cache[path] = (mtime, graph)
+
+    logger.debug(f"加载知识图谱 {path}: {len(graph.records)}个实体, {len(graph.relations)}个关系, "
+                 f"关系表 {graph.relations.nbytes() / 1024 / 1024:.1f}MB")
+    return graph
@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+知识图谱实体搜索索引
+对实体名称与描述建立倒排索引：jieba搜索模式分词 + 字符n-gram（用户常只输入名称的一部分），
+按BM25打分，名称字段加权；支持名称/词语前缀补全，以及编辑距离为1的错别字匹配。
+实体可随时增删，索引就地更新，不需要重建
+"""
+
+import re
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from functools import lru_cache
+from math import log
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import jieba
+import numpy as np
+
+# 字段权重：名称命中比描述命中重要得多
+FIELD_WEIGHTS = {'name': 3.0, 'text': 1.0}
+# 分词结果与n-gram分别打分，n-gram负责部分匹配，权重较低
+WORD_WEIGHT = 1.0
+GRAM_WEIGHT = 0.5
+# 错别字纠正后的词打折计分
+FUZZY_WEIGHT = 0.6
+
+# 文档频率超过 max(COMMON_TERM_MIN_DF, 文档数*COMMON_TERM_RATIO) 的n-gram视为常见n-gram
+COMMON_TERM_MIN_DF = 1000
+COMMON_TERM_RATIO = 0.2
+# 各字段取的n-gram长度：名称含单字（支持单字查询），描述只取二元组
+NGRAM_SIZES = {'name': (1, 2), 'text': (2,)}
+
+# 前缀补全时每个结果最多扫描的候选数
+SUGGEST_SCAN = 20
+
+# 不计入描述的属性（名称单独成字段；链接、编号不参与检索）
+SKIP_PROPERTIES = {'id', 'name', 'title', 'image_url'}
+
+_TOKEN = re.compile(r'[\w一-鿿]+')
+
+
+def normalize(text: str) -> str:
+    return text.strip().lower()
+
+
+def char_ngrams(text: str, sizes: Tuple[int, ...] = (1, 2)) -> List[str]:
+    """字符n-gram（按连续的字母数字/汉字片段切分后再取）"""
+    grams = []
+    for piece in _TOKEN.findall(text):
+        for n in sizes:
+            grams.extend(piece[i:i + n] for i in range(len(piece) - n + 1))
+    return grams
+
+
+@lru_cache(maxsize=1 << 16)
+def _segment(piece: str) -> Tuple[str, ...]:
+    # 不用HMM猜新词：词典外的地名等交给n-gram匹配，分词也快得多
+    return tuple(jieba.lcut_for_search(piece, HMM=False))
+
+
+def words(text: str) -> List[str]:
+    """jieba搜索模式分词（按连续的字母数字/汉字片段分别切分，片段结果有缓存）"""
+    return [w for piece in _TOKEN.findall(text) for w in _segment(piece)]
+
+
+def deletions(word: str) -> Set[str]:
+    """删除一个字符得到的所有变体（用于编辑距离为1的匹配）"""
+    return {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+def _grow(array: np.ndarray, size: int) -> np.ndarray:
+    """容量不足时按倍数扩容"""
+    if size <= len(array):
+        return array
+    grown = np.zeros(max(size, 2 * len(array)), dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+class _Field:
+    """单个字段的倒排表与BM25统计
+
+    倒排表用dict便于增删；查询时按词编译成numpy数组并缓存，词的倒排表变化后作废
+    """
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        self.lengths = np.zeros(1024, dtype=np.float32)
+        self.num_docs = 0
+        self.total_length = 0
+        self._arrays: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+
+    def add(self, doc: int, terms: List[str]):
+        counts: Dict[str, int] = {}
+        for term in terms:
+            counts[term] = counts.get(term, 0) + 1
+        for term, tf in counts.items():
+            self.postings[term][doc] = tf
+            self._arrays.pop(term, None)
+        self.lengths = _grow(self.lengths, doc + 1)
+        self.lengths[doc] = len(terms)
+        self.num_docs += 1
+        self.total_length += len(terms)
+
+    def remove(self, doc: int, terms: Iterable[str]):
+        for term in set(terms):
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(doc, None)
+                self._arrays.pop(term, None)
+                if not postings:
+                    del self.postings[term]
+        self.num_docs -= 1
+        self.total_length -= int(self.lengths[doc])
+        self.lengths[doc] = 0
+
+    def df(self, term: str) -> int:
+        postings = self.postings.get(term)
+        return len(postings) if postings else 0
+
+    def score(self, term: str, weight: float, scores: np.ndarray, num_docs: int,
+              k1: float = 1.2, b: float = 0.75):
+        """把词的BM25分数累加到 scores（按文档编号的稠密数组）"""
+        arrays = self._arrays.get(term)
+        if arrays is None:
+            postings = self.postings.get(term)
+            if not postings:
+                return
+            arrays = (np.fromiter(postings.keys(), dtype=np.int64, count=len(postings)),
+                      np.fromiter(postings.values(), dtype=np.float32, count=len(postings)))
+            self._arrays[term] = arrays
+        docs, tf = arrays
+        df = len(docs)
+        idf = log(1 + (num_docs - df + 0.5) / (df + 0.5))
+        avg_length = self.total_length / max(self.num_docs, 1)
+        norm = tf + k1 * (1 - b + b * self.lengths[docs] / avg_length)
+        scores[docs] += weight * idf * tf * (k1 + 1) / norm
+
+
+class EntitySearchIndex:
+    """实体搜索索引"""
+
+    def __init__(self):
+        self.entity_ids: Dict[int, str] = {}
+        self.doc_ids: Dict[str, int] = {}
+        self.entity_types: Dict[int, str] = {}
+        self.names: Dict[int, str] = {}
+        self._next_doc = 0
+        # 按文档编号的类型编码，用于过滤
+        self._type_ids: Dict[str, int] = {}
+        self._type_codes = np.zeros(1024, dtype=np.int32)
+        # 每个文档的分词结果，删除时用来撤销倒排表
+        self._doc_terms: Dict[int, Dict[str, Tuple[List[str], List[str]]]] = {}
+
+        self.words = {field: _Field() for field in FIELD_WEIGHTS}
+        self.grams = {field: _Field() for field in FIELD_WEIGHTS}
+
+        # 前缀补全：排序的 (名称, 文档) 与 (词, 文档)；新增的先放入待合并列表，
+        # 下次补全时一次排序合并，已删除文档的条目在合并时清理
+        self._name_keys: List[Tuple[str, int]] = []
+        self._word_keys: List[Tuple[str, int]] = []
+        self._pending_names: List[Tuple[str, int]] = []
+        self._pending_words: List[Tuple[str, int]] = []
+        self._stale_keys = 0
+        # 删除变体 -> 原词，用于错别字匹配
+        self._deletes: Dict[str, Set[str]] = defaultdict(set)
+        self._vocabulary: Dict[str, int] = defaultdict(int)
+
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    @staticmethod
+    def describe(properties: Dict) -> str:
+        """实体属性中可检索的描述文本"""
+        return ' '.join(
+            value for key, value in properties.items()
+            if key not in SKIP_PROPERTIES and isinstance(value, str) and not value.startswith('http')
+        )
+
+    def add(self, entity_id: str, name: str, entity_type: str = '', text: str = ''):
+        """加入或更新一个实体
+
+        Args:
+            entity_id: 实体ID
+            name: 名称
+            entity_type: 实体类型，用于按类型过滤
+            text: 描述文本（地址、类型、主管单位等）
+        """
+        with self._lock:
+            if entity_id in self.doc_ids:
+                self.remove(entity_id)
+
+            doc = self._next_doc
+            self._next_doc += 1
+            self.doc_ids[entity_id] = doc
+            self.entity_ids[doc] = entity_id
+            self.entity_types[doc] = entity_type
+            self.names[doc] = name
+            self._type_codes = _grow(self._type_codes, doc + 1)
+            self._type_codes[doc] = self._type_ids.setdefault(entity_type, len(self._type_ids))
+
+            terms = {}
+            for field, value in (('name', normalize(name)), ('text', normalize(text))):
+                field_words, field_grams = words(value), char_ngrams(value, NGRAM_SIZES[field])
+                self.words[field].add(doc, field_words)
+                self.grams[field].add(doc, field_grams)
+                terms[field] = (field_words, field_grams)
+            self._doc_terms[doc] = terms
+
+            self._pending_names.append((normalize(name), doc))
+            self._pending_words.extend((word, doc) for word in set(terms['name'][0]))
+            for word in set(terms['name'][0]) | set(terms['text'][0]):
+                self._add_vocabulary(word)
+
+    def remove(self, entity_id: str):
+        """删除实体（不存在时忽略）"""
+        with self._lock:
+            doc = self.doc_ids.pop(entity_id, None)
+            if doc is None:
+                return
+            terms = self._doc_terms.pop(doc)
+            for field, (field_words, field_grams) in terms.items():
+                self.words[field].remove(doc, field_words)
+                self.grams[field].remove(doc, field_grams)
+
+            self._stale_keys += 1 + len(set(terms['name'][0]))
+            for word in set(terms['name'][0]) | set(terms['text'][0]):
+                self._remove_vocabulary(word)
+
+            del self.entity_ids[doc], self.entity_types[doc], self.names[doc]
+
+    def optimize(self):
+        """把待合并的补全条目并入有序列表（批量加入后调用，避免第一次补全时排序）"""
+        with self._lock:
+            self._merge_keys()
+
+    def _merge_keys(self):
+        if self._stale_keys > len(self._name_keys) // 4:
+            alive = self.entity_ids
+            self._name_keys = [key for key in self._name_keys if key[1] in alive]
+            self._word_keys = [key for key in self._word_keys if key[1] in alive]
+            self._stale_keys = 0
+        if self._pending_names:
+            self._name_keys.extend(self._pending_names)
+            self._name_keys.sort()
+            self._pending_names = []
+        if self._pending_words:
+            self._word_keys.extend(self._pending_words)
+            self._word_keys.sort()
+            self._pending_words = []
+
+    def _add_vocabulary(self, word: str):
+        self._vocabulary[word] += 1
+        if self._vocabulary[word] == 1 and len(word) > 1:
+            for variant in deletions(word):
+                self._deletes[variant].add(word)
+
+    def _remove_vocabulary(self, word: str):
+        self._vocabulary[word] -= 1
+        if self._vocabulary[word] <= 0:
+            del self._vocabulary[word]
+            for variant in deletions(word) if len(word) > 1 else ():
+                candidates = self._deletes.get(variant)
+                if candidates is not None:
+                    candidates.discard(word)
+                    if not candidates:
+                        del self._deletes[variant]
+
+    def correct(self, word: str) -> Set[str]:
+        """词表中与 word 编辑距离为1的词（替换、增、删一个字符）"""
+        if len(word) < 2:
+            return set()
+        matches = set(self._deletes.get(word, ()))  # word 少打了一个字
+        for variant in deletions(word):
+            if variant in self._vocabulary:  # word 多打了一个字
+                matches.add(variant)
+            matches |= self._deletes.get(variant, set())  # 打错了一个字
+        matches.discard(word)
+        return matches
+
+    def search(self, query: str, limit: int = 20, entity_type: Optional[str] = None) -> List[Tuple[str, float]]:
+        """BM25检索
+
+        Args:
+            query: 查询文本
+            limit: 返回数量
+            entity_type: 只返回该类型的实体
+
+        Returns:
+            [(实体ID, 分数)]，按分数降序
+        """
+        query = normalize(query)
+        if not query:
+            return []
+
+        with self._lock:
+            num_docs = len(self.doc_ids)
+            # (字段, 词, 权重)：分词命中的词，词表中没有的词换成纠错后的词，再加上n-gram
+            jobs, gram_jobs = [], []
+            for word in set(words(query)):
+                if word in self._vocabulary:
+                    jobs.extend((self.words[field], word, WORD_WEIGHT * w) for field, w in FIELD_WEIGHTS.items())
+                else:
+                    for corrected in self.correct(word):
+                        jobs.extend((self.words[field], corrected, WORD_WEIGHT * FUZZY_WEIGHT * w)
+                                    for field, w in FIELD_WEIGHTS.items())
+            for gram in set(char_ngrams(query)):
+                gram_jobs.extend((self.grams[field], gram, GRAM_WEIGHT * w) for field, w in FIELD_WEIGHTS.items())
+
+            # 有区分度更高的n-gram时，跳过出现在大部分文档中的n-gram
+            # （idf很低，对排序几乎没有贡献，却要遍历很长的倒排表）
+            common = max(COMMON_TERM_MIN_DF, int(num_docs * COMMON_TERM_RATIO))
+            df = [field.df(term) for field, term, _ in gram_jobs]
+            if any(0 < d <= common for d in df):
+                gram_jobs = [job for job, d in zip(gram_jobs, df) if d <= common]
+            jobs.extend(gram_jobs)
+
+            scores = np.zeros(self._next_doc, dtype=np.float64)
+            for field, term, weight in jobs:
+                field.score(term, weight, scores, num_docs)
+
+            if entity_type:
+                code = self._type_ids.get(entity_type)
+                if code is None:
+                    return []
+                scores[self._type_codes[:self._next_doc] != code] = 0
+            candidates = np.flatnonzero(scores > 0)
+            if len(candidates) > limit:
+                candidates = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+            # 分数降序，同分按加入顺序
+            candidates = candidates[np.lexsort((candidates, -scores[candidates]))]
+            return [(self.entity_ids[int(doc)], float(scores[doc])) for doc in candidates]
+
+    def suggest(self, prefix: str, limit: int = 10, entity_type: Optional[str] = None) -> List[str]:
+        """前缀补全：先返回名称以 prefix 开头的实体（名称短的在前），再返回名称中有词以 prefix 开头的实体
+
+        Returns:
+            实体ID列表
+        """
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+
+        with self._lock:
+            self._merge_keys()
+            alive = self.entity_ids
+            results: List[int] = []
+            seen = set()
+            for keys in (self._name_keys, self._word_keys):
+                matched = []
+                i = bisect_left(keys, (prefix, -1))
+                # 前缀很短时匹配项可能很多，只在前 limit*SUGGEST_SCAN 个中按名称长度排序
+                while i < len(keys) and keys[i][0].startswith(prefix) and len(matched) < limit * SUGGEST_SCAN:
+                    doc = keys[i][1]
+                    if doc in alive and doc not in seen and (not entity_type or self.entity_types[doc] == entity_type):
+                        matched.append(doc)
+                        seen.add(doc)
+                    i += 1
+                matched.sort(key=lambda doc: (len(self.names[doc]), doc))
+                results.extend(matched)
+                if len(results) >= limit:
+                    break
+            return [self.entity_ids[doc] for doc in results[:limit]]
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+三元组存储
+
+实体与谓词统一映射为整数ID，维护 SPO / POS / OSP 三组索引，
+任意位置已知的三元组模式都只需访问相关实体的邻接集合（O(度)），
+重复添加的三元组会被合并，统计信息随增删同步更新；
+并行构建时各子进程用 TriplePartition 建好按全局ID编码的部分索引，由主进程整块并入
+"""
+
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+Triple = Tuple[int, int, int]
+
+
+class TripleStore:
+    """带索引的三元组存储"""
+
+    def __init__(self):
+        # 字符串 <-> 整数ID
+        self._terms: List[str] = []
+        self._term_ids: Dict[str, int] = {}
+
+        # 三元组 -> 关系属性，dict保持插入顺序
+        self._triples: Dict[Triple, Dict] = {}
+
+        # 三组索引：第一项 -> 第二项 -> 第三项集合
+        self._spo: Dict[int, Dict[int, Set[int]]] = {}
+        self._pos: Dict[int, Dict[int, Set[int]]] = {}
+        self._osp: Dict[int, Dict[int, Set[int]]] = {}
+
+        # 谓词使用次数，用于增量统计
+        self._predicate_counts: Counter = Counter()
+
+    def __len__(self) -> int:
+        return len(self._triples)
+
+    def __contains__(self, triple: Tuple[str, str, str]) -> bool:
+        ids = self._lookup(*triple)
+        return ids is not None and ids in self._triples
+
+    @property
+    def num_terms(self) -> int:
+        """词表中的词数（含已不再被任何三元组使用的词）"""
+        return len(self._terms)
+
+    @property
+    def num_predicates(self) -> int:
+        """当前使用中的谓词数量"""
+        return len(self._predicate_counts)
+
+    def predicate_counts(self) -> Dict[str, int]:
+        """各谓词的三元组数量"""
+        return {self._terms[p]: n for p, n in self._predicate_counts.items()}
+
+    def degree(self, entity: str) -> int:
+        """实体作为主语或宾语的三元组数量"""
+        term = self._term_ids.get(entity)
+        if term is None:
+            return 0
+        return (sum(len(o) for o in self._spo.get(term, {}).values())
+                + sum(len(p) for p in self._osp.get(term, {}).values()))
+
+    def add(self, subject: str, predicate: str, object: str, properties: Optional[Dict] = None) -> bool:
+        """添加三元组
+
+        Args:
+            subject: 主语
+            predicate: 谓词
+            object: 宾语
+            properties: 关系属性，三元组已存在时合并到原有属性
+
+        Returns:
+            是否为新三元组
+        """
+        key = (self._intern(subject), self._intern(predicate), self._intern(object))
+        existing = self._triples.get(key)
+        if existing is not None:
+            if properties:
+                existing.update(properties)
+            return False
+
+        s, p, o = key
+        self._triples[key] = dict(properties or {})
+        self._spo.setdefault(s, {}).setdefault(p, set()).add(o)
+        self._pos.setdefault(p, {}).setdefault(o, set()).add(s)
+        self._osp.setdefault(o, {}).setdefault(s, set()).add(p)
+        self._predicate_counts[p] += 1
+        return True
+
+    def intern_terms(self, terms: Iterable[str]) -> Dict[str, int]:
+        """登记一批词（如并行构建前各分片共用的谓词与宾语），返回 {词: ID}"""
+        return {term: self._intern(term) for term in terms}
+
+    def merge_partition(self, partition: 'TriplePartition') -> int:
+        """并入子进程建好的分片，结果同逐条 add
+
+        分片的私有词须紧接在当前词表之后编号（first_id 等于词表长度）；
+        三元组与各级索引在两边的键不相交时直接 dict.update，相交处取集合并集
+
+        Returns:
+            新增的三元组数
+
+        Raises:
+            ValueError: 分片的私有词ID与当前词表不衔接
+        """
+        if partition.first_id != len(self._terms):
+            raise ValueError(f"分片的私有词从 {partition.first_id} 起编号，而词表长度为 {len(self._terms)}")
+        self._terms.extend(partition.terms)
+        self._term_ids.update(partition.private_ids)
+
+        if self._triples.keys().isdisjoint(partition.triples):
+            self._triples.update(partition.triples)
+            self._predicate_counts.update(partition.predicate_counts)
+            added = len(partition.triples)
+        else:
+            added = 0
+            for key, properties in partition.triples.items():
+                existing = self._triples.get(key)
+                if existing is not None:
+                    existing.update(properties)
+                    continue
+                self._triples[key] = properties
+                self._predicate_counts[key[1]] += 1
+                added += 1
+
+        self._union_index(self._spo, partition.spo)
+        self._union_index(self._pos, partition.pos)
+        self._union_index(self._osp, partition.osp)
+        return added
+
+    def remove(self, subject: str, predicate: str, object: str) -> bool:
+        """删除三元组，返回是否存在"""
+        key = self._lookup(subject, predicate, object)
+        if key is None or key not in self._triples:
+            return False
+
+        s, p, o = key
+        del self._triples[key]
+        self._discard(self._spo, s, p, o)
+        self._discard(self._pos, p, o, s)
+        self._discard(self._osp, o, s, p)
+        self._predicate_counts[p] -= 1
+        if not self._predicate_counts[p]:
+            del self._predicate_counts[p]
+        return True
+
+    def get_properties(self, subject: str, predicate: str, object: str) -> Optional[Dict]:
+        """获取关系属性，三元组不存在时返回None"""
+        key = self._lookup(subject, predicate, object)
+        return None if key is None else self._triples.get(key)
+
+    def match(self, subject: Optional[str] = None, predicate: Optional[str] = None,
+              object: Optional[str] = None) -> Iterator[Tuple[str, str, str, Dict]]:
+        """按模式匹配三元组，None表示任意
+
+        Yields:
+            (subject, predicate, object, properties)
+        """
+        terms = self._terms
+        for key in self._match_ids(subject, predicate, object):
+            yield terms[key[0]], terms[key[1]], terms[key[2]], self._triples[key]
+
+    def count(self, subject: Optional[str] = None, predicate: Optional[str] = None,
+              object: Optional[str] = None) -> int:
+        """统计匹配模式的三元组数量"""
+        if subject is None and object is None:
+            if predicate is None:
+                return len(self._triples)
+            p = self._term_ids.get(predicate)
+            return self._predicate_counts.get(p, 0) if p is not None else 0
+        return sum(1 for _ in self._match_ids(subject, predicate, object))
+
+    def relations(self, subject: Optional[str] = None, predicate: Optional[str] = None,
+                  object: Optional[str] = None) -> List[Dict]:
+        """以关系字典列表返回匹配的三元组（与JSON导出格式一致）"""
+        return [
+            {'subject': s, 'predicate': p, 'object': o, 'properties': props}
+            for s, p, o, props in self.match(subject, predicate, object)
+        ]
+
+    def relations_by_subject(self, subject: str) -> List[Dict]:
+        """主语为指定实体的所有关系"""
+        return self.relations(subject=subject)
+
+    def relations_by_predicate(self, predicate: str) -> List[Dict]:
+        """指定谓词的所有关系"""
+        return self.relations(predicate=predicate)
+
+    def relations_by_object(self, object: str) -> List[Dict]:
+        """宾语为指定实体的所有关系"""
+        return self.relations(object=object)
+
+    def _intern(self, term: str) -> int:
+        term_id = self._term_ids.get(term)
+        if term_id is None:
+            term_id = len(self._terms)
+            self._terms.append(term)
+            self._term_ids[term] = term_id
+        return term_id
+
+    def _lookup(self, subject: str, predicate: str, object: str) -> Optional[Triple]:
+        ids = (self._term_ids.get(subject), self._term_ids.get(predicate), self._term_ids.get(object))
+        return None if None in ids else ids
+
+    @staticmethod
+    def _union_index(index: Dict[int, Dict[int, Set[int]]], partial: Dict[int, Dict[int, Set[int]]]):
+        """把分片的部分索引并入（直接接管分片的dict与集合，不再复制）"""
+        if index.keys().isdisjoint(partial):
+            index.update(partial)
+            return
+        for a, seconds in partial.items():
+            target = index.get(a)
+            if target is None:
+                index[a] = seconds
+            elif target.keys().isdisjoint(seconds):
+                target.update(seconds)
+            else:
+                for b, thirds in seconds.items():
+                    existing = target.get(b)
+                    if existing is None:
+                        target[b] = thirds
+                    else:
+                        existing |= thirds
+
+    @staticmethod
+    def _discard(index: Dict[int, Dict[int, Set[int]]], a: int, b: int, c: int):
+        """从索引中删除一项，并清理空集合"""
+        second = index[a]
+        second[b].discard(c)
+        if not second[b]:
+            del second[b]
+            if not second:
+                del index[a]
+
+    def _match_ids(self, subject: Optional[str], predicate: Optional[str],
+                   object: Optional[str]) -> Iterator[Triple]:
+        """选择合适的索引枚举匹配的三元组ID"""
+        ids = []
+        for term in (subject, predicate, object):
+            if term is None:
+                ids.append(None)
+                continue
+            term_id = self._term_ids.get(term)
+            if term_id is None:
+                return
+            ids.append(term_id)
+        s, p, o = ids
+
+        if s is not None:
+            by_predicate = self._spo.get(s, {})
+            if p is not None:
+                objects = by_predicate.get(p, ())
+                if o is not None:
+                    if o in objects:
+                        yield s, p, o
+                    return
+                for obj in objects:
+                    yield s, p, obj
+            elif o is not None:
+                for pred in self._osp.get(o, {}).get(s, ()):
+                    yield s, pred, o
+            else:
+                for pred, objects in by_predicate.items():
+                    for obj in objects:
+                        yield s, pred, obj
+        elif p is not None:
+            by_object = self._pos.get(p, {})
+            if o is not None:
+                for subj in by_object.get(o, ()):
+                    yield subj, p, o
+            else:
+                for obj, subjects in by_object.items():
+                    for subj in subjects:
+                        yield subj, p, obj
+        elif o is not None:
+            for subj, predicates in self._osp.get(o, {}).items():
+                for pred in predicates:
+                    yield subj, pred, o
+        else:
+            yield from self._triples
+
+
+class TriplePartition:
+    """三元组存储的一个分片，在子进程中按全局ID编码三元组并建立部分索引
+
+    shared_ids 中的词（主进程预先登记的谓词、宾语等）使用其全局ID，
+    其余为分片私有的词（如按主语分片时的主语），从 first_id 起连续编号；
+    主进程按 first_id 顺序调用 TripleStore.merge_partition 并入
+    """
+
+    def __init__(self, shared_ids: Dict[str, int], first_id: int):
+        self.shared_ids = shared_ids
+        self.first_id = first_id
+        self.terms: List[str] = []
+        self.private_ids: Dict[str, int] = {}
+
+        self.triples: Dict[Triple, Dict] = {}
+        self.spo: Dict[int, Dict[int, Set[int]]] = {}
+        self.pos: Dict[int, Dict[int, Set[int]]] = {}
+        self.osp: Dict[int, Dict[int, Set[int]]] = {}
+        self.predicate_counts: Counter = Counter()
+
+    def __len__(self) -> int:
+        return len(self.triples)
+
+    def intern(self, term: str) -> int:
+        """词的全局ID，私有词首次出现时分配下一个ID"""
+        term_id = self.shared_ids.get(term)
+        if term_id is None:
+            term_id = self.private_ids.get(term)
+            if term_id is None:
+                term_id = self.first_id + len(self.terms)
+                self.terms.append(term)
+                self.private_ids[term] = term_id
+        return term_id
+
+    def add(self, subject: str, predicate: str, object: str, properties: Optional[Dict] = None) -> bool:
+        """添加三元组（语义同 TripleStore.add），返回是否为新三元组"""
+        key = (self.intern(subject), self.intern(predicate), self.intern(object))
+        existing = self.triples.get(key)
+        if existing is not None:
+            if properties:
+                existing.update(properties)
+            return False
+
+        s, p, o = key
+        self.triples[key] = dict(properties or {})
+        self.spo.setdefault(s, {}).setdefault(p, set()).add(o)
+        self.pos.setdefault(p, {}).setdefault(o, set()).add(s)
+        self.osp.setdefault(o, {}).setdefault(s, set()).add(p)
+        self.predicate_counts[p] += 1
+        return True
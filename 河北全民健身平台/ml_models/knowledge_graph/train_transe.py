@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+在FPS知识图谱上训练TransE并发布
+从 fps_knowledge_graph.json 逐条流式读取关系三元组（不整体载入关系列表），
+编码为int32数组后用向量化训练器训练，评估后以新版本发布到模型目录
+"""
+import argparse
+import sys
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+# 以脚本方式运行时也能导入项目内模块
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+from knowledge_graph.relation_table import iter_kg_items
+from ml_models.knowledge_graph.transe_model import TransE
+from ml_models.model_artifact import new_version_path
+
+MODEL_NAME = 'transe'
+
+
+def iter_kg_triples(kg_file: str, labels: Optional[Dict[str, str]] = None,
+                    chunk_size: int = 1 << 16) -> Iterator[Tuple[str, str, str]]:
+    """流式读取知识图谱导出文件中的 (subject, predicate, object) 三元组
+
+    Args:
+        kg_file: FPSKnowledgeGraph.export_to_json 导出的文件
+        labels: 传入字典时顺带收集 实体ID -> 名称
+        chunk_size: 每次读取的字符数
+    """
+    for key, value in iter_kg_items(kg_file, chunk_size):
+        if key == 'relation':
+            yield value['subject'], value['predicate'], value['object']
+        elif key == 'entities' and labels is not None:
+            for entities in value.values():
+                for entity_id, props in entities.items():
+                    labels[entity_id] = props.get('name', entity_id)
+
+
+def load_triples(kg_file: str) -> Tuple[np.ndarray, list, list, Dict[str, str]]:
+    """读取三元组并编码
+
+    Returns:
+        (int32三元组数组, 实体列表, 关系列表, 实体名称)
+    """
+    entity2id: Dict[str, int] = {}
+    relation2id: Dict[str, int] = {}
+    labels: Dict[str, str] = {}
+    encoded = []
+    for h, r, t in iter_kg_triples(kg_file, labels):
+        encoded.append((
+            entity2id.setdefault(h, len(entity2id)),
+            relation2id.setdefault(r, len(relation2id)),
+            entity2id.setdefault(t, len(entity2id))
+        ))
+
+    triples = np.unique(np.array(encoded, dtype=np.int32).reshape(-1, 3), axis=0)
+    logger.info(f"读取 {len(triples)} 个三元组: {len(entity2id)}个实体, {len(relation2id)}个关系")
+    return triples, list(entity2id), list(relation2id), labels
+
+
+def train_and_publish(kg_file: str, model_dir: str, dim: int = 50, epochs: int = 200,
+                      batch_size: int = 128, learning_rate: float = 0.01, margin: float = 1.0,
+                      test_ratio: float = 0.1, seed: int = 42) -> Path:
+    """训练TransE并发布
+
+    Returns:
+        发布路径
+    """
+    triples, entities, relations, labels = load_triples(kg_file)
+
+    model = TransE(entity_dim=dim, relation_dim=dim, learning_rate=learning_rate, margin=margin, seed=seed)
+    model.initialize_embeddings(entities, relations)
+
+    # 留出部分三元组评估链接预测效果
+    order = model.rng.permutation(len(triples))
+    num_test = int(len(triples) * test_ratio)
+    train_triples, test_triples = triples[order[num_test:]], triples[order[:num_test]]
+
+    model.train(train_triples, epochs=epochs, batch_size=batch_size)
+    if num_test:
+        model.evaluate(test_triples, known_triples=triples)
+
+    model.entity_labels = {e: labels[e] for e in entities if e in labels}
+    model.known_triples = triples
+
+    path = new_version_path(model_dir, MODEL_NAME)
+    model.save(str(path))
+    return path
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="在FPS知识图谱上训练TransE")
+    parser.add_argument('--kg-file', default='fps_knowledge_graph.json', help='知识图谱JSON文件')
+    parser.add_argument('--model-dir', default='ml_models/saved_models', help='模型发布目录')
+    parser.add_argument('--dim', type=int, default=50, help='嵌入维度')
+    parser.add_argument('--epochs', type=int, default=200, help='训练轮数')
+    parser.add_argument('--batch-size', type=int, default=128, help='批次大小')
+    parser.add_argument('--test-ratio', type=float, default=0.1, help='留作评估的三元组比例')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子')
+    args = parser.parse_args()
+
+    logger.info("=" * 60)
+    logger.info("训练知识图谱嵌入 (TransE)")
+    logger.info("=" * 60)
+
+    path = train_and_publish(args.kg_file, args.model_dir, dim=args.dim, epochs=args.epochs,
+                             batch_size=args.batch_size, test_ratio=args.test_ratio, seed=args.seed)
+
+    logger.info(f"✅ TransE模型已发布: {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,16 +3,25 @@ TransE知识图谱补全模型
 Translation-based Embedding for Knowledge Graph Completion
 """
 import numpy as np
-from typing import List, Tuple, Dict
+from typing import List, Tuple, Dict, Optional, Union
 import json
+import sys
+from pathlib import Path
 from loguru import logger
 
+# 以脚本方式运行时也能导入项目内模块
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+from ml_models.model_artifact import save_artifact, load_artifact, is_artifact
+
 
 class TransE:
     """TransE模型实现"""
     
     def __init__(self, entity_dim: int = 50, relation_dim: int = 50, 
-                 learning_rate: float = 0.01, margin: float = 1.0):
+                 learning_rate: float = 0.01, margin: float = 1.0, seed: Optional[int] = None):
         """
         初始化TransE模型
         
@@ -21,11 +30,13 @@ class TransE:
             relation_dim: 关系向量维度
             learning_rate: 学习率
             margin: margin-based ranking loss的margin值
+            seed: 随机种子，固定后初始化与负采样结果可复现
         """
         self.entity_dim = entity_dim
         self.relation_dim = relation_dim
         self.learning_rate = learning_rate
         self.margin = margin
+        self.rng = np.random.default_rng(seed)
         
         self.entity_embeddings = {}
         self.relation_embeddings = {}
@@ -33,6 +44,9 @@ class TransE:
         self.relation2id = {}
         self.id2entity = {}
         self.id2relation = {}
+        # 可选：实体显示名称与训练用的已知三元组（补全时排除已知事实）
+        self.entity_labels: Dict[str, str] = {}
+        self.known_triples: Optional[np.ndarray] = None
         
         logger.info(f"初始化TransE模型: entity_dim={entity_dim}, relation_dim={relation_dim}")
     
@@ -51,17 +65,17 @@ class TransE:
         num_entities = len(entities)
         num_relations = len(relations)
         
-        self.entity_embeddings = np.random.uniform(
+        self.entity_embeddings = self.rng.uniform(
             -6/np.sqrt(self.entity_dim), 
             6/np.sqrt(self.entity_dim),
             (num_entities, self.entity_dim)
-        )
+        ).astype(np.float32)
         
-        self.relation_embeddings = np.random.uniform(
+        self.relation_embeddings = self.rng.uniform(
             -6/np.sqrt(self.relation_dim),
             6/np.sqrt(self.relation_dim),
             (num_relations, self.relation_dim)
-        )
+        ).astype(np.float32)
         
         # L2归一化
         self.entity_embeddings = self._normalize(self.entity_embeddings)
@@ -78,86 +92,150 @@ class TransE:
         """计算距离: ||h + r - t||"""
         return np.linalg.norm(h + r - t)
     
-    def train(self, triples: List[Tuple[str, str, str]], epochs: int = 100, batch_size: int = 128):
+    def encode_triples(self, triples: List[Tuple[str, str, str]]) -> np.ndarray:
+        """把字符串三元组编码为 (n, 3) 的int32数组，未知的实体或关系会被跳过"""
+        encoded = np.empty((len(triples), 3), dtype=np.int32)
+        n = 0
+        for h, r, t in triples:
+            h_id = self.entity2id.get(h)
+            r_id = self.relation2id.get(r)
+            t_id = self.entity2id.get(t)
+            if h_id is None or r_id is None or t_id is None:
+                continue
+            encoded[n] = (h_id, r_id, t_id)
+            n += 1
+        
+        if n < len(triples):
+            logger.warning(f"跳过{len(triples) - n}个包含未知实体或关系的三元组")
+        return encoded[:n]
+    
+    def train(self, triples: Union[List[Tuple[str, str, str]], np.ndarray],
+              epochs: int = 100, batch_size: int = 128) -> List[float]:
         """
         训练TransE模型
         
         Args:
-            triples: 三元组列表 [(head, relation, tail), ...]
+            triples: 三元组列表 [(head, relation, tail), ...]，或 encode_triples 得到的ID数组
             epochs: 训练轮数
             batch_size: 批次大小
+        
+        Returns:
+            每轮的平均损失
         """
+        if not isinstance(triples, np.ndarray):
+            triples = self.encode_triples(triples)
+        triples = np.asarray(triples, dtype=np.int32)
+        if len(triples) == 0:
+            logger.warning("没有可训练的三元组")
+            return []
+        
+        # 加载的模型可能是只读内存映射，训练前转为可写的float32数组
+        self.entity_embeddings = np.array(self.entity_embeddings, dtype=np.float32)
+        self.relation_embeddings = np.array(self.relation_embeddings, dtype=np.float32)
+        
         logger.info(f"开始训练: {len(triples)}个三元组, {epochs}轮")
         
+        history = []
         for epoch in range(epochs):
-            np.random.shuffle(triples)
-            total_loss = 0
+            order = self.rng.permutation(len(triples))
+            total_loss = 0.0
             
             for i in range(0, len(triples), batch_size):
-                batch = triples[i:i+batch_size]
-                loss = self._train_batch(batch)
-                total_loss += loss
+                total_loss += self._train_batch(triples[order[i:i+batch_size]])
             
+            avg_loss = total_loss / len(triples)
+            history.append(avg_loss)
             if (epoch + 1) % 10 == 0:
-                avg_loss = total_loss / len(triples)
                 logger.info(f"Epoch {epoch+1}/{epochs}, Loss: {avg_loss:.4f}")
         
         logger.info("训练完成")
+        return history
     
-    def _train_batch(self, batch: List[Tuple[str, str, str]]) -> float:
-        """训练一个批次"""
-        batch_loss = 0
-        
-        for (h, r, t) in batch:
-            # 获取正样本的嵌入
-            h_id = self.entity2id[h]
-            r_id = self.relation2id[r]
-            t_id = self.entity2id[t]
-            
-            h_emb = self.entity_embeddings[h_id]
-            r_emb = self.relation_embeddings[r_id]
-            t_emb = self.entity_embeddings[t_id]
-            
-            # 生成负样本（替换头实体或尾实体）
-            if np.random.random() < 0.5:
-                # 替换头实体
-                neg_h_id = np.random.randint(0, len(self.entity2id))
-                neg_h_emb = self.entity_embeddings[neg_h_id]
-                neg_t_emb = t_emb
-            else:
-                # 替换尾实体
-                neg_h_emb = h_emb
-                neg_t_id = np.random.randint(0, len(self.entity2id))
-                neg_t_emb = self.entity_embeddings[neg_t_id]
-            
-            # 计算距离
-            pos_distance = self._distance(h_emb, r_emb, t_emb)
-            neg_distance = self._distance(neg_h_emb, r_emb, neg_t_emb)
-            
-            # Margin-based ranking loss
-            loss = max(0, self.margin + pos_distance - neg_distance)
-            batch_loss += loss
-            
-            if loss > 0:
-                # 更新梯度
-                grad_pos = 2 * (h_emb + r_emb - t_emb)
-                grad_neg = 2 * (neg_h_emb + r_emb - neg_t_emb)
-                
-                # 更新嵌入
-                self.entity_embeddings[h_id] -= self.learning_rate * grad_pos
-                self.relation_embeddings[r_id] -= self.learning_rate * grad_pos
-                self.entity_embeddings[t_id] += self.learning_rate * grad_pos
-                
-                if np.random.random() < 0.5:
-                    self.entity_embeddings[neg_h_id] += self.learning_rate * grad_neg
-                else:
-                    self.entity_embeddings[neg_t_id] -= self.learning_rate * grad_neg
-                
-                # 重新归一化
-                self.entity_embeddings = self._normalize(self.entity_embeddings)
-                self.relation_embeddings = self._normalize(self.relation_embeddings)
-        
-        return batch_loss
+    def _train_batch(self, batch: np.ndarray) -> float:
+        """训练一个批次
+        
+        Args:
+            batch: (n, 3) 的三元组ID数组
+        """
+        h, r, t = batch[:, 0], batch[:, 1], batch[:, 2]
+        n = len(batch)
+        
+        # 整批生成负样本：一半替换头实体，一半替换尾实体
+        corrupt = self.rng.integers(0, len(self.entity_embeddings), n, dtype=np.int32)
+        replace_head = self.rng.random(n) < 0.5
+        neg_h = np.where(replace_head, corrupt, h)
+        neg_t = np.where(replace_head, t, corrupt)
+        
+        ent, rel = self.entity_embeddings, self.relation_embeddings
+        pos_diff = ent[h] + rel[r] - ent[t]
+        neg_diff = ent[neg_h] + rel[r] - ent[neg_t]
+        pos_distance = np.linalg.norm(pos_diff, axis=1)
+        neg_distance = np.linalg.norm(neg_diff, axis=1)
+        
+        # Margin-based ranking loss
+        loss = np.maximum(0, self.margin + pos_distance - neg_distance)
+        active = loss > 0
+        if not np.any(active):
+            return 0.0
+        
+        # ||h + r - t|| 对 (h + r - t) 的梯度为单位方向向量
+        grad_pos = pos_diff[active] / (pos_distance[active, None] + 1e-10)
+        grad_neg = neg_diff[active] / (neg_distance[active, None] + 1e-10)
+        lr = self.learning_rate
+        
+        # 同一实体在批次内出现多次时用np.add.at累加更新
+        np.add.at(ent, h[active], -lr * grad_pos)
+        np.add.at(ent, t[active], lr * grad_pos)
+        np.add.at(ent, neg_h[active], lr * grad_neg)
+        np.add.at(ent, neg_t[active], -lr * grad_neg)
+        np.add.at(rel, r[active], -lr * (grad_pos - grad_neg))
+        
+        # 只重新归一化本批次更新过的行
+        touched = np.unique(np.concatenate([h[active], t[active], neg_h[active], neg_t[active]]))
+        ent[touched] = self._normalize(ent[touched])
+        touched_rel = np.unique(r[active])
+        rel[touched_rel] = self._normalize(rel[touched_rel])
+        
+        return float(loss.sum())
+    
+    def _query_distances(self, queries: np.ndarray, candidate_ids: Optional[np.ndarray] = None) -> np.ndarray:
+        """计算一批查询向量到全部（或候选）实体的距离 ||q - e||，返回 (查询数, 实体数)"""
+        ent = self.entity_embeddings if candidate_ids is None else self.entity_embeddings[candidate_ids]
+        ent = np.asarray(ent, dtype=np.float32)
+        queries = np.asarray(queries, dtype=np.float32)
+        # ||q - e||^2 = ||q||^2 + ||e||^2 - 2 q·e，一次矩阵乘法代替逐实体计算
+        sq = (np.einsum('ij,ij->i', queries, queries)[:, None]
+              + np.einsum('ij,ij->i', ent, ent)[None, :]
+              - 2 * queries @ ent.T)
+        return np.sqrt(np.maximum(sq, 0))
+    
+    @staticmethod
+    def _top_k(distances: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """按距离取每行最近的top_k个实体，返回 (实体ID, 负距离分数)"""
+        k = min(top_k, distances.shape[1])
+        if k <= 0:
+            empty = np.empty((len(distances), 0))
+            return empty.astype(np.int64), empty
+        top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        top_distances = np.take_along_axis(distances, top, axis=1)
+        order = np.argsort(top_distances, axis=1)
+        return np.take_along_axis(top, order, axis=1), -np.take_along_axis(top_distances, order, axis=1)
+    
+    def predict_tails_batch(self, head_ids: np.ndarray, relation_ids: np.ndarray,
+                            top_k: int = 10) -> Tuple[np.ndarray, np.ndarray]:
+        """批量预测尾实体 (h, r, ?)
+        
+        Returns:
+            (实体ID数组, 分数数组)，形状均为 (查询数, top_k)，分数为负距离
+        """
+        queries = self.entity_embeddings[head_ids] + self.relation_embeddings[relation_ids]
+        return self._top_k(self._query_distances(queries), top_k)
+    
+    def predict_heads_batch(self, relation_ids: np.ndarray, tail_ids: np.ndarray,
+                            top_k: int = 10) -> Tuple[np.ndarray, np.ndarray]:
+        """批量预测头实体 (?, r, t)"""
+        queries = self.entity_embeddings[tail_ids] - self.relation_embeddings[relation_ids]
+        return self._top_k(self._query_distances(queries), top_k)
     
     def predict(self, head: str, relation: str, top_k: int = 10) -> List[Tuple[str, float]]:
         """
@@ -177,44 +255,220 @@ class TransE:
         if h_id is None or r_id is None:
             return []
         
-        h_emb = self.entity_embeddings[h_id]
-        r_emb = self.relation_embeddings[r_id]
+        ids, scores = self.predict_tails_batch(np.array([h_id]), np.array([r_id]), top_k)
+        return [(self.id2entity[int(i)], float(score)) for i, score in zip(ids[0], scores[0])]
+    
+    def predict_head(self, relation: str, tail: str, top_k: int = 10) -> List[Tuple[str, float]]:
+        """预测头实体，返回 [(entity, score), ...]"""
+        r_id = self.relation2id.get(relation)
+        t_id = self.entity2id.get(tail)
         
-        # 计算与所有实体的距离
-        scores = []
-        for t_id, t_name in self.id2entity.items():
-            t_emb = self.entity_embeddings[t_id]
-            distance = self._distance(h_emb, r_emb, t_emb)
-            scores.append((t_name, -distance))  # 负距离作为分数
+        if r_id is None or t_id is None:
+            return []
         
-        # 排序并返回top-k
-        scores.sort(key=lambda x: x[1], reverse=True)
-        return scores[:top_k]
+        ids, scores = self.predict_heads_batch(np.array([r_id]), np.array([t_id]), top_k)
+        return [(self.id2entity[int(i)], float(score)) for i, score in zip(ids[0], scores[0])]
     
-    def save(self, filepath: str):
-        """保存模型"""
-        model_data = {
-            'entity_embeddings': self.entity_embeddings.tolist(),
-            'relation_embeddings': self.relation_embeddings.tolist(),
-            'entity2id': self.entity2id,
-            'relation2id': self.relation2id,
-            'id2entity': self.id2entity,
-            'id2relation': self.id2relation,
-            'config': {
-                'entity_dim': self.entity_dim,
-                'relation_dim': self.relation_dim,
-                'learning_rate': self.learning_rate,
-                'margin': self.margin
-            }
+    def complete_tails(self, head: str, relation: str, candidates: Optional[List[str]] = None,
+                       top_k: int = 10, exclude_known: bool = True) -> List[Tuple[str, float]]:
+        """
+        补全 (head, relation, ?)：在候选实体中找最可能的尾实体
+        
+        Args:
+            head: 头实体
+            relation: 关系
+            candidates: 候选尾实体，默认全部实体
+            top_k: 返回数量
+            exclude_known: 是否排除训练数据中已存在的三元组
+        
+        Returns:
+            [(entity, score), ...] 按分数排序
+        """
+        h_id = self.entity2id.get(head)
+        r_id = self.relation2id.get(relation)
+        if h_id is None or r_id is None:
+            return []
+        
+        if candidates is None:
+            candidate_ids = np.arange(len(self.entity_embeddings))
+        else:
+            candidate_ids = np.array([self.entity2id[c] for c in candidates if c in self.entity2id], dtype=np.int64)
+        if exclude_known and self.known_triples is not None and len(self.known_triples):
+            known = self.known_triples
+            known_tails = known[(known[:, 0] == h_id) & (known[:, 1] == r_id), 2]
+            candidate_ids = candidate_ids[~np.isin(candidate_ids, known_tails)]
+        if len(candidate_ids) == 0:
+            return []
+        
+        query = (self.entity_embeddings[h_id] + self.relation_embeddings[r_id])[None, :]
+        top, scores = self._top_k(self._query_distances(query, candidate_ids), top_k)
+        return [(self.id2entity[int(candidate_ids[i])], float(score)) for i, score in zip(top[0], scores[0])]
+    
+    def evaluate(self, test_triples: Union[List[Tuple[str, str, str]], np.ndarray],
+                 known_triples: Optional[Union[List[Tuple[str, str, str]], np.ndarray]] = None,
+                 hits_at: Tuple[int, ...] = (1, 3, 10), chunk_size: int = 512) -> Dict[str, float]:
+        """
+        链接预测评估（filtered设置）
+        
+        对每个测试三元组分别替换头、尾实体，在全部实体上排序；
+        排序时排除已知为真的其他三元组，只与真正的负例比较
+        
+        Args:
+            test_triples: 测试三元组
+            known_triples: 全部已知三元组（训练+验证+测试），默认只用测试集过滤
+            hits_at: 统计Hits@k的k值
+            chunk_size: 每次参与矩阵运算的查询数
+        
+        Returns:
+            {'mr': ..., 'mrr': ..., 'hits@1': ..., 'num_triples': ...}
+        """
+        if not isinstance(test_triples, np.ndarray):
+            test_triples = self.encode_triples(test_triples)
+        if known_triples is None:
+            known_triples = test_triples
+        elif not isinstance(known_triples, np.ndarray):
+            known_triples = self.encode_triples(known_triples)
+        test_triples = np.asarray(test_triples, dtype=np.int64)
+        known_triples = np.asarray(known_triples, dtype=np.int64)
+        
+        if len(test_triples) == 0:
+            return {'mr': 0.0, 'mrr': 0.0, **{f'hits@{k}': 0.0 for k in hits_at}, 'num_triples': 0}
+        
+        h, r, t = test_triples[:, 0], test_triples[:, 1], test_triples[:, 2]
+        tail_ranks = self._filtered_ranks(
+            self.entity_embeddings[h] + self.relation_embeddings[r], h, r, t,
+            known_triples[:, 0], known_triples[:, 1], known_triples[:, 2], chunk_size
+        )
+        head_ranks = self._filtered_ranks(
+            self.entity_embeddings[t] - self.relation_embeddings[r], t, r, h,
+            known_triples[:, 2], known_triples[:, 1], known_triples[:, 0], chunk_size
+        )
+        ranks = np.concatenate([tail_ranks, head_ranks]).astype(np.float64)
+        
+        metrics = {
+            'mr': float(ranks.mean()),
+            'mrr': float((1.0 / ranks).mean())
         }
+        for k in hits_at:
+            metrics[f'hits@{k}'] = float((ranks <= k).mean())
+        metrics['num_triples'] = int(len(test_triples))
+        
+        logger.info(f"评估完成: {len(test_triples)}个三元组, MRR={metrics['mrr']:.4f}, "
+                    + ", ".join(f"Hits@{k}={metrics[f'hits@{k}']:.4f}" for k in hits_at))
+        return metrics
+    
+    def _filtered_ranks(self, queries: np.ndarray, anchors: np.ndarray, relations: np.ndarray,
+                        targets: np.ndarray, known_anchors: np.ndarray, known_relations: np.ndarray,
+                        known_targets: np.ndarray, chunk_size: int) -> np.ndarray:
+        """计算每个查询中正确实体的filtered排名（从1开始）
+        
+        已知三元组按 (锚点实体, 关系) 排序，每个查询要排除的实体是其中一段连续区间，
+        用searchsorted一次找出整批查询的区间
+        """
+        num_relations = len(self.relation_embeddings)
+        known_keys = known_anchors * num_relations + known_relations
+        order = np.argsort(known_keys, kind='stable')
+        known_keys = known_keys[order]
+        known_targets = known_targets[order]
+        
+        ranks = np.empty(len(queries), dtype=np.int64)
+        for start in range(0, len(queries), chunk_size):
+            end = min(start + chunk_size, len(queries))
+            distances = self._query_distances(queries[start:end])
+            rows = np.arange(end - start)
+            true_distances = distances[rows, targets[start:end]]
+            
+            keys = anchors[start:end] * num_relations + relations[start:end]
+            lo = np.searchsorted(known_keys, keys, side='left')
+            hi = np.searchsorted(known_keys, keys, side='right')
+            counts = hi - lo
+            if counts.sum() > 0:
+                filter_rows = np.repeat(rows, counts)
+                positions = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+                filter_cols = known_targets[np.repeat(lo, counts) + positions]
+                distances[filter_rows, filter_cols] = np.inf
+            
+            ranks[start:end] = 1 + (distances < true_distances[:, None]).sum(axis=1)
+        return ranks
+    
+    def save(self, filepath: str):
+        """保存模型
         
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(model_data, f, ensure_ascii=False, indent=2)
+        Args:
+            filepath: 模型目录路径。配置与实体/关系列表写入manifest.json，
+                      嵌入矩阵以float32 .npy 存储
+        """
+        config = {
+            'entity_dim': self.entity_dim,
+            'relation_dim': self.relation_dim,
+            'learning_rate': self.learning_rate,
+            'margin': self.margin
+        }
+        # ID即列表下标，清单中只需保存有序的名称列表
+        metadata = {
+            'entities': [self.id2entity[i] for i in range(len(self.id2entity))],
+            'relations': [self.id2relation[i] for i in range(len(self.id2relation))]
+        }
+        if self.entity_labels:
+            metadata['entity_labels'] = self.entity_labels
+        arrays = {
+            'entity_embeddings': self.entity_embeddings,
+            'relation_embeddings': self.relation_embeddings
+        }
+        if self.known_triples is not None:
+            arrays['known_triples'] = np.asarray(self.known_triples, dtype=np.int32)
+        save_artifact(filepath, 'transe', config, arrays, metadata)
         
         logger.info(f"模型已保存到: {filepath}")
     
-    def load(self, filepath: str):
-        """加载模型"""
+    def load(self, filepath: str, mmap: bool = True):
+        """加载模型
+        
+        Args:
+            filepath: 模型目录路径；旧版的 .json 模型文件仍可读取
+            mmap: 是否以只读内存映射方式加载嵌入（继续训练时需设为False）
+        """
+        if not is_artifact(filepath):
+            self._load_json(filepath)
+            return
+        
+        if not hasattr(self, 'rng'):
+            self.rng = np.random.default_rng()
+        
+        manifest, arrays = load_artifact(filepath, mmap=mmap)
+        self.entity_embeddings = arrays['entity_embeddings']
+        self.relation_embeddings = arrays['relation_embeddings']
+        
+        self.known_triples = arrays.get('known_triples')
+        
+        entities = manifest['metadata']['entities']
+        relations = manifest['metadata']['relations']
+        self.entity_labels = manifest['metadata'].get('entity_labels', {})
+        self.entity2id = {e: i for i, e in enumerate(entities)}
+        self.relation2id = {r: i for i, r in enumerate(relations)}
+        self.id2entity = dict(enumerate(entities))
+        self.id2relation = dict(enumerate(relations))
+        
+        config = manifest['config']
+        self.entity_dim = config['entity_dim']
+        self.relation_dim = config['relation_dim']
+        self.learning_rate = config['learning_rate']
+        self.margin = config['margin']
+        
+        logger.info(f"模型已从{filepath}加载")
+    
+    @classmethod
+    def from_file(cls, filepath: str, mmap: bool = True) -> 'TransE':
+        """直接从模型文件创建实例"""
+        model = cls.__new__(cls)
+        model.load(filepath, mmap=mmap)
+        return model
+    
+    def _load_json(self, filepath: str):
+        """加载旧版JSON格式模型"""
+        if not hasattr(self, 'rng'):
+            self.rng = np.random.default_rng()
+        
         with open(filepath, 'r', encoding='utf-8') as f:
             model_data = json.load(f)
         
@@ -224,6 +478,8 @@ class TransE:
         self.relation2id = model_data['relation2id']
         self.id2entity = {int(k): v for k, v in model_data['id2entity'].items()}
         self.id2relation = {int(k): v for k, v in model_data['id2relation'].items()}
+        self.entity_labels = {}
+        self.known_triples = None
         
         config = model_data['config']
         self.entity_dim = config['entity_dim']
@@ -265,7 +521,7 @@ if __name__ == "__main__":
     ]
     
     # 创建并训练模型
-    model = TransE(entity_dim=50, relation_dim=50, learning_rate=0.01, margin=1.0)
+    model = TransE(entity_dim=50, relation_dim=50, learning_rate=0.01, margin=1.0, seed=42)
     model.initialize_embeddings(entities, relations)
     model.train(triples, epochs=100, batch_size=5)
     
@@ -277,6 +533,6 @@ if __name__ == "__main__":
         print(f"  {entity}: {score:.4f}")
     
     # 保存模型
-    model.save('ml_models/saved_models/transe_model.json')
+    model.save('ml_models/saved_models/transe_model')
     
     logger.info("✅ TransE模型训练完成!")
@@ -0,0 +1,165 @@
+"""
+模型文件格式
+小体积的 manifest.json 保存模型类型、配置与ID映射，
+嵌入矩阵等大数组以 float32 的 .npy 文件单独存储，加载时可使用内存映射(mmap)，
+多个API进程可共享同一份页缓存中的嵌入数据
+"""
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+from loguru import logger
+
+MANIFEST_FILE = "manifest.json"
+FORMAT_VERSION = 1
+
+PathLike = Union[str, Path]
+
+
+def _normalize_array(array: np.ndarray) -> np.ndarray:
+    """统一数组存储类型：浮点数组转为float32，整数数组转为int32"""
+    array = np.asarray(array)
+    if np.issubdtype(array.dtype, np.floating):
+        return np.ascontiguousarray(array, dtype=np.float32)
+    if np.issubdtype(array.dtype, np.integer) and array.dtype.itemsize > 4:
+        if array.size == 0 or (array.min() >= np.iinfo(np.int32).min and array.max() <= np.iinfo(np.int32).max):
+            return np.ascontiguousarray(array, dtype=np.int32)
+    return np.ascontiguousarray(array)
+
+
+def is_artifact(path: PathLike) -> bool:
+    """判断路径是否为模型目录（包含manifest.json）"""
+    return (Path(path) / MANIFEST_FILE).is_file()
+
+
+def save_artifact(path: PathLike, model_type: str, config: Dict,
+                  arrays: Dict[str, np.ndarray], metadata: Optional[Dict] = None) -> Path:
+    """保存模型目录
+
+    先写入同级临时目录，完成后再整体重命名，读取方不会看到写了一半的模型。
+
+    Args:
+        path: 模型目录路径
+        model_type: 模型类型 (ncf/mf/transe/cf_similarity 等)
+        config: 模型配置（需可JSON序列化）
+        arrays: 数组名 -> 数组
+        metadata: 附加元数据（ID映射等，需可JSON序列化）
+
+    Returns:
+        模型目录路径
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_dir = Path(tempfile.mkdtemp(prefix=f".{path.name}.", dir=path.parent))
+
+    try:
+        array_specs = {}
+        for name, array in arrays.items():
+            array = _normalize_array(array)
+            file_name = f"{name}.npy"
+            np.save(tmp_dir / file_name, array, allow_pickle=False)
+            array_specs[name] = {
+                'file': file_name,
+                'dtype': str(array.dtype),
+                'shape': list(array.shape)
+            }
+
+        manifest = {
+            'format_version': FORMAT_VERSION,
+            'model_type': model_type,
+            'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'config': config,
+            'arrays': array_specs,
+            'metadata': metadata or {}
+        }
+        with open(tmp_dir / MANIFEST_FILE, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False)
+
+        # 覆盖已有模型时先移走旧目录，再把新目录换上
+        backup_dir = None
+        if path.exists():
+            backup_dir = path.with_name(f".{path.name}.old")
+            if backup_dir.exists():
+                shutil.rmtree(backup_dir)
+            os.replace(path, backup_dir)
+        os.replace(tmp_dir, path)
+        if backup_dir is not None:
+            shutil.rmtree(backup_dir, ignore_errors=True)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    logger.debug(f"模型文件已写入: {path} ({len(arrays)}个数组)")
+    return path
+
+
+def read_manifest(path: PathLike) -> Dict:
+    """只读取模型清单，不加载数组"""
+    with open(Path(path) / MANIFEST_FILE, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    if manifest.get('format_version', 0) > FORMAT_VERSION:
+        raise ValueError(f"不支持的模型格式版本: {manifest.get('format_version')}")
+    return manifest
+
+
+def load_artifact(path: PathLike, mmap: bool = True) -> Tuple[Dict, Dict[str, np.ndarray]]:
+    """加载模型目录
+
+    Args:
+        path: 模型目录路径
+        mmap: 是否以只读内存映射方式加载数组。映射得到的数组不可原地修改，
+              需要继续训练时请传入 mmap=False
+
+    Returns:
+        (manifest, arrays)
+    """
+    path = Path(path)
+    manifest = read_manifest(path)
+
+    mmap_mode = 'r' if mmap else None
+    arrays = {
+        name: np.load(path / spec['file'], mmap_mode=mmap_mode, allow_pickle=False)
+        for name, spec in manifest['arrays'].items()
+    }
+    return manifest, arrays
+
+
+def artifact_nbytes(path: PathLike) -> int:
+    """模型数组占用的字节数（依据清单中的形状计算）"""
+    manifest = read_manifest(path)
+    total = 0
+    for spec in manifest['arrays'].values():
+        total += int(np.prod(spec['shape'], dtype=np.int64)) * np.dtype(spec['dtype']).itemsize
+    return total
+
+
+def list_versions(model_dir: PathLike, name: str) -> List[str]:
+    """列出某个模型已发布的版本（按版本号升序）
+
+    目录结构为 <model_dir>/<name>/<version>/manifest.json，
+    只有写入完成（含清单文件）的版本才会被列出
+    """
+    base = Path(model_dir) / name
+    if not base.is_dir():
+        return []
+    return sorted(
+        entry.name for entry in base.iterdir()
+        if not entry.name.startswith('.') and is_artifact(entry)
+    )
+
+
+def new_version_path(model_dir: PathLike, name: str) -> Path:
+    """为新训练的模型分配版本目录，版本号为时间戳，保证单调递增"""
+    base = Path(model_dir) / name
+    version = datetime.now().strftime('%Y%m%d%H%M%S')
+    existing = list_versions(model_dir, name)
+    if existing and existing[-1] >= version:
+        # 同一秒内重复发布时在最新版本后追加序号
+        version = f"{existing[-1]}_{len(existing)}"
+    return base / version
@@ -3,10 +3,19 @@
 基于神经网络的协同过滤推荐系统
 """
 import numpy as np
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Tuple
 import json
+import sys
+from pathlib import Path
 from loguru import logger
 
+# 以脚本方式运行时也能导入项目内模块
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+from ml_models.model_artifact import save_artifact, load_artifact, is_artifact
+
 
 class NeuralCollaborativeFiltering:
     """神经协同过滤模型"""
@@ -82,54 +91,162 @@ class NeuralCollaborativeFiltering:
         
         return prediction
     
+    def forward_batch(self, user_ids: np.ndarray, item_ids: np.ndarray) -> np.ndarray:
+        """批量前向传播
+        
+        Args:
+            user_ids: 用户ID数组
+            item_ids: 项目ID数组（与user_ids等长）
+        
+        Returns:
+            预测分数数组
+        """
+        x = np.concatenate([self.user_embedding[user_ids], self.item_embedding[item_ids]], axis=1)
+        for weight, bias in zip(self.mlp_weights, self.mlp_biases):
+            x = self._relu(x @ weight + bias)
+        output = x @ self.output_weight + self.output_bias
+        return self._sigmoid(output[:, 0])
+    
+    def score_all(self, user_ids: np.ndarray, batch_size: int = 65536) -> np.ndarray:
+        """计算一批用户对全部项目的预测分数
+        
+        Returns:
+            形状为 (len(user_ids), num_items) 的分数矩阵
+        """
+        user_ids = np.asarray(user_ids)
+        scores = np.empty((len(user_ids), self.num_items), dtype=np.float32)
+        rows_per_batch = max(1, batch_size // max(self.num_items, 1))
+        items = np.arange(self.num_items)
+        
+        for start in range(0, len(user_ids), rows_per_batch):
+            users = user_ids[start:start + rows_per_batch]
+            pairs_users = np.repeat(users, self.num_items)
+            pairs_items = np.tile(items, len(users))
+            scores[start:start + len(users)] = self.forward_batch(pairs_users, pairs_items).reshape(len(users), -1)
+        
+        return scores
+    
     def train(self, interactions: List[Tuple[int, int, float]], 
-              epochs: int = 10, learning_rate: float = 0.001, batch_size: int = 256):
+              epochs: int = 10, learning_rate: float = 0.001, batch_size: int = 256,
+              negative_ratio: int = 4, seed: Optional[int] = None) -> List[float]:
         """
-        训练模型
+        训练模型（隐式反馈：交互为正样本，每个正样本随机采样 negative_ratio 个未交互项目作负样本）
         
         Args:
-            interactions: [(user_id, item_id, rating), ...]
+            interactions: [(user_id, item_id, rating), ...]，rating 为归一化到[0, 1]的正样本目标值
             epochs: 训练轮数
-            learning_rate: 学习率
+            learning_rate: 学习率（Adam）
             batch_size: 批次大小
+            negative_ratio: 每个正样本采样的负样本数
+            seed: 随机种子
+        
+        Returns:
+            每轮的平均交叉熵损失
         """
         logger.info(f"开始训练: {len(interactions)}个交互, {epochs}轮")
-        
+        rng = np.random.default_rng(seed)
+        data = np.asarray(interactions, dtype=np.float64).reshape(-1, 3)
+        pos_users, pos_items = data[:, 0].astype(np.int64), data[:, 1].astype(np.int64)
+        pos_targets = data[:, 2]
+        # 用户已交互的 (用户, 项目) 编码，负采样时排除
+        positive_codes = np.unique(pos_users * self.num_items + pos_items)
+        self._reset_optimizer()
+        
+        losses = []
         for epoch in range(epochs):
-            np.random.shuffle(interactions)
-            total_loss = 0
+            neg_users = np.repeat(pos_users, negative_ratio)
+            neg_items = rng.integers(0, self.num_items, size=len(neg_users))
+            keep = ~np.isin(neg_users * self.num_items + neg_items, positive_codes)
+            users = np.concatenate([pos_users, neg_users[keep]])
+            items = np.concatenate([pos_items, neg_items[keep]])
+            targets = np.concatenate([pos_targets, np.zeros(int(keep.sum()))])
             
-            for i in range(0, len(interactions), batch_size):
-                batch = interactions[i:i+batch_size]
-                loss = self._train_batch(batch, learning_rate)
-                total_loss += loss
+            order = rng.permutation(len(users))
+            total_loss = 0.0
+            for i in range(0, len(order), batch_size):
+                batch = order[i:i + batch_size]
+                total_loss += self._train_batch(users[batch], items[batch], targets[batch], learning_rate)
             
-            avg_loss = total_loss / len(interactions)
+            losses.append(total_loss / max(len(order), 1))
             if (epoch + 1) % 2 == 0:
-                logger.info(f"Epoch {epoch+1}/{epochs}, Loss: {avg_loss:.4f}")
+                logger.info(f"Epoch {epoch+1}/{epochs}, Loss: {losses[-1]:.4f}")
         
         logger.info("训练完成")
+        return losses
     
-    def _train_batch(self, batch: List[Tuple[int, int, float]], learning_rate: float) -> float:
-        """训练一个批次（简化版梯度下降）"""
-        batch_loss = 0
-        
-        for user_id, item_id, rating in batch:
-            # 前向传播
-            prediction = self.forward(user_id, item_id)
-            
-            # 计算损失（MSE）
-            loss = (prediction - rating) ** 2
-            batch_loss += loss
-            
-            # 简化的梯度更新（实际应该用反向传播）
-            error = prediction - rating
-            
-            # 更新嵌入（简化版）
-            self.user_embedding[user_id] -= learning_rate * error * 0.01
-            self.item_embedding[item_id] -= learning_rate * error * 0.01
+    def _parameters(self) -> Dict[str, np.ndarray]:
+        """全部可训练的稠密参数（嵌入除外）"""
+        params = {'output_weight': self.output_weight, 'output_bias': self.output_bias}
+        for i, (weight, bias) in enumerate(zip(self.mlp_weights, self.mlp_biases)):
+            params[f'mlp_weight_{i}'] = weight
+            params[f'mlp_bias_{i}'] = bias
+        return params
+    
+    def _reset_optimizer(self):
+        """Adam的一阶/二阶矩估计，嵌入按行稀疏更新"""
+        shapes = {name: param.shape for name, param in self._parameters().items()}
+        shapes['user_embedding'] = self.user_embedding.shape
+        shapes['item_embedding'] = self.item_embedding.shape
+        self._adam_step = 0
+        self._adam_state = {name: (np.zeros(shape), np.zeros(shape)) for name, shape in shapes.items()}
+    
+    def _adam_update(self, name: str, param: np.ndarray, grad: np.ndarray, learning_rate: float,
+                     rows: Optional[np.ndarray] = None, beta1: float = 0.9, beta2: float = 0.999,
+                     eps: float = 1e-8):
+        """Adam更新一个参数（rows 不为None时只更新这些行）"""
+        m, v = self._adam_state[name]
+        index = slice(None) if rows is None else rows
+        m[index] = beta1 * m[index] + (1 - beta1) * grad
+        v[index] = beta2 * v[index] + (1 - beta2) * grad ** 2
+        m_hat = m[index] / (1 - beta1 ** self._adam_step)
+        v_hat = v[index] / (1 - beta2 ** self._adam_step)
+        param[index] -= learning_rate * m_hat / (np.sqrt(v_hat) + eps)
+    
+    def _train_batch(self, user_ids: np.ndarray, item_ids: np.ndarray, targets: np.ndarray,
+                     learning_rate: float) -> float:
+        """训练一个批次：前向传播、交叉熵损失对全部权重与嵌入的反向传播、Adam更新
         
-        return batch_loss
+        Returns:
+            批次的交叉熵损失之和
+        """
+        # 前向传播，保留各层输入与激活前的值
+        x = np.concatenate([self.user_embedding[user_ids], self.item_embedding[item_ids]], axis=1)
+        inputs, pre_activations = [], []
+        h = x
+        for weight, bias in zip(self.mlp_weights, self.mlp_biases):
+            inputs.append(h)
+            a = h @ weight + bias
+            pre_activations.append(a)
+            h = self._relu(a)
+        prediction = self._sigmoid((h @ self.output_weight + self.output_bias)[:, 0])
+        
+        clipped = np.clip(prediction, 1e-7, 1 - 1e-7)
+        loss = -np.sum(targets * np.log(clipped) + (1 - targets) * np.log(1 - clipped))
+        
+        # 反向传播：sigmoid + 交叉熵对输出的梯度为 (预测 - 目标)
+        grad_out = ((prediction - targets) / len(targets))[:, None]
+        grads = {'output_weight': h.T @ grad_out, 'output_bias': grad_out.sum(axis=0)}
+        grad_h = grad_out @ self.output_weight.T
+        for i in reversed(range(len(self.mlp_weights))):
+            grad_a = grad_h * (pre_activations[i] > 0)
+            grads[f'mlp_weight_{i}'] = inputs[i].T @ grad_a
+            grads[f'mlp_bias_{i}'] = grad_a.sum(axis=0)
+            grad_h = grad_a @ self.mlp_weights[i].T
+        
+        self._adam_step += 1
+        for name, param in self._parameters().items():
+            self._adam_update(name, param, grads[name], learning_rate)
+        
+        # 嵌入梯度按行累加（同一批次中同一用户/项目可能出现多次）
+        dim = self.embedding_dim
+        for name, embedding, ids, grad in (('user_embedding', self.user_embedding, user_ids, grad_h[:, :dim]),
+                                           ('item_embedding', self.item_embedding, item_ids, grad_h[:, dim:])):
+            rows, inverse = np.unique(ids, return_inverse=True)
+            row_grad = np.zeros((len(rows), dim))
+            np.add.at(row_grad, inverse, grad)
+            self._adam_update(name, embedding, row_grad, learning_rate, rows=rows)
+        
+        return float(loss)
     
     def predict(self, user_id: int, item_ids: List[int]) -> List[Tuple[int, float]]:
         """
@@ -163,39 +280,81 @@ class NeuralCollaborativeFiltering:
         Returns:
             [(item_id, score), ...] 推荐列表
         """
-        if exclude_items is None:
-            exclude_items = []
-        
-        # 对所有项目进行预测
-        all_items = [i for i in range(self.num_items) if i not in exclude_items]
-        predictions = self.predict(user_id, all_items)
-        
-        return predictions[:top_k]
+        # 一次性对所有项目打分
+        scores = self.score_all(np.array([user_id]))[0].astype(np.float64)
+        if exclude_items:
+            scores[list(exclude_items)] = -np.inf
+        
+        top_k = min(top_k, self.num_items)
+        if top_k <= 0:
+            return []
+        top = np.argpartition(-scores, top_k - 1)[:top_k]
+        top = top[np.argsort(-scores[top])]
+        
+        return [(int(i), float(scores[i])) for i in top if np.isfinite(scores[i])]
     
     def save(self, filepath: str):
-        """保存模型"""
-        model_data = {
-            'user_embedding': self.user_embedding.tolist(),
-            'item_embedding': self.item_embedding.tolist(),
-            'mlp_weights': [w.tolist() for w in self.mlp_weights],
-            'mlp_biases': [b.tolist() for b in self.mlp_biases],
-            'output_weight': self.output_weight.tolist(),
-            'output_bias': self.output_bias.tolist(),
-            'config': {
-                'num_users': self.num_users,
-                'num_items': self.num_items,
-                'embedding_dim': self.embedding_dim,
-                'hidden_layers': self.hidden_layers
-            }
+        """保存模型
+
+        Args:
+            filepath: 模型目录路径。配置写入manifest.json，权重以float32 .npy 存储
+        """
+        arrays = {
+            'user_embedding': self.user_embedding,
+            'item_embedding': self.item_embedding,
+            'output_weight': self.output_weight,
+            'output_bias': self.output_bias
         }
-        
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(model_data, f, ensure_ascii=False, indent=2)
+        for i, (weight, bias) in enumerate(zip(self.mlp_weights, self.mlp_biases)):
+            arrays[f'mlp_weight_{i}'] = weight
+            arrays[f'mlp_bias_{i}'] = bias
+        
+        config = {
+            'num_users': self.num_users,
+            'num_items': self.num_items,
+            'embedding_dim': self.embedding_dim,
+            'hidden_layers': list(self.hidden_layers)
+        }
+        save_artifact(filepath, 'ncf', config, arrays)
         
         logger.info(f"模型已保存到: {filepath}")
     
-    def load(self, filepath: str):
-        """加载模型"""
+    def load(self, filepath: str, mmap: bool = True):
+        """加载模型
+        
+        Args:
+            filepath: 模型目录路径；旧版的 .json 模型文件仍可读取
+            mmap: 是否以只读内存映射方式加载权重（继续训练时需设为False）
+        """
+        if not is_artifact(filepath):
+            self._load_json(filepath)
+            return
+        
+        manifest, arrays = load_artifact(filepath, mmap=mmap)
+        config = manifest['config']
+        self.num_users = config['num_users']
+        self.num_items = config['num_items']
+        self.embedding_dim = config['embedding_dim']
+        self.hidden_layers = config['hidden_layers']
+        
+        self.user_embedding = arrays['user_embedding']
+        self.item_embedding = arrays['item_embedding']
+        self.mlp_weights = [arrays[f'mlp_weight_{i}'] for i in range(len(self.hidden_layers))]
+        self.mlp_biases = [arrays[f'mlp_bias_{i}'] for i in range(len(self.hidden_layers))]
+        self.output_weight = arrays['output_weight']
+        self.output_bias = arrays['output_bias']
+        
+        logger.info(f"模型已从{filepath}加载")
+    
+    @classmethod
+    def from_file(cls, filepath: str, mmap: bool = True) -> 'NeuralCollaborativeFiltering':
+        """直接从模型文件创建实例（不做随机初始化）"""
+        model = cls.__new__(cls)
+        model.load(filepath, mmap=mmap)
+        return model
+    
+    def _load_json(self, filepath: str):
+        """加载旧版JSON格式模型"""
         with open(filepath, 'r', encoding='utf-8') as f:
             model_data = json.load(f)
         
@@ -291,6 +450,44 @@ class MatrixFactorization:
         
         scores.sort(key=lambda x: x[1], reverse=True)
         return scores[:top_k]
+    
+    def save(self, filepath: str):
+        """保存模型（模型目录格式）"""
+        config = {
+            'num_users': self.num_users,
+            'num_items': self.num_items,
+            'num_factors': self.num_factors
+        }
+        save_artifact(filepath, 'mf', config, {
+            'user_factors': self.user_factors,
+            'item_factors': self.item_factors
+        })
+        
+        logger.info(f"模型已保存到: {filepath}")
+    
+    def load(self, filepath: str, mmap: bool = True):
+        """加载模型
+        
+        Args:
+            filepath: 模型目录路径
+            mmap: 是否以只读内存映射方式加载因子矩阵（继续训练时需设为False）
+        """
+        manifest, arrays = load_artifact(filepath, mmap=mmap)
+        config = manifest['config']
+        self.num_users = config['num_users']
+        self.num_items = config['num_items']
+        self.num_factors = config['num_factors']
+        self.user_factors = arrays['user_factors']
+        self.item_factors = arrays['item_factors']
+        
+        logger.info(f"模型已从{filepath}加载")
+    
+    @classmethod
+    def from_file(cls, filepath: str, mmap: bool = True) -> 'MatrixFactorization':
+        """直接从模型文件创建实例（不做随机初始化）"""
+        model = cls.__new__(cls)
+        model.load(filepath, mmap=mmap)
+        return model
 
 
 if __name__ == "__main__":
@@ -327,7 +524,7 @@ if __name__ == "__main__":
         print(f"  项目{item_id}: {score:.4f}")
     
     # 保存模型
-    ncf_model.save('ml_models/saved_models/ncf_model.json')
+    ncf_model.save('ml_models/saved_models/ncf_model')
     
     # 训练MF模型
     logger.info("\n" + "=" * 60)
@@ -342,4 +539,6 @@ if __name__ == "__main__":
     for item_id, score in recommendations:
         print(f"  项目{item_id}: {score:.4f}")
     
+    mf_model.save('ml_models/saved_models/mf_model')
+    
     logger.info("\n✅ 推荐模型训练完成!")
@@ -8,6 +8,15 @@ from loguru import logger
 from sklearn.metrics.pairwise import cosine_similarity
 from scipy.sparse import csr_matrix
 import json
+import sys
+from pathlib import Path
+
+# 以脚本方式运行时也能导入项目内模块
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+from ml_models.model_artifact import save_artifact, load_artifact
 
 
 class CollaborativeFilteringRecommender:
@@ -150,6 +159,49 @@ class CollaborativeFilteringRecommender:
         
         logger.info(f"为用户 {user_id} 生成 {len(predictions[:top_n])} 个推荐")
         return predictions[:top_n]
+    
+    def save(self, filepath: str):
+        """保存评分矩阵与相似度矩阵（模型目录格式）"""
+        if self.user_item_matrix is None:
+            raise ValueError("请先构建用户-项目矩阵")
+        
+        arrays = {'user_item_matrix': self.user_item_matrix.values}
+        if self.user_similarity is not None:
+            arrays['user_similarity'] = self.user_similarity
+        if self.item_similarity is not None:
+            arrays['item_similarity'] = self.item_similarity
+        
+        metadata = {
+            'user_ids': [int(u) for u in self.user_item_matrix.index],
+            'item_ids': [int(i) for i in self.user_item_matrix.columns]
+        }
+        config = {'num_users': len(metadata['user_ids']), 'num_items': len(metadata['item_ids'])}
+        save_artifact(filepath, 'cf_similarity', config, arrays, metadata)
+        
+        logger.info(f"协同过滤模型已保存到: {filepath}")
+    
+    def load(self, filepath: str, mmap: bool = True):
+        """加载评分矩阵与相似度矩阵"""
+        manifest, arrays = load_artifact(filepath, mmap=mmap)
+        metadata = manifest['metadata']
+        
+        self.user_item_matrix = pd.DataFrame(
+            arrays['user_item_matrix'],
+            index=pd.Index(metadata['user_ids'], name='user_id'),
+            columns=pd.Index(metadata['item_ids'], name='item_id'),
+            copy=False
+        )
+        self.user_similarity = arrays.get('user_similarity')
+        self.item_similarity = arrays.get('item_similarity')
+        
+        logger.info(f"协同过滤模型已从{filepath}加载")
+    
+    @classmethod
+    def from_file(cls, filepath: str, mmap: bool = True) -> 'CollaborativeFilteringRecommender':
+        """直接从模型文件创建实例"""
+        model = cls()
+        model.load(filepath, mmap=mmap)
+        return model
 
 
 class FitnessActivityRecommender:
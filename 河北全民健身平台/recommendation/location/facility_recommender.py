@@ -0,0 +1,385 @@
+"""
+基于位置的健身设施推荐
+用网格空间索引取出半径范围内的候选设施，再对候选设施一次性向量化打分：
+距离、预测负载（客流预测规则）、运动项目匹配度与评分
+"""
+import re
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+# 以脚本方式运行时也能导入项目内模块
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+from traffic_prediction.traffic_predictor import estimate_load_rates
+
+EARTH_RADIUS_KM = 6371.0
+
+# 文本形式的场地列表（如“篮球场、足球场”）的分隔符
+PLACE_SEPARATORS = re.compile(r'[、，：；,:;\s]+')
+
+# 河北省各地级市中心坐标 (纬度, 经度)，设施缺少经纬度时按所在城市定位
+CITY_CENTERS = {
+    '石家庄市': (38.0428, 114.5149),
+    '唐山市': (39.6304, 118.1803),
+    '秦皇岛市': (39.9354, 119.6005),
+    '邯郸市': (36.6256, 114.5391),
+    '邢台市': (37.0706, 114.5044),
+    '保定市': (38.8738, 115.4645),
+    '张家口市': (40.8240, 114.8875),
+    '承德市': (40.9515, 117.9634),
+    '沧州市': (38.3037, 116.8388),
+    '廊坊市': (39.5380, 116.6838),
+    '衡水市': (37.7389, 115.6705)
+}
+
+# 设施类型的常见运动项目（设施未登记运动项目时使用）
+FACILITY_TYPE_SPORTS = {
+    '体育场': ['跑步', '足球'],
+    '体育馆': ['篮球', '羽毛球', '乒乓球'],
+    '健身中心': ['健身', '瑜伽'],
+    '公共游泳(跳水)': ['游泳'],
+    '游泳馆': ['游泳']
+}
+
+# 场地/活动名称 -> 运动项目
+SPORT_ALIASES = {'健身房': '健身', '田径': '跑步'}
+
+# 默认打分权重
+DEFAULT_WEIGHTS = {'distance': 0.4, 'load': 0.2, 'sport': 0.25, 'rating': 0.15}
+
+# 每个推荐名额最多打分的候选设施数（取距离最近的 top_n × CANDIDATE_FACTOR 个）
+CANDIDATE_FACTOR = 20
+
+# 搜索范围内的设施不超过该数量时直接计算全部距离，否则由近及远逐圈读取网格
+DIRECT_SCAN_MAX = 4096
+
+
+def haversine_km(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """计算一个点到多个点的球面距离（公里）"""
+    lat1, lon1 = np.radians(lat), np.radians(lon)
+    lat2, lon2 = np.radians(lats), np.radians(lons)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+class GridIndex:
+    """经纬度网格空间索引
+
+    设施按 (行, 列) 网格编号排序存储，同一行内相邻网格在排序后是连续区间，
+    一次半径查询只需对每一行做一次二分查找；也可以由近及远逐圈读取查询点周围的网格
+    """
+
+    def __init__(self, lats: np.ndarray, lons: np.ndarray, cell_deg: float = 0.05):
+        """
+        Args:
+            lats: 纬度数组
+            lons: 经度数组
+            cell_deg: 网格边长（度），0.05度约5.5公里
+        """
+        self.cell_deg = cell_deg
+        self.lat0 = float(lats.min()) if len(lats) else 0.0
+        self.lon0 = float(lons.min()) if len(lons) else 0.0
+        rows = self._row(lats)
+        cols = self._col(lons)
+        self.num_rows = int(rows.max()) + 1 if len(rows) else 1
+        self.num_cols = int(cols.max()) + 1 if len(cols) else 1
+
+        keys = rows.astype(np.int64) * self.num_cols + cols
+        self.order = np.argsort(keys, kind='stable')
+        self.sorted_keys = keys[self.order]
+
+    def _row(self, lats) -> np.ndarray:
+        return np.floor((np.asarray(lats) - self.lat0) / self.cell_deg).astype(np.int64)
+
+    def _col(self, lons) -> np.ndarray:
+        return np.floor((np.asarray(lons) - self.lon0) / self.cell_deg).astype(np.int64)
+
+    def _spans(self, lat: float, lon: float, radius_km: float) -> Tuple[np.ndarray, np.ndarray]:
+        """外接矩形内每一行网格在排序数组中的 [lo, hi) 区间"""
+        dlat = radius_km / 111.0
+        dlon = radius_km / (111.0 * max(np.cos(np.radians(lat)), 1e-6))
+
+        row_min, row_max = self._row(lat - dlat), self._row(lat + dlat)
+        col_min = max(int(self._col(lon - dlon)), 0)
+        col_max = min(int(self._col(lon + dlon)), self.num_cols - 1)
+        if col_min > col_max:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+        rows = np.arange(max(int(row_min), 0), int(row_max) + 1, dtype=np.int64)
+        lo = np.searchsorted(self.sorted_keys, rows * self.num_cols + col_min, side='left')
+        hi = np.searchsorted(self.sorted_keys, rows * self.num_cols + col_max, side='right')
+        return lo, hi
+
+    def count(self, lat: float, lon: float, radius_km: float) -> int:
+        """外接矩形内的设施数（不读取下标）"""
+        lo, hi = self._spans(lat, lon, radius_km)
+        return int((hi - lo).sum())
+
+    def query(self, lat: float, lon: float, radius_km: float) -> np.ndarray:
+        """返回可能位于半径范围内的设施下标（外接矩形内的全部网格）"""
+        lo, hi = self._spans(lat, lon, radius_km)
+        if not np.any(hi > lo):
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([self.order[a:b] for a, b in zip(lo, hi) if b > a])
+
+    def max_ring(self, lat: float, lon: float) -> int:
+        """覆盖全部网格所需的最大圈数"""
+        row, col = int(self._row(lat)), int(self._col(lon))
+        return max(row, self.num_rows - 1 - row, col, self.num_cols - 1 - col, 0)
+
+    def covered_km(self, lat: float, lon: float, ring: int) -> float:
+        """读取 0..ring 圈网格后，以查询点为圆心、已完整读取的圆的半径（公里）"""
+        row, col = int(self._row(lat)), int(self._col(lon))
+        lat_lo = self.lat0 + (row - ring) * self.cell_deg
+        lon_lo = self.lon0 + (col - ring) * self.cell_deg
+        span = (2 * ring + 1) * self.cell_deg
+        lat_margin = min(lat - lat_lo, lat_lo + span - lat) * 111.0
+        lon_margin = min(lon - lon_lo, lon_lo + span - lon) * 111.0 * max(np.cos(np.radians(lat)), 1e-6)
+        return max(min(lat_margin, lon_margin), 0.0)
+
+    def ring(self, lat: float, lon: float, ring: int) -> np.ndarray:
+        """返回与查询点所在网格的切比雪夫距离恰为 ring 的一圈网格中的设施下标"""
+        row, col = int(self._row(lat)), int(self._col(lon))
+        if ring == 0:
+            rows = np.array([row])
+            col_lo, col_hi = np.array([col]), np.array([col])
+        else:
+            # 上下两行取整段，中间各行只取左右两个网格
+            middle = np.arange(row - ring + 1, row + ring)
+            rows = np.concatenate([[row - ring, row + ring], middle, middle])
+            col_lo = np.concatenate([[col - ring] * 2, np.full(len(middle), col - ring),
+                                     np.full(len(middle), col + ring)])
+            col_hi = np.concatenate([[col + ring] * 2, np.full(len(middle), col - ring),
+                                     np.full(len(middle), col + ring)])
+        col_lo, col_hi = np.maximum(col_lo, 0), np.minimum(col_hi, self.num_cols - 1)
+        valid = (rows >= 0) & (rows < self.num_rows) & (col_lo <= col_hi)
+        rows, col_lo, col_hi = rows[valid].astype(np.int64), col_lo[valid], col_hi[valid]
+        lo = np.searchsorted(self.sorted_keys, rows * self.num_cols + col_lo, side='left')
+        hi = np.searchsorted(self.sorted_keys, rows * self.num_cols + col_hi, side='right')
+        if not np.any(hi > lo):
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([self.order[a:b] for a, b in zip(lo, hi) if b > a])
+
+
+class FacilityRecommender:
+    """基于位置的设施推荐器"""
+
+    def __init__(self, facilities: List[Dict], cell_deg: float = 0.05,
+                 weights: Optional[Dict[str, float]] = None):
+        """
+        Args:
+            facilities: 设施列表，支持 fitness_facilities_data.json 与 data/raw/facilities.json 两种格式
+            cell_deg: 空间索引网格边长（度）
+            weights: 打分权重 distance/load/sport/rating
+        """
+        records = [r for r in (self._normalize(f) for f in facilities) if r is not None]
+        skipped = len(facilities) - len(records)
+        self.weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+        self.records = records
+
+        self.lats = np.array([r['latitude'] for r in records], dtype=np.float64)
+        self.lons = np.array([r['longitude'] for r in records], dtype=np.float64)
+        self.ratings = np.array([np.nan if r['rating'] is None else r['rating'] for r in records], dtype=np.float64)
+        self.daily_visitors = np.array([r['daily_visitors'] for r in records], dtype=np.float64)
+        self.seats = np.array([r['seats'] for r in records], dtype=np.float64)
+        self.types = np.array([r['type'] for r in records], dtype=object)
+        # 只定位到城市中心的设施没有可信的距离
+        self.city_located = np.array([r['location_precision'] == 'city' for r in records], dtype=bool)
+
+        # 运动项目编码为 设施 × 项目 的布尔矩阵
+        self.sport_vocab = sorted({s for r in records for s in r['sports']})
+        sport_index = {s: i for i, s in enumerate(self.sport_vocab)}
+        self.sport_matrix = np.zeros((len(records), len(self.sport_vocab)), dtype=bool)
+        for i, r in enumerate(records):
+            self.sport_matrix[i, [sport_index[s] for s in r['sports']]] = True
+
+        # 同城设施数量，用于客流预测中的邻近调整
+        _, city_codes, city_counts = np.unique(
+            np.array([r['city'] for r in records], dtype=object).astype(str),
+            return_inverse=True, return_counts=True
+        ) if records else (None, np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64))
+        self.nearby_counts = city_counts[city_codes] if records else np.empty(0)
+
+        self.index = GridIndex(self.lats, self.lons, cell_deg)
+        logger.info(f"初始化设施推荐器: {len(records)}个设施, {len(self.sport_vocab)}个运动项目"
+                    + (f", 跳过{skipped}个无法定位的设施" if skipped else ""))
+
+    @staticmethod
+    def _normalize(facility: Dict) -> Optional[Dict]:
+        """统一不同来源的设施字段，无法定位的设施返回None"""
+        location = facility.get('location') or {}
+        city = facility.get('city') or location.get('city') or ''
+        lat, lon = facility.get('latitude'), facility.get('longitude')
+        precision = 'exact'
+        if lat is None or lon is None:
+            if city not in CITY_CENTERS:
+                return None
+            lat, lon = CITY_CENTERS[city]
+            precision = 'city'
+
+        indicators = facility.get('indicators') or {}
+        facility_type = facility.get('facility_type') or facility.get('type') or ''
+        sports = [SPORT_ALIASES.get(s, s) for s in facility.get('sports_types') or [] if s]
+        if not sports:
+            sports = list(FACILITY_TYPE_SPORTS.get(facility_type, []))
+        # data/raw格式中的场地列表（如“篮球场”）也视为可开展的运动项目，可能是列表或分隔的文本
+        places = facility.get('facilities') or []
+        if isinstance(places, str):
+            places = PLACE_SEPARATORS.split(places)
+        elif not isinstance(places, (list, tuple)):
+            places = []
+        for place in places:
+            if isinstance(place, str) and place:
+                place = place[:-1] if place.endswith('场') else place
+                sports.append(SPORT_ALIASES.get(place, place))
+
+        return {
+            'facility_id': facility.get('id'),
+            'name': facility.get('name', ''),
+            'type': facility_type,
+            'city': city,
+            'latitude': float(lat),
+            'longitude': float(lon),
+            'location_precision': precision,
+            'rating': facility.get('rating'),
+            'daily_visitors': indicators.get('daily_visitors', facility.get('daily_visitors', 0)) or 0,
+            'seats': indicators.get('seats', facility.get('capacity', 0)) or 0,
+            'sports': sorted(set(sports))
+        }
+
+    def candidates(self, latitude: float, longitude: float, radius_km: float,
+                   limit: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """空间索引预筛选后精确计算距离，返回半径范围内的 (设施下标, 距离)
+
+        Args:
+            limit: 只返回距离最近的 limit 个设施；搜索范围内设施较多时由近及远逐圈读取网格，
+                已读取的网格覆盖了第 limit 近的距离后即停止
+        """
+        if limit is None or self.index.count(latitude, longitude, radius_km) <= max(limit, DIRECT_SCAN_MAX):
+            idx = self.index.query(latitude, longitude, radius_km)
+            if len(idx) == 0:
+                return idx, np.empty(0)
+            distances = haversine_km(latitude, longitude, self.lats[idx], self.lons[idx])
+            mask = distances <= radius_km
+            idx, distances = idx[mask], distances[mask]
+            if limit is not None and len(idx) > limit:
+                nearest = np.argpartition(distances, limit - 1)[:limit]
+                idx, distances = idx[nearest], distances[nearest]
+            return idx, distances
+
+        cell_km = self.index.cell_deg * 111.0 * max(np.cos(np.radians(latitude)), 1e-6)
+        max_ring = min(self.index.max_ring(latitude, longitude), int(np.ceil(radius_km / cell_km)) + 1)
+        found_idx, found_distances, count = [], [], 0
+        for ring in range(max_ring + 1):
+            idx = self.index.ring(latitude, longitude, ring)
+            if len(idx):
+                distances = haversine_km(latitude, longitude, self.lats[idx], self.lons[idx])
+                mask = distances <= radius_km
+                found_idx.append(idx[mask])
+                found_distances.append(distances[mask])
+                count += int(mask.sum())
+            if count >= limit and ring < max_ring:
+                kth = np.partition(np.concatenate(found_distances), limit - 1)[limit - 1]
+                if kth <= self.index.covered_km(latitude, longitude, ring):
+                    break
+        if not count:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        idx, distances = np.concatenate(found_idx), np.concatenate(found_distances)
+        if count > limit:
+            nearest = np.argpartition(distances, limit - 1)[:limit]
+            idx, distances = idx[nearest], distances[nearest]
+        return idx, distances
+
+    def recommend(self, latitude: float, longitude: float, top_n: int = 5,
+                  sports: Optional[Iterable[str]] = None, radius_km: float = 10.0,
+                  max_radius_km: float = 80.0, timestamp: Optional[datetime] = None) -> List[Dict]:
+        """推荐附近的健身设施
+
+        Args:
+            latitude: 用户纬度
+            longitude: 用户经度
+            top_n: 推荐数量
+            sports: 用户偏好的运动项目
+            radius_km: 初始搜索半径，候选不足时逐步扩大到 max_radius_km
+            timestamp: 计划到访时间，用于预测负载，默认当前时间
+
+        只对半径内距离最近的 top_n × CANDIDATE_FACTOR 个设施打分
+        """
+        timestamp = timestamp or datetime.now()
+        limit = max(top_n, 1) * CANDIDATE_FACTOR
+        radius = radius_km
+        idx, distances = self.candidates(latitude, longitude, radius, limit)
+        while len(idx) < top_n and radius < max_radius_km:
+            radius = min(radius * 2, max_radius_km)
+            idx, distances = self.candidates(latitude, longitude, radius, limit)
+        if len(idx) == 0:
+            return []
+
+        # 距离得分：按搜索半径做指数衰减，只定位到城市中心的设施不计距离分
+        city_located = self.city_located[idx]
+        distance_score = np.where(city_located, 0.0, np.exp(-distances / max(radius_km, 1e-6)))
+
+        _, load_rates = estimate_load_rates(
+            self.daily_visitors[idx], self.seats[idx], self.types[idx], timestamp, self.nearby_counts[idx]
+        )
+        load_score = 1.0 - load_rates
+
+        sport_index = {s: i for i, s in enumerate(self.sport_vocab)}
+        wanted = sorted({sport_index[s] for s in (SPORT_ALIASES.get(s, s) for s in sports or []) if s in sport_index})
+        if wanted:
+            sport_score = self.sport_matrix[np.ix_(idx, wanted)].sum(axis=1) / len(wanted)
+        else:
+            sport_score = np.zeros(len(idx))
+
+        ratings = self.ratings[idx]
+        rating_score = np.where(np.isnan(ratings), 0.5, np.clip(ratings / 5.0, 0, 1))
+
+        w = self.weights
+        scores = (w['distance'] * distance_score + w['load'] * load_score
+                  + w['sport'] * sport_score + w['rating'] * rating_score)
+
+        k = min(top_n, len(idx))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        results = []
+        for j in top:
+            record = self.records[idx[j]]
+            results.append({
+                'facility_id': record['facility_id'],
+                'name': record['name'],
+                'type': record['type'],
+                'city': record['city'],
+                # 只定位到城市中心的设施没有可信的距离
+                'distance_km': None if record['location_precision'] == 'city' else round(float(distances[j]), 2),
+                'location_precision': record['location_precision'],
+                'rating': record['rating'],
+                'activities': record['sports'],
+                'predicted_load': round(float(load_rates[j]), 3),
+                'recommendation_score': round(float(scores[j]), 4),
+                'reason': self._reason(distances[j], load_rates[j], sport_score[j],
+                                       record['location_precision'])
+            })
+        return results
+
+    @staticmethod
+    def _reason(distance: float, load_rate: float, sport_match: float,
+                location_precision: str = 'exact') -> str:
+        """生成推荐理由（只定位到城市中心的设施不给出距离理由）"""
+        reasons = []
+        if location_precision != 'city' and distance <= 3:
+            reasons.append("距离近")
+        if sport_match > 0:
+            reasons.append("提供您喜欢的运动项目")
+        if load_rate < 0.4:
+            reasons.append("当前人少")
+        elif load_rate > 0.8:
+            reasons.append("当前较拥挤,建议错峰前往")
+        return ",".join(reasons) or "综合评分较高"
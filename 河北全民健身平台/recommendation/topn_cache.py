@@ -0,0 +1,275 @@
+"""
+推荐结果预计算缓存
+每次训练完成后批量计算所有用户的Top-N推荐列表与相似用户列表，
+以紧凑的int32/float32矩阵存储，在线请求只需O(1)查表
+"""
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+# 以脚本方式运行时也能导入项目内模块
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+from ml_models.model_artifact import save_artifact, load_artifact
+
+
+def top_n(scores: np.ndarray, n: int) -> Tuple[np.ndarray, np.ndarray]:
+    """按行取分数最高的n个位置
+
+    Args:
+        scores: 形状 (rows, cols) 的分数矩阵，不可推荐的位置为 -inf
+        n: 每行保留数量
+
+    Returns:
+        (indices, values)，不足n个有效值时 indices 以 -1 补齐
+    """
+    rows, cols = scores.shape
+    n = min(n, cols)
+    if n <= 0:
+        return np.empty((rows, 0), dtype=np.int32), np.empty((rows, 0), dtype=np.float32)
+
+    part = np.argpartition(-scores, n - 1, axis=1)[:, :n]
+    part_scores = np.take_along_axis(scores, part, axis=1)
+    order = np.argsort(-part_scores, axis=1, kind='stable')
+    indices = np.take_along_axis(part, order, axis=1).astype(np.int32)
+    values = np.take_along_axis(part_scores, order, axis=1).astype(np.float32)
+
+    indices[~np.isfinite(values)] = -1
+    return indices, values
+
+
+def item_based_scores(ratings: np.ndarray, item_similarity: np.ndarray) -> np.ndarray:
+    """基于项目的协同过滤预测分数（与 item_based_recommend 的加权平均一致）
+
+    只使用正相似度，已评分项目与无法预测的项目记为 -inf
+    """
+    rated = ratings > 0
+    similarity = np.clip(item_similarity, 0, None).T
+    numerator = ratings @ similarity
+    denominator = rated.astype(similarity.dtype) @ similarity
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scores = np.where(denominator > 0, numerator / denominator, -np.inf)
+    scores[rated] = -np.inf
+    return scores
+
+
+def user_based_scores(ratings: np.ndarray, user_similarity_rows: np.ndarray,
+                      row_offset: int = 0) -> np.ndarray:
+    """基于用户的协同过滤预测分数（与 user_based_recommend 的加权平均一致）
+
+    Args:
+        ratings: 全量用户-项目评分矩阵
+        user_similarity_rows: 本批用户与全部用户的相似度 (batch, num_users)
+        row_offset: 本批第一个用户在评分矩阵中的行号
+    """
+    batch = user_similarity_rows.shape[0]
+    similarity = np.clip(user_similarity_rows, 0, None).copy()
+    similarity[np.arange(batch), np.arange(row_offset, row_offset + batch)] = 0
+
+    rated = ratings > 0
+    numerator = similarity @ ratings
+    denominator = similarity @ rated.astype(similarity.dtype)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scores = np.where(denominator > 0, numerator / denominator, -np.inf)
+    scores[rated[row_offset:row_offset + batch]] = -np.inf
+    return scores
+
+
+class TopNCache:
+    """Top-N推荐缓存"""
+
+    MODEL_TYPE = 'recommend_topn'
+
+    def __init__(self, user_ids: np.ndarray, item_ids: np.ndarray,
+                 lists: Dict[str, Tuple[np.ndarray, np.ndarray]],
+                 similar: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+                 popularity: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+                 validation: Optional[Dict[str, float]] = None):
+        """
+        Args:
+            user_ids: 行号 -> 用户ID
+            item_ids: 列号 -> 项目ID
+            lists: 推荐方法 -> (项目列号矩阵, 分数矩阵)
+            similar: (相似用户行号矩阵, 相似度矩阵)
+            popularity: (各项目评分人数, 各项目平均评分)
+            validation: 推荐方法（含 popular）-> 留出交互上的MRR
+        """
+        self.user_ids = user_ids
+        self.item_ids = item_ids
+        self.lists = lists
+        self.similar = similar
+        self.popularity = popularity
+        self.validation = dict(validation or {})
+        self._user_row = {int(u): i for i, u in enumerate(user_ids)}
+
+    @property
+    def methods(self) -> List[str]:
+        return list(self.lists)
+
+    def validated(self, method: str) -> bool:
+        """该方法的推荐列表已预计算，且留出验证MRR高于热门推荐"""
+        return (method in self.lists and method in self.validation
+                and self.validation[method] > self.validation.get('popular', 0.0))
+
+    def has_user(self, user_id: int) -> bool:
+        return user_id in self._user_row
+
+    def recommend(self, method: str, user_id: int, top_n: int = 10) -> Optional[List[Tuple[int, float]]]:
+        """查表获取推荐结果，缓存中没有该用户时返回None"""
+        row = self._user_row.get(user_id)
+        if row is None or method not in self.lists:
+            return None
+
+        items, scores = self.lists[method]
+        result = []
+        for col, score in zip(items[row, :top_n], scores[row, :top_n]):
+            if col < 0:
+                break
+            result.append((int(self.item_ids[col]), float(score)))
+        return result
+
+    def similar_users(self, user_id: int, top_n: int = 10) -> Optional[List[Tuple[int, float]]]:
+        """查表获取相似用户"""
+        row = self._user_row.get(user_id)
+        if row is None or self.similar is None:
+            return None
+
+        users, scores = self.similar
+        result = []
+        for other, score in zip(users[row, :top_n], scores[row, :top_n]):
+            if other < 0:
+                break
+            result.append((int(self.user_ids[other]), float(score)))
+        return result
+
+    def popular_items(self, limit: int = 10) -> List[Dict]:
+        """按评分人数排序的热门项目"""
+        if self.popularity is None:
+            return []
+
+        counts, mean_ratings = self.popularity
+        order = np.lexsort((-mean_ratings, -counts))[:limit]
+        return [
+            {
+                'item_id': int(self.item_ids[i]),
+                'count': int(counts[i]),
+                'mean_rating': round(float(mean_ratings[i]), 2)
+            }
+            for i in order if counts[i] > 0
+        ]
+
+    @classmethod
+    def build(cls, cf_recommender, ncf_model=None, top_n_size: int = 20,
+              similar_k: int = 20, chunk_size: int = 2048,
+              validation: Optional[Dict[str, float]] = None) -> 'TopNCache':
+        """批量预计算所有用户的推荐列表
+
+        Args:
+            cf_recommender: 已构建评分矩阵的 CollaborativeFilteringRecommender
+            ncf_model: 可选，以评分矩阵行/列号为ID训练的 NeuralCollaborativeFiltering
+            top_n_size: 每个用户保留的推荐数量
+            similar_k: 每个用户保留的相似用户数量
+            chunk_size: 每批计算的用户数，控制中间矩阵的内存占用
+            validation: 推荐方法 -> 留出验证MRR，随缓存一起发布
+        """
+        matrix = cf_recommender.user_item_matrix
+        if matrix is None:
+            raise ValueError("请先构建用户-项目矩阵")
+        if cf_recommender.item_similarity is None:
+            cf_recommender.calculate_item_similarity()
+        if cf_recommender.user_similarity is None:
+            cf_recommender.calculate_user_similarity()
+
+        ratings = np.asarray(matrix.values, dtype=np.float32)
+        item_similarity = np.asarray(cf_recommender.item_similarity, dtype=np.float32)
+        user_similarity = np.asarray(cf_recommender.user_similarity, dtype=np.float32)
+        num_users, num_items = ratings.shape
+
+        methods = ['item_based', 'user_based'] + (['ncf'] if ncf_model is not None else [])
+        lists = {
+            m: (np.full((num_users, min(top_n_size, num_items)), -1, dtype=np.int32),
+                np.full((num_users, min(top_n_size, num_items)), -np.inf, dtype=np.float32))
+            for m in methods
+        }
+        k = min(similar_k, max(num_users - 1, 0))
+        similar_users = np.full((num_users, k), -1, dtype=np.int32)
+        similar_scores = np.zeros((num_users, k), dtype=np.float32)
+
+        for start in range(0, num_users, chunk_size):
+            end = min(start + chunk_size, num_users)
+            chunk_ratings = ratings[start:end]
+
+            chunk_scores = {
+                'item_based': item_based_scores(chunk_ratings, item_similarity),
+                'user_based': user_based_scores(ratings, user_similarity[start:end], start)
+            }
+            if ncf_model is not None:
+                ncf_scores = ncf_model.score_all(np.arange(start, end)).astype(np.float32)
+                ncf_scores[chunk_ratings > 0] = -np.inf
+                chunk_scores['ncf'] = ncf_scores
+
+            for method, scores in chunk_scores.items():
+                items, values = top_n(scores, top_n_size)
+                lists[method][0][start:end] = items
+                lists[method][1][start:end] = values
+
+            # 相似用户（排除自身）
+            if k > 0:
+                sims = user_similarity[start:end].copy()
+                sims[np.arange(end - start), np.arange(start, end)] = -np.inf
+                users, values = top_n(sims, k)
+                similar_users[start:end] = users
+                similar_scores[start:end] = values
+
+        rated = ratings > 0
+        counts = rated.sum(axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean_ratings = np.where(counts > 0, ratings.sum(axis=0) / counts, 0)
+
+        logger.info(f"预计算推荐缓存: {num_users}个用户 × Top-{top_n_size}, 方法: {', '.join(methods)}")
+        return cls(
+            user_ids=np.asarray(matrix.index, dtype=np.int64),
+            item_ids=np.asarray(matrix.columns, dtype=np.int64),
+            lists=lists,
+            similar=(similar_users, similar_scores),
+            popularity=(counts.astype(np.int32), mean_ratings.astype(np.float32)),
+            validation=validation
+        )
+
+    def save(self, filepath: str):
+        """保存缓存（模型目录格式）"""
+        arrays = {'user_ids': self.user_ids, 'item_ids': self.item_ids}
+        for method, (items, scores) in self.lists.items():
+            arrays[f'{method}_items'] = items
+            arrays[f'{method}_scores'] = scores
+        if self.similar is not None:
+            arrays['similar_users'], arrays['similar_scores'] = self.similar
+        if self.popularity is not None:
+            arrays['popular_counts'], arrays['popular_ratings'] = self.popularity
+
+        config = {
+            'methods': self.methods,
+            'num_users': len(self.user_ids),
+            'num_items': len(self.item_ids),
+            'validation': self.validation
+        }
+        save_artifact(filepath, self.MODEL_TYPE, config, arrays)
+        logger.info(f"推荐缓存已保存到: {filepath}")
+
+    @classmethod
+    def from_file(cls, filepath: str, mmap: bool = True) -> 'TopNCache':
+        """从模型目录加载缓存"""
+        manifest, arrays = load_artifact(filepath, mmap=mmap)
+        lists = {
+            m: (arrays[f'{m}_items'], arrays[f'{m}_scores'])
+            for m in manifest['config']['methods']
+        }
+        similar = (arrays['similar_users'], arrays['similar_scores']) if 'similar_users' in arrays else None
+        popularity = (arrays['popular_counts'], arrays['popular_ratings']) if 'popular_counts' in arrays else None
+        return cls(arrays['user_ids'], arrays['item_ids'], lists, similar, popularity,
+                   manifest['config'].get('validation'))
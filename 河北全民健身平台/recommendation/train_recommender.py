@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+推荐模型训练与发布
+训练协同过滤与NCF模型，批量预计算全部用户的Top-N推荐缓存，
+并以新版本发布到模型目录，后端的模型注册中心会自动切换到新版本。
+NCF先在留出交互上与热门推荐比较MRR，不优于热门推荐时不发布
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+# 以脚本方式运行时也能导入项目内模块
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+from ml_models.model_artifact import new_version_path
+from ml_models.recommendation.deep_recommender import NeuralCollaborativeFiltering
+from recommendation.collaborative.cf_recommender import FitnessActivityRecommender
+from recommendation.topn_cache import TopNCache
+
+
+def load_interactions(interactions_file: str, num_users: int = 50,
+                      num_interactions: int = 200) -> List[Dict]:
+    """加载交互数据，文件不存在时生成示例数据
+
+    Args:
+        interactions_file: [{"user_id": 1, "item_id": 1, "rating": 5}, ...] 格式的JSON文件
+    """
+    path = Path(interactions_file)
+    if path.exists():
+        with open(path, 'r', encoding='utf-8') as f:
+            interactions = json.load(f)
+        logger.info(f"加载 {len(interactions)} 条交互数据: {path}")
+        return interactions
+
+    logger.warning(f"未找到交互数据 {path}，使用示例数据")
+    return FitnessActivityRecommender().generate_sample_interactions(num_users, num_interactions)
+
+
+def split_holdout(ratings: np.ndarray, seed: int = 42) -> Tuple[np.ndarray, np.ndarray]:
+    """留一法划分：每个至少有2条交互的用户随机留出一条交互用于验证
+
+    Returns:
+        (训练评分矩阵, 各用户留出的项目列号，没有留出时为-1)
+    """
+    rng = np.random.default_rng(seed)
+    train = ratings.copy()
+    held_out = np.full(ratings.shape[0], -1, dtype=np.int64)
+    for row in range(ratings.shape[0]):
+        rated = np.flatnonzero(ratings[row] > 0)
+        if len(rated) >= 2:
+            held_out[row] = rng.choice(rated)
+            train[row, held_out[row]] = 0
+    return train, held_out
+
+
+def reciprocal_rank(scores: np.ndarray, train: np.ndarray, held_out: np.ndarray) -> float:
+    """留出项目在候选项目（排除训练集中已评分项目）中排名倒数的平均值（MRR）
+
+    同分项目排在留出项目之前不计入，对同分较多的热门推荐偏宽松
+    """
+    users = np.flatnonzero(held_out >= 0)
+    if len(users) == 0:
+        return 0.0
+    scores = np.asarray(scores[users], dtype=np.float64).copy()
+    scores[train[users] > 0] = -np.inf
+    target = scores[np.arange(len(users)), held_out[users]]
+    ranks = 1 + (scores > target[:, None]).sum(axis=1)
+    return float(np.mean(1.0 / ranks))
+
+
+def train_ncf(ratings: np.ndarray, epochs: int, seed: int = 42) -> NeuralCollaborativeFiltering:
+    """以评分矩阵的行/列号作为用户/项目ID训练NCF，评分归一化到[0, 1]"""
+    users, items = np.nonzero(ratings)
+    max_rating = float(ratings.max()) or 1.0
+    ncf_interactions = [(int(u), int(i), float(ratings[u, i]) / max_rating) for u, i in zip(users, items)]
+    np.random.seed(seed)
+    model = NeuralCollaborativeFiltering(num_users=ratings.shape[0], num_items=ratings.shape[1])
+    model.train(ncf_interactions, epochs=epochs, seed=seed)
+    return model
+
+
+def validate_ncf(ratings: np.ndarray, epochs: int) -> Tuple[float, float]:
+    """在留出交互上比较NCF与热门推荐的MRR
+
+    Returns:
+        (NCF的MRR, 热门推荐的MRR)
+    """
+    train, held_out = split_holdout(ratings)
+    model = train_ncf(train, epochs)
+    ncf_mrr = reciprocal_rank(model.score_all(np.arange(ratings.shape[0])), train, held_out)
+    # 热门推荐：按训练集中的评分人数排序，人数相同再按评分总和
+    popularity = (train > 0).sum(axis=0) + train.sum(axis=0) / (train.sum() + 1)
+    popular_mrr = reciprocal_rank(np.broadcast_to(popularity, train.shape), train, held_out)
+    return ncf_mrr, popular_mrr
+
+
+def train_and_publish(interactions: List[Dict], model_dir: str, epochs: int = 30,
+                      top_n: int = 20, with_ncf: bool = True) -> Dict[str, Path]:
+    """训练推荐模型并发布
+
+    NCF在留出交互上的MRR不高于热门推荐时不发布，也不写入推荐缓存
+
+    Returns:
+        模型名 -> 发布路径
+    """
+    recommender = FitnessActivityRecommender()
+    cf = recommender.cf_recommender
+    matrix = cf.build_user_item_matrix(interactions)
+    cf.calculate_user_similarity()
+    cf.calculate_item_similarity()
+
+    ncf_model: Optional[NeuralCollaborativeFiltering] = None
+    validation: Dict[str, float] = {}
+    if with_ncf:
+        ratings = np.asarray(matrix.values, dtype=np.float64)
+        ncf_mrr, popular_mrr = validate_ncf(ratings, epochs)
+        logger.info(f"留出验证 MRR: NCF {ncf_mrr:.3f}, 热门推荐 {popular_mrr:.3f}")
+        if ncf_mrr > popular_mrr:
+            # 验证通过后用全部交互重新训练
+            ncf_model = train_ncf(ratings, epochs)
+            validation = {'ncf': ncf_mrr, 'popular': popular_mrr}
+        else:
+            logger.warning("NCF未优于热门推荐，本次不发布NCF模型")
+
+    cache = TopNCache.build(cf, ncf_model, top_n_size=top_n, validation=validation)
+
+    published = {}
+    path = new_version_path(model_dir, 'cf_similarity')
+    cf.save(str(path))
+    published['cf_similarity'] = path
+
+    if ncf_model is not None:
+        path = new_version_path(model_dir, 'ncf')
+        ncf_model.save(str(path))
+        published['ncf'] = path
+
+    # 缓存最后发布，保证其引用的模型版本已经可用
+    path = new_version_path(model_dir, 'recommend_topn')
+    cache.save(str(path))
+    published['recommend_topn'] = path
+
+    for name, path in published.items():
+        logger.info(f"  {name}: {path}")
+    return published
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="训练推荐模型并发布Top-N缓存")
+    parser.add_argument('--interactions', default='data/processed/interactions.json', help='交互数据JSON文件')
+    parser.add_argument('--model-dir', default='ml_models/saved_models', help='模型发布目录')
+    parser.add_argument('--epochs', type=int, default=30, help='NCF训练轮数')
+    parser.add_argument('--top-n', type=int, default=20, help='每个用户预计算的推荐数量')
+    parser.add_argument('--no-ncf', action='store_true', help='不训练NCF模型')
+    args = parser.parse_args()
+
+    logger.info("=" * 60)
+    logger.info("训练推荐模型")
+    logger.info("=" * 60)
+
+    interactions = load_interactions(args.interactions)
+    train_and_publish(interactions, args.model_dir, epochs=args.epochs,
+                      top_n=args.top_n, with_ncf=not args.no_ncf)
+
+    logger.info("✅ 推荐模型已发布!")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,22 +6,18 @@
 __version__ = "1.0.0"
 __author__ = "郝秀功"
 
-from .feature_engineering import FeatureEngineer
-from .models.lstm_model import LSTMPredictor
-from .models.xgboost_model import XGBoostPredictor
-from .models.prophet_model import ProphetPredictor
-from .models.kg_enhanced_model import KGEnhancedPredictor
-from .ensemble import EnsemblePredictor
-from .scheduler import ScheduleOptimizer
-from .distributor import TrafficDistributor
+from .traffic_predictor import (
+    FeatureExtractor,
+    SimpleTrafficPredictor,
+    ScheduleOptimizer,
+    TrafficDistributor,
+    estimate_load_rates,
+)
 
 __all__ = [
-    'FeatureEngineer',
-    'LSTMPredictor',
-    'XGBoostPredictor',
-    'ProphetPredictor',
-    'KGEnhancedPredictor',
-    'EnsemblePredictor',
+    'FeatureExtractor',
+    'SimpleTrafficPredictor',
     'ScheduleOptimizer',
-    'TrafficDistributor'
+    'TrafficDistributor',
+    'estimate_load_rates'
 ]
@@ -3,22 +3,169 @@
 """
 训练数据生成器
 基于现有日客流数据生成小时级训练数据
+
+按 日期 × 设施 × 营业小时 整块广播计算期望客流，节假日、季节、周末因子按日期数组查表，
+噪声来自带种子的 np.random.Generator；数据按天分块生成，可逐块写成按月分区的
+Parquet/CSV 文件，多年、数千个设施的数据也只占一个分块的内存
 """
 
+import argparse
 import json
+import sys
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-from typing import List, Dict
+from typing import Dict, Iterator, List, Optional
 from loguru import logger
 from pathlib import Path
 
+# 没有匹配小时分布时使用的设施类型
+DEFAULT_FACILITY_TYPE = '体育场'
+
+# 季节调整因子，下标为月份（0不用）：春1.1 夏1.2 秋1.15 冬0.9
+SEASON_FACTORS = np.array([0.9, 0.9, 0.9, 1.1, 1.1, 1.1, 1.2, 1.2, 1.2, 1.15, 1.15, 1.15, 0.9])
+
+# 节假日（简化版）：(月, 起始日, 结束日)
+HOLIDAYS = [
+    (1, 1, 7),    # 春节
+    (4, 4, 6),    # 清明
+    (5, 1, 5),    # 劳动节
+    (6, 22, 24),  # 端午
+    (9, 15, 17),  # 中秋
+    (10, 1, 7)    # 国庆
+]
+
+WEEKEND_FACTOR = 1.3
+HOLIDAY_FACTOR = 1.5
+
+# 每个分块的目标记录数，决定一次生成多少天
+DEFAULT_CHUNK_ROWS = 1_000_000
+
+OUTPUT_FORMATS = ('parquet', 'csv')
+
+
+def _holiday_table() -> np.ndarray:
+    """[月, 日] -> 是否节假日"""
+    table = np.zeros((13, 32), dtype=bool)
+    for month, first, last in HOLIDAYS:
+        table[month, first:last + 1] = True
+    return table
+
+
+HOLIDAY_TABLE = _holiday_table()
+
+
+def date_parts(dates: np.ndarray) -> Dict[str, np.ndarray]:
+    """datetime64[D] 日期数组 -> 月、日、星期（周一为0）"""
+    months = dates.astype('datetime64[M]')
+    return {
+        'month': months.astype(np.int64) % 12 + 1,
+        'day': (dates - months).astype(np.int64) + 1,
+        # 1970-01-01 是星期四
+        'weekday': (dates.astype(np.int64) + 3) % 7
+    }
+
+
+def day_factors(dates: np.ndarray) -> np.ndarray:
+    """每天的 周末 × 季节 × 节假日 调整因子"""
+    parts = date_parts(dates)
+    weekend = np.where(parts['weekday'] >= 5, WEEKEND_FACTOR, 1.0)
+    holiday = np.where(HOLIDAY_TABLE[parts['month'], parts['day']], HOLIDAY_FACTOR, 1.0)
+    return weekend * SEASON_FACTORS[parts['month']] * holiday
+
+
+class TrafficStatistics:
+    """逐块累积的客流统计，结果与一次性对整张表统计相同
+
+    客流为非负整数，用直方图得到精确中位数，用整数和与平方和得到样本标准差
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.total_squares = 0
+        self.histogram = np.zeros(0, dtype=np.int64)
+        self.facilities = set()
+        self.first: Optional[pd.Timestamp] = None
+        self.last: Optional[pd.Timestamp] = None
+        sizes = {'hour': 24, 'weekday': 7, 'month': 13}
+        self.sums = {key: np.zeros(size) for key, size in sizes.items()}
+        self.counts = {key: np.zeros(size, dtype=np.int64) for key, size in sizes.items()}
+
+    def update(self, df: pd.DataFrame) -> 'TrafficStatistics':
+        """累积一个分块（含 facility_id, timestamp, visitors）"""
+        if df.empty:
+            return self
+        visitors = df['visitors'].to_numpy(dtype=np.int64)
+        self.count += len(visitors)
+        self.total += int(visitors.sum())
+        self.total_squares += int(np.dot(visitors, visitors))
+
+        histogram = np.bincount(visitors)
+        if len(histogram) > len(self.histogram):
+            histogram[:len(self.histogram)] += self.histogram
+            self.histogram = histogram
+        else:
+            self.histogram[:len(histogram)] += histogram
+
+        self.facilities.update(df['facility_id'].unique())
+        timestamps = df['timestamp']
+        first, last = timestamps.min(), timestamps.max()
+        self.first = first if self.first is None else min(self.first, first)
+        self.last = last if self.last is None else max(self.last, last)
+
+        dt = timestamps.dt
+        for key, values in (('hour', dt.hour), ('weekday', dt.dayofweek), ('month', dt.month)):
+            values = values.to_numpy()
+            self.sums[key] += np.bincount(values, weights=visitors, minlength=len(self.sums[key]))
+            self.counts[key] += np.bincount(values, minlength=len(self.counts[key]))
+        return self
+
+    def _median(self) -> float:
+        cumulative = np.cumsum(self.histogram)
+        lower = int(np.searchsorted(cumulative, (self.count - 1) // 2 + 1))
+        upper = int(np.searchsorted(cumulative, self.count // 2 + 1))
+        return (lower + upper) / 2
+
+    def _means(self, key: str) -> Dict[int, float]:
+        counts = self.counts[key]
+        return {int(i): float(self.sums[key][i] / counts[i]) for i in np.nonzero(counts)[0]}
+
+    def to_dict(self) -> Dict:
+        """统计结果，格式与 TrafficDataGenerator.generate_statistics 一致"""
+        n = self.count
+        variance = (n * self.total_squares - self.total ** 2) / (n * (n - 1)) if n > 1 else float('nan')
+        return {
+            'total_records': n,
+            'facilities_count': len(self.facilities),
+            'date_range': {
+                'start': self.first.strftime('%Y-%m-%d'),
+                'end': self.last.strftime('%Y-%m-%d'),
+                'days': (self.last - self.first).days + 1
+            },
+            'visitors': {
+                'total': self.total,
+                'mean': self.total / n,
+                'median': self._median(),
+                'std': float(np.sqrt(variance)),
+                'min': int(np.nonzero(self.histogram)[0][0]),
+                'max': len(self.histogram) - 1
+            },
+            'by_hour': self._means('hour'),
+            'by_weekday': self._means('weekday'),
+            'by_month': self._means('month')
+        }
+
 
 class TrafficDataGenerator:
     """客流数据生成器"""
-    
-    def __init__(self):
-        """初始化"""
+
+    def __init__(self, seed: Optional[int] = None):
+        """初始化
+
+        Args:
+            seed: 随机种子，相同种子与参数生成相同的数据（与分块大小无关）
+        """
         # 不同设施类型的小时分布模式
         self.hourly_patterns = {
             '体育场': {
@@ -41,80 +188,170 @@ class TrafficDataGenerator:
                 15: 0.08, 16: 0.10, 17: 0.12, 18: 0.15, 19: 0.14, 20: 0.08, 21: 0.01
             }
         }
-        
+        self.rng = np.random.default_rng(seed)
+
         logger.info("✅ 数据生成器初始化完成")
-    
-    def generate_hourly_data(self, facilities_data: List[Dict], 
+
+    def _facility_hours(self, facilities_data: List[Dict]) -> Dict:
+        """展开所有 (设施, 营业小时) 组合，按设施顺序、小时升序排列，日客流为0的设施跳过"""
+        facility_ids, base, hours, owners = [], [], [], []
+        for facility in facilities_data:
+            daily_visitors = facility.get('indicators', {}).get('daily_visitors', 0)
+            if daily_visitors == 0:
+                continue
+            facility_type = facility.get('facility_type', DEFAULT_FACILITY_TYPE)
+            pattern = self.hourly_patterns.get(facility_type, self.hourly_patterns[DEFAULT_FACILITY_TYPE])
+            for hour, ratio in sorted(pattern.items()):
+                owners.append(len(facility_ids))
+                hours.append(hour)
+                base.append(daily_visitors * ratio)
+            facility_ids.append(f"Facility_{facility['id']}")
+
+        codes, categories = pd.factorize(pd.Series(facility_ids, dtype=object))
+        return {
+            'categories': categories,
+            'codes': codes[np.asarray(owners, dtype=np.int64)] if owners else np.zeros(0, dtype=np.int64),
+            'hours': np.asarray(hours, dtype='timedelta64[h]'),
+            'base': np.asarray(base, dtype=np.float64)
+        }
+
+    @staticmethod
+    def _day_chunks(start_date: datetime, end_date: datetime, chunk_days: int) -> Iterator[np.ndarray]:
+        """把日期范围切成不超过 chunk_days 天、且不跨月的分块"""
+        day = np.datetime64(start_date.date(), 'D')
+        last = np.datetime64(end_date.date(), 'D')
+        while day <= last:
+            month_end = (day.astype('datetime64[M]') + 1).astype('datetime64[D]') - 1
+            stop = min(day + chunk_days - 1, month_end, last)
+            yield np.arange(day, stop + 1, dtype='datetime64[D]')
+            day = stop + 1
+
+    def iter_hourly_chunks(self, facilities_data: List[Dict],
+                           start_date: datetime, end_date: datetime,
+                           noise_level: float = 0.15,
+                           chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+        """逐块生成小时级客流数据
+
+        每块覆盖若干天（不跨月），行按 日期、设施、小时 排序；
+        期望客流 = 日客流 × 小时占比 × 周末/季节/节假日因子，叠加标准差为 noise_level 倍期望值的正态噪声
+
+        Args:
+            facilities_data: 场馆数据列表
+            start_date: 开始日期
+            end_date: 结束日期
+            noise_level: 噪声水平（标准差占比）
+            chunk_rows: 每块的目标记录数
+
+        Yields:
+            包含 facility_id, timestamp, visitors 的DataFrame
+        """
+        slots = self._facility_hours(facilities_data)
+        base, hours = slots['base'], slots['hours']
+        if not len(base) or end_date < start_date:
+            return
+
+        total_days = (end_date.date() - start_date.date()).days + 1
+        chunk_days = max(1, chunk_rows // len(base))
+        done = 0
+        for dates in self._day_chunks(start_date, end_date, chunk_days):
+            expected = day_factors(dates)[:, None] * base[None, :]
+            # 噪声按 日期、设施、小时 的顺序抽取，分块大小不影响结果
+            noise = self.rng.standard_normal(expected.shape) * (expected * noise_level)
+            visitors = np.maximum(0, (expected + noise).astype(np.int64))
+
+            timestamps = dates.astype('datetime64[h]')[:, None] + hours[None, :]
+            yield pd.DataFrame({
+                'facility_id': pd.Categorical.from_codes(np.tile(slots['codes'], len(dates)),
+                                                         categories=slots['categories']),
+                'timestamp': timestamps.ravel().astype('datetime64[ns]'),
+                'visitors': visitors.ravel()
+            })
+
+            done += len(dates)
+            logger.debug(f"已生成 {done}/{total_days} 天数据")
+
+    def generate_hourly_data(self, facilities_data: List[Dict],
                             start_date: datetime, end_date: datetime,
                             noise_level: float = 0.15) -> pd.DataFrame:
         """生成小时级客流数据
-        
+
         Args:
             facilities_data: 场馆数据列表
             start_date: 开始日期
             end_date: 结束日期
             noise_level: 噪声水平（标准差占比）
-            
+
         Returns:
             包含 facility_id, timestamp, visitors 的DataFrame
         """
         logger.info(f"开始生成数据: {start_date} 到 {end_date}")
         logger.info(f"场馆数量: {len(facilities_data)}")
-        
-        data = []
-        current_date = start_date
-        total_days = (end_date - start_date).days + 1
-        
-        while current_date <= end_date:
-            for facility in facilities_data:
-                facility_id = f"Facility_{facility['id']}"
-                facility_type = facility.get('facility_type', '体育场')
-                daily_visitors = facility.get('indicators', {}).get('daily_visitors', 0)
-                
-                if daily_visitors == 0:
-                    continue
-                
-                # 获取该类型的小时分布模式
-                pattern = self.hourly_patterns.get(facility_type, self.hourly_patterns['体育场'])
-                
-                for hour, ratio in pattern.items():
-                    timestamp = current_date.replace(hour=hour, minute=0, second=0)
-                    
-                    # 基础客流
-                    base_visitors = daily_visitors * ratio
-                    
-                    # 周末调整
-                    weekend_factor = 1.3 if timestamp.weekday() >= 5 else 1.0
-                    
-                    # 季节调整
-                    season_factor = self._get_season_factor(timestamp.month)
-                    
-                    # 节假日调整
-                    holiday_factor = 1.5 if self._is_holiday(timestamp) else 1.0
-                    
-                    # 综合计算
-                    expected_visitors = base_visitors * weekend_factor * season_factor * holiday_factor
-                    
-                    # 添加随机噪声
-                    noise = np.random.normal(0, expected_visitors * noise_level)
-                    visitors = max(0, int(expected_visitors + noise))
-                    
-                    data.append({
-                        'facility_id': facility_id,
-                        'timestamp': timestamp,
-                        'visitors': visitors
-                    })
-            
-            current_date += timedelta(days=1)
-            
-            if (current_date - start_date).days % 30 == 0:
-                logger.info(f"已生成 {(current_date - start_date).days}/{total_days} 天数据")
-        
-        df = pd.DataFrame(data)
+
+        chunks = list(self.iter_hourly_chunks(facilities_data, start_date, end_date, noise_level))
+        if chunks:
+            df = pd.concat(chunks, ignore_index=True)
+            df['facility_id'] = df['facility_id'].astype(object)
+        else:
+            df = pd.DataFrame(columns=['facility_id', 'timestamp', 'visitors'])
         logger.info(f"✅ 数据生成完成: {len(df)} 条记录")
-        
+
         return df
-    
+
+    def write_partitions(self, facilities_data: List[Dict], start_date: datetime, end_date: datetime,
+                         output_dir: str, output_format: str = 'parquet', noise_level: float = 0.15,
+                         chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Dict:
+        """生成数据并逐块写入按月分区的文件（output_dir/month=YYYY-MM/part-NNNNN.parquet）
+
+        内存中只保留一个分块；重新生成时先清除所写月份分区中原有的分块文件
+
+        Args:
+            facilities_data: 场馆数据列表
+            start_date: 开始日期
+            end_date: 结束日期
+            output_dir: 输出目录
+            output_format: parquet（需要 pyarrow）或 csv
+            noise_level: 噪声水平（标准差占比）
+            chunk_rows: 每个分块文件的目标记录数
+
+        Returns:
+            写入的文件列表、记录数与统计信息
+
+        Raises:
+            ValueError: 不支持的输出格式
+        """
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"不支持的输出格式: {output_format}，可选 {', '.join(OUTPUT_FORMATS)}")
+
+        logger.info(f"开始生成数据: {start_date} 到 {end_date}，场馆数量: {len(facilities_data)}")
+        root = Path(output_dir)
+        statistics = TrafficStatistics()
+        files: List[str] = []
+        parts: Dict[Path, int] = {}
+        for chunk in self.iter_hourly_chunks(facilities_data, start_date, end_date, noise_level, chunk_rows):
+            partition = root / f"month={chunk['timestamp'].iloc[0]:%Y-%m}"
+            if partition not in parts:
+                partition.mkdir(parents=True, exist_ok=True)
+                for stale in partition.glob('part-*'):
+                    stale.unlink()
+                parts[partition] = 0
+            path = partition / f"part-{parts[partition]:05d}.{output_format}"
+            parts[partition] += 1
+
+            if output_format == 'parquet':
+                chunk.to_parquet(path, index=False)
+            else:
+                chunk.to_csv(path, index=False)
+            statistics.update(chunk)
+            files.append(str(path))
+            logger.info(f"已写入 {path} ({len(chunk):,} 条)")
+
+        logger.info(f"✅ 数据生成完成: {statistics.count:,} 条记录，{len(files)} 个文件")
+        return {
+            'files': files,
+            'records': statistics.count,
+            'statistics': statistics.to_dict() if statistics.count else None
+        }
+
     def generate_from_json(self, json_file: str, start_date: str, end_date: str,
                           output_file: str = None) -> pd.DataFrame:
         """从JSON文件生成数据
@@ -150,93 +387,52 @@ class TrafficDataGenerator:
         
         return df
     
-    def _get_season_factor(self, month: int) -> float:
-        """获取季节调整因子"""
-        if month in [3, 4, 5]:  # 春季
-            return 1.1
-        elif month in [6, 7, 8]:  # 夏季
-            return 1.2
-        elif month in [9, 10, 11]:  # 秋季
-            return 1.15
-        else:  # 冬季
-            return 0.9
-    
-    def _is_holiday(self, timestamp: datetime) -> bool:
-        """判断是否为节假日（简化版）"""
-        # 春节
-        if timestamp.month == 1 and 1 <= timestamp.day <= 7:
-            return True
-        # 清明
-        if timestamp.month == 4 and 4 <= timestamp.day <= 6:
-            return True
-        # 劳动节
-        if timestamp.month == 5 and 1 <= timestamp.day <= 5:
-            return True
-        # 端午
-        if timestamp.month == 6 and timestamp.day in [22, 23, 24]:
-            return True
-        # 中秋
-        if timestamp.month == 9 and timestamp.day in [15, 16, 17]:
-            return True
-        # 国庆
-        if timestamp.month == 10 and 1 <= timestamp.day <= 7:
-            return True
-        
-        return False
-    
     def generate_statistics(self, df: pd.DataFrame) -> Dict:
         """生成数据统计信息"""
-        stats = {
-            'total_records': len(df),
-            'facilities_count': df['facility_id'].nunique(),
-            'date_range': {
-                'start': df['timestamp'].min().strftime('%Y-%m-%d'),
-                'end': df['timestamp'].max().strftime('%Y-%m-%d'),
-                'days': (df['timestamp'].max() - df['timestamp'].min()).days + 1
-            },
-            'visitors': {
-                'total': int(df['visitors'].sum()),
-                'mean': float(df['visitors'].mean()),
-                'median': float(df['visitors'].median()),
-                'std': float(df['visitors'].std()),
-                'min': int(df['visitors'].min()),
-                'max': int(df['visitors'].max())
-            },
-            'by_hour': df.groupby(df['timestamp'].dt.hour)['visitors'].mean().to_dict(),
-            'by_weekday': df.groupby(df['timestamp'].dt.dayofweek)['visitors'].mean().to_dict(),
-            'by_month': df.groupby(df['timestamp'].dt.month)['visitors'].mean().to_dict()
-        }
-        
-        return stats
+        return TrafficStatistics().update(df).to_dict()
 
 
 def main():
     """主函数 - 生成训练数据"""
-    import sys
-    
+    parser = argparse.ArgumentParser(description="生成小时级客流训练数据")
+    parser.add_argument('--facilities-file', default='fitness_facilities_data.json', help='场馆数据JSON文件')
+    parser.add_argument('--start-date', default='2023-01-01', help='开始日期 (YYYY-MM-DD)')
+    parser.add_argument('--end-date', default='2023-12-31', help='结束日期 (YYYY-MM-DD)')
+    parser.add_argument('--output-dir', default='data/columnar/traffic',
+                        help='分区输出目录（默认为列式数据层的 traffic 数据集）')
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='parquet', help='输出格式')
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS, help='每个分块文件的记录数')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子')
+    args = parser.parse_args()
+
     # 配置日志
     logger.remove()
     logger.add(sys.stderr, level="INFO")
     logger.add("logs/data_generation.log", rotation="10 MB", level="DEBUG")
-    
+
     logger.info("=" * 80)
     logger.info("开始生成训练数据")
     logger.info("=" * 80)
-    
+
     # 创建生成器
-    generator = TrafficDataGenerator()
-    
-    # 生成2023年全年数据
-    df = generator.generate_from_json(
-        json_file='fitness_facilities_data.json',
-        start_date='2023-01-01',
-        end_date='2023-12-31',
-        output_file='traffic_prediction/data/hourly_traffic_2023.csv'
+    generator = TrafficDataGenerator(seed=args.seed)
+
+    with open(args.facilities_file, 'r', encoding='utf-8') as f:
+        facilities = json.load(f)['facilities']
+
+    result = generator.write_partitions(
+        facilities,
+        datetime.strptime(args.start_date, '%Y-%m-%d'),
+        datetime.strptime(args.end_date, '%Y-%m-%d'),
+        output_dir=args.output_dir,
+        output_format=args.format,
+        chunk_rows=args.chunk_rows
     )
-    
-    # 生成统计信息
-    stats = generator.generate_statistics(df)
-    
+    stats = result['statistics']
+    if stats is None:
+        logger.warning("没有生成任何记录")
+        return
+
     logger.info("\n" + "=" * 80)
     logger.info("数据统计信息")
     logger.info("=" * 80)
@@ -251,13 +447,13 @@ def main():
     logger.info(f"  标准差: {stats['visitors']['std']:.1f}")
     logger.info(f"  最小值: {stats['visitors']['min']}")
     logger.info(f"  最大值: {stats['visitors']['max']}")
-    
+
     # 保存统计信息
     stats_file = 'traffic_prediction/data/data_statistics.json'
     with open(stats_file, 'w', encoding='utf-8') as f:
         json.dump(stats, f, ensure_ascii=False, indent=2)
     logger.info(f"\n✅ 统计信息已保存到: {stats_file}")
-    
+
     logger.info("\n" + "=" * 80)
     logger.info("🎉 数据生成完成!")
     logger.info("=" * 80)
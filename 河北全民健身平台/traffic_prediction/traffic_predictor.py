@@ -5,7 +5,6 @@
 结合知识图谱的多因素客流预测系统
 """
 
-import json
 import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
@@ -14,12 +13,92 @@ from loguru import logger
 import sys
 from pathlib import Path
 
-# 配置日志
-log_dir = Path("logs")
-log_dir.mkdir(exist_ok=True)
-logger.remove()
-logger.add(sys.stderr, level="INFO")
-logger.add(log_dir / "traffic_prediction.log", rotation="10 MB", level="DEBUG")
+# 以脚本方式运行时也能导入项目内模块
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+from knowledge_graph.relation_table import load_graph
+
+# 典型的小时客流分布模式（相对日均客流的调整因子）
+HOURLY_PATTERN = {
+    6: 0.3, 7: 0.5, 8: 0.7, 9: 0.9,
+    10: 0.8, 11: 0.7, 12: 0.5, 13: 0.4,
+    14: 0.5, 15: 0.7, 16: 0.9, 17: 1.2,
+    18: 1.5, 19: 1.3, 20: 0.8, 21: 0.4
+}
+
+# 设施类型调整因子
+TYPE_FACTORS = {
+    '体育馆': 1.1,  # 体育馆更受欢迎
+    '健身中心': 1.2,  # 健身中心客流稳定
+    '游泳馆': 0.9  # 游泳馆季节性强
+}
+
+
+def configure_logging():
+    """配置日志（以脚本方式运行时调用）"""
+    log_dir = Path("logs")
+    log_dir.mkdir(exist_ok=True)
+    logger.remove()
+    logger.add(sys.stderr, level="INFO")
+    logger.add(log_dir / "traffic_prediction.log", rotation="10 MB", level="DEBUG")
+
+
+def season_factor(month: int) -> float:
+    """获取季节调整因子"""
+    # 春夏秋冬的客流差异
+    if month in [3, 4, 5]:  # 春季
+        return 1.1
+    elif month in [6, 7, 8]:  # 夏季
+        return 1.2
+    elif month in [9, 10, 11]:  # 秋季
+        return 1.15
+    else:  # 冬季
+        return 0.9
+
+
+def kg_factors(nearby_counts: np.ndarray) -> np.ndarray:
+    """批量计算知识图谱调整因子（同城设施数量的竞争/独家效应）"""
+    nearby_counts = np.asarray(nearby_counts)
+    # 同城设施多则竞争激烈产生分流效应，少于5个则有独家优势
+    return np.select(
+        [nearby_counts > 30, nearby_counts > 15, nearby_counts < 5],
+        [0.9, 0.95, 1.1],
+        default=1.0
+    )
+
+
+def estimate_load_rates(daily_visitors: np.ndarray, seats: np.ndarray,
+                        facility_types: np.ndarray, timestamp: datetime,
+                        nearby_counts: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray]:
+    """批量估算多个设施在某一时刻的客流与负载率
+
+    规则与 SimpleTrafficPredictor.predict 一致，一次向量化计算代替逐个设施提取特征
+
+    Args:
+        daily_visitors: 日均客流
+        seats: 座位数（容量按1.5倍座位数计算）
+        facility_types: 设施类型名称
+        timestamp: 预测时间点
+        nearby_counts: 同城设施数量，缺省时不做邻近调整
+
+    Returns:
+        (predicted_visitors, load_rates)
+    """
+    daily_visitors = np.asarray(daily_visitors, dtype=np.float64)
+    hour_factor = HOURLY_PATTERN.get(timestamp.hour, 0.1)
+    weekend_factor = 1.3 if timestamp.weekday() >= 5 else 1.0
+    type_factor = np.array([TYPE_FACTORS.get(t, 1.0) for t in facility_types], dtype=np.float64)
+    kg_factor = kg_factors(nearby_counts) if nearby_counts is not None else 1.0
+
+    capacity = np.asarray(seats, dtype=np.float64) * 1.5
+    predicted = daily_visitors * hour_factor * weekend_factor * season_factor(timestamp.month) * type_factor * kg_factor
+    predicted = np.minimum(predicted, capacity)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        load_rates = np.where(capacity > 0, np.minimum(predicted / capacity, 1.0), 0.0)
+    return predicted, load_rates
 
 
 class FeatureExtractor:
@@ -31,11 +110,10 @@ class FeatureExtractor:
         Args:
             kg_data_file: 知识图谱JSON文件路径
         """
-        with open(kg_data_file, 'r', encoding='utf-8') as f:
-            self.kg_data = json.load(f)
-        
-        self.entities = self.kg_data['entities']
-        self.relations = self.kg_data['relations']
+        # 与同进程内其他模块共享同一份列式存储
+        self.graph = load_graph(kg_data_file)
+        self.entities = self.graph.entities
+        self.relations = self.graph.relations
         logger.info("✅ 特征提取器初始化完成")
     
     def extract_time_features(self, timestamp: datetime) -> Dict:
@@ -69,11 +147,7 @@ class FeatureExtractor:
     def extract_facility_features(self, facility_id: str) -> Dict:
         """从知识图谱提取场馆特征"""
         # 查找设施实体
-        facility = None
-        for fac_id, fac_data in self.entities['Facility'].items():
-            if fac_id == facility_id:
-                facility = fac_data
-                break
+        facility = self.entities['Facility'].get(facility_id)
         
         if not facility:
             logger.warning(f"未找到设施: {facility_id}")
@@ -112,21 +186,20 @@ class FeatureExtractor:
         has_subsidy = 0
         city_id = None
         
-        for rel in self.relations:
-            if rel['subject'] == facility_id:
-                relation_count += 1
-                
-                # 提供的运动项目
-                if rel['predicate'] == '提供':
-                    sports.append(rel['object'])
-                
-                # 政策受益
-                if rel['predicate'] == '受益于':
-                    has_subsidy = 1
-                
-                # 所在城市
-                if rel['predicate'] == '位于':
-                    city_id = rel['object']
+        for rel in self.relations.by_subject(facility_id):
+            relation_count += 1
+            
+            # 提供的运动项目
+            if rel['predicate'] == '提供':
+                sports.append(rel['object'])
+            
+            # 政策受益
+            if rel['predicate'] == '受益于':
+                has_subsidy = 1
+            
+            # 所在城市
+            if rel['predicate'] == '位于':
+                city_id = rel['object']
         
         features['relation_count'] = relation_count
         features['sport_count'] = len(sports)
@@ -154,11 +227,10 @@ class FeatureExtractor:
         """获取城市的所有设施"""
         facilities = []
         
-        for rel in self.relations:
-            if rel['predicate'] == '位于' and rel['object'] == city_id:
-                fac_id = rel['subject']
-                if fac_id in self.entities['Facility']:
-                    facilities.append(self.entities['Facility'][fac_id])
+        for rel in self.relations.relations(predicate='位于', object=city_id):
+            fac_id = rel['subject']
+            if fac_id in self.entities['Facility']:
+                facilities.append(self.entities['Facility'][fac_id])
         
         return facilities
     
@@ -263,53 +335,27 @@ class SimpleTrafficPredictor:
     
     def _get_hour_factor(self, hour: int) -> float:
         """获取小时调整因子"""
-        # 典型的客流分布模式
-        hourly_pattern = {
-            6: 0.3, 7: 0.5, 8: 0.7, 9: 0.9,
-            10: 0.8, 11: 0.7, 12: 0.5, 13: 0.4,
-            14: 0.5, 15: 0.7, 16: 0.9, 17: 1.2,
-            18: 1.5, 19: 1.3, 20: 0.8, 21: 0.4
-        }
-        return hourly_pattern.get(hour, 0.1)
+        return HOURLY_PATTERN.get(hour, 0.1)
     
     def _get_season_factor(self, month: int) -> float:
         """获取季节调整因子"""
-        # 春夏秋冬的客流差异
-        if month in [3, 4, 5]:  # 春季
-            return 1.1
-        elif month in [6, 7, 8]:  # 夏季
-            return 1.2
-        elif month in [9, 10, 11]:  # 秋季
-            return 1.15
-        else:  # 冬季
-            return 0.9
+        return season_factor(month)
     
     def _get_type_factor(self, features: Dict) -> float:
         """获取设施类型调整因子"""
         if features.get('type_gymnasium'):
-            return 1.1  # 体育馆更受欢迎
+            return TYPE_FACTORS['体育馆']
         elif features.get('type_fitness'):
-            return 1.2  # 健身中心客流稳定
+            return TYPE_FACTORS['健身中心']
         elif features.get('type_swimming'):
-            return 0.9  # 游泳馆季节性强
+            return TYPE_FACTORS['游泳馆']
         else:
             return 1.0
     
     def _get_kg_factor(self, features: Dict) -> float:
         """获取知识图谱调整因子"""
         # 基于邻近设施的影响
-        nearby_count = features.get('nearby_facility_count', 0)
-        
-        if nearby_count > 30:
-            # 竞争激烈，分流效应
-            return 0.9
-        elif nearby_count > 15:
-            return 0.95
-        elif nearby_count < 5:
-            # 独家优势
-            return 1.1
-        else:
-            return 1.0
+        return float(kg_factors(features.get('nearby_facility_count', 0)))
 
 
 class ScheduleOptimizer:
@@ -492,13 +538,12 @@ class TrafficDistributor:
         """获取城市设施"""
         facilities = []
         
-        for rel in self.feature_extractor.relations:
-            if rel['predicate'] == '位于' and rel['object'] == city_id:
-                fac_id = rel['subject']
-                if fac_id in self.feature_extractor.entities['Facility']:
-                    fac_data = self.feature_extractor.entities['Facility'][fac_id]
-                    fac_data['id'] = fac_id
-                    facilities.append(fac_data)
+        for rel in self.feature_extractor.relations.relations(predicate='位于', object=city_id):
+            fac_id = rel['subject']
+            if fac_id in self.feature_extractor.entities['Facility']:
+                # 图谱数据为共享只读，返回副本
+                fac_data = self.feature_extractor.entities['Facility'][fac_id]
+                facilities.append({**fac_data, 'id': fac_id})
         
         return facilities
     
@@ -579,4 +624,5 @@ def demo():
 
 
 if __name__ == "__main__":
+    configure_logging()
     demo()